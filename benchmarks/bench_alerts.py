@@ -0,0 +1,64 @@
+# Costo della valutazione degli alert con centinaia di regole su serie per host
+# Uso: python benchmarks/bench_alerts.py [campioni] [host,host,...]
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from forecasting_plugin.alerts import AlertEngine, default_rules, host_rules  # noqa: E402
+from forecasting_plugin.config import Config  # noqa: E402
+
+
+def traces(hosts, samples, seed=0):
+    """Random walk per host (percentuali di allocazione) più aggregati cpu/ram"""
+    rng = np.random.default_rng(seed)
+    steps = rng.normal(0, 2.0, (samples, hosts, 2))
+    walk = np.clip(30 + np.cumsum(steps, axis=0), 0, 100)
+    return walk
+
+
+def run(hosts, samples):
+    names = [f'compute-{i:04d}' for i in range(hosts)]
+    engine = AlertEngine(default_rules(Config))
+    for host in names:
+        for rule in host_rules(Config, host):
+            engine.add_rule(rule)
+
+    walk = traces(hosts, samples)
+    series = [(f'host:{h}:cpu', f'host:{h}:ram') for h in names]
+    rows = []
+    for t in range(samples):
+        values = {'cpu': float(walk[t, :, 0].mean()), 'ram': float(walk[t, :, 1].mean()), 'storage': 40.0}
+        for column, (cpu_key, ram_key) in enumerate(series):
+            values[cpu_key] = walk[t, column, 0]
+            values[ram_key] = walk[t, column, 1]
+        rows.append(values)
+
+    start = time.perf_counter()
+    for t, values in enumerate(rows):
+        engine.evaluate(t * 60.0, values)
+    elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(10000):
+        engine.alerts()
+    read = (time.perf_counter() - start) / 10000
+
+    return len(engine.rules), elapsed / samples, engine.transitions, len(engine.alerts()), read
+
+
+def main():
+    samples = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    counts = [int(c) for c in sys.argv[2].split(',')] if len(sys.argv) > 2 else [10, 100, 250, 500]
+
+    print(f"{'host':>6} {'regole':>7} {'us/campione':>12} {'transizioni':>12} {'attivi':>7} {'lettura us':>11}")
+    for hosts in counts:
+        rules, per_sample, transitions, active, read = run(hosts, samples)
+        print(f"{hosts:6d} {rules:7d} {per_sample * 1e6:12.1f} {transitions:12d} {active:7d} {read * 1e6:11.3f}")
+
+
+if __name__ == '__main__':
+    main()
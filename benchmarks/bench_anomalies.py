@@ -0,0 +1,143 @@
+# Rilevamento di anomalie all'ingestione: throughput su milioni di campioni riprodotti, qualità
+# delle rilevazioni su spike iniettati ed effetto della quarantena sulle medie orarie viste dalle previsioni
+# Uso: python benchmarks/bench_anomalies.py [campioni_totali] [cicli_collector]
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from forecasting_plugin.anomalies import SERIES_FLAGS, AnomalyDetector  # noqa: E402
+from forecasting_plugin.config import Config  # noqa: E402
+
+
+def trace(cycles, n_series, seed=0):
+    """Serie al minuto: profilo giornaliero + rumore, con spike e cambi di livello iniettati (etichette note)"""
+    rng = np.random.default_rng(seed)
+    minutes = np.arange(cycles)
+    daily = 15 * np.sin(2 * np.pi * (minutes / 60 - 8) / 24)
+    clean = 40 + daily[:, None] + rng.normal(0, 1.5, (cycles, n_series))
+
+    # Cambi di livello (VM avviate/spente) in media ogni 6 ore per serie: livelli a tratti in ±12 punti
+    changes = rng.random((cycles, n_series)) < 1 / 360
+    segments = np.cumsum(changes, axis=0)
+    clean += rng.uniform(-12, 12, (segments.max() + 1, n_series))[segments, np.arange(n_series)]
+    clean = np.clip(clean, 0, 100)
+
+    # Spike isolati sullo 0.5% dei campioni, ampiezza 12-40 punti
+    spikes = rng.random((cycles, n_series)) < 0.005
+    observed = clean.copy()
+    observed[spikes] += rng.choice([-1, 1], spikes.sum()) * rng.uniform(12, 40, spikes.sum())
+
+    # I campioni subito dopo un cambio di livello non si valutano: finché il cambio non è
+    # confermato (ANOMALY_SHIFT_SAMPLES campioni) il rilevatore li marca come spike
+    settling = np.zeros_like(changes)
+    for lag in range(Config.ANOMALY_SHIFT_SAMPLES):
+        settling[lag:] |= changes[:cycles - lag]
+    return np.clip(observed, 0, 100), clean, spikes, settling
+
+
+def detector(series):
+    return AnomalyDetector(series, alpha=Config.ANOMALY_ALPHA, z_threshold=Config.ANOMALY_Z_THRESHOLD,
+                           min_std=Config.ANOMALY_MIN_STD, warmup=Config.ANOMALY_WARMUP,
+                           shift_samples=Config.ANOMALY_SHIFT_SAMPLES)
+
+
+def replay(observed, series):
+    """Un observe() per ciclo su tutte le serie; restituisce (secondi, maschera degli spike marcati)"""
+    d = detector(series)
+    rows = observed.tolist()
+    flagged = np.zeros(observed.shape, dtype=bool)
+    start = time.perf_counter()
+    for j, row in enumerate(rows):
+        _, detections = d.observe(j * 60, dict(zip(series, row)), 'openstack_calculated')
+        for detection in detections:
+            if detection['kind'] == 'spike':
+                flagged[j, series.index(detection['series'])] = True
+    return time.perf_counter() - start, flagged
+
+
+def throughput(total):
+    print(f"Throughput (circa {total:,} campioni riprodotti per riga)")
+    print(f"{'serie':>7} {'cicli':>9} {'campioni/s':>12} {'µs/ciclo':>9} {'precisione':>11} {'recall':>7}")
+    for n_series in (2, 16, 128, 512):
+        cycles = max(1, total // n_series)
+        observed, _, spikes, settling = trace(cycles, n_series)
+        series = [f'host:{i}:cpu' for i in range(n_series)]
+        seconds, flagged = replay(observed, series)
+        flagged, spikes = flagged & ~settling, spikes & ~settling
+        precision = (flagged & spikes).sum() / max(1, flagged.sum())
+        recall = (flagged & spikes).sum() / max(1, spikes.sum())
+        print(f"{n_series:>7} {cycles:>9,} {cycles * n_series / seconds:>12,.0f} {seconds / cycles * 1e6:>9.1f} "
+              f"{precision:>11.3f} {recall:>7.3f}")
+
+
+def hourly_skew(cycles):
+    """Errore delle medie orarie (input delle previsioni) rispetto al segnale pulito, con e senza quarantena"""
+    observed, clean, _, _ = trace(cycles, 2, seed=1)
+    d = detector(('cpu', 'ram'))
+    keep = np.ones(observed.shape, dtype=bool)
+    pending = [[], []]
+    for j, (cpu, ram) in enumerate(observed.tolist()):
+        flags, detections = d.observe(j * 60, {'cpu': cpu, 'ram': ram}, 'openstack_calculated')
+        shifted = {x['series'] for x in detections if x['kind'] == 'level_shift'}
+        for s, key in enumerate(('cpu', 'ram')):
+            # Come il collector: spike trattenuti, rilasciati se il cambio di livello viene confermato
+            if flags & SERIES_FLAGS[key]:
+                keep[j, s] = False
+                pending[s].append(j)
+                continue
+            if key in shifted:
+                keep[pending[s], s] = True
+            pending[s] = []
+
+    hours = cycles // 60
+    shape = (hours, 60, 2)
+    truth = clean[:hours * 60].reshape(shape).mean(axis=1)
+    raw = observed[:hours * 60].reshape(shape).mean(axis=1)
+    kept = keep[:hours * 60].reshape(shape)
+    quarantined = np.where(kept, observed[:hours * 60].reshape(shape), 0).sum(axis=1) / kept.sum(axis=1)
+    print(f"\nMedie orarie su {hours} ore (2 serie): errore assoluto rispetto al segnale pulito")
+    print(f"{'storico':>22} {'medio':>7} {'p99':>7} {'max':>7}")
+    for name, hourly in (('grezzo', raw), ('spike in quarantena', quarantined)):
+        error = np.abs(hourly - truth)
+        print(f"{name:>22} {error.mean():7.3f} {np.percentile(error, 99):7.3f} {error.max():7.3f}")
+
+
+def collector_cycle(cycles):
+    """Costo del rilevamento dentro _record_sample del collector (simulazione, storage spento)"""
+    Config.STORAGE_ENABLED = False
+    Config.SSE_ENABLED = False
+    from forecasting_plugin.collector import collector
+    from forecasting_plugin.simulation import FakeConnection, ScriptedFleet, Simulation, VirtualClock
+
+    clock = VirtualClock(time.time() - cycles * 60)
+    simulation = Simulation(collector, clock, FakeConnection(ScriptedFleet(200, hosts=4, seed=0), clock), seed=0)
+    timings = {'senza rilevamento': [], 'con rilevamento': []}
+    detector_backup = collector.anomalies
+    for _ in range(2):  # Modalità alternate: il riscaldamento non favorisce nessuna delle due
+        for name in timings:
+            collector.anomalies = detector_backup if name == 'con rilevamento' else None
+            start = time.perf_counter()
+            simulation.run(cycles * 60 // 4)
+            timings[name].append((time.perf_counter() - start) / (cycles // 4) * 1e6)
+    collector.anomalies = detector_backup
+    timings = {name: min(runs) for name, runs in timings.items()}
+    print(f"\nCiclo completo del collector simulato ({cycles // 2:,} cicli per modalità, migliore di 2)")
+    for name, us in timings.items():
+        print(f"{name:>22} {us:9.1f} µs/ciclo")
+    print(f"Anomalie: {collector.get_anomaly_stats()}")
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    cycles = int(sys.argv[2]) if len(sys.argv) > 2 else 20_000
+    throughput(total)
+    hourly_skew(14 * 1440)
+    collector_cycle(cycles)
+
+
+if __name__ == '__main__':
+    main()
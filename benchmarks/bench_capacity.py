@@ -0,0 +1,110 @@
+# Pianificazione della capacità: passaggio vettoriale su host x orizzonti x flavor contro cicli Python,
+# e richieste a /api/v1/capacity con e senza cache per versione
+# Uso: python benchmarks/bench_capacity.py [host] [flavor] [richieste]
+import math
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from forecasting_plugin.config import Config  # noqa: E402
+
+Config.STORAGE_ENABLED = False
+Config.SSE_ENABLED = False
+
+from forecasting_plugin.capacity import flavor_fits, peak_percents  # noqa: E402
+
+HORIZONS = [6, 12, 24, 48]
+THRESHOLD = 90.0
+
+
+def loop_fits(total_vcpus, total_ram_mb, cpu_forecasts, ram_forecasts, cpu_now, ram_now, flavors):
+    """Riferimento: host per host, orizzonte per orizzonte, flavor per flavor"""
+    fits = {}
+    for horizon in HORIZONS:
+        for name, vcpus, ram_mb in flavors:
+            count = 0
+            for h in range(len(total_vcpus)):
+                cpu_peak = max(cpu_now[h], max(cpu_forecasts[h][:horizon]))
+                ram_peak = max(ram_now[h], max(ram_forecasts[h][:horizon]))
+                free_vcpus = max(total_vcpus[h] * (THRESHOLD - cpu_peak) / 100, 0.0)
+                free_ram = max(total_ram_mb[h] * (THRESHOLD - ram_peak) / 100, 0.0)
+                count += math.floor(min(free_vcpus / vcpus, free_ram / ram_mb) + 1e-9)
+            fits[horizon, name] = count
+    return fits
+
+
+def vector_fits(total_vcpus, total_ram_mb, cpu_forecasts, ram_forecasts, cpu_now, ram_now, flavors):
+    _, vcpus, ram_mb = zip(*flavors)
+    cpu_peaks = peak_percents(cpu_forecasts, cpu_now, HORIZONS)
+    ram_peaks = peak_percents(ram_forecasts, ram_now, HORIZONS)
+    return flavor_fits(total_vcpus, total_ram_mb, cpu_peaks, ram_peaks, vcpus, ram_mb, THRESHOLD)
+
+
+def timed(func, *args, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def kernel(hosts, n_flavors):
+    rng = np.random.default_rng(0)
+    total_vcpus = rng.choice([32, 64, 96], hosts)
+    total_ram_mb = total_vcpus * rng.choice([2048, 4096], hosts)
+    cpu_now = rng.uniform(20, 80, hosts)
+    ram_now = rng.uniform(20, 80, hosts)
+    cpu_forecasts = np.clip(cpu_now[:, None] + rng.normal(0, 5, (hosts, max(HORIZONS))).cumsum(axis=1), 0, 100)
+    ram_forecasts = np.clip(ram_now[:, None] + rng.normal(0, 5, (hosts, max(HORIZONS))).cumsum(axis=1), 0, 100)
+    flavors = [(f'f{i}', int(2 ** (i % 5)), int(1024 * 2 ** (i % 6))) for i in range(n_flavors)]
+    args = (total_vcpus, total_ram_mb, cpu_forecasts, ram_forecasts, cpu_now, ram_now, flavors)
+
+    loop_s, expected = timed(loop_fits, *args, repeat=1)
+    vector_s, fits = timed(vector_fits, *args)
+    same = all(fits[HORIZONS.index(h), [f[0] for f in flavors].index(name)] == count
+               for (h, name), count in expected.items())
+    print(f"{hosts} host x {len(HORIZONS)} orizzonti x {n_flavors} flavor")
+    print(f"  cicli Python  {loop_s * 1000:9.1f} ms")
+    print(f"  vettoriale    {vector_s * 1000:9.2f} ms  ({loop_s / vector_s:.0f}x, risultati identici: {same})")
+
+
+def endpoint(requests):
+    from forecasting_plugin.api import create_app, forecast_cache
+    from forecasting_plugin.collector import collector
+    from forecasting_plugin.simulation import FakeConnection, ScriptedFleet, Simulation, VirtualClock
+
+    clock = VirtualClock(time.time() - 7 * 86400)
+    Simulation(collector, clock, FakeConnection(ScriptedFleet(400, hosts=32, seed=0), clock), seed=0).run(7 * 86400)
+    client = create_app().test_client()
+    assert client.get('/api/v1/capacity').status_code == 200
+
+    def run(clear):
+        start = time.perf_counter()
+        for _ in range(requests):
+            if clear:
+                forecast_cache.clear()
+            client.get('/api/v1/capacity')
+        return requests / (time.perf_counter() - start)
+
+    uncached = run(clear=True)
+    cached = run(clear=False)
+    print(f"/api/v1/capacity, {len(collector.snapshot.host_metrics.hosts)} host, {requests} richieste")
+    print(f"  senza cache   {uncached:9.0f} req/s")
+    print(f"  con cache     {cached:9.0f} req/s (stessa versione dello storico)")
+
+
+def main():
+    hosts = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    n_flavors = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+    requests = int(sys.argv[3]) if len(sys.argv) > 3 else 300
+    kernel(hosts, n_flavors)
+    endpoint(requests)
+
+
+if __name__ == '__main__':
+    main()
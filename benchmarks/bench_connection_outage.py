@@ -0,0 +1,81 @@
+# Latenza dei cicli di raccolta durante un'interruzione del control plane: retry semplici contro circuit breaker
+# Uso: python benchmarks/bench_connection_outage.py [ore_interruzione] [timeout_chiamata_s] [scala]
+import logging
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from forecasting_plugin.config import Config  # noqa: E402
+
+Config.STORAGE_ENABLED = False
+Config.SSE_ENABLED = False
+
+from forecasting_plugin.collector import collector  # noqa: E402
+from forecasting_plugin.connections import CircuitBreaker, ConnectionManager  # noqa: E402
+from forecasting_plugin.simulation import (FakeConnection, Outages, ScriptedFleet, Simulation,  # noqa: E402
+                                           VirtualClock)
+
+
+def run(threshold, outage_hours, call_timeout, scale):
+    """Un giorno simulato con un'interruzione nel mezzo; tempi reali per ciclo (in secondi equivalenti)"""
+    clock = VirtualClock(time.time() - 86400)
+    outage = (clock.epoch + 6 * 3600, clock.epoch + (6 + outage_hours) * 3600)
+    # Ogni chiamata fallita costa il timeout di connessione (scalato in tempo reale)
+    outages = Outages(clock, [outage], latency=call_timeout * scale)
+    connection = FakeConnection(ScriptedFleet(200, hosts=4, seed=0), clock, outages=outages)
+    simulation = Simulation(collector, clock, connection, seed=0)
+    simulation.connections = ConnectionManager(
+        lambda: connection, retries=Config.OS_RETRIES,
+        backoff=Config.OS_RETRY_BACKOFF, backoff_max=Config.OS_RETRY_BACKOFF_MAX,
+        breaker=CircuitBreaker(threshold, Config.OS_BREAKER_RESET, clock=clock.monotonic),
+        sleep=lambda seconds: time.sleep(seconds * scale), rng=random.Random(0))
+
+    during = []
+    gaps_before = len(collector.gaps)
+    with simulation.attached() as c:
+        while clock.epoch < outage[1] + 3600:
+            start = time.perf_counter()
+            c.collect_once()
+            elapsed = (time.perf_counter() - start) / scale
+            if outage[0] <= clock.epoch < outage[1]:
+                during.append(elapsed)
+            clock.advance(Config.COLLECTION_INTERVAL)
+    during = np.array(during)
+    return {
+        'p50': np.percentile(during, 50),
+        'p99': np.percentile(during, 99),
+        'max': during.max(),
+        'calls': outages.failures,
+        'gaps': len(collector.gaps) - gaps_before,
+        'state': simulation.connections.breaker.state,
+    }
+
+
+def main():
+    outage_hours = float(sys.argv[1]) if len(sys.argv) > 1 else 2
+    call_timeout = float(sys.argv[2]) if len(sys.argv) > 2 else 10
+    scale = float(sys.argv[3]) if len(sys.argv) > 3 else 0.002  # 1 s simulato = 2 ms reali
+    logging.getLogger('forecasting_plugin').setLevel(logging.ERROR)  # Un warning per chiamata fallita falserebbe i tempi
+
+    # Storico reale prima dell'interruzione: i cicli falliti diventano buchi, non dati mock
+    clock = VirtualClock(time.time() - 2 * 86400)
+    Simulation(collector, clock, FakeConnection(ScriptedFleet(200, hosts=4, seed=0), clock)).run(3600)
+
+    modes = {'solo retry': 10 ** 9, 'breaker': Config.OS_BREAKER_THRESHOLD}
+    print(f"Interruzione di {outage_hours:g} h, timeout per chiamata {call_timeout:g} s, "
+          f"{Config.OS_RETRIES} retry con backoff {Config.OS_RETRY_BACKOFF}-{Config.OS_RETRY_BACKOFF_MAX} s")
+    print(f"{'modalità':>11} {'p50 s':>7} {'p99 s':>7} {'max s':>7} {'chiamate':>9} {'buchi':>6} {'circuito':>9}")
+    for name, threshold in modes.items():
+        r = run(threshold, outage_hours, call_timeout, scale)
+        print(f"{name:>11} {r['p50']:7.2f} {r['p99']:7.2f} {r['max']:7.2f} {r['calls']:9d} "
+              f"{r['gaps']:6d} {r['state']:>9}")
+    print(f"Timeout del poll server: {Config.POLL_SCHEDULES['servers']['timeout']} s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+# Previsioni batch (/api/v1/forecast/batch) contro la stessa sequenza di chiamate singole
+# Uso: python benchmarks/bench_forecast_batch.py [host] [ripetizioni]
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from forecasting_plugin.config import Config  # noqa: E402
+
+Config.STORAGE_ENABLED = False
+Config.SSE_ENABLED = False
+
+from forecasting_plugin.api import create_app, forecast_cache  # noqa: E402
+from forecasting_plugin.collector import collector  # noqa: E402
+from forecasting_plugin.simulation import FakeConnection, ScriptedFleet, Simulation, VirtualClock  # noqa: E402
+
+# CPU e RAM su quattro orizzonti, più le previsioni per host su due
+SPECS = ([{'metric': m, 'scope': 'cloud', 'hours': h} for m in ('cpu', 'ram') for h in (6, 12, 24, 48)]
+         + [{'metric': m, 'scope': 'hosts', 'hours': h} for m in ('cpu', 'ram') for h in (24, 48)])
+
+
+def single_url(spec):
+    if spec['scope'] == 'hosts':
+        return f"/api/v1/hosts/forecast?metric={spec['metric']}&hours={spec['hours']}"
+    return f"/api/v1/forecast/{spec['metric']}?hours={spec['hours']}"
+
+
+def run_singles(client):
+    return [client.get(single_url(spec)).get_json() for spec in SPECS]
+
+
+def run_batch(client):
+    return client.post('/api/v1/forecast/batch', json={'forecasts': SPECS}).get_json()['results']
+
+
+def measure(func, client, repeat, cold):
+    times = []
+    for _ in range(repeat):
+        if cold:
+            forecast_cache.clear()
+        start = time.perf_counter()
+        func(client)
+        times.append(time.perf_counter() - start)
+    return np.median(times) * 1000
+
+
+def main():
+    hosts = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+
+    clock = VirtualClock(time.time() - 8 * 86400)
+    fleet = ScriptedFleet(hosts * 12, hosts=hosts, seed=0)
+    Simulation(collector, clock, FakeConnection(fleet, clock), seed=0).run(8 * 86400 - 600)
+    client = create_app().test_client()
+
+    # Stessi valori: il batch riempie la cache con le chiavi delle chiamate singole
+    forecast_cache.clear()
+    batch = run_batch(client)
+    forecast_cache.clear()
+    singles = run_singles(client)
+    same = all(b.get('predictions', b.get('hosts')) == s.get('predictions', s.get('hosts'))
+               for b, s in zip(batch, singles))
+
+    print(f"{len(SPECS)} specifiche, {len(collector.snapshot.host_metrics.hosts)} host, "
+          f"mediana di {repeat} (risultati identici: {same})")
+    print(f"{'modalità':>22} {'cache fredda ms':>16} {'cache calda ms':>15}")
+    for name, func in (('chiamate singole', run_singles), ('batch', run_batch)):
+        print(f"{name:>22} {measure(func, client, repeat, True):16.2f} {measure(func, client, repeat, False):15.2f}")
+
+
+if __name__ == '__main__':
+    main()
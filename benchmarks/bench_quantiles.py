@@ -0,0 +1,101 @@
+# Bande di quantili: numero di simulazioni contro latenza, stabilità Monte Carlo e copertura reale p10-p90
+# Uso: python benchmarks/bench_quantiles.py [orizzonte] [settimane_traccia] [richieste]
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from forecasting_plugin.config import Config  # noqa: E402
+
+Config.STORAGE_ENABLED = False
+Config.SSE_ENABLED = False
+
+from forecasting_plugin.backtest import synthetic_trace  # noqa: E402
+from forecasting_plugin.predictor import ResourcePredictor  # noqa: E402
+from forecasting_plugin.seasonal import HarmonicModel  # noqa: E402
+
+SIMULATIONS = (100, 250, 1000, 4000, 10000)
+QUANTILES = (0.1, 0.5, 0.9)
+
+
+def bands(model, timestamps, values, origin, horizon, simulations, seed, fitted=None):
+    predictor = ResourcePredictor(seed=seed)
+    if model == 'seasonal':
+        return predictor.seasonal_bands(timestamps[:origin], values[:origin], horizon, timestamps[origin],
+                                        fitted, QUANTILES, simulations)
+    return predictor.sinusoidal_bands(values[origin - 168:origin], horizon,
+                                      datetime.fromtimestamp(timestamps[origin]).hour, QUANTILES, simulations)
+
+
+def evaluate(model, timestamps, values, horizon, simulations, origins):
+    """Latenza mediana, copertura e ampiezza p10-p90 sulle origini, dispersione MC del p90 fra seed"""
+    fitted = HarmonicModel()  # Fit incrementale lungo le origini, come nel servizio
+    times, covered, widths = [], [], []
+    for origin in origins:
+        start = time.perf_counter()
+        result = bands(model, timestamps, values, origin, horizon, simulations, origin, fitted)
+        times.append(time.perf_counter() - start)
+        low, high = np.array(result['p10']), np.array(result['p90'])
+        actual = values[origin:origin + horizon]
+        covered.append((actual >= low) & (actual <= high))
+        widths.append(high - low)
+
+    # Stessa origine, seed diversi: quanto si muove il p90 per solo effetto Monte Carlo
+    origin = origins[-1]
+    p90 = np.array([bands(model, timestamps, values, origin, horizon, simulations, seed)['p90']
+                    for seed in range(20)])
+    return {
+        'ms': np.median(times) * 1000,
+        'coverage': np.mean(covered),
+        'width': np.mean(widths),
+        'mc_std': p90.std(axis=0).mean(),
+    }
+
+
+def endpoint(requests):
+    from forecasting_plugin.api import create_app, forecast_cache
+    from forecasting_plugin.collector import collector
+    from forecasting_plugin.simulation import FakeConnection, ScriptedFleet, Simulation, VirtualClock
+
+    clock = VirtualClock(time.time() - 8 * 86400)
+    Simulation(collector, clock, FakeConnection(ScriptedFleet(400, hosts=16, seed=0), clock), seed=0).run(8 * 86400)
+    client = create_app().test_client()
+
+    print(f"\n/api/v1/forecast/cpu?hours=24, {requests} richieste senza cache")
+    print(f"{'simulazioni':>12} {'req/s':>8}")
+    for simulations in (0,) + SIMULATIONS:
+        url = f'/api/v1/forecast/cpu?hours=24&model=seasonal&simulations={simulations}'
+        assert client.get(url).status_code == 200
+        start = time.perf_counter()
+        for _ in range(requests):
+            forecast_cache.clear()
+            client.get(url)
+        print(f"{simulations:>12} {requests / (time.perf_counter() - start):8.0f}")
+
+
+def main():
+    horizon = int(sys.argv[1]) if len(sys.argv) > 1 else 24
+    weeks = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    requests = int(sys.argv[3]) if len(sys.argv) > 3 else 100
+
+    timestamps, values = synthetic_trace(weeks, seed=1)
+    origins = list(range(336, len(values) - horizon + 1, 12))
+    print(f"Traccia sintetica di {weeks} settimane, orizzonte {horizon} h, {len(origins)} origini, "
+          f"banda nominale p10-p90 = 0.80")
+    print(f"{'modello':>22} {'simulazioni':>12} {'ms/chiamata':>12} {'copertura':>10} {'ampiezza':>9} "
+          f"{'disp. MC p90':>13}")
+    for model in ('sinusoidal_with_trend', 'seasonal'):
+        for simulations in SIMULATIONS:
+            r = evaluate(model, timestamps, values, horizon, simulations, origins)
+            print(f"{model:>22} {simulations:>12} {r['ms']:12.2f} {r['coverage']:10.3f} {r['width']:9.1f} "
+                  f"{r['mc_std']:13.2f}")
+
+    endpoint(requests)
+
+
+if __name__ == '__main__':
+    main()
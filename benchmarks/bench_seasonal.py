@@ -0,0 +1,58 @@
+# Accuratezza e tempo di fit: modello stagionale armonico contro sinusoidal_with_trend
+# Uso: python benchmarks/bench_seasonal.py [settimane] [orizzonte_ore]
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from forecasting_plugin.backtest import synthetic_trace  # noqa: E402
+from forecasting_plugin.predictor import ResourcePredictor  # noqa: E402
+from forecasting_plugin.seasonal import HarmonicModel  # noqa: E402
+
+
+def main():
+    weeks = int(sys.argv[1]) if len(sys.argv) > 1 else 6
+    horizon = int(sys.argv[2]) if len(sys.argv) > 2 else 24
+    timestamps, values = synthetic_trace(weeks)
+
+    # Origini ogni 6 ore nelle ultime due settimane
+    origins = range(len(values) - 14 * 24 - horizon, len(values) - horizon, 6)
+    errors = {'sinusoidal_with_trend': [], 'seasonal': []}
+    times = {'sinusoidal_with_trend': [], 'seasonal': [], 'seasonal_full': []}
+
+    incremental = HarmonicModel()
+    for origin in origins:
+        actual = values[origin:origin + horizon]
+        start = timestamps[origin]
+
+        predictor = ResourcePredictor(seed=origin)
+        t0 = time.perf_counter()
+        sinus = predictor.sinusoidal_with_trend(values[origin - 168:origin], horizon,
+                                                datetime.fromtimestamp(start).hour)
+        times['sinusoidal_with_trend'].append(time.perf_counter() - t0)
+        errors['sinusoidal_with_trend'].append(np.abs(np.array(sinus) - actual).mean())
+
+        # Incrementale: il modello vede solo le ore nuove dall'origine precedente
+        t0 = time.perf_counter()
+        seasonal = predictor.seasonal_harmonic(timestamps[:origin], values[:origin], horizon, start, incremental)
+        times['seasonal'].append(time.perf_counter() - t0)
+        errors['seasonal'].append(np.abs(np.array(seasonal) - actual).mean())
+
+        # Riferimento: fit da zero su tutto lo storico a ogni origine
+        t0 = time.perf_counter()
+        predictor.seasonal_harmonic(timestamps[:origin], values[:origin], horizon, start)
+        times['seasonal_full'].append(time.perf_counter() - t0)
+
+    print(f"Traccia: {weeks} settimane orarie, {len(origins)} origini, orizzonte {horizon}h")
+    print(f"{'modello':>24} {'MAE':>7} {'ms/previsione':>14}")
+    for name in ('sinusoidal_with_trend', 'seasonal'):
+        print(f"{name:>24} {np.mean(errors[name]):7.2f} {np.mean(times[name]) * 1000:14.3f}")
+    print(f"{'seasonal (fit da zero)':>24} {'':>7} {np.mean(times['seasonal_full']) * 1000:14.3f}")
+
+
+if __name__ == '__main__':
+    main()
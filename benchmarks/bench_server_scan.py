@@ -0,0 +1,43 @@
+# Benchmark della scansione inventario su un endpoint compute finto
+# Uso: python benchmarks/bench_server_scan.py [numero_server] [latenza_pagina_ms]
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from forecasting_plugin.inventory import scan_servers  # noqa: E402
+from forecasting_plugin.simulation import SIM_FLAVORS, FakeConnection, ScriptedFleet, VirtualClock  # noqa: E402
+
+FLAVORS = {f['id']: f for f in SIM_FLAVORS}
+
+
+def resolve_flavor(server):
+    flavor = FLAVORS[server.flavor['id']]
+    return {'vcpus': flavor['vcpus'], 'ram_mb': flavor['ram']}
+
+
+def run(total, page_latency, page_size, max_workers):
+    # Flotta scriptata (simulation.py): ogni pagina costa un round-trip simulato
+    conn = FakeConnection(ScriptedFleet(total, hosts=32), VirtualClock(), page_latency)
+    tracemalloc.start()
+    start = time.perf_counter()
+    totals = scan_servers(conn, resolve_flavor, page_size=page_size, max_workers=max_workers)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    assert totals['server_count'] == total
+    print(f"{total:>7} server | page={page_size:>5} workers={max_workers} | "
+          f"{elapsed * 1000:8.1f} ms | picco {peak / 1024:8.1f} KiB | "
+          f"{conn.compute.requests} richieste")
+
+
+if __name__ == '__main__':
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    latency = (float(sys.argv[2]) if len(sys.argv) > 2 else 20) / 1000
+
+    for fleet in (total // 10, total):
+        for workers in (1, 4):
+            run(fleet, latency, 1000, workers)
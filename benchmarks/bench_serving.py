@@ -0,0 +1,81 @@
+# Load test della modalità prefork: richieste/s e latenza p99 al variare dei worker
+# Uso: python benchmarks/bench_serving.py [richieste_per_client] [client]
+import http.client
+import os
+import signal
+import subprocess
+import sys
+import time
+from multiprocessing import Pool
+
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+PATHS = ['/api/v1/metrics/current', '/api/v1/forecast/cpu?hours=24', '/api/v1/alerts']
+
+
+def client(args):
+    """Un client con connessione keep-alive: restituisce le latenze in secondi"""
+    port, requests = args
+    latencies = []
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    for i in range(requests):
+        start = time.perf_counter()
+        conn.request('GET', PATHS[i % len(PATHS)])
+        response = conn.getresponse()
+        response.read()
+        if response.getheader('Connection', '').lower() == 'close':
+            conn.close()
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        latencies.append(time.perf_counter() - start)
+    conn.close()
+    return latencies
+
+
+def wait_healthy(port, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            conn.request('GET', '/api/v1/health')
+            if conn.getresponse().status == 200:
+                return True
+        except OSError:
+            time.sleep(0.1)
+    return False
+
+
+def run(workers, port, requests, clients):
+    env = dict(os.environ, FORECASTING_STORAGE_ENABLED='0', PYTHONPATH=ROOT)
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'forecasting_plugin.server', '--host', '127.0.0.1',
+         '--port', str(port), '--workers', str(workers)],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        if not wait_healthy(port):
+            print(f"{workers} worker: il server non risponde")
+            return
+        time.sleep(1)  # Lascia pubblicare il primo snapshot del collector
+
+        with Pool(clients) as pool:
+            start = time.perf_counter()
+            results = pool.map(client, [(port, requests)] * clients)
+            elapsed = time.perf_counter() - start
+
+        latencies = np.concatenate(results) * 1000
+        print(f"{workers:>7} | {len(latencies) / elapsed:10.0f} | "
+              f"{np.percentile(latencies, 50):8.2f} | {np.percentile(latencies, 99):8.2f}")
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=10)
+
+
+if __name__ == '__main__':
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    clients = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+
+    print(f"{clients} client x {requests} richieste ({', '.join(PATHS)})")
+    print(f"{'worker':>7} | {'req/s':>10} | {'p50 ms':>8} | {'p99 ms':>8}")
+    for i, workers in enumerate((1, 2, 4, 8)):
+        run(workers, 18000 + i, requests, clients)
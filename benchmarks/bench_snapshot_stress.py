@@ -0,0 +1,168 @@
+# Stress delle letture concorrenti: snapshot immutabili contro lock condiviso e lettura diretta dello stato vivo,
+# più il costo di append e freeze() a ogni campione al crescere della capacità
+# Uso: python benchmarks/bench_snapshot_stress.py [lettori] [secondi_per_modalità] [campioni_per_lettura]
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from forecasting_plugin.config import Config  # noqa: E402
+
+# Solo memoria: il percorso misurato è quello delle letture dalle API
+Config.STORAGE_ENABLED = False
+Config.SSE_ENABLED = False
+
+from forecasting_plugin.collector import collector  # noqa: E402
+from forecasting_plugin.history import MetricsRingBuffer  # noqa: E402
+from forecasting_plugin.rollups import MetricRollups  # noqa: E402
+
+TOTAL = 100.0  # Lo scrittore salva sempre cpu + ram == TOTAL nello stesso campione
+
+
+def write(stop, counter):
+    """Scrittore: un campione dopo l'altro, senza pause, come un ciclo di raccolta velocissimo"""
+    epoch = int(time.time()) - 30 * 86400
+    i = 0
+    while not stop.is_set():
+        cpu = float(5 + i % 90)
+        collector._record_sample(epoch + 60 * i, cpu, TOTAL - cpu, 'mock_realistic', active_vms=i % 30000)
+        i += 1
+    counter.append(i)
+
+
+def read_snapshot(samples):
+    snap = collector.snapshot
+    history = snap.metrics_history
+    return (snap.version, history['cpu'].timestamps(samples), history['cpu'].values(samples),
+            history['ram'].timestamps(samples), history['ram'].values(samples))
+
+
+def read_locked(samples):
+    # Alternativa con lock: stessi dati, ma ogni lettore si serializza con lo scrittore e con gli altri
+    with collector._write_lock:
+        history = collector.metrics_history
+        return (collector.version, history['cpu'].timestamps(samples).copy(), history['cpu'].values(samples).copy(),
+                history['ram'].timestamps(samples).copy(), history['ram'].values(samples).copy())
+
+
+def read_live(samples):
+    # Senza snapshot né lock (come prima): cpu e ram possono appartenere a cicli diversi
+    history = collector.metrics_history
+    return (collector.version, history['cpu'].timestamps(samples).copy(), history['cpu'].values(samples).copy(),
+            history['ram'].timestamps(samples).copy(), history['ram'].values(samples).copy())
+
+
+def check(result, last_version):
+    """Invarianti di una lettura coerente; restituisce il numero di violazioni"""
+    version, cpu_ts, cpu, ram_ts, ram = result
+    if version < last_version:
+        return 1
+    if len(cpu_ts) != len(ram_ts) or not np.array_equal(cpu_ts, ram_ts):
+        return 1
+    return int(not np.allclose(cpu + ram, TOTAL))
+
+
+def reader(read, samples, stop, results):
+    latencies = []
+    violations = 0
+    last_version = 0
+    while not stop.is_set():
+        start = time.perf_counter()
+        result = read(samples)
+        latencies.append(time.perf_counter() - start)
+        violations += check(result, last_version)
+        last_version = result[0]
+    results.append((np.array(latencies), violations))
+
+
+def run(read, readers, seconds, samples):
+    stop = threading.Event()
+    written = []
+    results = []
+    threads = [threading.Thread(target=write, args=(stop, written))]
+    threads += [threading.Thread(target=reader, args=(read, samples, stop, results)) for _ in range(readers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    latencies = np.concatenate([r[0] for r in results]) * 1e6
+    return {
+        'reads': len(latencies),
+        'violations': sum(r[1] for r in results),
+        'p50': np.percentile(latencies, 50),
+        'p99': np.percentile(latencies, 99),
+        'max': latencies.max(),
+        'writes': written[0],
+    }
+
+
+def per_call(func, n):
+    start = time.perf_counter()
+    for i in range(n):
+        func(i)
+    return (time.perf_counter() - start) / n * 1e6
+
+
+def append_cost(n=20000):
+    """µs per campione: append semplice e append + freeze() come nel collector (uno snapshot per ciclo)"""
+    print(f"\nAppend e freeze() per campione ({n:,} campioni, storico già pieno)")
+    print(f"{'capacità':>10} {'append µs':>10} {'append+freeze µs':>17} {'rollup add+freeze µs':>21}")
+    for capacity in (1000, 10080, 100000):
+        buffer = MetricsRingBuffer(capacity)
+        for i in range(capacity):
+            buffer.append(i, 1.0, 'mock_realistic')
+        plain = per_call(lambda i: buffer.append(i, 1.0, 'mock_realistic'), n)
+
+        def append_freeze(i):
+            buffer.append(i, 1.0, 'mock_realistic')
+            buffer.freeze()
+        frozen = per_call(append_freeze, n)
+
+        rollups = MetricRollups()
+        rollups.load(np.arange(0, 60 * capacity, 60), np.ones(capacity))
+
+        def add_freeze(i):
+            rollups.add(60 * (capacity + i), 1.0)
+            rollups.freeze()
+        rolled = per_call(add_freeze, n)
+        print(f"{capacity:>10,} {plain:10.2f} {frozen:17.2f} {rolled:21.2f}")
+
+
+def main():
+    readers = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 3
+    samples = int(sys.argv[3]) if len(sys.argv) > 3 else 500
+
+    # Storico già pieno: le letture coprono `samples` campioni reali
+    stop = threading.Event()
+    threading.Timer(0.5, stop.set).start()
+    write(stop, [])
+
+    print(f"{readers} lettori + 1 scrittore, {seconds:.0f}s per modalità, {samples} campioni per lettura")
+    print(f"{'modalità':>10} {'letture/s':>10} {'p50 µs':>8} {'p99 µs':>8} {'max µs':>9} "
+          f"{'scritture/s':>12} {'violazioni':>11}")
+    modes = {'snapshot': read_snapshot, 'lock': read_locked, 'diretta': read_live}
+    outcome = {}
+    for name, read in modes.items():
+        stats = outcome[name] = run(read, readers, seconds, samples)
+        print(f"{name:>10} {stats['reads'] / seconds:10.0f} {stats['p50']:8.1f} {stats['p99']:8.1f} "
+              f"{stats['max']:9.1f} {stats['writes'] / seconds:12.0f} {stats['violations']:11d}")
+
+    # Le letture dallo snapshot non devono mai vedere uno stato a metà
+    if outcome['snapshot']['violations']:
+        print("ERRORE: letture incoerenti dagli snapshot")
+        sys.exit(1)
+    print("Snapshot: nessuna lettura incoerente")
+
+    append_cost()
+
+
+if __name__ == '__main__':
+    main()
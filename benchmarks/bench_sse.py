@@ -0,0 +1,87 @@
+# Latenza di fan-out dello stream SSE al crescere dei client connessi
+# Uso: python benchmarks/bench_sse.py [eventi] [client,client,...]
+import asyncio
+import json
+import os
+import sys
+import time
+from multiprocessing import Process, Queue
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from forecasting_plugin.events import Broadcaster, SSEServer  # noqa: E402
+
+
+async def _subscribe(port, events, ready, latencies):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(b'GET /api/v1/stream?events=sample HTTP/1.1\r\nHost: bench\r\n\r\n')
+    await reader.readuntil(b'\r\n\r\n')
+    await reader.readuntil(b'\n\n')  # retry
+    ready()
+    received = 0
+    while received < events:
+        frame = await reader.readuntil(b'\n\n')
+        arrived = time.time()
+        for line in frame.split(b'\n'):
+            if line.startswith(b'data: '):
+                latencies.append(arrived - json.loads(line[6:])['sent'])
+                received += 1
+    writer.close()
+
+
+def client_process(port, clients, events, ready_queue, result_queue):
+    """Un processo con N connessioni SSE su un solo event loop"""
+    latencies = []
+
+    async def main():
+        connected = 0
+
+        def ready():
+            nonlocal connected
+            connected += 1
+            if connected == clients:
+                ready_queue.put(True)
+
+        await asyncio.gather(*(_subscribe(port, events, ready, latencies) for _ in range(clients)))
+
+    asyncio.run(main())
+    result_queue.put(latencies)
+
+
+def run(clients, events, interval=0.05):
+    broadcaster = Broadcaster()
+    server = SSEServer(broadcaster, host='127.0.0.1', port=0, heartbeat=60, queue_size=100)
+    server.start()
+
+    ready_queue, result_queue = Queue(), Queue()
+    proc = Process(target=client_process, args=(server.port, clients, events, ready_queue, result_queue))
+    proc.start()
+    ready_queue.get(timeout=120)
+
+    start = time.perf_counter()
+    for i in range(events):
+        broadcaster.publish('sample', {'version': i, 'sent': time.time()})
+        time.sleep(interval)
+    latencies = np.array(result_queue.get(timeout=120)) * 1000
+    elapsed = time.perf_counter() - start
+    proc.join()
+    stats = server.stats()
+    server.stop()
+    return latencies, elapsed, stats
+
+
+def main():
+    events = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    counts = [int(c) for c in sys.argv[2].split(',')] if len(sys.argv) > 2 else [10, 100, 1000, 5000]
+
+    print(f"{'client':>7} {'consegne':>9} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'scartati':>9}")
+    for clients in counts:
+        latencies, _, stats = run(clients, events)
+        print(f"{clients:7d} {len(latencies):9d} {np.percentile(latencies, 50):8.2f} "
+              f"{np.percentile(latencies, 99):8.2f} {latencies.max():8.2f} {stats['dropped']:9d}")
+
+
+if __name__ == '__main__':
+    main()
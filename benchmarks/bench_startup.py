@@ -0,0 +1,98 @@
+# Avvio del servizio: tempo di import dei moduli e tempo alla prima risposta sana di /api/v1/health
+# Uso: python benchmarks/bench_startup.py [ripetizioni] [worker_prefork]
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+
+# Import in un interprete pulito: tempo, thread avviati e dipendenze pesanti caricate
+IMPORT_PROBE = """
+import json, sys, threading, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{'seconds': elapsed, 'threads': threading.active_count() - 1,
+                  'loaded': [m for m in ('flask', 'numpy', 'openstack') if m in sys.modules]}}))
+"""
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def environment(data_dir):
+    env = dict(os.environ, PYTHONPATH=ROOT, FORECASTING_DATA_DIR=data_dir, FORECASTING_SSE_PORT=str(free_port()),
+               FORECASTING_LOG_LEVEL='ERROR')
+    env.pop('FORECASTING_ROLE', None)
+    return env
+
+
+def measure_import(module, env):
+    out = subprocess.run([sys.executable, '-c', IMPORT_PROBE.format(module=module)], env=env,
+                         capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def measure_health(workers, env, timeout=30):
+    """Secondi dal lancio del processo alla prima risposta 200 'healthy'"""
+    port = free_port()
+    url = f"http://127.0.0.1:{port}/api/v1/health"
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, '-m', 'forecasting_plugin.server', '--host', '127.0.0.1',
+                                '--port', str(port), '--workers', str(workers)],
+                               env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(url, timeout=1) as response:
+                    if response.status == 200 and json.load(response).get('status') == 'healthy':
+                        return time.perf_counter() - start
+            except OSError:
+                pass
+            time.sleep(0.005)
+        return float('nan')
+    finally:
+        process.terminate()
+        try:
+            process.wait(10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+    data_dir = tempfile.mkdtemp(prefix='forecasting-startup-')
+    env = environment(data_dir)
+
+    try:
+        print(f"Import in un interprete nuovo (mediana di {repeat})")
+        print(f"{'modulo':>30} {'ms':>8} {'thread':>7}  dipendenze caricate")
+        for module in ('forecasting_plugin', 'forecasting_plugin.server', 'forecasting_plugin.api'):
+            runs = [measure_import(module, env) for _ in range(repeat)]
+            ms = np.median([r['seconds'] for r in runs]) * 1000
+            print(f"{module:>30} {ms:8.1f} {runs[-1]['threads']:7d}  {', '.join(runs[-1]['loaded']) or '-'}")
+
+        print(f"\nPrima risposta sana di /api/v1/health dal lancio (mediana di {repeat})")
+        print(f"{'modalità':>30} {'p50 ms':>8} {'max ms':>8}")
+        for mode, count in (('standalone', 0), (f'prefork {workers} worker', workers)):
+            runs = np.array([measure_health(count, env) for _ in range(repeat)]) * 1000
+            print(f"{mode:>30} {np.median(runs):8.1f} {runs.max():8.1f}")
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -57,19 +57,13 @@ import sys
 sys.dont_write_bytecode = True
 sys.path.insert(0, '.')
 
-# Importa e avvia
-from forecasting_plugin.api import app
+# Importa e avvia: bind, poi collector e API nello stesso processo
+from forecasting_plugin.api import run_app
 
 print('=' * 60)
 print('SERVIZIO AVVIATO IN MODALITÀ PRODUZIONE')
 print('=' * 60)
 
-# Configurazione che BLOCCA OGNI DEBUG/RELOAD
-app.run(
-    host='0.0.0.0',
-    port=5000,
-    debug=False,
-    use_reloader=False,
-    threaded=True
-)
+# Server senza debug né reloader (vedi server.run_standalone)
+run_app(host='0.0.0.0', port=5000)
 "
\ No newline at end of file
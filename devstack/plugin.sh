@@ -18,12 +18,14 @@ function configure_forecasting {
     # Crea directory
     sudo install -d -o $STACK_USER /var/log/forecasting
     sudo install -d -o $STACK_USER /etc/forecasting
+    sudo install -d -o $STACK_USER /var/lib/forecasting
 
     # Crea file configurazione
     cat > /etc/forecasting/forecasting.conf << EOF
 [DEFAULT]
 debug = True
 log_dir = /var/log/forecasting
+data_dir = /var/lib/forecasting
 
 [api]
 host = 0.0.0.0
@@ -34,8 +36,8 @@ EOF
 function init_forecasting {
     echo_summary "Initializing AI Forecasting Service"
 
-    #Avvia il servizio come processo DevStack
-    run_process forecasting-api "python $PROGETTO_DIR/forecasting_plugin/api.py"
+    #Avvia il servizio come processo DevStack (prefork: N worker + 1 collector)
+    run_process forecasting-api "env FORECASTING_DATA_DIR=/var/lib/forecasting python -m forecasting_plugin.server --host $FORECASTING_BIND_HOST --port $FORECASTING_BIND_PORT --workers $FORECASTING_API_WORKERS"
 }
 
 function stop_forecasting {
@@ -76,7 +78,8 @@ if is_service_enabled forecasting; then
         # Remove state and transient data
         # Remember clean.sh first calls unstack.sh
         echo_summary "Cleaning up Forecasting"
-        # Remove log files
+        # Remove log files and stored metrics
         sudo rm -rf /var/log/forecasting
+        sudo rm -rf /var/lib/forecasting
     fi
 fi
\ No newline at end of file
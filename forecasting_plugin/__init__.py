@@ -1,6 +1,15 @@
 #Trasforma la cartella in un "package" Python che si può importare
-from .collector import collector
-from .api import app
-
+# Import pigri: importare il package non carica Flask, NumPy né openstacksdk
+# e non avvia nulla (il ciclo di vita è in server.py, l'app in api.create_app)
 __all__ = ['collector', 'app']
-__version__ = '2.0.0'
\ No newline at end of file
+__version__ = '2.0.0'
+
+
+def __getattr__(name):
+    if name == 'collector':
+        from .collector import collector
+        return collector
+    if name == 'app':
+        from .api import app
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
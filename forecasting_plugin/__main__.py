@@ -1,9 +1,9 @@
 #Permette di eseguire il plugin con python -m forecasting_plugin
-from .api import app
+from .server import main
 
 if __name__ == "__main__":
-    # Quando si esegue: python -m forecasting_plugin
+    # Quando si esegue: python -m forecasting_plugin [--workers N]
     print("=" * 60)
     print("OpenStack AI Resource Forecasting Service")
     print("=" * 60)
-    app.run(host='0.0.0.0', port=5000, debug=True) # Avvia il server
\ No newline at end of file
+    main() # Avvia il server
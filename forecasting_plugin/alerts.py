@@ -0,0 +1,319 @@
+# Motore di alert incrementale: soglie, persistenza, velocità di variazione, previsioni e anomalie
+from datetime import datetime
+
+import numpy as np
+
+SEVERITIES = (None, 'WARNING', 'CRITICAL')  # Indice = livello dell'alert
+
+
+class ThresholdRule:
+    """Soglie warning/critical con isteresi e persistenza per N campioni consecutivi"""
+
+    kind = 'threshold'
+
+    def __init__(self, series, warning, critical=None, hysteresis=0.0, for_samples=1,
+                 resource=None, label=None, name=None):
+        self.series = series  # Chiave della serie: 'cpu', 'ram', 'host:<nome>:cpu', ...
+        self.warning = warning
+        self.critical = critical
+        self.hysteresis = hysteresis  # Punti sotto la soglia necessari per scendere di livello
+        self.for_samples = for_samples  # Campioni consecutivi oltre soglia prima di scattare
+        self.resource = resource or series.rsplit(':', 1)[-1].upper()
+        self.label = label or self.resource
+        self.name = name or f"{self.kind}:{series}"
+        self.window = 0
+
+    def message(self, level, value):
+        threshold = self.critical if level == 2 else self.warning
+        return f"High {self.label} usage: {value:.1f}% (>= {threshold}%)"
+
+
+class RateRule(ThresholdRule):
+    """Variazione assoluta della serie oltre `delta` punti in `window` campioni"""
+
+    kind = 'rate'
+
+    def __init__(self, series, delta, window=5, severity='WARNING', hysteresis=0.0, for_samples=1,
+                 resource=None, label=None, name=None):
+        critical = severity == 'CRITICAL'
+        super().__init__(series, None if critical else delta, delta if critical else None,
+                         hysteresis, for_samples, resource, label, name)
+        self.delta = delta
+        self.window = window
+
+    def message(self, level, value):
+        return f"Rapid {self.label} change: {value:.1f} points in {self.window} samples"
+
+
+class PredictiveRule:
+    """La previsione della serie raggiunge `level` entro `within_hours` ore"""
+
+    kind = 'predictive'
+
+    def __init__(self, series, level, within_hours=6, severity='WARNING', resource=None, label=None, name=None):
+        self.series = series
+        self.level = level
+        self.within_hours = within_hours
+        self.severity = SEVERITIES.index(severity)
+        self.resource = resource or series.rsplit(':', 1)[-1].upper()
+        self.label = label or self.resource
+        self.name = name or f"{self.kind}:{series}"
+
+    def message(self, hours, value):
+        return f"{self.label} forecast reaches {value:.1f}% (>= {self.level}%) within {hours}h"
+
+
+class AnomalyRule:
+    """Rilevazioni del rilevatore di anomalie su una serie; si chiude dopo `clear_samples` campioni puliti"""
+
+    kind = 'anomaly'
+
+    def __init__(self, series, clear_samples=10, severity='WARNING', resource=None, label=None, name=None):
+        self.series = series  # 'cpu', 'ram' oppure 'source' (cambi di sorgente dei dati)
+        self.clear_samples = clear_samples
+        self.severity = SEVERITIES.index(severity)
+        self.resource = resource or series.upper()
+        self.label = label or self.resource
+        self.name = name or f"{self.kind}:{series}"
+
+    def message(self, detection):
+        if detection['kind'] == 'source_change':
+            return f"Data source changed: {detection['previous']} -> {detection['source']}"
+        kind = detection['kind'].replace('_', ' ')
+        return (f"{self.label} {kind}: {detection['value']:.1f}% "
+                f"(baseline {detection['baseline']:.1f}%, z={detection['z']:.1f})")
+
+
+def default_rules(config):
+    """Regole dalle soglie in Config (CPU/RAM/storage, variazioni rapide, previsioni)"""
+    hysteresis = config.ALERT_HYSTERESIS
+    sustained = config.ALERT_SUSTAINED_SAMPLES
+    rules = [
+        ThresholdRule('cpu', config.CPU_WARNING, config.CPU_CRITICAL, hysteresis, sustained),
+        ThresholdRule('ram', config.RAM_WARNING, config.RAM_CRITICAL, hysteresis, sustained),
+        ThresholdRule('storage', config.STORAGE_WARNING, None, hysteresis, 1, label='data disk'),
+    ]
+    for series in ('cpu', 'ram'):
+        rules.append(RateRule(series, config.ALERT_RATE_DELTA, config.ALERT_RATE_WINDOW))
+    for series, critical in (('cpu', config.CPU_CRITICAL), ('ram', config.RAM_CRITICAL)):
+        rules.append(PredictiveRule(series, critical, config.ALERT_PREDICTIVE_HOURS))
+    if config.ANOMALY_DETECTION:
+        for series in ('cpu', 'ram'):
+            rules.append(AnomalyRule(series, config.ANOMALY_ALERT_CLEAR))
+        rules.append(AnomalyRule('source', config.ANOMALY_ALERT_CLEAR, label='data source'))
+    return rules
+
+
+def host_rules(config, host):
+    """Soglie di allocazione per un hypervisor (serie 'host:<nome>:cpu' e ':ram')"""
+    return [
+        ThresholdRule(f'host:{host}:{metric}', warning, critical, config.ALERT_HYSTERESIS,
+                      config.ALERT_SUSTAINED_SAMPLES, label=f'{metric.upper()} on {host}')
+        for metric, warning, critical in (('cpu', config.CPU_WARNING, config.CPU_CRITICAL),
+                                          ('ram', config.RAM_WARNING, config.RAM_CRITICAL))
+    ]
+
+
+class AlertEngine:
+    """Valuta le regole a ogni campione e mantiene lo stato firing/resolved
+
+    Le regole su campioni (soglie e velocità) sono tenute in array paralleli
+    e valutate in un solo passaggio vettoriale; lo stato (livello corrente,
+    campioni consecutivi oltre soglia, ultimi valori per le velocità) è O(1)
+    per regola. La lista degli alert attivi è ricostruita solo alle
+    transizioni, quindi leggerla costa O(1).
+    """
+
+    def __init__(self, rules=(), on_transition=None):
+        self.rules = {}
+        self.on_transition = on_transition  # Chiamata con (alert, stato, timestamp) a ogni transizione
+
+        self._sample_rules = []
+        self._predictive_rules = []
+        self._anomaly_rules = []
+        self._quiet = {}  # Regola anomalia -> campioni puliti dall'ultima rilevazione
+        self._dirty = False
+        self._level = np.zeros(0, dtype=np.int8)
+        self._streak = np.zeros(0, dtype=np.int32)
+        self._ring = np.full((0, 1), np.nan)
+        self._ring_pos = 0
+
+        self.active = {}  # nome regola -> alert in corso
+        self._alerts = []
+        self.evaluations = 0
+        self.transitions = 0
+
+        for rule in rules:
+            self.add_rule(rule)
+
+    def add_rule(self, rule):
+        if rule.name in self.rules:
+            return
+        self.rules[rule.name] = rule
+        if rule.kind == 'predictive':
+            self._predictive_rules.append(rule)
+        elif rule.kind == 'anomaly':
+            self._anomaly_rules.append(rule)
+        else:
+            self._sample_rules.append(rule)
+            self._dirty = True
+
+    def _build(self):
+        """Ricostruisce gli array delle regole, conservando lo stato di quelle esistenti"""
+        rules = self._sample_rules
+        n_old = len(self._level)
+        self._series = [rule.series for rule in rules]
+        self._warning = np.array([np.inf if r.warning is None else r.warning for r in rules], dtype=np.float64)
+        self._critical = np.array([np.inf if r.critical is None else r.critical for r in rules], dtype=np.float64)
+        self._hysteresis = np.array([r.hysteresis for r in rules], dtype=np.float64)
+        self._for_samples = np.array([r.for_samples for r in rules], dtype=np.int32)
+        self._window = np.array([r.window for r in rules], dtype=np.int64)
+        self._is_rate = self._window > 0
+
+        # Le regole sono solo aggiunte in coda: lo stato esistente resta allineato
+        level = np.zeros(len(rules), dtype=np.int8)
+        streak = np.zeros(len(rules), dtype=np.int32)
+        level[:n_old] = self._level
+        streak[:n_old] = self._streak
+        self._level, self._streak = level, streak
+
+        width = int(self._window.max()) + 1 if len(rules) else 1
+        ring = np.full((len(rules), width), np.nan)
+        if self._ring.shape[1] == width:
+            ring[:n_old] = self._ring
+        else:
+            self._ring_pos = 0
+        self._ring = ring
+        self._rows = np.arange(len(rules))
+        self._dirty = False
+
+    def evaluate(self, timestamp, values):
+        """Valuta le regole su campioni per {serie: valore}; restituisce le transizioni"""
+        if self._dirty:
+            self._build()
+        if not self._sample_rules:
+            return []
+        self.evaluations += 1
+
+        raw = np.array([values.get(series, np.nan) for series in self._series], dtype=np.float64)
+
+        # Velocità: differenza rispetto a `window` campioni fa (buffer circolare per regola)
+        width = self._ring.shape[1]
+        lagged = self._ring[self._rows, (self._ring_pos - self._window) % width]
+        self._ring[:, self._ring_pos] = raw
+        self._ring_pos = (self._ring_pos + 1) % width
+        x = np.where(self._is_rate, np.abs(raw - lagged), raw)
+
+        valid = ~np.isnan(x)
+        level = self._level
+        up = np.where(x >= self._critical, 2, np.where(x >= self._warning, 1, 0))
+        down = np.where(x >= self._critical - self._hysteresis, 2,
+                        np.where(x >= self._warning - self._hysteresis, 1, 0))
+        target = np.where(up > level, up, np.minimum(level, down))
+
+        # Salita solo dopo for_samples campioni consecutivi, discesa (con isteresi) immediata
+        rising = valid & (target > level)
+        self._streak = np.where(rising, self._streak + 1, 0).astype(np.int32)
+        new_level = np.where(rising & (self._streak >= self._for_samples), target,
+                             np.where(valid & (target < level), target, level)).astype(np.int8)
+
+        changed = np.flatnonzero(new_level != level)
+        self._streak[changed] = 0
+        self._level = new_level
+
+        transitions = []
+        for i in changed:
+            rule = self._sample_rules[i]
+            transitions.append(self._transition(rule, int(new_level[i]), float(x[i]), timestamp))
+        if transitions:
+            self._rebuild_alerts()
+        return transitions
+
+    def evaluate_forecasts(self, timestamp, forecasts):
+        """Valuta le regole predittive su {serie: previsione oraria}"""
+        transitions = []
+        for rule in self._predictive_rules:
+            forecast = forecasts.get(rule.series)
+            if forecast is None:
+                continue
+            window = np.asarray(forecast[:rule.within_hours], dtype=np.float64)
+            crossing = np.flatnonzero(window >= rule.level)
+            firing = rule.name in self.active
+            if len(crossing) and not firing:
+                hours = int(crossing[0]) + 1
+                value = float(window[crossing[0]])
+                transitions.append(self._transition(rule, rule.severity, value, timestamp,
+                                                    rule.message(hours, value), hours_to_threshold=hours))
+            elif not len(crossing) and firing:
+                transitions.append(self._transition(rule, 0, float(window.max()) if len(window) else 0.0, timestamp))
+        if transitions:
+            self._rebuild_alerts()
+        return transitions
+
+    def evaluate_anomalies(self, timestamp, detections):
+        """Valuta le regole di anomalia sulle rilevazioni dell'ultimo campione (lista di dizionari)"""
+        transitions = []
+        by_series = {d['series']: d for d in detections}
+        for rule in self._anomaly_rules:
+            detection = by_series.get(rule.series)
+            firing = rule.name in self.active
+            if detection is not None:
+                self._quiet[rule.name] = 0
+                if not firing or self.active[rule.name]['kind'] != detection['kind']:
+                    transitions.append(self._transition(
+                        rule, rule.severity, detection.get('value', 0.0), timestamp, rule.message(detection),
+                        kind=detection['kind']))
+            elif firing:
+                self._quiet[rule.name] += 1
+                if self._quiet[rule.name] >= rule.clear_samples:
+                    transitions.append(self._transition(rule, 0, self.active[rule.name]['value'], timestamp))
+        if transitions:
+            self._rebuild_alerts()
+        return transitions
+
+    def _transition(self, rule, level, value, timestamp, message=None, **extra):
+        if level:
+            if rule.kind == 'anomaly':
+                threshold = None  # Nessuna soglia fissa: z-score rispetto alla base della serie
+            elif rule.kind == 'predictive':
+                threshold = rule.level
+            else:
+                threshold = rule.critical if level == 2 else rule.warning
+            alert = {
+                'id': rule.name,
+                'rule': rule.kind,
+                'severity': SEVERITIES[level],
+                'resource': rule.resource,
+                'series': rule.series,
+                'message': message or rule.message(level, value),
+                'value': round(value, 1),
+                'threshold': threshold,
+                'since': datetime.fromtimestamp(timestamp).isoformat(),
+                **extra,
+            }
+            self.active[rule.name] = alert
+            state = 'firing'
+        else:
+            alert = dict(self.active.pop(rule.name), value=round(value, 1))
+            state = 'resolved'
+
+        self.transitions += 1
+        if self.on_transition is not None:
+            self.on_transition(alert, state, timestamp)
+        return alert
+
+    def _rebuild_alerts(self):
+        # CRITICAL prima di WARNING, poi in ordine di attivazione
+        self._alerts = sorted(self.active.values(), key=lambda a: -SEVERITIES.index(a['severity']))
+
+    def alerts(self):
+        """Alert attivi (lista precalcolata)"""
+        return self._alerts
+
+    def stats(self):
+        return {
+            'rules': len(self.rules),
+            'active': len(self.active),
+            'evaluations': self.evaluations,
+            'transitions': self.transitions,
+        }
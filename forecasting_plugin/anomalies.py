@@ -0,0 +1,141 @@
+# Rilevamento online di anomalie nel percorso di ingestione: z-score EWMA per serie, stato O(1)
+import numpy as np
+
+from .storage import (FLAG_ANOMALY_CPU, FLAG_ANOMALY_RAM, FLAG_LEVEL_SHIFT_CPU, FLAG_LEVEL_SHIFT_RAM,
+                      FLAG_SOURCE_CHANGE)
+
+# Bit di spike per serie: i campioni marcati si possono escludere da rollup e previsioni
+SERIES_FLAGS = {'cpu': FLAG_ANOMALY_CPU, 'ram': FLAG_ANOMALY_RAM}
+# Bit di cambio di livello per serie: rilasciano solo gli spike trattenuti della stessa serie
+SHIFT_FLAGS = {'cpu': FLAG_LEVEL_SHIFT_CPU, 'ram': FLAG_LEVEL_SHIFT_RAM}
+KINDS = ('spike', 'level_shift', 'source_change')
+
+
+def anomaly_mask(flags, metric):
+    """True per i campioni di `metric` marcati come spike"""
+    return (np.asarray(flags) & SERIES_FLAGS[metric]) != 0
+
+
+def quarantine_mask(flags, metric, shift_samples):
+    """Spike di `metric` da tenere fuori dai rollup, come nel percorso live del collector
+
+    Gli spike consecutivi subito prima di un cambio di livello della stessa
+    serie erano l'inizio del nuovo livello e vengono rilasciati.
+    """
+    flags = np.asarray(flags)
+    mask = anomaly_mask(flags, metric)
+    for i in np.flatnonzero(flags & SHIFT_FLAGS[metric]):
+        j = i - 1
+        while j >= max(0, i - shift_samples) and mask[j]:
+            mask[j] = False
+            j -= 1
+    return mask
+
+
+class AnomalyDetector:
+    """Z-score su media e varianza EWMA, valutato in un passaggio vettoriale su tutte le serie
+
+    Lo stato è O(1) per serie (media, varianza, campioni visti, outlier
+    consecutivi con segno). Uno spike (|z| >= z_threshold dopo `warmup`
+    campioni) non aggiorna la base, così non la sposta; `shift_samples`
+    outlier consecutivi dallo stesso lato sono un cambio di livello e la base
+    riparte dal nuovo valore (i campioni precedenti restano marcati come
+    spike: il rilevatore non riscrive il passato). Un cambio di sorgente o un
+    buco più lungo di `gap_seconds` riallineano la base senza segnalare spike.
+    """
+
+    def __init__(self, series=('cpu', 'ram'), alpha=0.05, z_threshold=4.0, min_std=1.0, warmup=30,
+                 shift_samples=5, gap_seconds=600):
+        self.series = tuple(series)
+        self.alpha = alpha  # Peso del nuovo campione nella media/varianza esponenziale
+        self.z_threshold = z_threshold
+        self.min_std = min_std  # Deviazione minima (punti %): serie piatte non segnalano rumore minimo
+        self.warmup = warmup
+        self.shift_samples = shift_samples
+        self.gap_seconds = gap_seconds
+
+        n = len(self.series)
+        self._flag_bits = np.array([SERIES_FLAGS.get(s, 0) for s in self.series], dtype=np.uint8)
+        self._shift_bits = np.array([SHIFT_FLAGS.get(s, 0) for s in self.series], dtype=np.uint8)
+        self._mean = np.zeros(n)
+        self._var = np.zeros(n)
+        self._seen = np.zeros(n, dtype=np.int64)
+        self._run = np.zeros(n, dtype=np.int64)  # Outlier consecutivi, con il segno del lato
+        self._source = None
+        self._last_epoch = None
+
+        self.samples = 0
+        self.counts = dict.fromkeys(KINDS, 0)
+
+    def observe(self, epoch, values, source=None):
+        """Valuta un campione {serie: valore}; restituisce (bit di flag, lista delle rilevazioni)"""
+        x = np.array([values.get(series, np.nan) for series in self.series], dtype=np.float64)
+        valid = ~np.isnan(x)
+        flags = 0
+        detections = []
+
+        # Cambio di sorgente (es. mock -> OpenStack) o ripresa dopo un buco: nuova base
+        rebase = self._last_epoch is not None and epoch - self._last_epoch > self.gap_seconds
+        if self._source is not None and source != self._source:
+            flags |= FLAG_SOURCE_CHANGE
+            detections.append({'series': 'source', 'kind': 'source_change', 'previous': self._source,
+                               'source': source})
+            rebase = True
+        self._source = source
+        self._last_epoch = epoch
+        if rebase:
+            self._mean = np.where(valid & (self._seen > 0), x, self._mean)
+            self._run[:] = 0
+
+        baseline = self._mean
+        std = np.sqrt(np.maximum(self._var, self.min_std ** 2))
+        z = (x - baseline) / std
+        outlier = valid & (self._seen >= self.warmup) & (np.abs(z) >= self.z_threshold)
+
+        # Outlier consecutivi dallo stesso lato: oltre shift_samples è il nuovo livello
+        any_outlier = outlier.any()
+        if any_outlier:
+            side = np.where(z > 0, 1, -1)
+            self._run = np.where(outlier, np.where(np.sign(self._run) == side, self._run + side, side), 0)
+            shift = outlier & (np.abs(self._run) >= self.shift_samples)
+            normal = valid & ~outlier
+        else:
+            self._run[:] = 0  # Caso comune: nessun outlier, niente da propagare
+            normal = valid
+
+        # Solo i campioni normali aggiornano media e varianza (il primo le inizializza)
+        diff = x - baseline
+        first = normal & (self._seen == 0)
+        mean = np.where(first, x, baseline + self.alpha * diff)
+        var = np.where(first, 0.0, (1 - self.alpha) * (self._var + self.alpha * diff * diff))
+        self._mean = np.where(normal, mean, baseline)
+        self._var = np.where(normal, var, self._var)
+        self._seen += valid
+        self.samples += 1
+
+        if any_outlier:
+            # Cambio di livello: la base riparte dal nuovo valore
+            self._mean = np.where(shift, x, self._mean)
+            self._run = np.where(shift, 0, self._run)
+            for i in np.flatnonzero(outlier):
+                kind = 'level_shift' if shift[i] else 'spike'
+                flags |= int(self._shift_bits[i] if shift[i] else self._flag_bits[i])
+                detections.append({'series': self.series[i], 'kind': kind, 'value': round(float(x[i]), 1),
+                                   'baseline': round(float(baseline[i]), 1), 'z': round(float(z[i]), 1)})
+        for detection in detections:
+            self.counts[detection['kind']] += 1
+        return flags, detections
+
+    def replay(self, timestamps, values, sources=None):
+        """Riporta lo stato su uno storico ({serie: array}); restituisce i flag, senza contare le rilevazioni"""
+        counts, samples = dict(self.counts), self.samples
+        columns = [np.asarray(values[series], dtype=np.float64) for series in self.series]
+        flags = np.zeros(len(timestamps), dtype=np.uint8)
+        for j, epoch in enumerate(np.asarray(timestamps).tolist()):
+            sample = {series: column[j] for series, column in zip(self.series, columns)}
+            flags[j] = self.observe(epoch, sample, None if sources is None else sources[j])[0]
+        self.counts, self.samples = counts, samples
+        return flags
+
+    def stats(self):
+        return {'series': len(self.series), 'samples': self.samples, **self.counts}
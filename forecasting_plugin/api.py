@@ -1,35 +1,107 @@
 # Crea l'API REST con Flask. 5 endpoint per monitorare OpenStack.
-import os
-import sys
+# Importare il modulo non avvia nulla: create_app() costruisce l'app e il
+# ciclo di vita (storage, raccolta, stream) lo gestisce server.py dopo il bind
+import logging
+import time
+import zlib
 
-# ===== FORZA PRODUCTION MODE =====
-# Disabilita COMPLETAMENTE il debug/reload di Flask
-os.environ['FLASK_ENV'] = 'production' # Dice a Flask: "siamo in produzione"
-os.environ['FLASK_DEBUG'] = '0' # Dice a Flask: "debug disattivato"
-sys.dont_write_bytecode = True  # No .pyc files
-# =================================
-
-from flask import Flask, jsonify, request
+import numpy as np
+from flask import Blueprint, Flask, Response, g, jsonify, request
 from datetime import datetime
+from . import instrumentation, logs
+from .cache import ForecastCache
+from .capacity import HOUR, exhaustion_hours, flavor_fits, peak_percents
 from .collector import collector
+from .config import Config
+from .connections import CircuitBreaker
+from .flavors import DEVSTACK_FLAVORS
+from .encoding import (FORMATS, arrow_ipc, binary_dtype, columnar_json, describe_dtype, iter_binary,
+                       iter_ndjson, next_cursor, parse_cursor, record_columns, rollup_columns)
+from .history import MetricsRingBuffer
+from .instrumentation import FORECAST_COMPUTE, FORECAST_ERRORS, HTTP_REQUEST, HTTP_RESPONSES, REGISTRY
 from .predictor import ResourcePredictor
+from .rollups import parse_duration, rollup_points
+from .seasonal import SeasonalModels
+from .storage import FLAGS, records_to_history
+
+bp = Blueprint('forecasting', __name__)
+log = logging.getLogger(__name__)
+
+# Previsioni in cache per (metrica, ore, modello, versione dello storico)
+forecast_cache = ForecastCache(max_size=Config.FORECAST_CACHE_SIZE)
+
+# Modelli stagionali per serie: coefficienti in memoria, fit incrementale sulle nuove ore
+FORECAST_MODELS = ('sinusoidal_with_trend', 'seasonal')
+CAPACITY_MODEL = 'linear_trend'  # Allocazioni per host: solo trend, nessun profilo giornaliero
+seasonal_models = SeasonalModels()
+
+_app = None  # App di default per `from forecasting_plugin.api import app`
+
+
+def create_app():
+    """Application factory: app Flask con gli endpoint, senza avviare il collector"""
+    app = Flask(__name__)
+    app.register_blueprint(bp)
+    return app
+
+
+def __getattr__(name):
+    # Compatibilità: `app` creata alla prima richiesta dell'attributo, non all'import
+    global _app
+    if name == 'app':
+        if _app is None:
+            _app = create_app()
+        return _app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-app = Flask(__name__)
+@bp.before_app_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
 
-# Variabile globale per tracciare se il collector è già stato avviato
-_COLLECTOR_STARTED = False
+@bp.before_app_request
+def sync_collector_state():
+    # Worker prefork: una stat() per richiesta, ricarica solo se il collector ha pubblicato
+    collector.sync_shared()
 
-# Avvia il collector SOLO se non è già in esecuzione
-if not _COLLECTOR_STARTED:
-    if not collector.running:
-        collector.start_collection()
-        _COLLECTOR_STARTED = True
-        print(f"Collector avviato dal modulo API")
-    else:
-        print(f"Collector già in esecuzione (non riavviato)")
+@bp.after_app_request
+def record_request_metrics(response):
+    # Etichetta = regola della route (non il path), per non creare una serie per host/parametro
+    endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    start = g.get('request_start')
+    if start is not None:
+        HTTP_REQUEST.labels(endpoint, request.method).observe(time.perf_counter() - start)
+    HTTP_RESPONSES.labels(endpoint, str(response.status_code)).inc()
+    instrumentation.publish()  # Prefork: snapshot del worker per /metrics (al massimo 1/s)
+    return response
+
+# Gauge letti al momento dello scrape (stato corrente del collector e delle cache)
+REGISTRY.gauge('forecasting_data_version', "Versione dello storico (campioni salvati)",
+               lambda: collector.snapshot.version)
+REGISTRY.gauge('forecasting_history_samples', "Campioni nello storico in memoria",
+               lambda: len(collector.snapshot.metrics_history['cpu']))
+REGISTRY.gauge('forecasting_collector_running', "1 se la raccolta è attiva", lambda: int(collector.is_running()))
+REGISTRY.gauge('forecasting_openstack_connected', "1 se il collector è connesso a OpenStack",
+               lambda: int(collector.is_connected()))
+REGISTRY.gauge('forecasting_openstack_circuit_state', "1 per lo stato corrente del circuit breaker OpenStack",
+               lambda: {(state,): int(state == collector.get_connection_stats().get('state'))
+                        for state in CircuitBreaker.STATES},
+               ['state'])
+REGISTRY.gauge('forecasting_alerts_active', "Alert attivi", lambda: len(collector.get_alerts()))
+REGISTRY.gauge('forecasting_stream_clients', "Client SSE connessi",
+               lambda: collector.get_stream_stats().get('clients', 0))
+REGISTRY.gauge('forecasting_forecast_cache', "Contatori della cache delle previsioni (worker corrente)",
+               lambda: {(k,): v for k, v in forecast_cache.stats().items() if isinstance(v, (int, float))},
+               ['stat'])
+REGISTRY.gauge('forecasting_log_records_dropped', "Record di log scartati con la coda piena (processo corrente)",
+               lambda: logs.stats().get('dropped', 0))
+
+#Metriche di strumentazione in formato testuale Prometheus
+@bp.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    return Response(instrumentation.exposition(), content_type='text/plain; version=0.0.4; charset=utf-8')
 
 #Controllare se il servizio è attivo e connesso a OpenStack
-@app.route('/api/v1/health', methods=['GET'])
+@bp.route('/api/v1/health', methods=['GET'])
 def health_check():
     current = collector.get_current_metrics()  # Chiede metriche al collector
 
@@ -38,86 +110,584 @@ def health_check():
         'service': 'openstack-forecasting-plugin',
         'version': '2.0.0',
         'timestamp': datetime.now().isoformat(),
-        'openstack_connected': collector.conn is not None,  # True se connesso
+        'openstack_connected': collector.is_connected(),  # True se connesso
+        'openstack': collector.get_connection_stats(),  # Circuit breaker e pool di connessioni
+        'collector': {
+            'running': collector.is_running(),
+            'polls': collector.get_engine_stats(),
+            'anomalies': collector.get_anomaly_stats(),
+        },
+        'stream': collector.get_stream_stats(),
+        'logging': logs.stats(),
         'metrics': {
             'cpu': current['cpu']['value'] if 'cpu' in current else 0,
             'ram': current['ram']['value'] if 'ram' in current else 0,
         }
     })
 
+def _seed(scope, metric, version):
+    """Seed del rumore per serie e versione: chiamate singole e batch danno gli stessi valori"""
+    key = f"{metric}:{version}" if scope == 'cloud' else f"{scope}:{metric}:{version}"
+    return zlib.crc32(key.encode())
+
+
+def _cloud_series(snap, metric):
+    """Ultime 168 ore: medie orarie dal tier di rollup '1h', non campioni grezzi"""
+    return snap.rollup(metric, '1h', 168)['mean']
+
+
+def _host_series(snap, metric):
+    """Host e matrice (host + aggregato) x ore delle allocazioni orarie"""
+    host_metrics = snap.host_metrics
+    hosts = list(host_metrics.hosts)
+    if not hosts:
+        return hosts, np.zeros((0, 0))
+    matrix = host_metrics.hourly(metric, 168)  # host x ore
+    aggregate = host_metrics.aggregate_hourly(metric, 168)
+    return hosts, np.vstack([matrix, aggregate[np.newaxis, :]])
+
+
+def _forecast(snap, metric, hours, model='sinusoidal_with_trend', now=None):
+    """Previsione su medie orarie dello snapshot, in cache per versione dello storico e ora di partenza"""
+    version = snap.version
+    # La previsione parte dall'ora corrente: entra nella chiave, come la versione
+    now = now or datetime.now()
+    hour = int(now.timestamp()) // HOUR
+
+    def compute():
+        with FORECAST_COMPUTE.labels(model, metric).time(FORECAST_ERRORS.labels(model)):
+            return predict()
+
+    def predict():
+        # Rumore deterministico per versione: risultati in cache coerenti
+        predictor = ResourcePredictor(seed=_seed('cloud', metric, version))
+
+        if model == 'seasonal':
+            # Solo ore chiuse (la media dell'ora in corso cambia a ogni campione);
+            # il modello incorpora soltanto quelle successive all'ultimo fit
+            window = snap.rollup(metric, '1h', include_open=False)
+            fitted = seasonal_models.get(metric)
+            return {
+                'predictions': predictor.seasonal_harmonic(
+                    window['timestamp'], window['mean'], hours, start=now.timestamp(), model=fitted),
+                'history_points': fitted.points,
+            }
+
+        values = _cloud_series(snap, metric)
+        return {
+            'predictions': predictor.sinusoidal_with_trend(values, hours, now.hour),
+            'history_points': len(values),
+        }
+
+    return forecast_cache.get_or_compute((metric, hours, model, hour, version), compute), version
+
+
+def _hours_arg():
+    """Orizzonte dalla query string (default 24); ValueError fuori da 1..FORECAST_MAX_HOURS"""
+    hours = request.args.get('hours', default=24, type=int)
+    if not 1 <= hours <= Config.FORECAST_MAX_HOURS:
+        raise ValueError(f"hours deve essere un intero tra 1 e {Config.FORECAST_MAX_HOURS}")
+    return hours
+
+
+def _band_args():
+    """Quantili e simulazioni dalla query string (default da Config); ValueError se non validi"""
+    raw = request.args.get('quantiles')
+    quantiles = Config.FORECAST_QUANTILES
+    if raw:
+        try:
+            quantiles = tuple(sorted({float(q) for q in raw.split(',') if q.strip()}))
+        except ValueError:
+            raise ValueError("quantiles deve essere una lista di numeri separati da virgola (es. 0.1,0.5,0.9)")
+        if not quantiles or len(quantiles) > 9 or not all(0 < q < 1 for q in quantiles):
+            raise ValueError("quantiles: da 1 a 9 valori strettamente tra 0 e 1")
+    simulations = request.args.get('simulations', default=Config.FORECAST_SIMULATIONS, type=int)
+    if not 0 <= simulations <= Config.FORECAST_MAX_SIMULATIONS:
+        raise ValueError(f"simulations deve essere tra 0 e {Config.FORECAST_MAX_SIMULATIONS}")
+    return quantiles, simulations
+
+
+def _forecast_bands(snap, metric, hours, model, quantiles, simulations):
+    """Bande di quantili della previsione (None se disattivate o storico troppo corto), in cache per versione"""
+    if not simulations:
+        return None
+    version = snap.version
+    # Le bande partono dall'ora corrente: entra nella chiave, come la versione
+    now = datetime.now()
+    hour = int(now.timestamp()) // HOUR
+
+    def compute():
+        with FORECAST_COMPUTE.labels(model, f'bands:{metric}').time(FORECAST_ERRORS.labels(model)):
+            predictor = ResourcePredictor(seed=_seed('bands', metric, version))
+            if model == 'seasonal':
+                window = snap.rollup(metric, '1h', include_open=False)
+                return predictor.seasonal_bands(window['timestamp'], window['mean'], hours, now.timestamp(),
+                                                model=seasonal_models.get(metric), quantiles=quantiles,
+                                                simulations=simulations)
+            return predictor.sinusoidal_bands(_cloud_series(snap, metric), hours, now.hour, quantiles, simulations)
+
+    key = ('bands', metric, hours, model, quantiles, simulations, hour, version)
+    return forecast_cache.get_or_compute(key, compute)
+
+
 #Prevedere l'utilizzo CPU per le prossime X ore
-@app.route('/api/v1/forecast/cpu', methods=['GET'])
+@bp.route('/api/v1/forecast/cpu', methods=['GET'])
 def forecast_cpu():
     try:
-        hours = request.args.get('hours', default=24, type=int)
-        history = collector.get_metrics_history()
-        values = [m['value'] for m in history['cpu'][-168:]]  # Ultime 168 ore
-
-        predictor = ResourcePredictor()  # Crea un'istanza del predictor
-        forecast = predictor.sinusoidal_with_trend(values, hours)
+        model = request.args.get('model', default='sinusoidal_with_trend')
+        if model not in FORECAST_MODELS:
+            return jsonify({'error': f"Modello non valido: {model} (disponibili: {', '.join(FORECAST_MODELS)})"}), 400
+        try:
+            hours = _hours_arg()
+            quantiles, simulations = _band_args()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        snap = collector.snapshot  # Un solo riferimento: previsione e valore corrente della stessa versione
+        forecast, version = _forecast(snap, 'cpu', hours, model)
+        bands = _forecast_bands(snap, 'cpu', hours, model, quantiles, simulations)
+        current = snap.current()['cpu']
 
         return jsonify({
             'metric': 'cpu_usage_percent',
             'forecast_hours': hours,
-            'predictions': forecast,
-            'current_value': values[-1] if values else 0,
-            'data_source': 'OpenStack' if collector.conn else 'Mock',
-            'model': 'sinusoidal_with_trend',
+            'predictions': forecast['predictions'],
+            'quantiles': bands,
+            'simulations': simulations,
+            'current_value': current['value'],
+            'data_source': 'OpenStack' if collector.is_connected() else 'Mock',
+            'model': model,
+            'history_resolution': '1h',
+            'history_points': forecast['history_points'],
+            'data_version': version,
             'timestamp': datetime.now().isoformat()
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 #Prevedere l'utilizzo RAM per le prossime X ore
-@app.route('/api/v1/forecast/ram', methods=['GET'])
+@bp.route('/api/v1/forecast/ram', methods=['GET'])
 def forecast_ram():
     try:
-        hours = request.args.get('hours', default=24, type=int)
-        history = collector.get_metrics_history()
-        values = [m['value'] for m in history['ram'][-168:]]
-
-        predictor = ResourcePredictor()
-        forecast = predictor.sinusoidal_with_trend(values, hours)
+        model = request.args.get('model', default='sinusoidal_with_trend')
+        if model not in FORECAST_MODELS:
+            return jsonify({'error': f"Modello non valido: {model} (disponibili: {', '.join(FORECAST_MODELS)})"}), 400
+        try:
+            hours = _hours_arg()
+            quantiles, simulations = _band_args()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        snap = collector.snapshot  # Un solo riferimento: previsione e valore corrente della stessa versione
+        forecast, version = _forecast(snap, 'ram', hours, model)
+        bands = _forecast_bands(snap, 'ram', hours, model, quantiles, simulations)
+        current = snap.current()['ram']
 
         return jsonify({
             'metric': 'ram_usage_percent',
             'forecast_hours': hours,
-            'predictions': forecast,
-            'current_value': values[-1] if values else 0,
-            'data_source': 'OpenStack' if collector.conn else 'Mock',
+            'predictions': forecast['predictions'],
+            'quantiles': bands,
+            'simulations': simulations,
+            'current_value': current['value'],
+            'data_source': 'OpenStack' if collector.is_connected() else 'Mock',
+            'model': model,
+            'history_resolution': '1h',
+            'history_points': forecast['history_points'],
+            'data_version': version,
+            'timestamp': datetime.now().isoformat()
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def _host_forecasts(snap, metric, hours, model='sinusoidal_with_trend', now=None):
+    """Previsioni di tutti gli host più l'aggregato, in un solo passaggio batch
+
+    `model` è 'sinusoidal_with_trend' (default di /hosts/forecast) o 'linear_trend'.
+    """
+    version = snap.version
+    now = now or datetime.now()
+    hour = int(now.timestamp()) // HOUR
+
+    def compute():
+        with FORECAST_COMPUTE.labels(model, f'hosts:{metric}').time(FORECAST_ERRORS.labels(model)):
+            return predict()
+
+    def predict():
+        hosts, series = _host_series(snap, metric)
+        if not hosts:
+            return {'hosts': {}, 'aggregate': [], 'history_points': 0}
+
+        predictor = ResourcePredictor(seed=_seed('hosts', metric, version))
+        if model == 'linear_trend':
+            return _host_result(hosts, predictor.linear_trend_batch(series, hours), series.shape[1])
+        return _host_result(hosts, predictor.sinusoidal_with_trend_batch(series, hours, now.hour), series.shape[1])
+
+    return forecast_cache.get_or_compute(('hosts', metric, hours, model, hour, version), compute), version
+
+
+def _host_result(hosts, predictions, history_points):
+    return {
+        'hosts': dict(zip(hosts, predictions[:-1].tolist())),
+        'aggregate': predictions[-1].tolist(),
+        'history_points': history_points,
+    }
+
+
+#Risorse allocate per hypervisor
+@bp.route('/api/v1/hosts', methods=['GET'])
+def list_hosts():
+    host_metrics = collector.snapshot.host_metrics
+    total_vcpus, total_ram_mb = host_metrics.totals()
+    hosts = host_metrics.snapshot()
+    return jsonify({
+        'hosts': hosts,
+        'count': len(hosts),
+        'total_vcpus': total_vcpus,
+        'total_ram_gb': round(total_ram_mb / 1024, 1),
+        'timestamp': datetime.now().isoformat()
+    })
+
+#Previsioni di allocazione per tutti gli host e aggregate
+@bp.route('/api/v1/hosts/forecast', methods=['GET'])
+def forecast_hosts():
+    metric = request.args.get('metric', default='cpu')
+    if metric not in ('cpu', 'ram'):
+        return jsonify({'error': "metric deve essere 'cpu' o 'ram'"}), 400
+    try:
+        hours = _hours_arg()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    try:
+        forecast, version = _host_forecasts(collector.snapshot, metric, hours)
+        return jsonify({
+            'metric': f'{metric}_allocated_percent',
+            'forecast_hours': hours,
+            'hosts': forecast['hosts'],
+            'aggregate': forecast['aggregate'],
+            'history_resolution': '1h',
+            'history_points': forecast['history_points'],
+            'model': 'sinusoidal_with_trend',
+            'data_version': version,
+            'timestamp': datetime.now().isoformat()
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+#Previsioni di allocazione per un singolo host
+@bp.route('/api/v1/hosts/<host>/forecast', methods=['GET'])
+def forecast_host(host):
+    metric = request.args.get('metric', default='cpu')
+    if metric not in ('cpu', 'ram'):
+        return jsonify({'error': "metric deve essere 'cpu' o 'ram'"}), 400
+    try:
+        hours = _hours_arg()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    try:
+        forecast, version = _host_forecasts(collector.snapshot, metric, hours)
+        if host not in forecast['hosts']:
+            return jsonify({'error': f'Host sconosciuto: {host}'}), 404
+        return jsonify({
+            'host': host,
+            'metric': f'{metric}_allocated_percent',
+            'forecast_hours': hours,
+            'predictions': forecast['hosts'][host],
+            'history_resolution': '1h',
             'model': 'sinusoidal_with_trend',
+            'data_version': version,
             'timestamp': datetime.now().isoformat()
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def _parse_spec(spec):
+    """Specifica di previsione normalizzata (metric, scope, hours, model); ValueError se non valida"""
+    if not isinstance(spec, dict):
+        raise ValueError("Specifica non valida: atteso un oggetto {metric, scope, hours, model}")
+    metric = spec.get('metric', 'cpu')
+    scope = spec.get('scope', 'cloud')
+    hours = spec.get('hours', Config.FORECAST_HORIZON)
+    model = spec.get('model', 'sinusoidal_with_trend')
+    if metric not in ('cpu', 'ram'):
+        raise ValueError("metric deve essere 'cpu' o 'ram'")
+    if scope not in ('cloud', 'hosts') and not (isinstance(scope, str) and scope.startswith('host:') and scope[5:]):
+        raise ValueError("scope deve essere 'cloud', 'hosts' o 'host:<nome>'")
+    if isinstance(hours, bool) or not isinstance(hours, int) or not 1 <= hours <= Config.FORECAST_MAX_HOURS:
+        raise ValueError(f"hours deve essere un intero tra 1 e {Config.FORECAST_MAX_HOURS}")
+    if model not in FORECAST_MODELS:
+        raise ValueError(f"Modello non valido: {model} (disponibili: {', '.join(FORECAST_MODELS)})")
+    if model == 'seasonal' and scope != 'cloud':
+        raise ValueError("Il modello seasonal è disponibile solo con scope 'cloud'")
+    return metric, scope, hours, model
+
+
+def _cache_key(block, hours, model, hour, version):
+    # Stesse chiavi di _forecast e _host_forecasts: batch e chiamate singole condividono la cache
+    kind, metric = block
+    return (metric, hours, model, hour, version) if kind == 'cloud' else ('hosts', metric, hours, model, hour, version)
+
+
+def _forecast_batch(snap, specs):
+    """Previsioni per più specifiche con un solo passaggio del modello
+
+    Ogni serie (cloud o blocco di host, per metrica) viene estratta una volta
+    e prevista una volta all'orizzonte massimo richiesto: il rumore è estratto
+    per ore, quindi gli orizzonti più corti sono prefissi identici a quelli di
+    una chiamata singola. Le serie con la stessa lunghezza passano al kernel
+    impilate in un'unica matrice. Gli errori restano confinati alla singola
+    specifica (o al blocco di serie che non si è potuto calcolare).
+    """
+    version = snap.version
+    now = datetime.now()  # Un solo istante per tutte le specifiche (ora di partenza e chiavi)
+    hour = int(now.timestamp()) // HOUR
+    model = 'sinusoidal_with_trend'
+    results = [None] * len(specs)
+    parsed = {}
+    for i, spec in enumerate(specs):
+        try:
+            parsed[i] = _parse_spec(spec)
+        except ValueError as e:
+            results[i] = {'error': str(e)}
+
+    # Blocchi da calcolare (orizzonte massimo mancante) e valori già in cache
+    cached = {}
+    missing = {}
+    for metric, scope, hours, spec_model in parsed.values():
+        if spec_model != model:
+            continue
+        block = ('cloud' if scope == 'cloud' else 'hosts', metric)
+        key = _cache_key(block, hours, model, hour, version)
+        if key not in cached:
+            cached[key] = forecast_cache.get(key)
+            if cached[key] is None:
+                missing[block] = max(missing.get(block, 0), hours)
+
+    failed = {}
+    if missing:
+        horizon = max(missing.values())
+        groups = {}  # Lunghezza della finestra -> blocchi impilabili
+        computed = {}
+        for block in missing:
+            kind, metric = block
+            if kind == 'cloud':
+                labels, series = None, _cloud_series(snap, metric)[np.newaxis, :]
+            else:
+                labels, series = _host_series(snap, metric)
+                if not labels:
+                    computed[block] = (labels, None, 0)  # Nessun host: niente da prevedere
+                    continue
+            draws = ResourcePredictor(seed=_seed(kind, metric, version)).draws(len(series), horizon)
+            groups.setdefault(series.shape[1], []).append((block, labels, series, draws))
+
+        for members in groups.values():
+            try:
+                with FORECAST_COMPUTE.labels(model, 'batch').time(FORECAST_ERRORS.labels(model)):
+                    predictions = ResourcePredictor().sinusoidal_with_trend_batch(
+                        np.vstack([m[2] for m in members]), horizon, now.hour, np.vstack([m[3] for m in members]))
+            except Exception as e:
+                failed.update({m[0]: str(e) for m in members})
+                continue
+            row = 0
+            for block, labels, series, _ in members:
+                computed[block] = (labels, predictions[row:row + len(series)], series.shape[1])
+                row += len(series)
+
+        # Ogni orizzonte richiesto entra in cache con la chiave della chiamata singola
+        for metric, scope, hours, spec_model in parsed.values():
+            block = ('cloud' if scope == 'cloud' else 'hosts', metric)
+            key = _cache_key(block, hours, model, hour, version)
+            if spec_model != model or block not in computed or cached.get(key) is not None:
+                continue
+            labels, predictions, points = computed[block]
+            if labels is None:
+                value = {'predictions': predictions[0, :hours].tolist(), 'history_points': points}
+            elif not labels:
+                value = {'hosts': {}, 'aggregate': [], 'history_points': 0}
+            else:
+                value = _host_result(labels, predictions[:, :hours], points)
+            cached[key] = forecast_cache.get_or_compute(key, lambda value=value: value)
+
+    for i, (metric, scope, hours, spec_model) in parsed.items():
+        result = {'metric': metric, 'scope': scope, 'hours': hours, 'model': spec_model}
+        block = ('cloud' if scope == 'cloud' else 'hosts', metric)
+        try:
+            if spec_model != model:
+                forecast, _ = _forecast(snap, metric, hours, spec_model, now)
+            elif block in failed:
+                raise RuntimeError(failed[block])
+            else:
+                forecast = cached[_cache_key(block, hours, model, hour, version)]
+
+            if scope.startswith('host:'):
+                host = scope[5:]
+                if host not in forecast['hosts']:
+                    raise KeyError(f'Host sconosciuto: {host}')
+                result.update(predictions=forecast['hosts'][host], history_points=forecast['history_points'])
+            else:
+                result.update(forecast)
+        except Exception as e:
+            result['error'] = e.args[0] if isinstance(e, KeyError) else str(e)
+        results[i] = result
+    return results, version
+
+
+#Previsioni per più metriche, ambiti e orizzonti in una sola richiesta
+@bp.route('/api/v1/forecast/batch', methods=['POST'])
+def forecast_batch():
+    body = request.get_json(silent=True)
+    specs = body.get('forecasts') if isinstance(body, dict) else body
+    if not isinstance(specs, list) or not specs:
+        return jsonify({'error': "Corpo atteso: {\"forecasts\": [{metric, scope, hours, model}, ...]}"}), 400
+    if len(specs) > Config.FORECAST_BATCH_MAX_SPECS:
+        return jsonify({'error': f"Al massimo {Config.FORECAST_BATCH_MAX_SPECS} specifiche per richiesta"}), 400
+    try:
+        results, version = _forecast_batch(collector.snapshot, specs)
+        return jsonify({
+            'results': results,
+            'count': len(results),
+            'errors': sum(1 for r in results if 'error' in r),
+            'data_source': 'OpenStack' if collector.is_connected() else 'Mock',
+            'history_resolution': '1h',
+            'data_version': version,
+            'timestamp': datetime.now().isoformat()
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+def _flavor_catalog(snap):
+    """Flavor (nome, vcpus, ram_mb) visti dal collector, o quelli standard DevStack"""
+    catalog = snap.flavors or tuple((name, f['vcpus'], f['ram_mb']) for name, f in sorted(DEVSTACK_FLAVORS.items()))
+    return tuple(f for f in catalog if f[1] > 0 and f[2] > 0)
+
+
+def _capacity(snap, horizons, threshold, flavors):
+    """Tempo all'esaurimento e VM per flavor che entrano ancora, in cache per versione dello storico
+
+    Parte dalle previsioni di allocazione per host con il solo trend lineare:
+    le allocazioni non seguono un ciclo giornaliero, e il profilo sinusoidale
+    di /hosts/forecast anticiperebbe l'esaurimento a ogni pomeriggio. None se
+    nessun hypervisor ha capacità nota.
+    """
+    version = snap.version
+    hours = max(horizons)
+    now = datetime.now()  # Le previsioni per host partono da quest'ora: entra nella chiave
+    hour = int(now.timestamp()) // HOUR
+
+    def compute():
+        with FORECAST_COMPUTE.labels(CAPACITY_MODEL, 'capacity').time(FORECAST_ERRORS.labels(CAPACITY_MODEL)):
+            return plan()
+
+    def plan():
+        host_metrics = snap.host_metrics
+        n = len(host_metrics.hosts)
+        known = (host_metrics.total_vcpus[:n] > 0) & (host_metrics.total_ram_mb[:n] > 0)
+        if not known.any():
+            return None
+        hosts = [host for host, ok in zip(host_metrics.hosts, known) if ok]
+        current = host_metrics.percents()
+        totals = {'cpu': host_metrics.total_vcpus[:n][known], 'ram': host_metrics.total_ram_mb[:n][known]}
+        allocated = {'cpu': host_metrics.allocated_vcpus[:n][known], 'ram': host_metrics.allocated_ram_mb[:n][known]}
+        last = snap.last_timestamp() or int(time.time())
+
+        resources = {}
+        peaks = {}
+        for metric in ('cpu', 'ram'):
+            forecast, _ = _host_forecasts(snap, metric, hours, CAPACITY_MODEL, now)
+            matrix = np.array([forecast['hosts'][host] for host in hosts])  # host x ore
+            peaks[metric] = peak_percents(matrix, current[metric][known], horizons)
+
+            total = int(totals[metric].sum())
+            used = int(allocated[metric].sum())
+            percent = 100.0 * used / total
+            aggregate = np.asarray(forecast['aggregate'])
+            hours_left = exhaustion_hours(aggregate, threshold, [percent])[0]
+            at_risk = exhaustion_hours(matrix, threshold, current[metric][known])
+            aggregate_peaks = peak_percents(aggregate, [percent], horizons)[0]
+
+            scale = 1 if metric == 'cpu' else 1 / 1024  # RAM in GB, come in /hosts
+            resources[metric] = {
+                'unit': 'vcpus' if metric == 'cpu' else 'ram_gb',
+                'capacity': round(total * scale, 1),
+                'allocated': round(used * scale, 1),
+                'allocated_percent': round(percent, 1),
+                'peak_percent': {f'{h}h': round(float(p), 1) for h, p in zip(horizons, aggregate_peaks)},
+                'exhaustion_hours': hours_left,
+                'exhaustion_at': (datetime.fromtimestamp(last + hours_left * HOUR).isoformat()
+                                  if hours_left is not None else None),
+                'hosts_at_risk': dict(sorted(((host, h) for host, h in zip(hosts, at_risk) if h is not None),
+                                             key=lambda item: item[1])),
+            }
+
+        names, vcpus, ram_mb = zip(*flavors)
+        fits = flavor_fits(totals['cpu'], totals['ram'], peaks['cpu'], peaks['ram'], vcpus, ram_mb, threshold)
+        return {
+            'resources': resources,
+            'flavors': {
+                name: {'vcpus': int(v), 'ram_mb': int(r),
+                       'fits': {f'{h}h': int(k) for h, k in zip(horizons, fits[:, j])}}
+                for j, (name, v, r) in enumerate(flavors)
+            },
+            'hosts': len(hosts),
+            'history_points': snap.host_metrics.hourly('cpu', 168).shape[1],
+        }
+
+    key = ('capacity', tuple(horizons), threshold, flavors, hour, version)
+    return forecast_cache.get_or_compute(key, compute), version
+
+
+#Quando finiscono le risorse e quante VM di ogni flavor entrano ancora
+@bp.route('/api/v1/capacity', methods=['GET'])
+def capacity_plan():
+    try:
+        horizons = sorted({int(h) for h in request.args.get('horizons', '').split(',') if h.strip()}
+                          or Config.CAPACITY_HORIZONS)
+        threshold = request.args.get('threshold', default=Config.CAPACITY_THRESHOLD, type=float)
+    except ValueError:
+        return jsonify({'error': "horizons deve essere un elenco di ore intere, es. 6,12,24"}), 400
+    if not 1 <= horizons[0] <= horizons[-1] <= Config.CAPACITY_MAX_HOURS:
+        return jsonify({'error': f"Orizzonti tra 1 e {Config.CAPACITY_MAX_HOURS} ore"}), 400
+    if not 0 < threshold <= 100:
+        return jsonify({'error': "threshold deve essere una percentuale in (0, 100]"}), 400
+
+    snap = collector.snapshot
+    catalog = _flavor_catalog(snap)
+    requested = [name for name in request.args.get('flavors', '').split(',') if name]
+    if requested:
+        unknown = set(requested) - {f[0] for f in catalog}
+        if unknown:
+            return jsonify({'error': f"Flavor sconosciuti: {', '.join(sorted(unknown))}",
+                            'available': [f[0] for f in catalog]}), 400
+        catalog = tuple(f for f in catalog if f[0] in requested)
+
+    try:
+        plan, version = _capacity(snap, horizons, threshold, catalog)
+        if plan is None:
+            return jsonify({'error': "Capacità degli hypervisor non ancora disponibile",
+                            'data_version': version}), 503
+        return jsonify(dict(
+            plan,
+            threshold_percent=threshold,
+            horizons=horizons,
+            model=CAPACITY_MODEL,
+            data_version=version,
+            timestamp=datetime.now().isoformat()
+        ))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+#Statistiche della cache delle previsioni
+@bp.route('/api/v1/forecast/cache', methods=['GET'])
+def forecast_cache_stats():
+    return jsonify({
+        'cache': forecast_cache.stats(),
+        'data_version': collector.snapshot.version,
+        'timestamp': datetime.now().isoformat()
+    })
+
 #Mostrare alert se CPU/RAM superano le soglie critiche
-@app.route('/api/v1/alerts', methods=['GET'])
+@bp.route('/api/v1/alerts', methods=['GET'])
 def get_alerts():
-    alerts = []
-    current = collector.get_current_metrics()
-
-    # Alert CPU > 80%
-    if 'cpu' in current:
-        cpu_val = current['cpu']['value']
-        if cpu_val > 80:
-            alerts.append({
-                'severity': 'WARNING',
-                'resource': 'CPU',
-                'message': f'High CPU usage: {cpu_val:.1f}%',
-                'value': cpu_val
-            })
-
-    # Alert RAM >75%
-    if 'ram' in current:
-        ram_val = current['ram']['value']
-        if ram_val > 75:
-            alerts.append({
-                'severity': 'WARNING',
-                'resource': 'RAM',
-                'message': f'High RAM usage: {ram_val:.1f}%',
-                'value': ram_val
-            })
+    alerts = collector.get_alerts()  # Stato corrente del motore di alert, nessun ricalcolo
 
     return jsonify({
         'alerts': alerts,
@@ -126,7 +696,7 @@ def get_alerts():
     })
 
 # Informazioni dettagliate sulla connessione OpenStack
-@app.route('/api/v1/openstack/info', methods=['GET'])
+@bp.route('/api/v1/openstack/info', methods=['GET'])
 def openstack_info():
     info = collector.get_openstack_info()  # Chiede info dettagliate
     info['timestamp'] = datetime.now().isoformat()
@@ -134,7 +704,7 @@ def openstack_info():
 
 
 #Solo le metriche attuali (senza info extra)
-@app.route('/api/v1/metrics/current', methods=['GET'])
+@bp.route('/api/v1/metrics/current', methods=['GET'])
 def get_current_metrics():
     current = collector.get_current_metrics()
     return jsonify({
@@ -144,50 +714,100 @@ def get_current_metrics():
         'timestamp': datetime.now().isoformat()
     })
 
+def _encode_history(fmt, columns, meta):
+    """Serializza le colonne dello storico nel formato richiesto"""
+    if fmt == 'columnar':
+        return jsonify(dict(meta, **columnar_json(columns)))
+
+    if fmt == 'ndjson':
+        return Response(iter_ndjson(columns, dict(meta, next_since=next_cursor(columns))),
+                        mimetype='application/x-ndjson')
+
+    headers = {
+        'X-Resolution': meta['resolution'],
+        'X-Record-Count': str(len(columns['timestamp'])),
+        'X-Next-Since': str(next_cursor(columns) or ''),
+    }
+    if 'gaps' in meta:
+        headers['X-Gap-Count'] = str(len(meta['gaps']))  # Cicli senza dati nella finestra (i dettagli in JSON)
+    if fmt == 'arrow':
+        return Response(arrow_ipc(columns), mimetype='application/vnd.apache.arrow.stream', headers=headers)
+
+    headers['X-Record-Format'] = describe_dtype(binary_dtype(columns))
+    return Response(iter_binary(columns), mimetype='application/octet-stream', headers=headers)
+
+
 #Metriche storiche
-@app.route('/api/v1/metrics/history', methods=['GET'])
+@bp.route('/api/v1/metrics/history', methods=['GET'])
 def get_metrics_history():
     limit = request.args.get('limit', default=100, type=int)
-    history = collector.get_metrics_history()
+    fmt = request.args.get('format', default='json')
+    if fmt not in FORMATS:
+        return jsonify({'error': f"format deve essere uno tra: {', '.join(FORMATS)}"}), 400
+    if limit < 1:
+        return jsonify({'error': "limit deve essere un intero positivo"}), 400
+    limit = min(limit, Config.HISTORY_MAX_LIMIT)
+    try:
+        span = parse_duration(request.args.get('span'))  # Es. 30d, 12h
+        resolution = parse_duration(request.args.get('resolution'))  # Es. 5m, 1h, 1d
+        since = parse_cursor(request.args.get('since'))  # Epoch o ISO, escluso
+        until = parse_cursor(request.args.get('until'))  # Epoch o ISO, escluso
+    except ValueError:
+        return jsonify({'error': 'span/resolution/since/until non validi (durate positive, es. 30d, 1h, 1700000000)'}), 400
 
-    return jsonify({
-        'cpu': history['cpu'][-limit:],
-        'ram': history['ram'][-limit:],
-        'timestamp': datetime.now().isoformat()
-    })
+    try:
+        snap = collector.snapshot  # cpu e ram (e rollup) della stessa versione
+        # Per span lunghi o risoluzioni aggregate si leggono i rollup precalcolati
+        tier = snap.select_rollup_tier(span, resolution, max_points=max(limit, 1000))
+        if tier is not None:
+            points = min(max(1, span // tier.resolution), Config.HISTORY_MAX_LIMIT) if span else limit
+            windows = {m: snap.rollup(m, tier.name) for m in ('cpu', 'ram')}
+            columns = rollup_columns(windows, since, until, points)
+            meta = {'resolution': tier.name, 'timestamp': datetime.now().isoformat()}
+
+            if fmt == 'json':
+                return jsonify(dict(meta, next_since=next_cursor(columns), **{
+                    m: rollup_points({
+                        'timestamp': columns['timestamp'],
+                        'count': columns['count'],
+                        **{f: columns[f'{m}_{f}'] for f in ('min', 'max', 'mean', 'p95')}
+                    })
+                    for m in ('cpu', 'ram')
+                }))
+            return _encode_history(fmt, columns, meta)
+
+        if span:
+            limit = min(max(1, span // collector.interval), Config.HISTORY_MAX_LIMIT)
+        records = collector.get_raw_records(limit, since, until, snap)  # Oltre il buffer legge da disco
+        columns = record_columns(records)
+
+        # Cicli senza dati nella finestra restituita (con since: fino all'ultimo record, il resto alla pagina dopo)
+        timestamps = records['timestamp']
+        first = int(timestamps[0]) if len(timestamps) else (since + 1 if since is not None else None)
+        last = int(timestamps[-1]) + 1 if since is not None and len(timestamps) else until
+        gaps = collector.get_gaps(first, last, snap)
+        meta = {'resolution': 'raw', 'timestamp': datetime.now().isoformat(),
+                'gaps': [datetime.fromtimestamp(t).isoformat() for t in gaps]}
+
+        if fmt == 'json':
+            history = records_to_history(records)
+            return jsonify(dict(meta, cpu=history['cpu'], ram=history['ram'], next_since=next_cursor(columns)))
+
+        meta['sources'] = list(MetricsRingBuffer.SOURCES)  # Legenda dei codici 'source'
+        meta['flags'] = FLAGS  # Legenda dei bit di 'flags'
+        return _encode_history(fmt, columns, meta)
+    except RuntimeError as e:
+        return jsonify({'error': str(e)}), 400
 
 
 # ===== FUNZIONE PER AVVIARE L'APP =====
-def run_app():
-    """Funzione per avviare l'applicazione Flask"""
-    print("\n" + "=" * 60)
-    print("OPENSTACK AI FORECASTING SERVICE")
-    print("=" * 60)
-    print(f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    print(f"Data source: {'✅ OpenStack' if collector.conn else '🤖 Mock data'}")
-    print(f"API: http://0.0.0.0:5000")
-    print(f"Collector interval: {collector.interval}s")
-    print("=" * 60)
-    print("Endpoints disponibili:")
-    print("  • GET  /api/v1/health")
-    print("  • GET  /api/v1/forecast/cpu?hours=24")
-    print("  • GET  /api/v1/forecast/ram?hours=24")
-    print("  • GET  /api/v1/alerts")
-    print("  • GET  /api/v1/metrics/current")
-    print("  • GET  /api/v1/openstack/info")
-    print("=" * 60 + "\n")
-
-    # Avvia Flask SENZA DEBUG e SENZA RELOADER
-    app.run(
-        host='0.0.0.0',
-        port=5000,
-        debug=False,  # ASSOLUTAMENTE NO DEBUG
-        use_reloader=False,  # ASSOLUTAMENTE NO RELOAD
-        threaded=True
-    )
+def run_app(host='0.0.0.0', port=5000):
+    """Avvia il servizio in processo singolo (vedi server.run_standalone)"""
+    from .server import run_standalone
+    run_standalone(host, port)
 
 
 # Questo blocco NON verrà eseguito quando importi il modulo
 # Serve solo se esegui direttamente python api.py
 if __name__ == '__main__':
-    run_app()
\ No newline at end of file
+    run_app()
@@ -0,0 +1,232 @@
+# Backtest dei modelli di previsione con origini mobili su tracce salvate o sintetiche
+# Uso: python -m forecasting_plugin.backtest --trace synthetic:6 --horizon 24 --output report.json
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+from .predictor import ResourcePredictor
+from .seasonal import HOUR, HarmonicModel
+
+
+def _sinusoidal(predictor, timestamps, values, horizon, start, state):
+    return predictor.sinusoidal_with_trend(values[-168:], horizon, datetime.fromtimestamp(start).hour)
+
+
+def _daily_pattern(predictor, timestamps, values, horizon, start, state):
+    return predictor.default_daily_pattern(horizon, float(values[-1]), datetime.fromtimestamp(start).hour)
+
+
+def _linear(predictor, timestamps, values, horizon, start, state):
+    return predictor.simple_linear_regression(values[-24:].tolist(), horizon)
+
+
+def _seasonal(predictor, timestamps, values, horizon, start, state):
+    # Un modello per blocco di origini consecutive: fit incrementale come nel servizio
+    model = state.setdefault('model', HarmonicModel())
+    return predictor.seasonal_harmonic(timestamps, values, horizon, start, model)
+
+
+# Nome -> funzione(predictor, timestamps, values, horizon, start, state) -> previsione
+MODELS = {
+    'sinusoidal_with_trend': _sinusoidal,
+    'default_daily_pattern': _daily_pattern,
+    'simple_linear_regression': _linear,
+    'seasonal': _seasonal,
+}
+
+
+def synthetic_trace(weeks, seed=0, start=1_700_000_000):
+    """Traccia oraria multi-settimana: profilo giornaliero, calo nel weekend, trend e rumore"""
+    rng = np.random.default_rng(seed)
+    timestamps = start // HOUR * HOUR + HOUR * np.arange(weeks * 168)
+    local = [datetime.fromtimestamp(t) for t in timestamps]
+    hour = np.array([d.hour for d in local])
+    weekend = np.array([d.weekday() >= 5 for d in local])
+
+    daily = 15 * np.exp(-((hour - 14) ** 2) / 18) + 6 * np.exp(-((hour - 10) ** 2) / 4)
+    values = 25 + 0.01 * np.arange(len(timestamps)) + np.where(weekend, 0.4, 1.0) * daily
+    values += rng.normal(0, 2.0, len(timestamps))
+    return timestamps, np.clip(values, 0, 100)
+
+
+def stored_trace(directory, metric):
+    """Medie orarie (ore chiuse) di una metrica dai segmenti su disco, senza gli spike marcati"""
+    from .anomalies import quarantine_mask
+    from .config import Config
+    from .rollups import RollupTier
+    from .storage import TimeSeriesStore
+
+    store = TimeSeriesStore(directory, read_only=True)
+    records = store.range()
+    store.close()
+    records = records[~quarantine_mask(records['flags'], metric, Config.ANOMALY_SHIFT_SAMPLES)]  # Come i rollup del servizio
+    tier = RollupTier('1h', HOUR, max(1, len(records)))
+    tier.load(records['timestamp'], records[metric])
+    window = tier.window(include_open=False)
+    observed = window['count'] > 0  # Solo le ore con campioni, come nella traccia sintetica
+    return (np.asarray(window['timestamp'][observed], dtype=np.int64),
+            np.asarray(window['mean'][observed], dtype=np.float64))
+
+
+def load_trace(spec, metric='cpu'):
+    """'synthetic[:settimane[:seed]]' oppure una directory di storage"""
+    if spec.startswith('synthetic'):
+        parts = spec.split(':')
+        weeks = int(parts[1]) if len(parts) > 1 else 6
+        seed = int(parts[2]) if len(parts) > 2 else 0
+        return synthetic_trace(weeks, seed)
+    return stored_trace(spec, metric)
+
+
+_TRACE = None  # (timestamps, values) nei processi del pool
+
+
+def _init_worker(timestamps, values):
+    global _TRACE
+    _TRACE = (timestamps, values)
+
+
+def _run_chunk(model, origins, horizon, tolerance, alloc_samples):
+    """Esegue un modello su un blocco di origini consecutive (processo del pool)"""
+    timestamps, values = _TRACE
+    forecast = MODELS[model]
+    state = {}
+    errors = np.empty((len(origins), horizon))
+    actuals = np.empty((len(origins), horizon))
+    times = np.empty(len(origins))
+
+    for i, origin in enumerate(origins):
+        predictor = ResourcePredictor(seed=origin)
+        start = time.perf_counter()
+        predicted = forecast(predictor, timestamps[:origin], values[:origin], horizon, timestamps[origin], state)
+        times[i] = time.perf_counter() - start
+        actuals[i] = values[origin:origin + horizon]
+        errors[i] = np.asarray(predicted, dtype=np.float64) - actuals[i]
+
+    # Memoria allocata per chiamata, misurata a parte (tracemalloc rallenta le chiamate)
+    peaks = []
+    tracemalloc.start()
+    for origin in origins[:alloc_samples]:
+        predictor = ResourcePredictor(seed=origin)
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        forecast(predictor, timestamps[:origin], values[:origin], horizon, timestamps[origin], {})
+        peaks.append(tracemalloc.get_traced_memory()[1] - base)
+    tracemalloc.stop()
+
+    return model, errors, actuals, times, peaks
+
+
+def summarize(errors, actuals, times, peaks, tolerance):
+    """MAE/MAPE/copertura per passo dell'orizzonte e complessivi, più tempi e memoria"""
+    absolute = np.abs(errors)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        percent = np.where(actuals != 0, absolute / np.abs(actuals) * 100, np.nan)
+    covered = absolute <= tolerance
+
+    def rounded(array):
+        return [round(float(v), 3) for v in array]
+
+    return {
+        'mae': round(float(absolute.mean()), 3),
+        'mape': round(float(np.nanmean(percent)), 3),
+        'coverage': round(float(covered.mean()), 3),
+        'per_horizon': {
+            'mae': rounded(absolute.mean(axis=0)),
+            'mape': rounded(np.nanmean(percent, axis=0)),
+            'coverage': rounded(covered.mean(axis=0)),
+        },
+        'time_ms': {
+            'mean': round(float(times.mean() * 1000), 4),
+            'p95': round(float(np.percentile(times, 95) * 1000), 4),
+        },
+        'alloc_peak_kb': round(float(np.mean(peaks) / 1024), 1) if peaks else None,
+    }
+
+
+def run_backtest(timestamps, values, models, horizon=24, min_history=168, step=6, workers=None,
+                 tolerance=5.0, alloc_samples=20):
+    """Origini ogni `step` ore dopo `min_history` ore; i blocchi di origini girano in parallelo"""
+    origins = list(range(min_history, len(values) - horizon + 1, step))
+    if not origins:
+        raise ValueError(f"Traccia troppo corta: {len(values)} ore, servono almeno {min_history + horizon}")
+
+    workers = workers or os.cpu_count() or 1
+    chunks = [list(chunk) for chunk in np.array_split(origins, min(workers, len(origins)))]
+    per_chunk = max(1, alloc_samples // len(chunks))
+
+    results = {model: [] for model in models}
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(timestamps, values)) as pool:
+        futures = [pool.submit(_run_chunk, model, chunk, horizon, tolerance, per_chunk)
+                   for model in models for chunk in chunks if chunk]
+        for future in futures:
+            model, *parts = future.result()
+            results[model].append(parts)
+
+    report = {
+        'horizon': horizon,
+        'origins': len(origins),
+        'step_hours': step,
+        'min_history_hours': min_history,
+        'coverage_tolerance': tolerance,
+        'models': {},
+    }
+    for model, parts in results.items():
+        errors, actuals, times, peaks = zip(*parts)
+        report['models'][model] = summarize(
+            np.vstack(errors), np.vstack(actuals), np.concatenate(times), sum(peaks, []), tolerance
+        )
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backtest dei modelli di previsione con origini mobili")
+    parser.add_argument('--trace', default='synthetic:6',
+                        help="'synthetic[:settimane[:seed]]' oppure una directory di storage")
+    parser.add_argument('--metric', default='cpu', choices=('cpu', 'ram'))
+    parser.add_argument('--models', default=','.join(MODELS), help="Modelli separati da virgola")
+    parser.add_argument('--horizon', type=int, default=24, help="Ore previste per origine")
+    parser.add_argument('--min-history', type=int, default=168, help="Ore di storico prima della prima origine")
+    parser.add_argument('--step', type=int, default=6, help="Ore tra due origini")
+    parser.add_argument('--workers', type=int, default=None, help="Processi del pool (default: CPU)")
+    parser.add_argument('--tolerance', type=float, default=5.0, help="Banda ± (punti %%) per la copertura")
+    parser.add_argument('--alloc-samples', type=int, default=20, help="Chiamate misurate con tracemalloc")
+    parser.add_argument('--output', help="File JSON del report (default: stdout)")
+    args = parser.parse_args(argv)
+
+    models = [m for m in args.models.split(',') if m]
+    unknown = [m for m in models if m not in MODELS]
+    if unknown:
+        parser.error(f"Modelli sconosciuti: {', '.join(unknown)} (disponibili: {', '.join(MODELS)})")
+
+    timestamps, values = load_trace(args.trace, args.metric)
+    start = time.perf_counter()
+    report = run_backtest(timestamps, values, models, args.horizon, args.min_history, args.step,
+                          args.workers, args.tolerance, args.alloc_samples)
+    report['trace'] = {'source': args.trace, 'metric': args.metric, 'hours': len(values)}
+    report['elapsed_s'] = round(time.perf_counter() - start, 3)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+    # Riepilogo leggibile su stderr (lo stdout resta JSON)
+    print(f"{'modello':>26} {'MAE':>7} {'MAPE %':>7} {'cop.':>6} {'ms/chiamata':>12} {'KB picco':>9}", file=sys.stderr)
+    for model, stats in report['models'].items():
+        print(f"{model:>26} {stats['mae']:7.2f} {stats['mape']:7.2f} {stats['coverage']:6.2f} "
+              f"{stats['time_ms']['mean']:12.3f} {stats['alloc_peak_kb'] or 0:9.1f}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+# Cache LRU dei risultati di previsione con deduplicazione single-flight
+import threading
+from collections import OrderedDict
+
+
+class _InFlight:
+    """Calcolo in corso: i thread che chiedono la stessa chiave lo attendono"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class ForecastCache:
+    """Cache a dimensione limitata indicizzata da (metrica, ore, modello, ora di partenza, versione dati)
+
+    Le chiavi includono la versione dello storico, quindi una nuova raccolta
+    invalida implicitamente i risultati precedenti, che escono per LRU.
+    Richieste concorrenti per la stessa chiave eseguono un solo calcolo.
+    """
+
+    def __init__(self, max_size=256):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0  # Richieste servite attendendo un calcolo già in corso
+        self.evictions = 0
+
+    def get_or_compute(self, key, compute):
+        """Restituisce il valore in cache o lo calcola una sola volta"""
+        with self._lock:
+            if key in self._entries:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return self._entries[key]
+
+            flight = self._inflight.get(key)
+            if flight is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                self.misses += 1
+                flight = self._inflight[key] = _InFlight()
+                leader = True
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = compute()
+        except Exception as e:
+            flight.error = e
+            raise
+        else:
+            with self._lock:
+                self._entries[key] = flight.result
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+            return flight.result
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.done.set()
+
+    def get(self, key, default=None):
+        """Valore in cache senza calcolarlo (un hit se presente, nessun conteggio se assente)"""
+        with self._lock:
+            if key not in self._entries:
+                return default
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Contatori della cache"""
+        requests = self.hits + self.misses + self.coalesced
+        return {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'coalesced': self.coalesced,
+            'evictions': self.evictions,
+            'hit_ratio': round((self.hits + self.coalesced) / requests, 3) if requests else 0.0,
+        }
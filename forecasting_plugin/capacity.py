@@ -0,0 +1,45 @@
+# Pianificazione della capacità: tempo all'esaurimento e VM di ogni flavor che entrano ancora
+import numpy as np
+
+HOUR = 3600
+
+
+def exhaustion_hours(forecasts, threshold, current=None):
+    """Prima ora di previsione (1 = prossima ora) in cui ogni serie raggiunge la soglia
+
+    `forecasts` è una matrice (serie x ore) di percentuali; 0 se `current` è
+    già oltre la soglia, None se la soglia non viene raggiunta nell'orizzonte.
+    """
+    forecasts = np.atleast_2d(np.asarray(forecasts, dtype=np.float64))
+    crossed = forecasts >= threshold
+    hours = np.where(crossed.any(axis=1), crossed.argmax(axis=1) + 1, -1)
+    if current is not None:
+        hours = np.where(np.asarray(current) >= threshold, 0, hours)
+    return [int(h) if h >= 0 else None for h in hours]
+
+
+def peak_percents(forecasts, current, horizons):
+    """Picco previsto (incluso il valore attuale) entro ogni orizzonte: matrice (serie x orizzonti)"""
+    forecasts = np.atleast_2d(np.asarray(forecasts, dtype=np.float64))
+    running = np.maximum.accumulate(forecasts, axis=1)  # Picco cumulato lungo le ore
+    peaks = running[:, np.asarray(horizons) - 1]
+    return np.maximum(peaks, np.asarray(current, dtype=np.float64)[:, None])
+
+
+def flavor_fits(total_vcpus, total_ram_mb, cpu_peaks, ram_peaks, flavor_vcpus, flavor_ram_mb, threshold):
+    """Istanze di ogni flavor che entrano ancora, host per host, per ogni orizzonte
+
+    Una VM non si divide tra host: per ogni host e orizzonte le risorse libere
+    sono la capacità sotto la soglia meno il picco previsto, e il numero di
+    istanze è il minimo tra vCPU e RAM. Un solo passaggio su array
+    (host x orizzonti x flavor), sommato sugli host: matrice (orizzonti x flavor).
+    """
+    total_vcpus = np.asarray(total_vcpus, dtype=np.float64)[:, None]
+    total_ram_mb = np.asarray(total_ram_mb, dtype=np.float64)[:, None]
+    free_vcpus = np.maximum(total_vcpus * (threshold - cpu_peaks) / 100, 0.0)  # host x orizzonti
+    free_ram_mb = np.maximum(total_ram_mb * (threshold - ram_peaks) / 100, 0.0)
+
+    flavor_vcpus = np.asarray(flavor_vcpus, dtype=np.float64)
+    flavor_ram_mb = np.asarray(flavor_ram_mb, dtype=np.float64)
+    fits = np.minimum(free_vcpus[..., None] / flavor_vcpus, free_ram_mb[..., None] / flavor_ram_mb)
+    return np.floor(fits + 1e-9).sum(axis=0).astype(np.int64)  # Tolleranza: 4.0 calcolato come 3.999...
@@ -1,9 +1,31 @@
+import logging
 import os
-import time
-import threading
 import random
+import shutil
+import threading
+from collections import deque
 from datetime import datetime
-from openstack import connection
+
+from . import instrumentation
+from .alerts import AlertEngine, default_rules, host_rules
+from .anomalies import SERIES_FLAGS, SHIFT_FLAGS, AnomalyDetector, quarantine_mask
+from .config import Config
+from .connections import CircuitBreaker, CircuitOpenError, ConnectionManager, KeystoneFactory
+from .engine import CollectionEngine, PollTask
+from .flavors import FlavorCache
+from .history import MetricsRingBuffer
+from .events import Broadcaster, SSEServer
+from .hosts import HostMetrics
+from .instrumentation import (ANOMALIES, COLLECT_ERRORS, COLLECT_GAPS, COLLECT_PHASE, FORECAST_COMPUTE,
+                              FORECAST_ERRORS, MOCK_FALLBACKS, timed_call)
+from .inventory import scan_servers
+from .predictor import ResourcePredictor
+from .rollups import MetricRollups
+from .seasonal import SeasonalModels
+from .snapshot import StateSnapshot
+from .storage import TimeSeriesStore, records_to_history, slice_records
+
+log = logging.getLogger(__name__)
 
 
 class OpenStackMetricsCollector:
@@ -24,122 +46,417 @@ class OpenStackMetricsCollector:
 
         self.interval = interval  # Ogni 60 secondi
         self.running = False
-        self.conn = None  # Connessione OpenStack
+
+        # Orologio e generatore casuale iniettabili (simulazione deterministica, vedi simulation.py)
+        self.clock = datetime.now
+        self.random = random.Random()
+
+        # Storico colonnare a capacità fissa (append O(1), finestre senza copia)
         self.metrics_history = {
-            'cpu': [],
-            'ram': [],
+            'cpu': MetricsRingBuffer(Config.HISTORY_LENGTH, 'allocated_vcpus'),
+            'ram': MetricsRingBuffer(Config.HISTORY_LENGTH, 'allocated_ram_gb', allocated_scale=1 / 1024),
+        }
+
+        # Versione dello storico: incrementata a ogni campione salvato
+        self.version = 0
+
+        # Le API leggono solo `self.snapshot` (immutabile, sostituito a ogni
+        # ciclo con un'assegnazione): il lock serializza i soli scrittori
+        # (ciclo server e poll secondari, in thread diversi del motore)
+        self.snapshot = None
+        self._write_lock = threading.RLock()
+
+        # Rollup incrementali (5m, 1h, 1d) con min/max/mean/p95 per bucket
+        self.rollups = {
+            'cpu': MetricRollups(),
+            'ram': MetricRollups(),
         }
 
+        # Eventi push (nuovi campioni, transizioni di alert) e stream SSE
+        self.events = Broadcaster(replay=Config.SSE_REPLAY)
+        self.stream = None
+
+        # Alert valutati a ogni campione (stato firing/resolved in memoria)
+        self.alert_engine = AlertEngine(default_rules(Config), on_transition=self._on_alert_transition)
+        self._last_predictive = None
+        self.alert_models = SeasonalModels()  # Modelli armonici delle regole predittive (fit incrementale)
+
+        # Anomalie all'ingestione: ogni campione è marcato prima di entrare nello storico
+        self.anomalies = AnomalyDetector(
+            alpha=Config.ANOMALY_ALPHA, z_threshold=Config.ANOMALY_Z_THRESHOLD, min_std=Config.ANOMALY_MIN_STD,
+            warmup=Config.ANOMALY_WARMUP, shift_samples=Config.ANOMALY_SHIFT_SAMPLES,
+            gap_seconds=Config.ANOMALY_GAP_SECONDS
+        ) if Config.ANOMALY_DETECTION else None
+        # Spike in quarantena in attesa: se si rivelano un cambio di livello entrano nei rollup
+        self._pending = {key: deque(maxlen=Config.ANOMALY_SHIFT_SAMPLES) for key in ('cpu', 'ram')}
+
+        # Stato condiviso con i worker WSGI (modalità prefork, vedi server.py)
+        self.shared = None
+        self._shared_running = False
+        self._shared_connected = False
+        self._shared_engine_stats = {}
+        self._shared_stream_stats = {}
+        self._shared_alerts = []
+        self._shared_connection_stats = {}
+        self._shared_anomaly_stats = {}
+
         # Credenziali OpenStack
         self.auth_url = os.getenv('OS_AUTH_URL', 'http://localhost/identity/v3')
         self.username = os.getenv('OS_USERNAME', 'admin')
         self.password = os.getenv('OS_PASSWORD', 'secret')
         self.project_name = os.getenv('OS_PROJECT_NAME', 'admin')
 
-        # Configurazione risorse (default per DevStack)
+        # Pool di connessioni (collector e API) con token condiviso, retry e circuit breaker
+        self.connections = ConnectionManager(
+            KeystoneFactory(
+                auth_url=self.auth_url,
+                username=self.username,
+                password=self.password,
+                project_name=self.project_name,
+                user_domain_name="default",
+                project_domain_name="default"
+            ),
+            size=Config.OS_POOL_SIZE,
+            retries=Config.OS_RETRIES,
+            backoff=Config.OS_RETRY_BACKOFF,
+            backoff_max=Config.OS_RETRY_BACKOFF_MAX,
+            breaker=CircuitBreaker(Config.OS_BREAKER_THRESHOLD, Config.OS_BREAKER_RESET),
+            timeout=Config.OS_POOL_TIMEOUT
+        )
+
+        # Cicli senza dati (epoch, i più recenti) e presenza di dati reali nello storico:
+        # una volta visti dati reali, i cicli falliti diventano buchi e non dati mock
+        self.gaps = ()
+        self._real_data = False
+        self._gap_streak = 0  # Cicli consecutivi senza dati
+
+        # Configurazione risorse (default per DevStack, sostituiti dalla
+        # somma delle capacità degli hypervisor appena disponibile)
         self.total_vcpus = 8  # vCPUs totali nel sistema
         self.total_ram_gb = 16  # GB RAM totali nel sistema
 
-        # Cache per performance
-        self.flavor_cache = {}
+        # Serie per hypervisor (risorse allocate per host)
+        self.host_metrics = HostMetrics()
+        self.hypervisor_capacity = {}  # host -> {'vcpus', 'memory_mb'}
+
+        # Cache condivisa dei flavor (listing bulk, TTL, LRU)
+        self.flavor_cache = FlavorCache(
+            self._list_flavors,
+            ttl=Config.FLAVOR_CACHE_TTL,
+            max_size=Config.FLAVOR_CACHE_SIZE
+        )
         self.last_server_count = 0
+        self.flavors = ()  # Catalogo (nome, vcpus, ram_mb) per la pianificazione della capacità
+
+        # Motore di raccolta asincrono e ultimi risultati dei poll secondari
+        self.engine = None
+        self.hypervisor_info = []
+        self.volume_info = {}
+
+        # Storage persistente: aperto da startup() (collector) o da open_store()
+        # in sola lettura (worker), mai alla creazione: importare il modulo non tocca il disco
+        self.store = None
 
+        self._publish_snapshot()
         self._initialized = True
 
-    def connect(self):
-        """Stabilisce la connessione a OpenStack"""
+    def _list_flavors(self, conn=None):
+        """Listing bulk dei flavor (loader della FlavorCache)"""
+        def list_flavors(conn):
+            return timed_call('compute.flavors', lambda: list(conn.compute.flavors(details=True, is_public=None)))
+
+        if conn is not None:
+            return list_flavors(conn)  # Connessione già presa dal chiamante
+        # Nessun retry qui: è dentro la scansione, che viene ripetuta per intero
+        return self.connections.call(list_flavors, 'flavors', retries=0)
+
+    def open_store(self, read_only=False, load=True):
+        """Apre lo storage su disco (e ricarica lo storico se richiesto)"""
         try:
-            self.conn = connection.Connection(
-                auth_url=self.auth_url,
-                username=self.username,
-                password=self.password,
-                project_name=self.project_name,
-                user_domain_name="default",
-                project_domain_name="default",
-                identity_api_version="3",
-                region_name="RegionOne"
+            self.store = TimeSeriesStore(
+                Config.STORAGE_DIR,
+                retention_days=Config.STORAGE_RETENTION_DAYS,
+                compact_after_days=Config.STORAGE_COMPACT_AFTER_DAYS,
+                compact_resolution=Config.STORAGE_COMPACT_RESOLUTION,
+                read_only=read_only,
+                quarantine_samples=(Config.ANOMALY_SHIFT_SAMPLES
+                                    if Config.ANOMALY_DETECTION and Config.ANOMALY_QUARANTINE else None)
             )
-            print(f"Connesso a OpenStack: {self.auth_url}")
-            return True
+            if load:
+                with self._write_lock:
+                    self._load_history()
+                    self._publish_snapshot()
         except Exception as e:
-            print(f"Errore connessione OpenStack: {e}")
-            return False
+            log.warning("Storage persistente non disponibile: %s", e, extra={'directory': Config.STORAGE_DIR})
+            self.store = None
 
-    #Interroga OpenStack per ottenere lista VM e risorse allocate
-    def get_active_servers_info(self):
-        """Ottiene informazioni sui server attivi e risorse allocate"""
-        try:
-            if not self.conn:
-                return None
+    def _load_history(self):
+        """Riempie i buffer in memoria con gli ultimi record salvati su disco"""
+        records = self.store.range()
+        if not len(records):
+            return
+        self._real_data = bool((records['source'] == MetricsRingBuffer.SOURCES.index('openstack_calculated')).any())
+
+        # I rollup si ricostruiscono in blocco da tutto lo storico su disco (spike in quarantena esclusi)
+        for key in ('cpu', 'ram'):
+            keep = (~quarantine_mask(records['flags'], key, Config.ANOMALY_SHIFT_SAMPLES)
+                    if Config.ANOMALY_QUARANTINE else slice(None))
+            self.rollups[key].load(records['timestamp'][keep], records[key][keep])
+
+        records = records[-Config.HISTORY_LENGTH:]
+        self.gaps = tuple(int(t) for t in self.store.gaps(int(records['timestamp'][0])))
+        self.metrics_history['cpu'].extend(
+            records['timestamp'], records['cpu'], records['source'],
+            records['active_vms'], records['allocated_vcpus'], records['flags']
+        )
+        self.metrics_history['ram'].extend(
+            records['timestamp'], records['ram'], records['source'],
+            records['active_vms'], records['allocated_ram_mb'], records['flags']
+        )
+        if self.anomalies is not None:
+            # Stato del rilevatore riportato sullo storico recente: nessun nuovo warmup al riavvio
+            sources = [MetricsRingBuffer.SOURCES[i] for i in records['source'].tolist()]
+            self.anomalies.replay(records['timestamp'], {'cpu': records['cpu'], 'ram': records['ram']}, sources)
+        log.info("Storico caricato da disco", extra={'samples': len(records)})
+
+    def _record_sample(self, timestamp, cpu, ram, source, active_vms=0, allocated_vcpus=-1, allocated_ram_mb=-1,
+                       hosts=None):
+        """Salva un campione nei buffer in memoria e nello storage su disco
+
+        `hosts` sono le percentuali di allocazione per host (HostMetrics.percents())
+        per le regole di alert per hypervisor.
+        """
+        if isinstance(timestamp, datetime):
+            epoch = timestamp.timestamp()
+        else:
+            epoch = timestamp
+
+        flags, anomalies = 0, []
+        if self.anomalies is not None:
+            with COLLECT_PHASE.labels('anomaly_detection').time(), self._write_lock:
+                flags, anomalies = self.anomalies.observe(epoch, {'cpu': cpu, 'ram': ram}, source)
+            for detection in anomalies:
+                ANOMALIES.labels(detection['series'], detection['kind']).inc()
+
+        with COLLECT_PHASE.labels('history_append').time(), self._write_lock:
+            self.metrics_history['cpu'].append(
+                timestamp, cpu, source, active_vms=active_vms, allocated=allocated_vcpus, flags=flags
+            )
+            self.metrics_history['ram'].append(
+                timestamp, ram, source, active_vms=active_vms, allocated=allocated_ram_mb, flags=flags
+            )
 
-            # Prende tutte le VM da OpenStack
-            servers = list(self.conn.compute.servers())
-            active_servers = [s for s in servers if s.status == 'ACTIVE']  # Filtra solo quelle ACTIVE
+            # Gli spike in quarantena restano nello storico grezzo ma non nei rollup (né nelle previsioni);
+            # a cambio di livello confermato i campioni trattenuti entrano nei bucket ancora aperti
+            for key, value in (('cpu', cpu), ('ram', ram)):
+                pending = self._pending[key]
+                if Config.ANOMALY_QUARANTINE and flags & SERIES_FLAGS[key]:
+                    pending.append((epoch, value))
+                    continue
+                if flags & SHIFT_FLAGS[key]:  # Stessa regola di quarantine_mask al ricaricamento
+                    for item in pending:
+                        self.rollups[key].add(*item)
+                pending.clear()
+                self.rollups[key].add(epoch, value)
+            self.version += 1
+
+            if self.store is not None:
+                try:
+                    self.store.append(
+                        timestamp, cpu, ram, source, active_vms=active_vms,
+                        allocated_vcpus=allocated_vcpus, allocated_ram_mb=allocated_ram_mb, flags=flags
+                    )
+                except Exception as e:
+                    COLLECT_ERRORS.labels('storage').inc()
+                    log.error("Errore scrittura storage: %s", e)
+
+            # Nuovo snapshot prima dell'evento: chi lo riceve legge già questa versione
+            self._publish_snapshot()
+
+        self.events.publish('sample', {
+            'version': self.version,
+            'timestamp': epoch,
+            'cpu': round(float(cpu), 1),
+            'ram': round(float(ram), 1),
+            'source': source,
+            'active_vms': int(active_vms),
+            'flags': flags,
+        })
+        for detection in anomalies:
+            self.events.publish('anomaly', dict(detection, timestamp=epoch))
+            log.info("Anomalia nei dati raccolti", extra=detection)
+        with COLLECT_PHASE.labels('alert_evaluation').time(COLLECT_ERRORS.labels('alerts')):
+            self._update_alerts(epoch, cpu, ram, hosts, anomalies)
+
+        with COLLECT_PHASE.labels('state_publish').time():
+            self._publish()
+
+    def _record_gap(self, timestamp, reason):
+        """Marca un ciclo senza dati: FLAG_GAP su disco, nessun valore inventato in memoria"""
+        epoch = int(timestamp.timestamp() if isinstance(timestamp, datetime) else timestamp)
+        COLLECT_GAPS.labels(reason).inc()
+        with self._write_lock:
+            if self.store is not None:
+                try:
+                    self.store.append_gap(epoch)
+                except Exception as e:
+                    COLLECT_ERRORS.labels('storage').inc()
+                    log.error("Errore scrittura storage: %s", e)
+            self.gaps = self.gaps[-(Config.HISTORY_LENGTH - 1):] + (epoch,)
+            self._publish_snapshot()
+
+        # Una riga all'inizio del buco, non una per ciclo
+        self._gap_streak += 1
+        level = logging.WARNING if self._gap_streak == 1 else logging.DEBUG
+        log.log(level, "Ciclo senza dati", extra={'reason': reason, 'circuit': self.connections.breaker.state})
+        self.events.publish('gap', {'timestamp': epoch, 'reason': reason})
+        self._publish()
+
+    def _collect_fallback(self, reason):
+        """Ciclo fallito: dati mock solo se OpenStack non ha mai fornito dati, altrimenti un buco"""
+        if Config.MOCK_DATA and not self._real_data:
+            MOCK_FALLBACKS.labels(reason).inc()
+            return self.collect_mock_metrics()
+        self._record_gap(self.clock(), reason)
+        return False
+
+    def _update_alerts(self, epoch, cpu, ram, hosts=None, anomalies=()):
+        """Aggiorna il motore di alert con il nuovo campione e le sue anomalie"""
+        values = {'cpu': cpu, 'ram': ram}
+        if self.store is not None:
+            usage = shutil.disk_usage(self.store.directory)
+            values['storage'] = 100.0 * usage.used / usage.total
+
+        if hosts is not None and Config.ALERT_HOST_RULES:
+            for column, host in enumerate(self.host_metrics.hosts):
+                if f'threshold:host:{host}:cpu' not in self.alert_engine.rules:
+                    for rule in host_rules(Config, host):
+                        self.alert_engine.add_rule(rule)
+                values[f'host:{host}:cpu'] = hosts['cpu'][column]
+                values[f'host:{host}:ram'] = hosts['ram'][column]
+
+        self.alert_engine.evaluate(epoch, values)
+        self.alert_engine.evaluate_anomalies(epoch, anomalies)
+
+        # Regole predittive: previsione sulle medie orarie, a intervalli più lunghi. Modello
+        # armonico appreso dallo storico se pronto, altrimenti solo trend: mai un profilo
+        # giornaliero inventato, che farebbe scattare alert a ore fisse
+        if self._last_predictive is None or epoch - self._last_predictive >= Config.ALERT_PREDICTIVE_INTERVAL:
+            self._last_predictive = epoch
+            forecasts = {}
+            for key in ('cpu', 'ram'):
+                closed = self.snapshot.rollup(key, '1h', 168, include_open=False)
+                model = self.alert_models.fit(key, closed['timestamp'], closed['mean'])
+                name = 'seasonal' if model.ready else 'linear_trend'
+                with FORECAST_COMPUTE.labels(name, f'alerts:{key}').time(FORECAST_ERRORS.labels(name)):
+                    if model.ready:
+                        forecasts[key] = model.forecast(epoch, Config.ALERT_PREDICTIVE_HOURS)
+                    else:
+                        hourly = self.snapshot.rollup(key, '1h', 168)['mean']
+                        forecasts[key] = ResourcePredictor().linear_trend(hourly, Config.ALERT_PREDICTIVE_HOURS)
+            self.alert_engine.evaluate_forecasts(epoch, forecasts)
+
+    def _on_alert_transition(self, alert, state, epoch):
+        self.events.publish('alert', dict(alert, state=state, timestamp=epoch))
+
+    def get_alerts(self):
+        """Alert attivi (stato mantenuto dal motore, nessun ricalcolo)"""
+        if self.shared is not None and not self.running:
+            return self._shared_alerts  # Worker prefork: stato pubblicato dal collector
+        return self.alert_engine.alerts()
+
+    # ----- Snapshot per le letture (API, stato condiviso) -----
+
+    def _publish_snapshot(self):
+        """Congela lo stato e lo pubblica con un'assegnazione (da chiamare con il lock di scrittura)"""
+        self.snapshot = StateSnapshot.capture(self, self.version)
+
+    # ----- Stato condiviso (collector -> worker WSGI) -----
+
+    def export_state(self):
+        """Stato serializzabile di tutto ciò che serve alle API"""
+        return {
+            'snapshot': self.snapshot,
+            'running': self.running,
+            'connected': self.connections.connected,
+            'connection_stats': self.connections.stats(),
+            'engine_stats': self.get_engine_stats(),
+            'stream_stats': self.get_stream_stats(),
+            'alerts': self.alert_engine.alerts(),
+            'anomaly_stats': self.get_anomaly_stats(),
+        }
 
-            print(f"Server trovati: {len(servers)} totali, {len(active_servers)} attivi")
+    def import_state(self, state):
+        """Sostituisce lo stato locale con uno snapshot del processo collector"""
+        self.snapshot = state['snapshot']
+        self.version = self.snapshot.version
+        self._shared_running = state['running']
+        self._shared_connected = state['connected']
+        self._shared_engine_stats = state['engine_stats']
+        self._shared_stream_stats = state['stream_stats']
+        self._shared_alerts = state['alerts']
+        self._shared_connection_stats = state['connection_stats']
+        self._shared_anomaly_stats = state['anomaly_stats']
+
+    def _publish(self):
+        if self.shared is not None:
+            try:
+                self.shared.publish(self.export_state())
+            except Exception as e:
+                COLLECT_ERRORS.labels('publish').inc()
+                log.error("Errore pubblicazione stato condiviso: %s", e)
+            instrumentation.publish()  # Metriche del processo collector per /metrics dei worker
 
-            # Per ogni VM attiva, calcola risorse
-            total_allocated_vcpus = 0
-            total_allocated_ram_mb = 0
+    def sync_shared(self):
+        """Nei worker: ricarica lo snapshot del collector se è cambiato"""
+        if self.shared is None:
+            return False
+        state, changed = self.shared.load()
+        if changed and state is not None:
+            self.import_state(state)
+        return changed
 
-            for server in active_servers[:10]:
-                try:
-                    # Cerca il flavor nella cache o usa default
-                    flavor_key = f"{server.id}_{server.flavor.get('id', 'default')}"
-
-                    if flavor_key not in self.flavor_cache:
-                        # Valori default per DevStack flavors
-                        flavor_name = None
-                        if isinstance(server.flavor, dict):
-                            flavor_name = server.flavor.get('original_name', 'm1.tiny')
-
-                        # Mappa di flavor standard DevStack
-                        flavor_map = {
-                            'm1.tiny': {'vcpus': 1, 'ram_mb': 512},
-                            'm1.small': {'vcpus': 1, 'ram_mb': 2048},
-                            'm1.medium': {'vcpus': 2, 'ram_mb': 4096},
-                            'm1.large': {'vcpus': 4, 'ram_mb': 8192},
-                            'm1.xlarge': {'vcpus': 8, 'ram_mb': 16384},
-                            'm1.micro': {'vcpus': 1, 'ram_mb': 256},
-                            'm1.nano': {'vcpus': 1, 'ram_mb': 192},
-                            'cirros256': {'vcpus': 1, 'ram_mb': 256},
-                            'ds512M': {'vcpus': 1, 'ram_mb': 512},
-                            'ds1G': {'vcpus': 1, 'ram_mb': 1024},
-                            'ds2G': {'vcpus': 2, 'ram_mb': 2048},
-                            'ds4G': {'vcpus': 4, 'ram_mb': 4096},
-                        }
-
-                        # Usa m1.tiny come default se non trovato
-                        flavor_info = flavor_map.get(flavor_name, flavor_map['m1.tiny'])
-                        self.flavor_cache[flavor_key] = flavor_info
-
-                        print(
-                            f"   📍 Server {server.name}: flavor '{flavor_name or 'default'}' -> {flavor_info['vcpus']} vCPU, {flavor_info['ram_mb']}MB RAM")
-
-                    flavor_info = self.flavor_cache[flavor_key]
-                    # Somma risorse
-                    total_allocated_vcpus += flavor_info['vcpus']
-                    total_allocated_ram_mb += flavor_info['ram_mb']
+    def is_running(self):
+        """True se la raccolta è attiva (qui o nel processo collector)"""
+        return self.running or self._shared_running
 
-                except Exception as e:
-                    # Solo errore, usa valori default
-                    print(f"Server {server.name}: usando valori default (1 vCPU, 512MB)")
-                    total_allocated_vcpus += 1
-                    total_allocated_ram_mb += 512
+    def is_connected(self):
+        """True se il collector (qui o nel processo collector) è connesso a OpenStack"""
+        return self.connections.connected or self._shared_connected
 
-            # Converti RAM in GB
-            total_allocated_ram_gb = total_allocated_ram_mb / 1024
+    def get_connection_stats(self):
+        """Stato del circuit breaker e del pool (del processo collector nei worker prefork)"""
+        if self.shared is not None and not self.running:
+            return self._shared_connection_stats
+        return self.connections.stats()
 
-            return {
-                'server_count': len(servers),
-                'active_count': len(active_servers),
-                'allocated_vcpus': total_allocated_vcpus,
-                'allocated_ram_gb': total_allocated_ram_gb
-            }
+    #Interroga OpenStack per ottenere lista VM e risorse allocate
+    def get_active_servers_info(self, conn):
+        """Ottiene informazioni sui server attivi e risorse allocate (solleva se OpenStack fallisce)"""
+        # Scansione paginata di TUTTI i server, pagine elaborate in parallelo
+        totals = scan_servers(
+            conn, lambda server: self.flavor_cache.resolve(server, conn),
+            page_size=Config.SERVER_PAGE_SIZE,
+            max_workers=Config.SCAN_WORKERS,
+            all_projects=Config.SCAN_ALL_PROJECTS
+        )
+        # Con il pool le due fasi si sovrappongono: sono tempi cumulati per pagina
+        COLLECT_PHASE.labels('server_listing').observe(totals['listing_seconds'])
+        COLLECT_PHASE.labels('flavor_resolution').observe(totals['resolve_seconds'])
+
+        log.debug("Scansione server completata", extra={
+            'servers': totals['server_count'], 'active': totals['active_count'], 'pages': totals['pages']})
+
+        # Converti RAM in GB
+        total_allocated_ram_gb = totals['allocated_ram_mb'] / 1024
 
-        except Exception as e:
-            print(f"Errore ottenimento server info: {e}")
-            return None
+        return {
+            'server_count': totals['server_count'],
+            'active_count': totals['active_count'],
+            'allocated_vcpus': totals['allocated_vcpus'],
+            'allocated_ram_gb': total_allocated_ram_gb,
+            'hosts': totals['hosts']
+        }
 
     #Trasforma i conteggi VM in percentuali di utilizzo realistiche
     def calculate_realistic_usage(self, server_info):
@@ -151,7 +468,7 @@ class OpenStackMetricsCollector:
         allocated_vcpus = server_info['allocated_vcpus']
         allocated_ram_gb = server_info['allocated_ram_gb']
 
-        print(f"Risorse allocate: {allocated_vcpus} vCPUs, {allocated_ram_gb:.1f}GB RAM")
+        log.debug("Risorse allocate", extra={'vcpus': allocated_vcpus, 'ram_gb': round(allocated_ram_gb, 1)})
 
         # BASE: Utilizzo minimo del sistema
         base_cpu_usage = 5.0  # 5% base
@@ -174,8 +491,9 @@ class OpenStackMetricsCollector:
         ram_usage = max(vm_based_ram, allocated_ram_pct * 1.15)  # 15% in più per overhead
 
         # Aggiungi variabilità giornaliera
-        hour = datetime.now().hour
-        minute = datetime.now().minute
+        now = self.clock()
+        hour = now.hour
+        minute = now.minute
         time_of_day = hour + minute / 60
 
         # Pattern giornaliero (picco alle 14, minimo alle 4)
@@ -184,8 +502,8 @@ class OpenStackMetricsCollector:
         ram_usage *= (daily_factor * 0.9)  # RAM meno variabile
 
         # Aggiungi randomicità
-        cpu_usage += random.uniform(-3, 5)
-        ram_usage += random.uniform(-2, 4)
+        cpu_usage += self.random.uniform(-3, 5)
+        ram_usage += self.random.uniform(-2, 4)
 
         # Limita tra valori realistici
         cpu_usage = max(5.0, min(95.0, cpu_usage))
@@ -193,8 +511,8 @@ class OpenStackMetricsCollector:
 
         # Se non ci sono VM, mostra comunque utilizzo di base
         if active_count == 0:
-            cpu_usage = random.uniform(8, 15)
-            ram_usage = random.uniform(12, 20)
+            cpu_usage = self.random.uniform(8, 15)
+            ram_usage = self.random.uniform(12, 20)
 
         return {
             'cpu_percent': round(cpu_usage, 1),
@@ -207,66 +525,68 @@ class OpenStackMetricsCollector:
     #Esegue un ciclo completo di raccolta dati
     def collect_once(self):
         """Raccolta principale delle metriche - UNA SOLA VOLTA"""
-        try:
-            # Controllo di sicurezza: se non siamo in esecuzione, esci
-            if not self.running:
-                return False
-
-            # Prova connessione
-            if not self.conn:
-                if not self.connect():
-                    return self.collect_mock_metrics()  # Fallback a mock
+        with COLLECT_PHASE.labels('total').time():
+            collected = self._collect_once()
+        instrumentation.publish(force=True)  # Prefork: ciclo completo visibile su /metrics dei worker
+        return collected
 
-            print("\n" + "=" * 50)
-            print(f"Raccolta metriche - {datetime.now().strftime('%H:%M:%S')}")
+    def _collect_once(self):
+        # Controllo di sicurezza: se non siamo in esecuzione, esci
+        if not self.running:
+            return False
 
-            # 1. Ottieni informazioni sui server
-            server_info = self.get_active_servers_info()
+        # 1. Ottieni informazioni sui server (connessione dal pool, retry con backoff)
+        try:
+            server_info = self.connections.call(self.get_active_servers_info, 'servers')
+        except CircuitOpenError:
+            # Circuito aperto: nessuna chiamata, il ciclo termina subito
+            return self._collect_fallback('circuit_open')
+        except Exception as e:
+            COLLECT_ERRORS.labels('server_info').inc()
+            log.warning("Errore ottenimento server info: %s", e)
+            return self._collect_fallback('openstack_error')
 
-            if server_info and server_info['active_count'] >= 0:
-                # 2. Calcola utilizzo realistico
+        try:
+            # 2. Calcola utilizzo realistico
+            with COLLECT_PHASE.labels('usage_calculation').time():
                 usage = self.calculate_realistic_usage(server_info)
 
-                if usage:
-                    timestamp = datetime.now().isoformat()
-
-                    # Salva metriche
-                    self.metrics_history['cpu'].append({
-                        'timestamp': timestamp,
-                        'value': usage['cpu_percent'],
-                        'source': 'openstack_calculated',
-                        'active_vms': usage['active_vms'],
-                        'allocated_vcpus': usage['allocated_vcpus']
-                    })
-
-                    self.metrics_history['ram'].append({
-                        'timestamp': timestamp,
-                        'value': usage['ram_percent'],
-                        'source': 'openstack_calculated',
-                        'active_vms': usage['active_vms'],
-                        'allocated_ram_gb': usage['allocated_ram_gb']
-                    })
-
-                    print(f"METRICHE CALCOLATE:")
-                    print(f"CPU: {usage['cpu_percent']}% ({usage['active_vms']} VM)")
-                    print(f"RAM: {usage['ram_percent']}% ({usage['allocated_ram_gb']}GB allocati)")
-                    print("=" * 50)
-
-                    # Mantieni storico limitato
-                    for key in self.metrics_history:
-                        if len(self.metrics_history[key]) > 1000:
-                            self.metrics_history[key] = self.metrics_history[key][-1000:]
-
-                    return True
-
-            # Fallback a mock se qualcosa va storto
-            return self.collect_mock_metrics()
+            timestamp = self.clock()
+            with self._write_lock:
+                # Catalogo dei flavor dalla cache appena usata dalla scansione (tupla nuova, non modificata)
+                self.flavors = self.flavor_cache.catalog()
+                # Serie per host: allocazioni dalla scansione, capacità dagli hypervisor
+                self.host_metrics.record(timestamp.timestamp(), server_info['hosts'], self.hypervisor_capacity)
+
+                # Salva metriche (la RAM allocata è salvata in MB interi)
+                self._record_sample(
+                    timestamp, usage['cpu_percent'], usage['ram_percent'], 'openstack_calculated',
+                    active_vms=usage['active_vms'],
+                    allocated_vcpus=usage['allocated_vcpus'],
+                    allocated_ram_mb=int(round(usage['allocated_ram_gb'] * 1024)),
+                    hosts=self.host_metrics.percents()
+                )
+                self._real_data = True
+
+            if self._gap_streak:
+                log.info("Raccolta ripresa", extra={'gap_cycles': self._gap_streak})
+                self._gap_streak = 0
+
+            # Una sola riga strutturata per ciclo (prima: banner e righe multiple su stdout)
+            log.info("Metriche calcolate", extra={
+                'cpu': usage['cpu_percent'], 'ram': usage['ram_percent'],
+                'active_vms': usage['active_vms'], 'allocated_ram_gb': usage['allocated_ram_gb'],
+                'servers': server_info['server_count'],
+            })
+
+            # Lo storico è limitato dalla capacità del buffer circolare
+            return True
 
         except Exception as e:
-            print(f"Errore critico nella raccolta: {e}")
-            import traceback
-            traceback.print_exc()
-            return self.collect_mock_metrics()
+            COLLECT_ERRORS.labels('collect').inc()
+            # Il traceback è formattato dal thread di scrittura, non nel ciclo di raccolta
+            log.exception("Errore critico nella raccolta: %s", e)
+            return self._collect_fallback('exception')
 
     def collect_mock_metrics(self):
         """Genera dati mock realistici"""
@@ -274,152 +594,301 @@ class OpenStackMetricsCollector:
         if not self.running:
             return False
 
-        print("Usando dati mock realistici")
-
-        hour = datetime.now().hour
-        minute = datetime.now().minute
+        now = self.clock()
+        hour = now.hour
+        minute = now.minute
         time_of_day = hour + minute / 60
 
         # Pattern giornaliero molto realistico
         if 0 <= hour < 6:  # Notte profonda
-            base_cpu = 8 + 4 * random.random()
-            base_ram = 15 + 5 * random.random()
+            base_cpu = 8 + 4 * self.random.random()
+            base_ram = 15 + 5 * self.random.random()
         elif 6 <= hour < 9:  # Mattina
-            base_cpu = 20 + 10 * random.random()
-            base_ram = 30 + 10 * random.random()
+            base_cpu = 20 + 10 * self.random.random()
+            base_ram = 30 + 10 * self.random.random()
         elif 9 <= hour < 12:  # Mattina lavorativa
-            base_cpu = 40 + 15 * random.random()
-            base_ram = 45 + 10 * random.random()
+            base_cpu = 40 + 15 * self.random.random()
+            base_ram = 45 + 10 * self.random.random()
         elif 12 <= hour < 14:  # Pausa pranzo
-            base_cpu = 30 + 10 * random.random()
-            base_ram = 40 + 8 * random.random()
+            base_cpu = 30 + 10 * self.random.random()
+            base_ram = 40 + 8 * self.random.random()
         elif 14 <= hour < 18:  # Pomeriggio lavorativo
-            base_cpu = 45 + 20 * random.random()
-            base_ram = 50 + 15 * random.random()
+            base_cpu = 45 + 20 * self.random.random()
+            base_ram = 50 + 15 * self.random.random()
         elif 18 <= hour < 22:  # Sera
-            base_cpu = 25 + 10 * random.random()
-            base_ram = 35 + 10 * random.random()
+            base_cpu = 25 + 10 * self.random.random()
+            base_ram = 35 + 10 * self.random.random()
         else:  # Notte
-            base_cpu = 15 + 5 * random.random()
-            base_ram = 25 + 5 * random.random()
+            base_cpu = 15 + 5 * self.random.random()
+            base_ram = 25 + 5 * self.random.random()
 
-        timestamp = datetime.now().isoformat()
+        timestamp = self.clock()
 
-        self.metrics_history['cpu'].append({
-            'timestamp': timestamp,
-            'value': round(base_cpu, 1),
-            'source': 'mock_realistic',
-            'active_vms': random.randint(0, 5)
-        })
-
-        self.metrics_history['ram'].append({
-            'timestamp': timestamp,
-            'value': round(base_ram, 1),
-            'source': 'mock_realistic',
-            'active_vms': random.randint(0, 5)
-        })
+        self._record_sample(
+            timestamp, round(base_cpu, 1), round(base_ram, 1), 'mock_realistic',
+            active_vms=self.random.randint(0, 5)
+        )
 
-        print(f"MOCK: CPU={base_cpu:.1f}%, RAM={base_ram:.1f}%")
+        log.info("Metriche mock", extra={'cpu': round(base_cpu, 1), 'ram': round(base_ram, 1)})
         return True
 
+    def poll_hypervisors(self):
+        """Aggiorna lo stato degli hypervisor (coroutine dedicata del motore)"""
+        try:
+            hypervisors = self.connections.call(
+                lambda conn: timed_call('compute.hypervisors', lambda: list(conn.compute.hypervisors(details=True))),
+                'hypervisors')
+        except CircuitOpenError:
+            return
+        hypervisor_info = [
+            {
+                'name': h.name,
+                'state': h.state,
+                'status': h.status,
+            }
+            for h in hypervisors
+        ]
+
+        # Capacità per host dai record degli hypervisor (nessuna chiamata per host)
+        capacity = {
+            h.name: {'vcpus': h.vcpus or 0, 'memory_mb': h.memory_size or 0}
+            for h in hypervisors
+        }
+        total_vcpus = sum(c['vcpus'] for c in capacity.values())
+        total_ram_mb = sum(c['memory_mb'] for c in capacity.values())
+
+        # Oggetti nuovi riassegnati (mai modificati sul posto): gli snapshot li condividono
+        with self._write_lock:
+            self.hypervisor_info = hypervisor_info
+            self.hypervisor_capacity = capacity
+            if total_vcpus and total_ram_mb:
+                self.total_vcpus = total_vcpus
+                self.total_ram_gb = total_ram_mb / 1024
+            self._publish_snapshot()
+        self._publish()
+
+    def poll_volumes(self):
+        """Aggiorna il riepilogo dei volumi Cinder (coroutine dedicata del motore)"""
+        try:
+            volumes = self.connections.call(
+                lambda conn: timed_call('block_storage.volumes', lambda: list(conn.block_storage.volumes())),
+                'volumes')
+        except CircuitOpenError:
+            return
+        volume_info = {
+            'total': len(volumes),
+            'active': len([v for v in volumes if v.status in ('available', 'in-use')]),
+        }
+        with self._write_lock:
+            self.volume_info = volume_info
+            self._publish_snapshot()
+        self._publish()
+
+    def startup(self, host=None):
+        """Avvio del processo che raccoglie: storico dal disco, raccolta periodica e stream SSE
+
+        `host` è l'indirizzo di bind del server (--host): lo stream ascolta sullo stesso.
+        """
+        if Config.STORAGE_ENABLED and self.store is None:
+            self.open_store(read_only=False)
+        self.start_collection()
+        self.start_stream(host)
+
+    def shutdown(self):
+        """Ferma raccolta e stream e chiude il segmento aperto in scrittura"""
+        self.stop_collection()
+        self.stop_stream()
+        if self.store is not None and not self.store.read_only:
+            self.store.close()
+
     def start_collection(self):
         """Avvia la raccolta periodica - UNA SOLA VOLTA"""
         if self.running:
-            print(f"Collector GIÀ in esecuzione (intervallo: {self.interval}s)")
+            log.info("Collector già in esecuzione", extra={'interval': self.interval})
             return
 
         self.running = True
-        print(f"Collector AVVIATO (intervallo: {self.interval}s)")
-
-        def collection_loop():
-            # Prima raccolta immediata
-            self.collect_once()
+        log.info("Collector avviato", extra={'interval': self.interval})
 
-            # Poi continua con intervallo
-            while self.running:
-                time.sleep(self.interval)  # Aspetta 60 secondi
-                self.collect_once()  # Raccogli UNA volta
-
-        thread = threading.Thread(target=collection_loop, daemon=True)
-        thread.name = "ForecastingCollectorThread"
-        thread.start()
+        # Server, hypervisor e volumi hanno ciascuno intervallo e timeout propri
+        schedules = Config.POLL_SCHEDULES
+        self.engine = CollectionEngine([
+            PollTask('servers', self.collect_once, self.interval, schedules['servers']['timeout']),
+            PollTask('hypervisors', self.poll_hypervisors, **schedules['hypervisors']),
+            PollTask('volumes', self.poll_volumes, **schedules['volumes']),
+        ])
+        self.engine.start()
 
     def stop_collection(self):
         """Ferma la raccolta periodica"""
         if self.running:
             self.running = False
-            print("Collector fermato")
+            if self.engine:
+                self.engine.stop()  # Cancella le coroutine, senza attendere il tick
+            log.info("Collector fermato")
+
+    def start_stream(self, host=None, port=None):
+        """Avvia lo stream SSE nel processo del collector (dove nascono gli eventi)"""
+        if self.stream is not None or not Config.SSE_ENABLED:
+            return
+        stream = SSEServer(
+            self.events, host or Config.API_HOST, Config.SSE_PORT if port is None else port,
+            heartbeat=Config.SSE_HEARTBEAT, queue_size=Config.SSE_QUEUE_SIZE, cors_origin=Config.SSE_CORS_ORIGIN
+        )
+        try:
+            stream.start()
+        except OSError as e:
+            log.warning("Stream SSE non disponibile: %s", e)
+            return
+        self.stream = stream
+
+    def stop_stream(self):
+        if self.stream is not None:
+            self.stream.stop()
+            self.stream = None
+
+    def get_stream_stats(self):
+        """Statistiche dello stream SSE (client, eventi, frame scartati)"""
+        return self.stream.stats() if self.stream else self._shared_stream_stats
+
+    def get_engine_stats(self):
+        """Statistiche dei poll (esecuzioni, timeout, tick saltati)"""
+        return self.engine.stats() if self.engine else self._shared_engine_stats
+
+    def get_anomaly_stats(self):
+        """Contatori del rilevatore di anomalie (del processo collector nei worker prefork)"""
+        if self.anomalies is None:
+            return {}
+        if self.shared is not None and not self.running:
+            return self._shared_anomaly_stats
+        return dict(self.anomalies.stats(), quarantine=Config.ANOMALY_QUARANTINE)
 
     def get_metrics_history(self):
-        """Restituisce lo storico"""
-        return self.metrics_history
+        """Restituisce lo storico dell'ultimo snapshot (dizionario di MetricsRingBuffer congelati)"""
+        return self.snapshot.metrics_history
+
+    def get_values(self, metric, limit, snapshot=None):
+        """Ultimi `limit` valori di una metrica ('cpu' o 'ram') come array NumPy
+
+        Se il buffer in memoria non basta, legge dai segmenti su disco (mmap)
+        fino all'ultimo campione dello snapshot.
+        """
+        snapshot = snapshot or self.snapshot
+        if self.store is not None and limit > len(snapshot.metrics_history[metric]):
+            records = self.store.tail(limit + 1)
+            last = snapshot.last_timestamp()
+            if last is not None:
+                records = records[records['timestamp'] <= last]
+            return records[metric][-limit:]
+        return snapshot.values(metric, limit)
+
+    def get_rollup(self, metric, tier, limit=None, include_open=True):
+        """Ultimi `limit` bucket di un tier di rollup ('5m', '1h', '1d')"""
+        return self.snapshot.rollup(metric, tier, limit, include_open)
+
+    def select_rollup_tier(self, span=None, resolution=None, max_points=1000):
+        """Tier di rollup per span/risoluzione richiesti (None = campioni grezzi)"""
+        return self.snapshot.select_rollup_tier(span, resolution, max_points)
+
+    def get_raw_records(self, limit=None, since=None, until=None, snapshot=None):
+        """Campioni grezzi come array RECORD_DTYPE, con cursori since/until (epoch)
+
+        Legge dal buffer in memoria se basta, altrimenti dai segmenti su disco
+        (senza andare oltre l'ultimo campione dello snapshot).
+        """
+        snapshot = snapshot or self.snapshot
+        if self.store is None or snapshot.covers(limit, since):
+            return snapshot.records(limit, since, until)
+
+        if since is not None or until is not None:
+            records = self.store.range(since + 1 if since is not None else None, until)
+        else:
+            # Un record in più: quello eventualmente scritto dopo lo snapshot viene scartato
+            records = self.store.tail(limit + 1) if limit is not None else self.store.range()
+
+        last = snapshot.last_timestamp()
+        if last is not None:
+            until = min(until, last + 1) if until is not None else last + 1
+        return slice_records(records, limit, since, until)
+
+    def get_gaps(self, since=None, until=None, snapshot=None):
+        """Epoch dei cicli senza dati (since <= t < until): in memoria se bastano, altrimenti da disco"""
+        snapshot = snapshot or self.snapshot
+        if self.store is not None and since is not None and not snapshot.covers(since=since):
+            return [int(t) for t in self.store.gaps(since, until)]
+        return snapshot.gaps_between(since, until)
+
+    def get_history_records(self, limit, since=None, until=None, snapshot=None):
+        """Ultimi `limit` campioni come {'cpu': [...], 'ram': [...]}"""
+        return records_to_history(self.get_raw_records(limit, since, until, snapshot))
 
     def get_current_metrics(self):
-        """Restituisce le metriche correnti"""
-        current = {}
-        for key in ['cpu', 'ram']:
-            if self.metrics_history[key]:
-                current[key] = self.metrics_history[key][-1]
-            else:
-                current[key] = {
-                    'timestamp': datetime.now().isoformat(),
-                    'value': 0,
-                    'source': 'none'
-                }
-        return current
+        """Restituisce le metriche correnti (cpu e ram dello stesso ciclo)"""
+        return self.snapshot.current()
+
+    def _openstack_info(self, conn):
+        hypervisors = list(conn.compute.hypervisors())
+        states = {}
+        for h in hypervisors:
+            states[h.state] = states.get(h.state, 0) + 1
+        if not hypervisors:
+            hypervisor_status = 'unknown'
+        elif set(states) == {'up'}:
+            hypervisor_status = 'up'
+        else:
+            hypervisor_status = 'degraded' if states.get('up') else 'down'
+        volumes = list(conn.block_storage.volumes())
+        servers = list(conn.compute.servers())
+
+        active_servers = [s for s in servers if s.status == 'ACTIVE']
+        error_servers = [s for s in servers if s.status == 'ERROR']
+
+        # Calcola risorse allocate
+        total_allocated_vcpus = 0
+        total_allocated_ram_mb = 0
+
+        for server in active_servers:
+            flavor_info = self.flavor_cache.resolve(server, conn)
+            total_allocated_vcpus += flavor_info['vcpus']
+            total_allocated_ram_mb += flavor_info['ram_mb']
+
+        return {
+            'connected': True,
+            'auth_url': self.auth_url,
+            'hypervisors': len(hypervisors),
+            'hypervisor_status': hypervisor_status,
+            'hypervisor_states': states,
+            'volumes_total': len(volumes),
+            'volumes_active': len([v for v in volumes if v.status == 'available' or v.status == 'in-use']),
+            'servers_total': len(servers),
+            'servers_active': len(active_servers),
+            'servers_error': len(error_servers),
+            'allocated_vcpus': total_allocated_vcpus,
+            'allocated_ram_gb': round(total_allocated_ram_mb / 1024, 1),
+            'system_total_vcpus': self.snapshot.total_vcpus,
+            'system_total_ram_gb': round(self.snapshot.total_ram_gb, 1),
+            'collection_method': 'calculated_from_servers',
+            'flavor_cache': self.flavor_cache.stats(),
+            'timestamp': datetime.now().isoformat()
+        }
 
     def get_openstack_info(self):
         """Informazioni dettagliate sulla connessione OpenStack"""
-        if self.conn:
-            try:
-                hypervisors = list(self.conn.compute.hypervisors())
-                volumes = list(self.conn.block_storage.volumes())
-                servers = list(self.conn.compute.servers())
-
-                active_servers = [s for s in servers if s.status == 'ACTIVE']
-                error_servers = [s for s in servers if s.status == 'ERROR']
-
-                # Calcola risorse allocate
-                total_allocated_vcpus = 0
-                total_allocated_ram_mb = 0
-
-                for server in active_servers:
-                    try:
-                        flavor_id = server.flavor['id']
-                        flavor = self.conn.compute.get_flavor(flavor_id)
-                        total_allocated_vcpus += flavor.vcpus
-                        total_allocated_ram_mb += flavor.ram
-                    except:
-                        total_allocated_vcpus += 1
-                        total_allocated_ram_mb += 512
-
-                return {
-                    'connected': True,
-                    'auth_url': self.auth_url,
-                    'hypervisors': len(hypervisors),
-                    'hypervisor_status': hypervisors[0].state if hypervisors else 'unknown',
-                    'volumes_total': len(volumes),
-                    'volumes_active': len([v for v in volumes if v.status == 'available' or v.status == 'in-use']),
-                    'servers_total': len(servers),
-                    'servers_active': len(active_servers),
-                    'servers_error': len(error_servers),
-                    'allocated_vcpus': total_allocated_vcpus,
-                    'allocated_ram_gb': round(total_allocated_ram_mb / 1024, 1),
-                    'system_total_vcpus': self.total_vcpus,
-                    'system_total_ram_gb': self.total_ram_gb,
-                    'collection_method': 'calculated_from_servers',
-                    'timestamp': datetime.now().isoformat()
-                }
-            except Exception as e:
-                return {
-                    'connected': False,
-                    'error': str(e),
-                    'timestamp': datetime.now().isoformat()
-                }
-        else:
+        if not self.is_connected():
             return {
                 'connected': False,
                 'message': 'Not connected to OpenStack',
+                'circuit': self.get_connection_stats(),
+                'timestamp': datetime.now().isoformat()
+            }
+        try:
+            # Dal thread della richiesta: nessun retry, a circuito aperto risponde subito
+            return self.connections.call(self._openstack_info, 'info', retries=0)
+        except Exception as e:
+            return {
+                'connected': False,
+                'error': str(e),
+                'circuit': self.get_connection_stats(),
                 'timestamp': datetime.now().isoformat()
             }
 
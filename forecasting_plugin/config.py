@@ -10,16 +10,111 @@ class Config:
     # Impostazioni Plugin
     COLLECTION_INTERVAL = 60  # 1 minuto
     HISTORY_LENGTH = 1000
+    HISTORY_MAX_LIMIT = int(os.getenv('FORECASTING_HISTORY_MAX_LIMIT', 100000))  # Punti per richiesta di storico
     FORECAST_HORIZON = 24
+    FORECAST_CACHE_SIZE = 256
+    FORECAST_MAX_HOURS = 168  # Orizzonte massimo delle previsioni (singole, per host e batch)
+    FORECAST_BATCH_MAX_SPECS = 100  # Specifiche per richiesta batch
+    # Bande di quantili delle previsioni: percorsi di errore simulati (0 = niente bande);
+    # più simulazioni = quantili più stabili ma latenza maggiore (benchmarks/bench_quantiles.py)
+    FORECAST_QUANTILES = (0.1, 0.5, 0.9)
+    FORECAST_SIMULATIONS = int(os.getenv('FORECASTING_FORECAST_SIMULATIONS', 1000))
+    FORECAST_MAX_SIMULATIONS = 20000
+
+    # Pianificazione della capacità (/api/v1/capacity): percentuale di allocazione
+    # considerata piena e orizzonti (ore) per cui si calcola quante VM entrano ancora
+    CAPACITY_THRESHOLD = float(os.getenv('FORECASTING_CAPACITY_THRESHOLD', 90))
+    CAPACITY_HORIZONS = (6, 12, 24)
+    CAPACITY_MAX_HOURS = 168
+
+    # Schedulazione dei poll (secondi); l'intervallo server è COLLECTION_INTERVAL
+    POLL_SCHEDULES = {
+        'servers': {'timeout': 45},
+        'hypervisors': {'interval': 300, 'timeout': 30},
+        'volumes': {'interval': 300, 'timeout': 30},
+    }
+
+    # Connessioni OpenStack: pool con token condiviso, retry e circuit breaker (vedi connections.py)
+    OS_POOL_SIZE = int(os.getenv('FORECASTING_OS_POOL_SIZE', 4))  # Connessioni per processo (collector + API)
+    OS_POOL_TIMEOUT = 10  # Secondi di attesa di una connessione libera
+    OS_RETRIES = 2  # Tentativi aggiuntivi per chiamata, finché il circuito resta chiuso
+    OS_RETRY_BACKOFF = 0.5  # Attesa base tra i tentativi (raddoppia, con jitter)...
+    OS_RETRY_BACKOFF_MAX = 4.0  # ...fino a questo massimo
+    OS_BREAKER_THRESHOLD = 5  # Fallimenti consecutivi che aprono il circuito
+    OS_BREAKER_RESET = 30  # Secondi di circuito aperto prima della chiamata di prova
+
+    # Dati mock solo finché OpenStack non ha mai risposto (demo senza cloud); dopo, i cicli
+    # falliti sono registrati come buchi espliciti invece di mescolare dati inventati allo storico
+    MOCK_DATA = os.getenv('FORECASTING_MOCK_DATA', '1') == '1'
+
+    # Scansione inventario server (paginazione a marker + pool di thread)
+    SERVER_PAGE_SIZE = int(os.getenv('FORECASTING_SERVER_PAGE_SIZE', 1000))
+    SCAN_WORKERS = int(os.getenv('FORECASTING_SCAN_WORKERS', 4))
+    SCAN_ALL_PROJECTS = os.getenv('FORECASTING_SCAN_ALL_PROJECTS', '1') == '1'
+
+    # Storage persistente (segmenti giornalieri su disco)
+    STORAGE_ENABLED = os.getenv('FORECASTING_STORAGE_ENABLED', '1') == '1'
+    STORAGE_DIR = os.getenv('FORECASTING_DATA_DIR', os.path.expanduser('~/.forecasting/data'))
+    STORAGE_RETENTION_DAYS = int(os.getenv('FORECASTING_RETENTION_DAYS', 35))
+    STORAGE_COMPACT_AFTER_DAYS = int(os.getenv('FORECASTING_COMPACT_AFTER_DAYS', 7))
+    STORAGE_COMPACT_RESOLUTION = 300  # 5 minuti per record dopo la compattazione
+
+    # Cache flavor
+    FLAVOR_CACHE_TTL = 300  # 5 minuti
+    FLAVOR_CACHE_SIZE = 256
 
     # Impostazioni API
     API_HOST = '0.0.0.0'
     API_PORT = 5000
     DEBUG = True
 
+    # Stream SSE (/api/v1/stream) servito dal processo che esegue il collector
+    SSE_ENABLED = os.getenv('FORECASTING_SSE_ENABLED', '1') == '1'
+    SSE_PORT = int(os.getenv('FORECASTING_SSE_PORT', 5001))
+    SSE_HEARTBEAT = 15  # Secondi tra i commenti di keep-alive
+    SSE_QUEUE_SIZE = 100  # Frame in coda per client prima di scartare i più vecchi
+    SSE_REPLAY = 256  # Eventi rinviati alla riconnessione con Last-Event-ID
+    SSE_CORS_ORIGIN = os.getenv('FORECASTING_SSE_CORS_ORIGIN')  # Es. https://dashboard.example; non impostato = niente CORS
+
+    # Logging strutturato (coda + thread di scrittura, vedi logs.py)
+    LOG_LEVEL = os.getenv('FORECASTING_LOG_LEVEL', 'INFO')
+    LOG_LEVELS = os.getenv('FORECASTING_LOG_LEVELS', '')  # Es. 'forecasting_plugin.inventory=DEBUG,werkzeug=WARNING'
+    LOG_FORMAT = os.getenv('FORECASTING_LOG_FORMAT', 'text')  # 'text' (chiave=valore) oppure 'json'
+    LOG_QUEUE_SIZE = 10000  # Record in attesa di scrittura; oltre si scartano invece di bloccare
+    LOG_SERVER_SAMPLE = int(os.getenv('FORECASTING_LOG_SERVER_SAMPLE', 100))  # 1 riga per server ogni N
+
+    # Strumentazione (istogrammi e contatori esposti su /metrics)
+    INSTRUMENTATION_ENABLED = os.getenv('FORECASTING_INSTRUMENTATION', '1') == '1'
+
+    # Prefork: worker WSGI che leggono lo stato pubblicato dal processo collector
+    API_WORKERS = int(os.getenv('FORECASTING_API_WORKERS', 0))  # 0 = standalone
+    SHARED_STATE_PATH = os.getenv('FORECASTING_SHARED_STATE')  # Default: file in una directory privata (0700) nuova
+
     # Alert Soglie
     CPU_WARNING = 25  # 25% - Facile da raggiungere
     CPU_CRITICAL = 40  # 40%
     RAM_WARNING = 30  # 30%
     RAM_CRITICAL = 50  # 50%
-    STORAGE_WARNING = 70  # 70%
\ No newline at end of file
+    STORAGE_WARNING = 70  # 70%
+
+    # Motore di alert
+    ALERT_HYSTERESIS = 2.0  # Punti sotto la soglia per chiudere (o declassare) un alert
+    ALERT_SUSTAINED_SAMPLES = 3  # Campioni consecutivi oltre soglia prima di scattare
+    ALERT_RATE_DELTA = 20  # Variazione (punti %) che fa scattare l'alert di velocità...
+    ALERT_RATE_WINDOW = 5  # ...entro questo numero di campioni
+    ALERT_PREDICTIVE_HOURS = 6  # Alert se la previsione raggiunge CRITICAL entro N ore
+    ALERT_PREDICTIVE_INTERVAL = 300  # Secondi tra due valutazioni delle regole predittive
+    ALERT_HOST_RULES = True  # Soglie di allocazione anche per ogni hypervisor
+
+    # Rilevamento di anomalie all'ingestione (z-score EWMA, vedi anomalies.py)
+    ANOMALY_DETECTION = os.getenv('FORECASTING_ANOMALY_DETECTION', '1') == '1'
+    # In quarantena gli spike restano nello storico grezzo (marcati) ma non entrano nei rollup,
+    # quindi nemmeno nelle previsioni; altrimenti sono solo marcati
+    ANOMALY_QUARANTINE = os.getenv('FORECASTING_ANOMALY_QUARANTINE', '1') == '1'
+    ANOMALY_Z_THRESHOLD = float(os.getenv('FORECASTING_ANOMALY_Z', 4.0))
+    ANOMALY_ALPHA = 0.05  # Peso del nuovo campione nella media/varianza EWMA (~20 campioni di memoria)
+    ANOMALY_MIN_STD = 1.0  # Deviazione minima (punti %) per lo z-score
+    ANOMALY_WARMUP = 30  # Campioni prima di segnalare
+    ANOMALY_SHIFT_SAMPLES = 5  # Outlier consecutivi dallo stesso lato = cambio di livello
+    ANOMALY_GAP_SECONDS = 600  # Buco oltre il quale la base si riallinea
+    ANOMALY_ALERT_CLEAR = 10  # Campioni puliti prima di chiudere l'alert di anomalia
@@ -0,0 +1,298 @@
+# Connessioni OpenStack resilienti: pool con token Keystone condiviso, retry con backoff e circuit breaker
+import contextlib
+import logging
+import os
+import random
+import threading
+import time
+
+from .instrumentation import CIRCUIT_TRANSITIONS, OPENSTACK_RETRIES, timed_call
+
+log = logging.getLogger(__name__)
+
+
+# Moduli le cui eccezioni indicano un control plane non raggiungibile o in errore
+_TRANSPORT_MODULES = ('openstack.', 'keystoneauth1.', 'requests.', 'urllib3.')
+
+
+class CircuitOpenError(Exception):
+    """Circuito aperto: nessuna chiamata al control plane fino al prossimo tentativo di prova"""
+
+
+class PoolTimeout(Exception):
+    """Nessuna connessione libera nel pool entro il timeout"""
+
+
+def backoff_delay(attempt, base, cap, rng=random):
+    """Backoff esponenziale con jitter: metà fissa, metà uniforme (mai zero, mai sincronizzato)"""
+    delay = min(cap, base * 2 ** attempt)
+    return delay / 2 + rng.uniform(0, delay / 2)
+
+
+class CircuitBreaker:
+    """Circuit breaker a tre stati
+
+    closed: le chiamate passano; dopo `threshold` fallimenti consecutivi si
+    apre. open: nessuna chiamata per `reset` secondi. half_open: passa una
+    sola chiamata di prova, le altre sono rifiutate finché non termina; il suo
+    esito chiude o riapre il circuito. Solo success()/failure() sono esiti:
+    una prova terminata senza esito (release()) lascia il posto alla prossima.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+    STATES = (CLOSED, OPEN, HALF_OPEN)
+
+    def __init__(self, threshold=5, reset=30, clock=time.monotonic):
+        self.threshold = threshold
+        self.reset = reset
+        self.clock = clock
+
+        self.state = self.CLOSED
+        self.failures = 0  # Fallimenti consecutivi
+        self.openings = 0  # Aperture consecutive
+        self.retry_at = None
+        self._probing = False  # Chiamata di prova in corso (half_open)
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """True se una chiamata può partire adesso (in half_open solo la prova)"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and self.clock() >= self.retry_at:
+                self._set(self.HALF_OPEN)
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def success(self):
+        with self._lock:
+            self.failures = 0
+            self.openings = 0
+            self._probing = False
+            if self.state != self.CLOSED:
+                self._set(self.CLOSED)
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.failures >= self.threshold):
+                self._probing = False
+                self.openings += 1
+                self.retry_at = self.clock() + self.reset
+                self._set(self.OPEN)
+
+    def release(self):
+        """Chiamata terminata senza esito sul control plane (es. errore locale, pool esaurito)"""
+        with self._lock:
+            self._probing = False
+
+    def _set(self, state):
+        self.state = state
+        CIRCUIT_TRANSITIONS.labels(state).inc()
+        if state == self.OPEN:
+            log.warning("Circuito OpenStack aperto", extra={
+                'failures': self.failures, 'retry_in_s': round(self.retry_at - self.clock(), 1)})
+        else:
+            log.info("Circuito OpenStack %s", state)
+
+    def stats(self):
+        retry_in = max(0.0, self.retry_at - self.clock()) if self.state == self.OPEN else 0.0
+        return {
+            'state': self.state,
+            'failures': self.failures,
+            'openings': self.openings,
+            'retry_in_s': round(retry_in, 1),
+        }
+
+
+def is_transport_error(error):
+    """True se l'errore viene da OpenStack o dal trasporto (rete, timeout) e non dal codice locale
+
+    Le eccezioni di openstacksdk, keystoneauth1 e requests si riconoscono dal
+    modulo, senza importare le librerie; ConnectionError e TimeoutError sono OSError.
+    """
+    if isinstance(error, OSError):
+        return True
+    return any(cls.__module__.startswith(_TRANSPORT_MODULES) for cls in type(error).__mro__)
+
+
+class KeystoneFactory:
+    """Crea connessioni che condividono il plugin di autenticazione Keystone
+
+    La prima connessione autentica; le successive riusano lo stesso plugin
+    (quindi lo stesso token, rinnovato da keystoneauth alla scadenza sotto
+    il suo lock) ma hanno ciascuna la propria sessione HTTP.
+    """
+
+    def __init__(self, region_name='RegionOne', **auth):
+        self.region_name = region_name
+        self.auth = auth
+        self._plugin = None
+
+    def __call__(self):
+        # Import pigri: openstacksdk costa centinaia di ms e serve solo alla prima connessione
+        from keystoneauth1 import session as ks_session
+        from openstack import connection
+
+        if self._plugin is None:
+            conn = timed_call('identity.connect', connection.Connection,
+                region_name=self.region_name,
+                identity_api_version="3",
+                **self.auth
+            )
+            self._plugin = conn.session.auth
+            log.info("Connessione OpenStack creata", extra={'auth_url': self.auth.get('auth_url')})
+            return conn
+        return connection.Connection(
+            session=ks_session.Session(auth=self._plugin),
+            region_name=self.region_name,
+            identity_api_version="3"
+        )
+
+
+class ConnectionManager:
+    """Pool di connessioni OpenStack per il collector e per le API
+
+    Ogni chiamata prende in prestito una connessione (lease), la restituisce
+    se va a buon fine e la scarta se fallisce (la prossima ne crea una nuova
+    sullo stesso token). I fallimenti OpenStack o di trasporto alimentano il
+    circuit breaker: a circuito aperto lease() fallisce subito con
+    CircuitOpenError, senza attendere timeout di rete.
+    """
+
+    def __init__(self, factory, size=4, retries=2, backoff=0.5, backoff_max=4.0, breaker=None, timeout=10,
+                 sleep=time.sleep, rng=None):
+        self.factory = factory
+        self.size = size
+        self.retries = retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.sleep = sleep
+        self.rng = rng or random.Random()
+        self.breaker = breaker or CircuitBreaker()
+
+        self._idle = []  # LIFO: la connessione usata più di recente ha keep-alive ancora aperti
+        self._created = 0
+        self._cond = threading.Condition()
+
+        self.connected = False  # Ultima chiamata riuscita (e non ancora fallita)
+        self.calls = 0
+        self.retried = 0
+        self.rejected = 0
+        self.discarded = 0
+
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._forget)
+
+    def _forget(self):
+        # Nel figlio i socket del padre non si usano: pool vuoto, stato del circuito conservato
+        self._idle = []
+        self._created = 0
+        self._cond = threading.Condition()
+
+    def _acquire(self):
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            while not self._idle and self._created >= self.size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolTimeout(f"Nessuna connessione libera su {self.size}")
+                self._cond.wait(remaining)
+            if self._idle:
+                return self._idle.pop()
+            self._created += 1
+
+        try:
+            return self.factory()  # Fuori dal lock: la creazione può autenticare
+        except BaseException:
+            self._drop()
+            raise
+
+    def _release(self, conn):
+        with self._cond:
+            self._idle.append(conn)
+            self._cond.notify()
+
+    def _drop(self):
+        with self._cond:
+            self._created -= 1
+            self._cond.notify()
+
+    def _discard(self, conn):
+        self.discarded += 1
+        self._drop()
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    @contextlib.contextmanager
+    def lease(self):
+        """Connessione in prestito per una chiamata (CircuitOpenError se il circuito è aperto)"""
+        if not self.breaker.allow():
+            self.rejected += 1
+            raise CircuitOpenError(f"Circuito aperto ({self.breaker.stats()['retry_in_s']}s al prossimo tentativo)")
+        try:
+            conn = self._acquire()
+        except BaseException as e:
+            self._failed(e)
+            raise
+
+        self.calls += 1
+        try:
+            yield conn
+        except BaseException as e:
+            self._discard(conn)
+            self._failed(e)
+            raise
+        self._release(conn)
+        self.connected = True
+        self.breaker.success()
+
+    def _failed(self, error):
+        # Solo gli errori OpenStack o di trasporto contano per il circuito: un errore
+        # locale (TypeError, pool esaurito...) non dice nulla sul control plane
+        if is_transport_error(error):
+            self.connected = False
+            self.breaker.failure()
+        else:
+            self.breaker.release()
+
+    def call(self, func, name, retries=None):
+        """Esegue func(conn) con retry e backoff con jitter finché il circuito resta chiuso
+
+        Si ritentano solo gli errori OpenStack o di trasporto.
+        """
+        retries = self.retries if retries is None else retries
+        attempt = 0
+        while True:
+            try:
+                with self.lease() as conn:
+                    return func(conn)
+            except Exception as e:
+                if (not is_transport_error(e) or attempt >= retries
+                        or self.breaker.state != CircuitBreaker.CLOSED):
+                    raise
+                delay = backoff_delay(attempt, self.backoff, self.backoff_max, self.rng)
+                OPENSTACK_RETRIES.labels(name).inc()
+                self.retried += 1
+                log.warning("Chiamata OpenStack fallita, nuovo tentativo: %s", e, extra={
+                    'call': name, 'attempt': attempt + 1, 'delay_s': round(delay, 2)})
+                self.sleep(delay)
+                attempt += 1
+
+    def close(self):
+        """Chiude le connessioni inattive"""
+        with self._cond:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            self._discard(conn)
+
+    def stats(self):
+        with self._cond:
+            pool = {'size': self.size, 'open': self._created, 'idle': len(self._idle)}
+        return dict(self.breaker.stats(), connected=self.connected, pool=pool, calls=self.calls,
+                    retries=self.retried, rejected=self.rejected, discarded=self.discarded)
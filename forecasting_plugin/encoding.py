@@ -0,0 +1,132 @@
+# Codifiche compatte e in streaming per lo storico (/api/v1/metrics/history)
+import json
+from datetime import datetime
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+except ImportError:  # Opzionale: senza pyarrow il formato 'arrow' non è disponibile
+    pa = None
+
+FORMATS = ('json', 'columnar', 'ndjson', 'binary', 'arrow')
+
+CHUNK_SIZE = 1000  # Punti per chunk negli encoding in streaming
+
+
+def parse_cursor(value):
+    """Cursore since/until: epoch in secondi oppure data ISO 8601"""
+    if value is None or value == '':
+        return None
+    try:
+        return int(float(value))
+    except ValueError:
+        return int(datetime.fromisoformat(value).timestamp())
+
+
+def record_columns(records):
+    """Colonne (nome -> array) da record RECORD_DTYPE"""
+    return {
+        'timestamp': records['timestamp'],
+        'cpu': records['cpu'],
+        'ram': records['ram'],
+        'active_vms': records['active_vms'],
+        'allocated_vcpus': records['allocated_vcpus'],
+        'allocated_ram_mb': records['allocated_ram_mb'],
+        'source': records['source'],
+        'flags': records['flags'],  # Bit FLAG_* (anomalie marcate all'ingestione)
+    }
+
+
+def rollup_columns(windows, since=None, until=None, limit=None):
+    """Colonne da finestre di rollup {'cpu': window, 'ram': window}, con cursori"""
+    timestamps = np.asarray(windows['cpu']['timestamp'])
+    lo = np.searchsorted(timestamps, since, 'right') if since is not None else 0
+    hi = np.searchsorted(timestamps, until, 'left') if until is not None else len(timestamps)
+    if limit is not None:
+        if since is not None:
+            hi = min(hi, lo + limit)
+        else:
+            lo = max(lo, hi - limit)
+
+    columns = {
+        'timestamp': timestamps[lo:hi],
+        'count': np.asarray(windows['cpu']['count'])[lo:hi],
+    }
+    for metric in ('cpu', 'ram'):
+        for field in ('min', 'max', 'mean', 'p95'):
+            columns[f'{metric}_{field}'] = np.asarray(windows[metric][field], dtype=np.float32)[lo:hi]
+    return columns
+
+
+def _json_lists(columns, start=None, end=None):
+    lists = {}
+    for name, column in columns.items():
+        column = column[start:end]
+        if column.dtype.kind == 'f':
+            column = np.round(column.astype(np.float64), 1)
+            missing = np.isnan(column)
+            if missing.any():
+                # NaN non è JSON valido (es. bucket di rollup senza campioni): diventa null
+                column = np.where(missing, None, column)
+        lists[name] = column.tolist()
+    return lists
+
+
+def next_cursor(columns):
+    """Cursore per la richiesta successiva (ultimo timestamp restituito)"""
+    timestamps = columns['timestamp']
+    return int(timestamps[-1]) if len(timestamps) else None
+
+
+def columnar_json(columns):
+    """Layout colonnare: array paralleli invece di un dizionario per punto"""
+    return {
+        'count': len(columns['timestamp']),
+        'columns': _json_lists(columns),
+        'next_since': next_cursor(columns),
+    }
+
+
+def iter_ndjson(columns, meta):
+    """NDJSON in streaming: una riga di metadati e poi un punto per riga, a chunk"""
+    yield json.dumps(meta) + '\n'
+    names = list(columns)
+    total = len(columns['timestamp'])
+    for start in range(0, total, CHUNK_SIZE):
+        chunk = _json_lists(columns, start, start + CHUNK_SIZE)
+        rows = zip(*(chunk[name] for name in names))
+        yield ''.join(json.dumps(dict(zip(names, row))) + '\n' for row in rows)
+
+
+def binary_dtype(columns):
+    """Dtype little-endian impacchettato delle colonne (un record per punto)"""
+    return np.dtype([(name, column.dtype.newbyteorder('<')) for name, column in columns.items()])
+
+
+def describe_dtype(dtype):
+    """Descrizione del formato binario per l'header X-Record-Format"""
+    return ','.join(f"{name}:{dtype.fields[name][0].str}" for name in dtype.names)
+
+
+def iter_binary(columns):
+    """Record impacchettati (es. <i8 timestamp, <f4 cpu, ...) in streaming a chunk"""
+    dtype = binary_dtype(columns)
+    total = len(columns['timestamp'])
+    for start in range(0, total, CHUNK_SIZE):
+        end = min(start + CHUNK_SIZE, total)
+        packed = np.empty(end - start, dtype=dtype)
+        for name, column in columns.items():
+            packed[name] = column[start:end]
+        yield packed.tobytes()
+
+
+def arrow_ipc(columns):
+    """Stream Arrow IPC (richiede pyarrow)"""
+    if pa is None:
+        raise RuntimeError("Formato 'arrow' non disponibile: installare pyarrow")
+    table = pa.table({name: np.ascontiguousarray(column) for name, column in columns.items()})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table, max_chunksize=CHUNK_SIZE)
+    return sink.getvalue().to_pybytes()
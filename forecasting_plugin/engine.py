@@ -0,0 +1,149 @@
+# Motore di raccolta asincrono: una coroutine per risorsa, tick a frequenza fissa
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+log = logging.getLogger(__name__)
+
+
+class PollTask:
+    """Una risorsa da interrogare periodicamente (server, hypervisor, volumi)"""
+
+    def __init__(self, name, func, interval, timeout=None, overrun='skip'):
+        self.name = name
+        self.func = func  # Funzione bloccante, eseguita nel pool di thread
+        self.interval = interval
+        self.timeout = timeout if timeout is not None else interval
+        self.overrun = overrun  # 'skip' = salta i tick persi, 'coalesce' = un solo recupero immediato
+
+        self.inflight = None  # Future dell'ultima esecuzione scaduta ma non terminata
+        self.runs = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.skipped_ticks = 0
+        self.last_duration = None
+        self.last_run = None
+
+    def stats(self):
+        return {
+            'interval': self.interval,
+            'timeout': self.timeout,
+            'runs': self.runs,
+            'errors': self.errors,
+            'timeouts': self.timeouts,
+            'skipped_ticks': self.skipped_ticks,
+            'last_duration_ms': round(self.last_duration * 1000, 1) if self.last_duration is not None else None,
+            'last_run': self.last_run,
+        }
+
+
+class CollectionEngine:
+    """Esegue i PollTask come coroutine indipendenti in un event loop dedicato
+
+    Ogni task è schedulato su tick fissi (start + k * interval), quindi la
+    durata delle chiamate OpenStack non accumula deriva. Se un poll supera
+    il proprio tick, i tick persi vengono saltati (o fusi in uno solo).
+    """
+
+    def __init__(self, tasks):
+        self.tasks = {task.name: task for task in tasks}
+        self._loop = None
+        self._main = None
+        self._thread = None
+        self._executor = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Avvia l'event loop in un thread daemon"""
+        if self.running:
+            return
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=len(self.tasks), thread_name_prefix="ForecastingPoll"
+        )
+        ready = threading.Event()
+
+        def run_loop():
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+            self._main = self._loop.create_task(self._run_all())
+            ready.set()
+            try:
+                self._loop.run_until_complete(self._main)
+            except asyncio.CancelledError:
+                pass
+            finally:
+                self._loop.close()
+
+        self._thread = threading.Thread(target=run_loop, daemon=True)
+        self._thread.name = "ForecastingCollectorThread"
+        self._thread.start()
+        ready.wait()
+
+    def stop(self, timeout=5):
+        """Cancella tutte le coroutine senza attendere il tick successivo"""
+        if not self.running:
+            return
+        self._loop.call_soon_threadsafe(self._main.cancel)
+        self._thread.join(timeout)
+        # I poll già in corso nel pool non possono essere interrotti: non li aspettiamo
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _run_all(self):
+        await asyncio.gather(*(self._run_task(task) for task in self.tasks.values()))
+
+    async def _poll(self, task):
+        loop = asyncio.get_running_loop()
+
+        if task.inflight is not None and not task.inflight.done():
+            # Il poll precedente è ancora in corso: non ne avviamo un secondo
+            task.skipped_ticks += 1
+            return
+
+        started = time.perf_counter()
+        future = loop.run_in_executor(self._executor, task.func)
+        try:
+            await asyncio.wait_for(asyncio.shield(future), task.timeout)
+            task.inflight = None
+        except asyncio.TimeoutError:
+            task.timeouts += 1
+            task.inflight = future
+            log.warning("Poll oltre il timeout", extra={'poll': task.name, 'timeout': task.timeout})
+        except Exception as e:
+            task.errors += 1
+            task.inflight = None
+            log.error("Errore nel poll: %s", e, extra={'poll': task.name})
+        finally:
+            task.runs += 1
+            task.last_duration = time.perf_counter() - started
+            task.last_run = time.time()
+
+    async def _run_task(self, task):
+        loop = asyncio.get_running_loop()
+        origin = loop.time()
+        tick = 0
+
+        while True:
+            await self._poll(task)
+
+            # Prossimo tick allineato alla griglia origin + k * interval
+            elapsed = loop.time() - origin
+            due = int(elapsed // task.interval) + 1
+            missed = due - (tick + 1)
+            if missed > 0:
+                task.skipped_ticks += missed
+                if task.overrun == 'coalesce':
+                    # Recupera subito con un unico poll al posto di quelli persi
+                    tick = due - 1
+                    continue
+            tick = due
+
+            await asyncio.sleep(max(0.0, origin + tick * task.interval - loop.time()))
+
+    def stats(self):
+        return {name: task.stats() for name, task in self.tasks.items()}
@@ -0,0 +1,252 @@
+# Canale push (Server-Sent Events) per nuovi campioni e transizioni di alert
+import asyncio
+import json
+import logging
+import threading
+from collections import deque
+from urllib.parse import parse_qs, urlsplit
+
+log = logging.getLogger(__name__)
+
+HEARTBEAT = b': ping\n\n'
+
+_RESPONSE_HEAD = (
+    b'HTTP/1.1 200 OK\r\n'
+    b'Content-Type: text/event-stream\r\n'
+    b'Cache-Control: no-cache\r\n'
+    b'Connection: keep-alive\r\n'
+)
+_RESPONSE_END = b'\r\nretry: 5000\n\n'
+
+_NOT_FOUND = b'HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\nConnection: close\r\n\r\n'
+
+
+def response_head(cors_origin=None):
+    """Intestazione della risposta SSE; Access-Control-Allow-Origin solo se configurato"""
+    if not cors_origin:
+        return _RESPONSE_HEAD + _RESPONSE_END
+    if '\r' in cors_origin or '\n' in cors_origin:
+        raise ValueError("Origine CORS non valida")
+    return _RESPONSE_HEAD + f'Access-Control-Allow-Origin: {cors_origin}\r\n'.encode('latin-1') + _RESPONSE_END
+
+
+def format_event(seq, event, data):
+    """Frame SSE codificato una sola volta e condiviso da tutti i client"""
+    return f"id: {seq}\nevent: {event}\ndata: {json.dumps(data)}\n\n".encode()
+
+
+class Broadcaster:
+    """Fan-out degli eventi del collector verso i listener registrati
+
+    publish() viene chiamato dal thread del collector: numera l'evento,
+    lo codifica una volta e lo passa ai listener (es. SSEServer). Gli ultimi
+    `replay` eventi restano disponibili per i client che si riconnettono
+    con Last-Event-ID.
+    """
+
+    def __init__(self, replay=256):
+        self._lock = threading.Lock()
+        self._listeners = []
+        self._replay = deque(maxlen=replay)
+        self.seq = 0
+
+    def subscribe(self, listener):
+        with self._lock:
+            self._listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def publish(self, event, data):
+        """Pubblica un evento ('sample', 'alert', ...) con payload serializzabile in JSON"""
+        with self._lock:
+            self.seq += 1
+            frame = (self.seq, event, format_event(self.seq, event, data))
+            self._replay.append(frame)
+            listeners = list(self._listeners)
+        for listener in listeners:
+            try:
+                listener(frame)
+            except Exception as e:
+                log.error("Errore consegna evento: %s", e, extra={'event': event})
+
+    def replay(self, after):
+        """Eventi con id successivo a `after` ancora nel buffer di replay"""
+        with self._lock:
+            return [frame for frame in self._replay if frame[0] > after]
+
+
+class _Subscriber:
+    """Client SSE: coda limitata che scarta i frame più vecchi se il client è lento"""
+
+    __slots__ = ('queue', 'events', 'wakeup')
+
+    def __init__(self, queue_size, events):
+        self.queue = deque(maxlen=queue_size)
+        self.events = events  # None = tutti i tipi di evento
+        self.wakeup = asyncio.Event()
+
+    def push(self, data):
+        """Accoda un frame; True se è stato scartato il più vecchio"""
+        full = len(self.queue) == self.queue.maxlen
+        self.queue.append(data)
+        self.wakeup.set()
+        return full
+
+
+class SSEServer:
+    """Server SSE asincrono: un solo thread con event loop per tutti i client
+
+    Ogni client è una coroutine in attesa sulla propria coda; il fan-out
+    avviene nel loop (una call_soon_threadsafe per evento, non per client)
+    e l'heartbeat è un unico task periodico. Gira nel processo che esegue
+    il collector: in prefork è il processo collector, non i worker WSGI.
+    """
+
+    PATH = '/api/v1/stream'
+
+    def __init__(self, broadcaster, host='0.0.0.0', port=5001, heartbeat=15, queue_size=100, cors_origin=None):
+        self.broadcaster = broadcaster
+        self.host = host
+        self.port = port
+        self.heartbeat = heartbeat
+        self.queue_size = queue_size
+        self.head = response_head(cors_origin)  # Senza CORS i browser di altre origini non leggono lo stream
+
+        self._clients = set()
+        self._loop = None
+        self._server = None
+        self._thread = None
+        self._ready = threading.Event()
+        self._error = None
+
+        self.connections = 0
+        self.fanouts = 0
+        self.dropped = 0  # Frame scartati per client lenti
+
+    def start(self):
+        """Avvia il thread del server e attende il bind della porta"""
+        self._thread = threading.Thread(target=self._run, daemon=True, name="ForecastingSSEThread")
+        self._thread.start()
+        self._ready.wait()
+        if self._error is not None:
+            raise self._error
+        self.broadcaster.subscribe(self._on_event)
+        log.info("Stream SSE avviato", extra={'url': f"http://{self.host}:{self.port}{self.PATH}"})
+
+    def stop(self):
+        self.broadcaster.unsubscribe(self._on_event)
+        if self._loop is not None and self._loop.is_running():
+            self._loop.call_soon_threadsafe(self._loop.stop)
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _run(self):
+        loop = self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            self._server = loop.run_until_complete(
+                asyncio.start_server(self._handle, self.host, self.port, backlog=4096)
+            )
+            self.port = self._server.sockets[0].getsockname()[1]  # Porta effettiva se 0
+        except OSError as e:
+            self._error = e
+            self._ready.set()
+            loop.close()
+            return
+
+        heartbeat = loop.create_task(self._heartbeats())
+        self._ready.set()
+        try:
+            loop.run_forever()
+        finally:
+            heartbeat.cancel()
+            self._server.close()
+            for task in asyncio.all_tasks(loop):
+                task.cancel()
+            loop.run_until_complete(asyncio.sleep(0))
+            loop.close()
+
+    def _on_event(self, frame):
+        """Listener del Broadcaster (thread del collector): passa il frame al loop"""
+        try:
+            self._loop.call_soon_threadsafe(self._fanout, frame)
+        except RuntimeError:
+            pass  # Loop già chiuso
+
+    def _fanout(self, frame):
+        _, event, data = frame
+        for client in self._clients:
+            if (client.events is None or event in client.events) and client.push(data):
+                self.dropped += 1
+        self.fanouts += 1
+
+    async def _heartbeats(self):
+        while True:
+            await asyncio.sleep(self.heartbeat)
+            for client in self._clients:
+                if not client.queue:  # Solo i client inattivi
+                    client.push(HEARTBEAT)
+
+    async def _handle(self, reader, writer):
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), timeout=10)
+            lines = head.decode('latin-1').split('\r\n')
+            method, target, _ = lines[0].split(' ', 2)
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError,
+                ConnectionError, ValueError):
+            writer.close()
+            return
+
+        url = urlsplit(target)
+        if method != 'GET' or url.path != self.PATH:
+            writer.write(_NOT_FOUND)
+            writer.close()
+            return
+
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+        query = parse_qs(url.query)
+
+        events = set(query['events'][0].split(',')) if 'events' in query else None
+        client = _Subscriber(self.queue_size, events)
+
+        # Riconnessione: rinvia gli eventi persi ancora nel buffer di replay
+        last_id = headers.get('last-event-id') or query.get('last_event_id', [''])[0]
+        if last_id.isdigit():
+            for _, event, data in self.broadcaster.replay(int(last_id)):
+                if (events is None or event in events) and client.push(data):
+                    self.dropped += 1
+
+        writer.write(self.head)
+        self._clients.add(client)
+        self.connections += 1
+        try:
+            while True:
+                await client.wakeup.wait()
+                client.wakeup.clear()
+                if writer.is_closing():
+                    break
+                while client.queue:
+                    writer.write(client.queue.popleft())
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self._clients.discard(client)
+            writer.close()
+
+    def stats(self):
+        """Contatori dello stream"""
+        return {
+            'port': self.port,
+            'clients': len(self._clients),
+            'connections': self.connections,
+            'events': self.broadcaster.seq,
+            'fanouts': self.fanouts,
+            'dropped': self.dropped,
+        }
@@ -0,0 +1,138 @@
+# Cache condivisa dei flavor: caricamento bulk, TTL ed eviction LRU
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+log = logging.getLogger(__name__)
+
+# Mappa di flavor standard DevStack (usata solo come ultima risorsa)
+DEVSTACK_FLAVORS = {
+    'm1.tiny': {'vcpus': 1, 'ram_mb': 512},
+    'm1.small': {'vcpus': 1, 'ram_mb': 2048},
+    'm1.medium': {'vcpus': 2, 'ram_mb': 4096},
+    'm1.large': {'vcpus': 4, 'ram_mb': 8192},
+    'm1.xlarge': {'vcpus': 8, 'ram_mb': 16384},
+    'm1.micro': {'vcpus': 1, 'ram_mb': 256},
+    'm1.nano': {'vcpus': 1, 'ram_mb': 192},
+    'cirros256': {'vcpus': 1, 'ram_mb': 256},
+    'ds512M': {'vcpus': 1, 'ram_mb': 512},
+    'ds1G': {'vcpus': 1, 'ram_mb': 1024},
+    'ds2G': {'vcpus': 2, 'ram_mb': 2048},
+    'ds4G': {'vcpus': 4, 'ram_mb': 4096},
+}
+
+DEFAULT_FLAVOR = DEVSTACK_FLAVORS['m1.tiny']
+
+
+class FlavorCache:
+    """Cache dei flavor indicizzata per flavor id
+
+    Viene riempita con una sola chiamata bulk a `flavors()` e ricaricata
+    alla scadenza del TTL, quindi una scansione di N server costa O(1)
+    chiamate API invece di una `get_flavor` per server.
+
+    Il loader riceve la connessione del chiamante (o None): chi ha già una
+    connessione del pool la passa a `resolve`, così il refresh non ne chiede
+    una seconda (con OS_POOL_SIZE=1 sarebbe un deadlock).
+    """
+
+    def __init__(self, loader, ttl=300, max_size=256, clock=time.monotonic):
+        self.loader = loader  # Callable(conn) che restituisce l'elenco dei flavor
+        self.ttl = ttl
+        self.max_size = max_size
+        self.clock = clock
+
+        self._flavors = OrderedDict()  # flavor_id -> {'name', 'vcpus', 'ram_mb'}
+        self._loaded_at = None
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()  # Un solo refresh alla volta
+
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.evictions = 0
+
+    def _store(self, flavor_id, info):
+        self._flavors[flavor_id] = info
+        self._flavors.move_to_end(flavor_id)
+        while len(self._flavors) > self.max_size:
+            self._flavors.popitem(last=False)
+            self.evictions += 1
+
+    def refresh(self, conn=None):
+        """Ricarica tutti i flavor con una singola chiamata bulk"""
+        flavors = list(self.loader(conn))
+        with self._lock:
+            self._flavors.clear()
+            for flavor in flavors:
+                self._store(flavor.id, {
+                    'name': flavor.name,
+                    'vcpus': flavor.vcpus,
+                    'ram_mb': flavor.ram,
+                })
+            self._loaded_at = self.clock()
+            self.refreshes += 1
+        log.info("Flavor caricati", extra={'flavors': len(flavors)})
+
+    def _is_stale(self):
+        return self._loaded_at is None or self.clock() - self._loaded_at > self.ttl
+
+    def _ensure_fresh(self, conn):
+        if not self._is_stale():
+            return
+        with self._refresh_lock:
+            if not self._is_stale():
+                return  # Già ricaricata da un altro thread
+            try:
+                self.refresh(conn)
+            except Exception as e:
+                # Senza listing valido si prosegue con i dati incorporati
+                log.warning("Errore caricamento flavor: %s", e)
+                self._loaded_at = self.clock()
+
+    @staticmethod
+    def _embedded(flavor):
+        """Risorse dal flavor incorporato nel server (original_name/vcpus/ram)"""
+        if flavor.get('vcpus') is not None and flavor.get('ram') is not None:
+            return {'name': flavor.get('original_name'), 'vcpus': flavor['vcpus'], 'ram_mb': flavor['ram']}
+
+        name = flavor.get('original_name')
+        known = DEVSTACK_FLAVORS.get(name, DEFAULT_FLAVOR)
+        return {'name': name, 'vcpus': known['vcpus'], 'ram_mb': known['ram_mb']}
+
+    def resolve(self, server, conn=None):
+        """Risorse (vcpus, ram_mb) del flavor di un server (conn: connessione già in uso)"""
+        flavor = server.flavor if isinstance(server.flavor, dict) else {}
+        flavor_id = flavor.get('id')
+
+        self._ensure_fresh(conn)
+
+        with self._lock:
+            if flavor_id is not None and flavor_id in self._flavors:
+                self.hits += 1
+                self._flavors.move_to_end(flavor_id)
+                return self._flavors[flavor_id]
+
+            self.misses += 1
+            info = self._embedded(flavor)
+            if flavor_id is not None:
+                self._store(flavor_id, info)
+            return info
+
+    def catalog(self):
+        """Flavor noti come tupla di (nome, vcpus, ram_mb) ordinata per nome (senza duplicati)"""
+        with self._lock:
+            named = {info['name']: info for info in self._flavors.values() if info.get('name')}
+        return tuple((name, info['vcpus'], info['ram_mb']) for name, info in sorted(named.items()))
+
+    def stats(self):
+        """Contatori della cache"""
+        return {
+            'size': len(self._flavors),
+            'hits': self.hits,
+            'misses': self.misses,
+            'refreshes': self.refreshes,
+            'evictions': self.evictions,
+            'ttl': self.ttl,
+        }
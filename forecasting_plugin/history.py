@@ -0,0 +1,164 @@
+# Storico metriche in formato colonnare su array NumPy preallocati
+from datetime import datetime
+
+import numpy as np
+
+
+def readonly(array):
+    """Vista in sola lettura (nessuna copia) di un array"""
+    view = array.view()
+    view.flags.writeable = False
+    return view
+
+
+class MetricsRingBuffer:
+    """Buffer circolare a capacità fissa, una colonna NumPy per campo"""
+
+    # Le sorgenti sono salvate come codice uint8 invece che come stringa
+    SOURCES = ('none', 'openstack_calculated', 'mock_realistic')
+
+    _COLUMNS = ('_timestamps', '_values', '_active_vms', '_allocated', '_sources', '_flags')
+
+    def __init__(self, capacity=1000, allocated_key=None, allocated_scale=1):
+        self.capacity = capacity
+        self.allocated_key = allocated_key  # Es. 'allocated_vcpus' o 'allocated_ram_gb'
+        self.allocated_scale = allocated_scale  # Fattore di conversione in output
+
+        # Ogni colonna è lunga 2 * capacity e si scrive solo in avanti: gli
+        # ultimi N campioni sono sempre la slice contigua [end - N, end) (vista
+        # senza copia). A colonne piene gli ultimi campioni passano in testa a
+        # colonne nuove: una copia di al più `capacity` campioni ogni
+        # `capacity` append, quindi O(1) ammortizzato
+        size = 2 * capacity
+        self._timestamps = np.zeros(size, dtype=np.int64)  # Epoch in secondi
+        self._values = np.zeros(size, dtype=np.float32)
+        self._active_vms = np.zeros(size, dtype=np.int16)
+        self._allocated = np.full(size, -1, dtype=np.int32)  # -1 = non disponibile
+        self._sources = np.zeros(size, dtype=np.uint8)
+        self._flags = np.zeros(size, dtype=np.uint8)  # Bit di stato del record (FLAG_ANOMALY_*, ...)
+
+        self._end = 0  # Prossima posizione di scrittura
+        self._count = 0
+        self._readonly = None  # Viste in sola lettura delle colonne correnti, per freeze()
+
+    def __len__(self):
+        return self._count
+
+    def freeze(self):
+        """Copia immutabile per gli snapshot, in O(1): viste in sola lettura sulle stesse colonne
+
+        Il buffer vivo scrive solo oltre la fine della finestra congelata o su
+        colonne nuove (vedi _rebase()), quindi la copia non cambia più.
+        """
+        if self._readonly is None:
+            self._readonly = {name: readonly(getattr(self, name)) for name in self._COLUMNS}
+        # Come copy.copy(), senza il suo costo fisso: un freeze() a ogni campione
+        frozen = object.__new__(type(self))
+        frozen.__dict__ = {**self.__dict__, **self._readonly}
+        return frozen
+
+    def _rebase(self, n):
+        """Colonne nuove con gli ultimi campioni in testa e spazio per altri `n`"""
+        keep = min(self._count, self.capacity - n)
+        for name in self._COLUMNS:
+            column = getattr(self, name)
+            fresh = np.zeros_like(column)
+            fresh[:keep] = column[self._end - keep:self._end]
+            setattr(self, name, fresh)
+        self._end = keep
+        self._count = keep
+        self._readonly = None
+
+    def append(self, timestamp, value, source, active_vms=0, allocated=-1, flags=0):
+        """Aggiunge un campione in O(1), sovrascrivendo il più vecchio"""
+        if isinstance(timestamp, datetime):
+            timestamp = timestamp.timestamp()
+
+        if self._end == len(self._values):
+            self._rebase(1)
+        j = self._end
+        self._timestamps[j] = int(timestamp)
+        self._values[j] = value
+        self._active_vms[j] = active_vms
+        self._allocated[j] = allocated
+        self._sources[j] = self.SOURCES.index(source)
+        self._flags[j] = flags
+
+        self._end = j + 1
+        self._count = min(self._count + 1, self.capacity)
+
+    def extend(self, timestamps, values, sources, active_vms, allocated, flags=None):
+        """Aggiunge in blocco campioni già codificati (sorgenti come indici uint8)"""
+        n = min(len(values), self.capacity)
+        if n == 0:
+            return
+
+        if self._end + n > len(self._values):
+            self._rebase(n)
+        positions = slice(self._end, self._end + n)
+        columns = (
+            (self._timestamps, timestamps),
+            (self._values, values),
+            (self._sources, sources),
+            (self._active_vms, active_vms),
+            (self._allocated, allocated),
+            (self._flags, np.zeros(n, dtype=np.uint8) if flags is None else flags),
+        )
+        for column, data in columns:
+            column[positions] = np.asarray(data)[-n:]
+
+        self._end += n
+        self._count = min(self._count + n, self.capacity)
+
+    def _window(self, limit=None):
+        """Indici [start, end) degli ultimi `limit` campioni"""
+        n = self._count if limit is None else max(0, min(limit, self._count))
+        return self._end - n, self._end
+
+    def timestamps(self, limit=None):
+        """Vista (senza copia) sugli ultimi timestamp"""
+        start, end = self._window(limit)
+        return self._timestamps[start:end]
+
+    def values(self, limit=None):
+        """Vista (senza copia) sugli ultimi valori"""
+        start, end = self._window(limit)
+        return self._values[start:end]
+
+    def columns(self, limit=None):
+        """Viste (senza copia) su tutte le colonne degli ultimi campioni"""
+        start, end = self._window(limit)
+        return {
+            'timestamp': self._timestamps[start:end],
+            'value': self._values[start:end],
+            'source': self._sources[start:end],
+            'active_vms': self._active_vms[start:end],
+            'allocated': self._allocated[start:end],
+            'flags': self._flags[start:end],
+        }
+
+    def _record(self, j):
+        record = {
+            'timestamp': datetime.fromtimestamp(int(self._timestamps[j])).isoformat(),
+            'value': round(float(self._values[j]), 1),
+            'source': self.SOURCES[self._sources[j]],
+            'active_vms': int(self._active_vms[j]),
+        }
+        allocated = int(self._allocated[j])
+        if self.allocated_key and allocated >= 0:
+            if self.allocated_scale == 1:
+                record[self.allocated_key] = allocated
+            else:
+                record[self.allocated_key] = round(allocated * self.allocated_scale, 1)
+        return record
+
+    def last(self):
+        """Ultimo campione come dizionario (None se vuoto)"""
+        if not self._count:
+            return None
+        return self._record(self._end - 1)
+
+    def to_records(self, limit=None):
+        """Ultimi campioni come lista di dizionari (per la serializzazione JSON)"""
+        start, end = self._window(limit)
+        return [self._record(j) for j in range(start, end)]
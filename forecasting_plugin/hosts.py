@@ -0,0 +1,255 @@
+# Metriche per hypervisor: risorse allocate per host e serie orarie in matrice
+import copy
+
+import numpy as np
+
+UNKNOWN_HOST = 'unknown'
+
+
+class HostMetrics:
+    """Serie per host in matrici (ore x host), aggiornate in un solo passaggio
+
+    Ogni ciclo di raccolta riceve le risorse allocate per host (dalla
+    scansione dei server) e le capacità (dal poll degli hypervisor); le
+    percentuali di allocazione sono mediate per ora e salvate in un buffer
+    circolare a colonne, così le previsioni di centinaia di host sono una
+    sola chiamata al kernel batch. Le ore in cui un host non era nella
+    scansione (hypervisor aggiunto dopo l'avvio o rimosso) e le ore intere
+    senza raccolta sono NaN, non 0%: le previsioni usano solo le ore
+    osservate. Un host assente per tutta la finestra oraria viene rimosso.
+    """
+
+    METRICS = ('cpu', 'ram')
+    STATE = ('allocated_vcpus', 'allocated_ram_mb', 'active_vms', 'total_vcpus', 'total_ram_mb', 'present')
+    HOUR = 3600
+
+    def __init__(self, capacity=168, initial_hosts=64):
+        self.capacity = capacity
+        self.hosts = []
+        self.index = {}
+
+        self._width = initial_hosts
+        # Ore x host, colonne doppie (come MetricsRingBuffer) per finestre contigue; NaN = host non ancora visto
+        self._hourly = {m: np.full((2 * capacity, self._width), np.nan, dtype=np.float32) for m in self.METRICS}
+        self._hour_starts = np.zeros(2 * capacity, dtype=np.int64)
+        self._head = 0
+        self._count = 0
+
+        # Ora aperta: somme delle percentuali e campioni per host (un host nuovo entra a metà ora)
+        self._open_hour = None
+        self._open_sums = {m: np.zeros(self._width) for m in self.METRICS}
+        self._open_counts = np.zeros(self._width, dtype=np.int64)
+        self._open_samples = 0
+
+        # Ultimo stato per host
+        self.allocated_vcpus = np.zeros(self._width, dtype=np.int64)
+        self.allocated_ram_mb = np.zeros(self._width, dtype=np.int64)
+        self.active_vms = np.zeros(self._width, dtype=np.int64)
+        self.total_vcpus = np.zeros(self._width, dtype=np.int64)
+        self.total_ram_mb = np.zeros(self._width, dtype=np.int64)
+        self.present = np.zeros(self._width, dtype=bool)  # Host nella scansione o nel poll dell'ultimo ciclo
+        self._shared = False  # Matrici orarie condivise con una copia congelata (copy-on-write)
+
+    def freeze(self):
+        """Copia immutabile per gli snapshot
+
+        Le matrici delle ore chiuse sono condivise (cambiano una volta l'ora);
+        lo stato corrente per host e le somme dell'ora aperta si copiano.
+        """
+        frozen = copy.copy(self)
+        frozen.hosts = list(self.hosts)
+        frozen.index = dict(self.index)
+        frozen._open_sums = {m: a.copy() for m, a in self._open_sums.items()}
+        frozen._open_counts = self._open_counts.copy()
+        for name in self.STATE:
+            setattr(frozen, name, getattr(self, name).copy())
+        if not self._shared:
+            for array in (self._hour_starts, *self._hourly.values()):
+                array.flags.writeable = False
+            self._shared = True
+        return frozen
+
+    def _own(self):
+        if self._shared:
+            self._hourly = {m: a.copy() for m, a in self._hourly.items()}
+            self._hour_starts = self._hour_starts.copy()
+            self._shared = False
+
+    def _resize(self, width, columns=None):
+        """Array nuovi larghi `width` con le colonne `columns` (tutte se None) in testa"""
+        def widen(array, fill=0):
+            kept = array[..., :self._width] if columns is None else array[..., columns]
+            shape = array.shape[:-1] + (width,)
+            grown = np.full(shape, fill, dtype=array.dtype)
+            grown[..., :kept.shape[-1]] = kept
+            return grown
+
+        # Matrici nuove: quelle condivise con gli snapshot restano intatte
+        self._hourly = {m: widen(a, np.nan) for m, a in self._hourly.items()}
+        self._hour_starts = self._hour_starts.copy() if self._shared else self._hour_starts
+        self._shared = False
+        self._open_sums = {m: widen(a) for m, a in self._open_sums.items()}
+        self._open_counts = widen(self._open_counts)
+        for name in self.STATE:
+            setattr(self, name, widen(getattr(self, name)))
+        self._width = width
+
+    def _grow(self, width):
+        """Raddoppia le colonne quando compaiono nuovi host"""
+        self._resize(width)
+
+    def _expire(self):
+        """Rimuove gli host assenti da tutta la finestra oraria (nessuna ora osservata)"""
+        n = len(self.hosts)
+        end = self._head + self.capacity
+        window = self._hourly['cpu'][end - self._count:end, :n]
+        gone = ~self.present[:n] & (self._open_counts[:n] == 0) & np.isnan(window).all(axis=0)
+        if not gone.any():
+            return
+        keep = np.flatnonzero(~gone)
+        self.hosts = [self.hosts[column] for column in keep]
+        self.index = {host: column for column, host in enumerate(self.hosts)}
+        self._resize(self._width, keep)
+
+    def _column(self, host):
+        column = self.index.get(host)
+        if column is None:
+            column = len(self.hosts)
+            if column >= self._width:
+                self._grow(2 * self._width)
+            self.hosts.append(host)
+            self.index[host] = column
+        return column
+
+    def record(self, timestamp, allocations, capacities):
+        """Registra un ciclo: allocations = {host: {vcpus, ram_mb, active}},
+        capacities = {host: {vcpus, memory_mb}} dal poll degli hypervisor"""
+        for host in list(capacities) + list(allocations):
+            self._column(host)
+        n = len(self.hosts)
+
+        # Lo stato di un host assente da scansione e poll non resta quello dell'ultima volta
+        for name in self.STATE:
+            getattr(self, name)[:n] = 0
+        for host, allocated in allocations.items():
+            column = self.index[host]
+            self.allocated_vcpus[column] = allocated['vcpus']
+            self.allocated_ram_mb[column] = allocated['ram_mb']
+            self.active_vms[column] = allocated['active']
+            self.present[column] = True
+        for host, capacity in capacities.items():
+            column = self.index[host]
+            self.total_vcpus[column] = capacity['vcpus']
+            self.total_ram_mb[column] = capacity['memory_mb']
+            self.present[column] = True
+
+        hour = int(timestamp) // self.HOUR * self.HOUR
+        if self._open_samples and hour != self._open_hour:
+            closed = self._open_hour
+            self._close_hour()
+            self._skip_hours(closed + self.HOUR, hour)
+            self._expire()
+            n = len(self.hosts)
+        if not self._open_samples:
+            self._open_hour = hour
+
+        percents = self.percents()
+        for metric in self.METRICS:
+            self._open_sums[metric][:n] += percents[metric]  # 0 per gli host assenti
+        self._open_counts[:n] += self.present[:n]
+        self._open_samples += 1
+
+    def percents(self):
+        """Percentuali di allocazione correnti per host (0 se capacità sconosciuta)"""
+        n = len(self.hosts)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cpu = np.where(self.total_vcpus[:n] > 0, 100.0 * self.allocated_vcpus[:n] / self.total_vcpus[:n], 0.0)
+            ram = np.where(self.total_ram_mb[:n] > 0, 100.0 * self.allocated_ram_mb[:n] / self.total_ram_mb[:n], 0.0)
+        return {'cpu': cpu, 'ram': ram}
+
+    def _open_means(self, metric, n=None):
+        """Medie dell'ora aperta per host, NaN per gli host senza campioni in quest'ora"""
+        counts = self._open_counts[:n]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(counts > 0, self._open_sums[metric][:n] / counts, np.nan)
+
+    def _push_hour(self, start, means):
+        self._own()
+        for j in (self._head, self._head + self.capacity):
+            self._hour_starts[j] = start
+            for metric in self.METRICS:
+                self._hourly[metric][j] = means[metric]
+        self._head = (self._head + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+
+    def _close_hour(self):
+        self._push_hour(self._open_hour, {metric: self._open_means(metric) for metric in self.METRICS})
+        for metric in self.METRICS:
+            self._open_sums[metric][:] = 0
+        self._open_counts[:] = 0
+        self._open_samples = 0
+
+    def _skip_hours(self, start, end):
+        """Ore intere senza campioni tra `start` e `end` (escluso): righe NaN, al massimo una finestra"""
+        for hour in range(max(start, end - self.capacity * self.HOUR), end, self.HOUR):
+            self._push_hour(hour, {metric: np.nan for metric in self.METRICS})
+
+    def hourly(self, metric, limit=None):
+        """Matrice (host x ore) delle medie orarie, inclusa l'ora in corso (NaN prima della comparsa dell'host)"""
+        n = len(self.hosts)
+        hours = self._count if limit is None else max(0, min(limit, self._count))
+        end = self._head + self.capacity
+        matrix = self._hourly[metric][end - hours:end, :n]
+        if self._open_samples:
+            partial = self._open_means(metric, n)
+            if limit is not None and hours == limit and hours > 0:
+                matrix = matrix[1:]
+            matrix = np.vstack([matrix, partial[np.newaxis, :]])
+        return matrix.T
+
+    def aggregate_hourly(self, metric, limit=None):
+        """Serie aggregata su tutti gli host, pesata per capacità
+
+        Ogni ora media solo gli host già presenti in quell'ora.
+        """
+        matrix = self.hourly(metric, limit)
+        n = len(self.hosts)
+        if not n:
+            return np.zeros(0)
+        weights = (self.total_vcpus if metric == 'cpu' else self.total_ram_mb)[:n].astype(np.float64)
+        observed = ~np.isnan(matrix)
+        if observed.all():
+            if weights.sum() == 0:
+                return matrix.mean(axis=0)
+            return weights @ matrix / weights.sum()
+
+        values = np.where(observed, matrix, 0.0)
+        if weights.sum() == 0:
+            weights = np.ones(n)
+        present = weights @ observed
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(present > 0, weights @ values / present, np.nan)
+
+    def snapshot(self):
+        """Stato corrente degli host presenti nell'ultimo ciclo"""
+        percents = self.percents()
+        hosts = []
+        for column, host in enumerate(self.hosts):
+            if not self.present[column]:
+                continue
+            hosts.append({
+                'host': host,
+                'active_vms': int(self.active_vms[column]),
+                'allocated_vcpus': int(self.allocated_vcpus[column]),
+                'total_vcpus': int(self.total_vcpus[column]),
+                'allocated_ram_gb': round(self.allocated_ram_mb[column] / 1024, 1),
+                'total_ram_gb': round(self.total_ram_mb[column] / 1024, 1),
+                'cpu_allocated_percent': round(float(percents['cpu'][column]), 1),
+                'ram_allocated_percent': round(float(percents['ram'][column]), 1),
+            })
+        return hosts
+
+    def totals(self):
+        """Capacità totale del cloud (somma delle capacità degli hypervisor)"""
+        n = len(self.hosts)
+        return int(self.total_vcpus[:n].sum()), int(self.total_ram_mb[:n].sum())
@@ -0,0 +1,354 @@
+# Strumentazione a basso costo: istogrammi e contatori esposti su /metrics (formato Prometheus)
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+
+from .config import Config
+from .shared import read_private, write_private
+
+log = logging.getLogger(__name__)
+
+# Bucket in secondi: da 0.5 ms a 60 s
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class _Timer:
+    """Context manager che osserva la durata del blocco (ed eventuali errori)"""
+
+    __slots__ = ('histogram', 'errors', 'start')
+
+    def __init__(self, histogram, errors=None):
+        self.histogram = histogram
+        self.errors = errors
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram._observe(time.perf_counter() - self.start)
+        if exc_type is not None and self.errors is not None:
+            self.errors.inc()
+        return False
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class Histogram:
+    """Conteggi per bucket, somma e numero di osservazioni di una serie"""
+
+    def __init__(self, buckets, registry):
+        self.buckets = buckets
+        self.registry = registry
+        self.counts = [0] * (len(buckets) + 1)  # L'ultimo è +Inf; il totale si calcola all'export
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        if self.registry.enabled:
+            self._observe(value)
+
+    def _observe(self, value):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+
+    def time(self, errors=None):
+        """Misura un blocco `with`; `errors` è un Counter incrementato se il blocco solleva"""
+        return _Timer(self, errors) if self.registry.enabled else _NULL_TIMER
+
+    def export(self):
+        with self._lock:
+            counts = self.counts[:]
+            return counts, self.sum, sum(counts)
+
+
+class Counter:
+    """Contatore monotono di una serie"""
+
+    def __init__(self, registry):
+        self.registry = registry
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        if not self.registry.enabled:
+            return
+        with self._lock:
+            self.value += amount
+
+    def export(self):
+        return self.value
+
+
+class MetricFamily:
+    """Metrica con etichette: una serie (Histogram o Counter) per combinazione di valori"""
+
+    def __init__(self, registry, kind, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.registry = registry
+        self.kind = kind
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets) if kind == 'histogram' else None
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        series = self._series.get(values)
+        if series is None:
+            with self._lock:
+                series = self._series.get(values)
+                if series is None:
+                    if self.kind == 'histogram':
+                        series = Histogram(self.buckets, self.registry)
+                    else:
+                        series = Counter(self.registry)
+                    self._series[values] = series
+        return series
+
+    def export(self):
+        return {
+            'kind': self.kind,
+            'help': self.help,
+            'labelnames': self.labelnames,
+            'buckets': self.buckets,
+            'series': {values: series.export() for values, series in list(self._series.items())},
+        }
+
+
+class Registry:
+    """Tutte le metriche del processo; enabled=False rende osservazioni e timer no-op"""
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.families = {}
+        self.gauges = {}  # nome -> (help, callable che restituisce {valori etichette: valore} o un numero)
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        family = self.families[name] = MetricFamily(self, 'histogram', name, help, labelnames, buckets)
+        return family
+
+    def counter(self, name, help, labelnames=()):
+        family = self.families[name] = MetricFamily(self, 'counter', name, help, labelnames)
+        return family
+
+    def gauge(self, name, help, func, labelnames=()):
+        """Gauge calcolato al momento della lettura di /metrics"""
+        self.gauges[name] = (help, func, tuple(labelnames))
+
+    def export(self):
+        """Snapshot serializzabile di istogrammi e contatori"""
+        return {name: family.export() for name, family in self.families.items()}
+
+
+def merge(snapshots):
+    """Somma snapshot di più processi (worker prefork + collector)"""
+    merged = {}
+    for snapshot in snapshots:
+        for name, family in snapshot.items():
+            target = merged.setdefault(name, dict(family, series={}))
+            for values, data in family['series'].items():
+                current = target['series'].get(values)
+                if current is None:
+                    target['series'][values] = data
+                elif family['kind'] == 'histogram':
+                    counts = [a + b for a, b in zip(current[0], data[0])]
+                    target['series'][values] = (counts, current[1] + data[1], current[2] + data[2])
+                else:
+                    target['series'][values] = current + data
+    return merged
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(snapshot, gauges=None):
+    """Formato testuale di esposizione Prometheus (0.0.4)"""
+    lines = []
+    for name, family in sorted(snapshot.items()):
+        names = family['labelnames']
+        lines.append(f"# HELP {name} {family['help']}")
+        lines.append(f"# TYPE {name} {family['kind']}")
+        for values, data in sorted(family['series'].items()):
+            if family['kind'] == 'histogram':
+                counts, total, count = data
+                cumulative = 0
+                for bound, bucket in zip(family['buckets'] + (float('inf'),), counts):
+                    cumulative += bucket
+                    le = 'le="' + _format_value(bound if bound == float('inf') else float(bound)) + '"'
+                    lines.append(f"{name}_bucket{_format_labels(names, values, le)} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(names, values)} {_format_value(float(total))}")
+                lines.append(f"{name}_count{_format_labels(names, values)} {count}")
+            else:
+                lines.append(f"{name}{_format_labels(names, values)} {_format_value(data)}")
+
+    for name, (help, func, names) in sorted((gauges or {}).items()):
+        try:
+            value = func()
+        except Exception:
+            continue  # Un gauge non disponibile non deve rompere lo scrape
+        lines.append(f"# HELP {name} {help}")
+        lines.append(f"# TYPE {name} gauge")
+        series = value if isinstance(value, dict) else {(): value}
+        for values, v in sorted(series.items()):
+            lines.append(f"{name}{_format_labels(names, values)} {_format_value(float(v))}")
+    return '\n'.join(lines) + '\n'
+
+
+class SharedMetrics:
+    """Snapshot per processo in memoria condivisa, sommati alla lettura di /metrics
+
+    In prefork ogni processo (collector e worker) scrive il proprio file al
+    massimo ogni `interval` secondi; i file di processi terminati vengono
+    ignorati ed eliminati. I file sono JSON (solo dati) scritti con
+    write_private, accanto allo stato condiviso.
+    """
+
+    def __init__(self, prefix, interval=1.0):
+        self.prefix = prefix
+        self.interval = interval
+        self._last = 0.0
+
+    def _path(self, pid):
+        return f"{self.prefix}-{pid}.json"
+
+    @staticmethod
+    def _encode(snapshot):
+        # Le etichette sono tuple (chiavi non ammesse in JSON): coppie [valori, dati]
+        return {name: dict(family, series=[[list(values), data] for values, data in family['series'].items()])
+                for name, family in snapshot.items()}
+
+    @staticmethod
+    def _decode(snapshot):
+        return {name: dict(family, labelnames=tuple(family['labelnames']),
+                           buckets=tuple(family['buckets']) if family['buckets'] is not None else None,
+                           series={tuple(values): data for values, data in family['series']})
+                for name, family in snapshot.items()}
+
+    def publish(self, registry, force=False):
+        now = time.monotonic()
+        if not force and now - self._last < self.interval:
+            return
+        self._last = now
+        write_private(self._path(os.getpid()), json.dumps(self._encode(registry.export())).encode())
+
+    def collect(self):
+        """Snapshot di tutti i processi vivi"""
+        snapshots = []
+        for path in glob.glob(f"{self.prefix}-*.json"):
+            pid = int(path[len(self.prefix) + 1:-5])
+            try:
+                os.kill(pid, 0)
+            except ProcessLookupError:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                continue
+            except PermissionError:
+                pass
+            try:
+                snapshots.append(self._decode(json.loads(read_private(path))))
+            except (OSError, ValueError, KeyError, TypeError):
+                continue
+        return snapshots
+
+    def remove_all(self):
+        for path in glob.glob(f"{self.prefix}-*.json*"):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+REGISTRY = Registry(enabled=Config.INSTRUMENTATION_ENABLED)
+SHARED = None  # SharedMetrics in modalità prefork (vedi share())
+
+COLLECT_PHASE = REGISTRY.histogram(
+    'forecasting_collect_phase_seconds', "Durata delle fasi del ciclo di raccolta", ['phase'])
+COLLECT_ERRORS = REGISTRY.counter(
+    'forecasting_collect_errors_total', "Errori nel ciclo di raccolta", ['stage'])
+MOCK_FALLBACKS = REGISTRY.counter(
+    'forecasting_mock_fallbacks_total', "Cicli ripiegati su dati mock", ['reason'])
+COLLECT_GAPS = REGISTRY.counter(
+    'forecasting_collect_gaps_total', "Cicli senza dati registrati come buco (nessun valore inventato)", ['reason'])
+ANOMALIES = REGISTRY.counter(
+    'forecasting_anomalies_total', "Anomalie rilevate all'ingestione (spike, cambi di livello o di sorgente)",
+    ['series', 'kind'])
+OPENSTACK_CALL = REGISTRY.histogram(
+    'forecasting_openstack_request_seconds', "Durata delle chiamate alle API OpenStack", ['call'])
+OPENSTACK_ERRORS = REGISTRY.counter(
+    'forecasting_openstack_errors_total', "Chiamate OpenStack fallite", ['call'])
+OPENSTACK_RETRIES = REGISTRY.counter(
+    'forecasting_openstack_retries_total', "Chiamate OpenStack ripetute dopo un errore (backoff con jitter)", ['call'])
+CIRCUIT_TRANSITIONS = REGISTRY.counter(
+    'forecasting_openstack_circuit_transitions_total', "Transizioni del circuit breaker OpenStack", ['state'])
+FORECAST_COMPUTE = REGISTRY.histogram(
+    'forecasting_forecast_compute_seconds', "Durata del calcolo delle previsioni (solo cache miss)",
+    ['model', 'scope'])
+FORECAST_ERRORS = REGISTRY.counter(
+    'forecasting_forecast_errors_total', "Previsioni fallite", ['model'])
+FORECAST_FALLBACKS = REGISTRY.counter(
+    'forecasting_forecast_fallbacks_total', "Previsioni ripiegate su un modello più semplice", ['model'])
+HTTP_REQUEST = REGISTRY.histogram(
+    'forecasting_http_request_seconds', "Latenza degli endpoint HTTP", ['endpoint', 'method'])
+HTTP_RESPONSES = REGISTRY.counter(
+    'forecasting_http_responses_total', "Risposte HTTP per endpoint e codice", ['endpoint', 'status'])
+
+
+def timed_call(call, func, *args, **kwargs):
+    """Esegue una chiamata OpenStack misurandone durata ed errori"""
+    with OPENSTACK_CALL.labels(call).time(OPENSTACK_ERRORS.labels(call)):
+        return func(*args, **kwargs)
+
+
+def share(prefix):
+    """Prefork: ogni processo pubblica le proprie metriche accanto allo stato condiviso"""
+    global SHARED
+    SHARED = SharedMetrics(prefix)
+
+
+def publish(force=False):
+    """Scrive lo snapshot del processo (al massimo una volta al secondo)"""
+    if SHARED is not None:
+        try:
+            SHARED.publish(REGISTRY, force)
+        except OSError as e:
+            log.error("Errore pubblicazione metriche: %s", e)
+
+
+def exposition():
+    """Testo di /metrics: metriche di tutti i processi (prefork) o di quello corrente"""
+    if SHARED is None:
+        return render(REGISTRY.export(), REGISTRY.gauges)
+    publish(force=True)
+    return render(merge(SHARED.collect()), REGISTRY.gauges)
@@ -0,0 +1,71 @@
+# Bande di quantili delle previsioni: bootstrap dei residui, tutte le simulazioni in un solo array
+import numpy as np
+
+MIN_ORIGINS = 24  # Errori in-sample minimi per stimare un passo dell'orizzonte
+
+
+def quantile_label(q):
+    """0.1 -> 'p10', 0.975 -> 'p97.5'"""
+    return f"p{round(q * 100, 1):g}"
+
+
+def ar1_paths(residuals, forecast_hours, simulations, rng, anchor=0.0):
+    """Percorsi di errore AR(1) con innovazioni ricampionate: matrice (simulazioni x ore)
+
+    phi è l'autocorrelazione lag-1 dei residui (limitata a [0, 0.98]) e le
+    innovazioni centrate vengono ricampionate con reinserimento. Il percorso
+    e_h = sum_j phi^(h-j) u_j segue la ricorsione e_h = phi * e_(h-1) + u_h,
+    un passo per ora su tutte le simulazioni (memoria O(simulazioni x ore));
+    `anchor` (0-1) toglie la parte dell'ultimo residuo già assorbita dalla
+    previsione puntuale (1 = la previsione parte dall'ultimo valore).
+    """
+    residuals = np.asarray(residuals, dtype=np.float64)
+    residuals = residuals[np.isfinite(residuals)]
+    if len(residuals) < 3:
+        return None
+
+    centered = residuals - residuals.mean()
+    denominator = centered[:-1] @ centered[:-1]
+    phi = float(np.clip(centered[1:] @ centered[:-1] / denominator, 0.0, 0.98)) if denominator > 0 else 0.0
+    innovations = centered[1:] - phi * centered[:-1]
+    innovations -= innovations.mean()
+
+    steps = np.arange(forecast_hours)
+    draws = innovations[rng.integers(0, len(innovations), (simulations, forecast_hours))]
+    paths = np.ascontiguousarray(draws.T)  # Ore x simulazioni: ogni passo è una riga contigua
+    for h in range(1, forecast_hours):
+        paths[h] += phi * paths[h - 1]
+    carry = (phi ** (steps + 1) - anchor) * centered[-1]  # Persistenza dell'ultimo residuo
+    return paths.T + carry
+
+
+def error_paths(errors, simulations, rng, min_samples=MIN_ORIGINS):
+    """Ricampiona percorsi interi di errori in-sample (origini x ore): matrice (simulazioni x ore)
+
+    Le origini sono in ordine di tempo: quelle recenti non hanno ancora il
+    futuro delle ore lontane (NaN), quindi ogni ora si estrae tra le origini
+    che l'hanno osservata, con la stessa estrazione uniforme per tutto il
+    percorso. I passi con meno di `min_samples` errori riusano l'ultimo passo
+    stimato, allargato come una passeggiata aleatoria (sqrt(h)); None se
+    nemmeno il primo passo è stimabile.
+    """
+    errors = np.asarray(errors, dtype=np.float64)
+    counts = np.isfinite(errors).sum(axis=0)  # Origini valide: un prefisso delle righe
+    estimated = np.flatnonzero(counts >= min_samples)
+    if not len(estimated):
+        return None
+
+    last = estimated[-1]
+    steps = np.arange(errors.shape[1])
+    columns = np.minimum(steps, last)
+    scale = np.sqrt(np.maximum(steps + 1, last + 1) / (last + 1))
+    rows = (rng.random(simulations)[:, None] * counts[columns]).astype(np.int64)
+    return errors[rows, columns] * scale
+
+
+def bands(point, paths, quantiles):
+    """Quantili per ora di previsione + errore simulato, limitati a 0-100%: {'p10': [...], ...}"""
+    simulated = np.asarray(point, dtype=np.float64) + paths  # simulazioni x ore
+    levels = np.quantile(simulated, quantiles, axis=0)
+    levels = np.round(np.clip(levels, 0.0, 100.0), 1)
+    return {quantile_label(q): row.tolist() for q, row in zip(quantiles, levels)}
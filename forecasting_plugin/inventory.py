@@ -0,0 +1,137 @@
+# Scansione paginata e parallela dell'inventario server di Nova
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from time import perf_counter
+
+from .hosts import UNKNOWN_HOST
+from .instrumentation import timed_call
+
+# Righe per server (DEBUG), campionate da logs.SamplingFilter: una ogni LOG_SERVER_SAMPLE
+server_log = logging.getLogger(__name__ + '.servers')
+
+
+def _fetch_page(conn, page_size, query):
+    # islice evita che l'SDK richieda in automatico la pagina successiva
+    return list(islice(conn.compute.servers(details=True, **query), page_size))
+
+
+def iter_server_pages(conn, page_size=1000, all_projects=True, timings=None):
+    """Restituisce i server una pagina alla volta usando la paginazione a marker
+
+    Nova può restituire meno di `page_size` server anche se ce ne sono altri
+    (il limite è ridotto a osapi_max_limit), quindi la scansione termina solo
+    con una pagina vuota.
+
+    Se `timings` è un dict, vi accumula in 'listing_seconds' il tempo speso
+    ad attendere le pagine.
+    """
+    marker = None
+    while True:
+        query = {'limit': page_size}
+        if all_projects:
+            query['all_projects'] = True
+        if marker:
+            query['marker'] = marker
+
+        start = perf_counter()
+        page = timed_call('compute.servers', _fetch_page, conn, page_size, query)
+        if timings is not None:
+            timings['listing_seconds'] += perf_counter() - start
+        if not page:
+            return
+
+        yield page
+
+        if page[-1].id == marker:
+            return  # Il marker non avanza: evita un ciclo infinito
+        marker = page[-1].id
+
+
+def summarize_page(page, resolve_flavor):
+    """Aggrega una pagina di server: conteggi e risorse allocate"""
+    start = perf_counter()
+    log_servers = server_log.isEnabledFor(logging.DEBUG)  # Un solo controllo per pagina
+    summary = {
+        'server_count': len(page),
+        'active_count': 0,
+        'error_count': 0,
+        'allocated_vcpus': 0,
+        'allocated_ram_mb': 0,
+        'hosts': {},  # host -> {'vcpus', 'ram_mb', 'active'}
+    }
+    for server in page:
+        if log_servers:
+            server_log.debug("Server", extra={'server_id': server.id, 'status': server.status,
+                                              'host': getattr(server, 'hypervisor_hostname', None)})
+        if server.status == 'ERROR':
+            summary['error_count'] += 1
+        if server.status != 'ACTIVE':
+            continue
+
+        summary['active_count'] += 1
+        flavor_info = resolve_flavor(server)
+        summary['allocated_vcpus'] += flavor_info['vcpus']
+        summary['allocated_ram_mb'] += flavor_info['ram_mb']
+
+        # Host di esecuzione (OS-EXT-SRV-ATTR:hypervisor_hostname, visibile agli admin)
+        host = getattr(server, 'hypervisor_hostname', None) or UNKNOWN_HOST
+        allocated = summary['hosts'].setdefault(host, {'vcpus': 0, 'ram_mb': 0, 'active': 0})
+        allocated['vcpus'] += flavor_info['vcpus']
+        allocated['ram_mb'] += flavor_info['ram_mb']
+        allocated['active'] += 1
+
+    # Tempo di risoluzione dei flavor e aggregazione della pagina (sommato tra le pagine)
+    summary['resolve_seconds'] = perf_counter() - start
+    return summary
+
+
+def scan_servers(conn, resolve_flavor, page_size=1000, max_workers=4, all_projects=True):
+    """Scansiona tutti i server elaborando le pagine in streaming su un pool limitato
+
+    Al massimo 2 * max_workers pagine sono in memoria contemporaneamente,
+    quindi il picco di memoria non dipende dalla dimensione della flotta.
+    """
+    totals = {
+        'server_count': 0,
+        'active_count': 0,
+        'error_count': 0,
+        'allocated_vcpus': 0,
+        'allocated_ram_mb': 0,
+        'hosts': {},
+        'pages': 0,
+        'listing_seconds': 0.0,
+        'resolve_seconds': 0.0,
+    }
+
+    def merge(summary):
+        for host, allocated in summary.pop('hosts').items():
+            host_totals = totals['hosts'].setdefault(host, {'vcpus': 0, 'ram_mb': 0, 'active': 0})
+            for key, value in allocated.items():
+                host_totals[key] += value
+        for key, value in summary.items():
+            totals[key] += value
+        totals['pages'] += 1
+
+    if max_workers <= 1:
+        # Senza parallelismo le pagine si elaborano nel thread chiamante (nessun pool)
+        for page in iter_server_pages(conn, page_size, all_projects, totals):
+            merge(summarize_page(page, resolve_flavor))
+        return totals
+
+    pending = deque()
+    max_pending = 2 * max_workers
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ForecastingScan") as pool:
+        for page in iter_server_pages(conn, page_size, all_projects, totals):
+            pending.append(pool.submit(summarize_page, page, resolve_flavor))
+
+            # Backpressure: aspetta la pagina più vecchia prima di scaricarne altre
+            while len(pending) >= max_pending:
+                merge(pending.popleft().result())
+
+        while pending:
+            merge(pending.popleft().result())
+
+    return totals
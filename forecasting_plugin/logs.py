@@ -0,0 +1,183 @@
+# Logging strutturato e non bloccante: i record passano da una coda limitata a un thread di scrittura
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+from datetime import datetime
+
+from .config import Config
+
+# Attributi standard di LogRecord: tutto il resto (passato con extra=) è un campo strutturato
+_RESERVED = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'taskName'}
+
+# Logger gestiti dalla coda: quelli del plugin e le righe di accesso del server di sviluppo
+MANAGED_LOGGERS = ('forecasting_plugin', 'werkzeug')
+
+
+def fields(record):
+    """Campi strutturati del record (chiavi passate con extra=)"""
+    return {k: v for k, v in record.__dict__.items() if k not in _RESERVED}
+
+
+class StructuredFormatter(logging.Formatter):
+    """Una riga per record: `ts livello logger messaggio chiave=valore ...` oppure un oggetto JSON"""
+
+    def __init__(self, fmt='text'):
+        super().__init__()
+        self.fmt = fmt
+
+    def format(self, record):
+        message = record.getMessage()
+        timestamp = datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds')
+        extra = fields(record)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+
+        if self.fmt == 'json':
+            entry = {'ts': timestamp, 'level': record.levelname, 'logger': record.name, 'msg': message}
+            entry.update(extra)
+            if record.exc_text:
+                entry['exc'] = record.exc_text
+            return json.dumps(entry, default=str, ensure_ascii=False)
+
+        line = f"{timestamp} {record.levelname:<7} {record.name} {message}"
+        if extra:
+            line += ' ' + ' '.join(f"{k}={_text_value(v)}" for k, v in extra.items())
+        if record.exc_text:
+            line += '\n' + record.exc_text
+        return line
+
+
+def _text_value(value):
+    text = str(value)
+    return json.dumps(text, ensure_ascii=False) if not text or ' ' in text or '=' in text else text
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler che non attende mai: con la coda piena il record viene scartato e contato
+
+    Il record entra in coda così com'è: messaggio, argomenti e traceback
+    sono formattati nel thread di scrittura, non nel chiamante.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class SamplingFilter(logging.Filter):
+    """Lascia passare un record ogni `every` (es. righe per server); WARNING e superiori sempre"""
+
+    def __init__(self, every=100):
+        super().__init__()
+        self.every = max(1, int(every))
+        self.seen = 0
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        self.seen += 1
+        return (self.seen - 1) % self.every == 0
+
+
+def parse_levels(spec):
+    """'forecasting_plugin.inventory=DEBUG,werkzeug=WARNING' -> {logger: livello}"""
+    levels = {}
+    for item in filter(None, (part.strip() for part in (spec or '').split(','))):
+        name, _, level = item.partition('=')
+        levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+class _Pipeline:
+    """Coda + listener (thread di scrittura) + handler installato sui logger gestiti"""
+
+    def __init__(self, stream, fmt, queue_size):
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.handler = NonBlockingQueueHandler(self.queue)
+        self.output = logging.StreamHandler(stream)
+        self.output.setFormatter(StructuredFormatter(fmt))
+        self.listener = None
+
+    def start(self):
+        # Il thread del listener è daemon: il flush finale avviene in shutdown() (atexit)
+        self.listener = logging.handlers.QueueListener(self.queue, self.output, respect_handler_level=True)
+        self.listener.start()
+
+    def restart_after_fork(self):
+        # Nel figlio il thread di scrittura non esiste più: coda e listener nuovi
+        self.queue = queue.Queue(maxsize=self.queue.maxsize)
+        self.handler.queue = self.queue
+        self.start()
+
+    def stop(self):
+        if self.listener is not None:
+            self.listener.stop()  # Svuota la coda prima di terminare
+            self.listener = None
+
+
+_pipeline = None
+_lock = threading.Lock()
+
+
+def configure(level=None, fmt=None, levels=None, queue_size=None, server_sample=None, stream=None):
+    """Installa la pipeline di logging (idempotente: le chiamate successive aggiornano solo i livelli)"""
+    global _pipeline
+    level = (level or Config.LOG_LEVEL).upper()
+    levels = parse_levels(Config.LOG_LEVELS if levels is None else levels)
+
+    with _lock:
+        if _pipeline is None:
+            _pipeline = _Pipeline(stream or sys.stderr, fmt or Config.LOG_FORMAT,
+                                  queue_size or Config.LOG_QUEUE_SIZE)
+            _pipeline.start()
+            for name in MANAGED_LOGGERS:
+                logger = logging.getLogger(name)
+                logger.addHandler(_pipeline.handler)
+                logger.propagate = False
+
+            # Righe per server: una ogni N, filtrate prima di entrare in coda
+            logging.getLogger('forecasting_plugin.inventory.servers').addFilter(
+                SamplingFilter(server_sample or Config.LOG_SERVER_SAMPLE))
+
+        logging.getLogger('forecasting_plugin').setLevel(level)
+        logging.getLogger('werkzeug').setLevel(levels.pop('werkzeug', level))
+        for name, logger_level in levels.items():
+            logging.getLogger(name).setLevel(logger_level)
+    return _pipeline.handler
+
+
+def shutdown():
+    """Scrive i record ancora in coda e ferma il thread di scrittura"""
+    if _pipeline is not None:
+        _pipeline.stop()
+
+
+def stats():
+    """Record in coda e scartati (coda piena)"""
+    if _pipeline is None:
+        return {'configured': False}
+    return {'configured': True, 'queued': _pipeline.queue.qsize(), 'dropped': _pipeline.handler.dropped}
+
+
+def _after_fork_in_child():
+    if _pipeline is not None and _pipeline.listener is not None:
+        _pipeline.restart_after_fork()
+
+
+atexit.register(shutdown)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
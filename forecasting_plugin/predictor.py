@@ -1,130 +1,265 @@
 import numpy as np
 from datetime import datetime
-import random
+
+from .instrumentation import FORECAST_FALLBACKS
+from .intervals import MIN_ORIGINS, ar1_paths, bands, error_paths
+from .seasonal import HOUR, HarmonicModel
+
+# Fattori del pattern giornaliero di default per ogni ora del giorno
+# (notte 0.6, mattina 0.8, lavoro 1.2, pranzo 1.0, pomeriggio 1.4, sera 0.9, notte 0.7)
+DAILY_FACTORS = np.array(
+    [0.6] * 6 + [0.8] * 3 + [1.2] * 3 + [1.0] * 2 + [1.4] * 4 + [0.9] * 4 + [0.7] * 2
+)
+
+QUANTILES = (0.1, 0.5, 0.9)
+RESIDUAL_HOURS = 672  # Residui del modello stagionale usati per il bootstrap (4 settimane)
+
 
 class ResourcePredictor:
-    def sinusoidal_with_trend(self, data_points, forecast_hours=24):
-        """Modello sinusoidale"""
+    def __init__(self, seed=None):
+        # Generatore dedicato: con un seed le previsioni sono riproducibili
+        self.rng = np.random.default_rng(seed)
+
+    def sinusoidal_with_trend(self, data_points, forecast_hours=24, hour_now=None, exclude=None):
+        """Modello sinusoidale
+
+        `exclude` (maschera booleana, es. anomalies.anomaly_mask sui flag dello
+        storico) toglie i punti marcati prima del fit; i NaN (ore senza
+        campioni) sono esclusi come nel batch.
+        """
+        # Accetta sia liste sia viste NumPy sullo storico
+        data_points = np.asarray(data_points, dtype=np.float64)
+        if exclude is not None:
+            data_points = data_points[~np.asarray(exclude, dtype=bool)]
+        data_points = data_points[~np.isnan(data_points)]
+
         if len(data_points) < 4:
             # Se non abbiamo abbastanza dati, usiamo pattern giornaliero di default
-            return self.default_daily_pattern(forecast_hours, data_points[-1] if data_points else 15)
-
-        # Prendi l'ultimo valore misurato
-        current_value = data_points[-1] if data_points else 15
-
-        # Calcola una media mobile degli ultimi valori
-        recent_data = data_points[-min(24, len(data_points)):]  # prendi 24 , ma se hai meno di 24 dati prendi tutti quelli che hai
-        base_value = np.mean(recent_data) if recent_data else current_value #Media degli ultimi dati
-
-        # Calcola un trend molto leggero (almeno 2 punti per capire la pendenza)
-        if len(data_points) >= 2:
-            last_values = data_points[-min(6, len(data_points)):]  # Prendo gli ultimi valori al massimo 6
-            #controllo anche gli elementi di last values per sicurezza
-            if len(last_values) >= 2:
-                # Calcola pendenza basata sugli ultimi valori
-                x = np.arange(len(last_values)) #x=[0,1,2,3]
-                y = np.array(last_values) #y=[20,21,22,23]
-
-                # Regressione lineare semplice (in maniera da trovare la retta che meglio si adatta ai punti)
-                A = np.vstack([x, np.ones(len(x))]).T
-                m, c = np.linalg.lstsq(A, y, rcond=None)[0]
-                trend_slope = m
-            else:
-                trend_slope = 0 #se non ci sono abbastanza dati trend = 0
-        else:
-            trend_slope = 0
-
-        # Limita la pendenza a valori realistici (max ±2% per ora)
-        trend_slope = max(-2.0, min(2.0, trend_slope))
-
-        hour_now = datetime.now().hour #ora attuale
-        predictions = [] #lista per mettere previsioni
-
-        #iterazione per ogni ora
-        for i in range(forecast_hours):
-            hour_of_day = (hour_now + i) % 24 #Calcola che ora sarà quando questa previsione si realizzerà
-
-            # COMPONENTE BASE: valore attuale + trend leggero
-            base_component = current_value + (trend_slope * i)
-
-            # COMPONENTE SINUSOIDALE: pattern giornaliero realistico
-            # Picco alle 14-16, minimo alle 4-6
-            # Ampiezza in base al valore base (non fissa!)
-
-            # Normalizza il valore base per determinare l'ampiezza
-            amplitude = 0.4 * base_value  # 40% del valore base come ampiezza (come oscillano le onde)
-
-            # Calcola fase per picco alle 14 (2 PM)
-            phase_shift = 14  # Picco alle 14:00
-
-            # Funzione sinusoidale normalizzata
-            sine_value = amplitude * np.sin(2 * np.pi * (hour_of_day - phase_shift) / 24)
-
-            # COMBINA le componenti
-            prediction = base_component + sine_value #Somma la linea di tendenza con l'onda sinusoidale
-
-            # Aggiungi piccola variazione random (non più del ±5%)
-            random_variation = random.uniform(-min(5, prediction * 0.3), min(5, prediction * 0.3))
-            prediction += random_variation
-
-            # La previsione deve essere ragionevole rispetto al valore attuale
-            # Non può crescere/decrescere troppo in poche ore
-            max_change_per_hour = 0.3 * current_value  # Max 30% del valore attuale per ora
-            if i > 0:
-                previous_pred = predictions[-1]
-                if abs(prediction - previous_pred) > max_change_per_hour:
-                    # Limita il cambio
-                    if prediction > previous_pred:
-                        prediction = previous_pred + max_change_per_hour
-                    else:
-                        prediction = previous_pred - max_change_per_hour
-
-            # Limita tra 0 e 100%
-            prediction = max(0.0, min(100.0, prediction))
-
-            # Arrotondamento
-            predictions.append(round(prediction, 1))
-
-        return predictions
-
-    def default_daily_pattern(self, forecast_hours, current_value=15):
+            return self.default_daily_pattern(
+                forecast_hours, float(data_points[-1]) if len(data_points) else 15, hour_now=hour_now
+            )
+
+        return self.sinusoidal_with_trend_batch(data_points[np.newaxis, :], forecast_hours, hour_now)[0].tolist()
+
+    def draws(self, n_series, forecast_hours):
+        """Estrazioni uniformi in [0, 1) (serie x ore) con le ore come asse esterno dello stream
+
+        Le prime h ore sono le stesse per qualunque orizzonte >= h: la
+        previsione a 48h contiene quella a 24h, quindi si può calcolare
+        l'orizzonte massimo una volta e tagliare (vedi il batch delle API).
+        """
+        return self.rng.random((forecast_hours, n_series)).T
+
+    def sinusoidal_with_trend_batch(self, series, forecast_hours=24, hour_now=None, draws=None):
+        """Modello sinusoidale su una matrice (serie x campioni), tutto con operazioni su array
+
+        Restituisce una matrice (serie x forecast_hours). `draws` (serie x ore,
+        in [0, 1)) sostituisce le estrazioni del generatore: serie con seed
+        diversi possono così passare nella stessa chiamata. I NaN (es. ore
+        precedenti la comparsa di un host) sono esclusi: ogni serie usa solo
+        i campioni osservati.
+        """
+        series = np.atleast_2d(np.asarray(series, dtype=np.float64))
+        n_series, n_points = series.shape
+        if forecast_hours <= 0:
+            return np.empty((n_series, 0))  # Come il ciclo originale su range(forecast_hours): nessuna ora
+        if draws is None:
+            draws = self.draws(n_series, forecast_hours)
+        draws = draws[:, :forecast_hours]
+
+        observed = ~np.isnan(series)
+        if not observed.all():
+            # Serie con buchi: un passaggio batch per numero di campioni osservati, stesse estrazioni
+            if hour_now is None:
+                hour_now = datetime.now().hour
+            counts = observed.sum(axis=1)
+            result = np.empty((n_series, forecast_hours))
+            for count in np.unique(counts):
+                rows = counts == count
+                compact = series[rows][observed[rows]].reshape(rows.sum(), count)
+                hours = np.asarray(hour_now)[rows] if np.ndim(hour_now) else hour_now
+                result[rows] = self.sinusoidal_with_trend_batch(compact, forecast_hours, hours, draws[rows])
+            return result
+
+        if n_points < 4:
+            current = series[:, -1] if n_points else np.full(n_series, 15.0)
+            return self.default_daily_pattern_batch(current, forecast_hours, hour_now, draws)
+
+        # Ultimo valore misurato e media mobile degli ultimi (al massimo) 24
+        current_value = series[:, -1]
+        base_value = series[:, -min(24, n_points):].mean(axis=1)
+
+        # Trend: pendenza ai minimi quadrati sugli ultimi (al massimo) 6 valori, in forma chiusa
+        last_values = series[:, -min(6, n_points):]
+        x = np.arange(last_values.shape[1]) - (last_values.shape[1] - 1) / 2
+        trend_slope = (last_values @ x) / (x @ x)
+        trend_slope = np.clip(trend_slope, -2.0, 2.0)  # Max ±2% per ora
+
+        # Fase oraria e componente sinusoidale (picco alle 14:00, ampiezza 40% della media);
+        # hour_now può essere un array (un'ora per serie, es. origini diverse del bootstrap)
+        if hour_now is None:
+            hour_now = datetime.now().hour
+        steps = np.arange(forecast_hours)
+        hour_of_day = (np.asarray(hour_now)[..., None] + steps) % 24
+        sine = np.sin(2 * np.pi * (hour_of_day - 14) / 24)
+
+        prediction = (current_value[:, None] + trend_slope[:, None] * steps
+                      + (0.4 * base_value)[:, None] * sine)
+
+        # Variazione random uniforme entro ±min(5, 30% della previsione)
+        bound = np.minimum(5, prediction * 0.3)
+        prediction += (-1.0 + 2.0 * draws) * bound  # Come rng.uniform(-1, 1): stessi valori, bit per bit
+
+        # Limite di variazione oraria (30% del valore attuale) rispetto alla
+        # previsione precedente: passata cumulativa lungo l'orizzonte,
+        # vettoriale su tutte le serie
+        max_change = 0.3 * current_value
+        result = np.empty_like(prediction)
+        previous = np.round(np.clip(prediction[:, 0], 0.0, 100.0), 1)
+        result[:, 0] = previous
+        for i in range(1, forecast_hours):
+            step = np.clip(prediction[:, i], previous - max_change, previous + max_change)
+            previous = np.round(np.clip(step, 0.0, 100.0), 1)
+            result[:, i] = previous
+
+        return result
+
+    def seasonal_harmonic(self, timestamps, values, forecast_hours=24, start=None, model=None, exclude=None):
+        """Modello stagionale appreso: profili giornaliero e settimanale (Fourier) + trend
+
+        `timestamps`/`values` sono medie orarie chiuse; con un `model` esistente
+        (es. da SeasonalModels) il fit è incrementale, altrimenti parte da zero.
+        I punti in `exclude` non entrano nel fit (la regressione sui timestamp
+        non ha bisogno di ore contigue). Con meno di `min_points` ore usa
+        sinusoidal_with_trend.
+        """
+        if exclude is not None:
+            keep = ~np.asarray(exclude, dtype=bool)
+            timestamps, values = np.asarray(timestamps)[keep], np.asarray(values)[keep]
+        if model is None:
+            model = HarmonicModel()
+        model.update(timestamps, values)
+
+        if start is None:
+            start = datetime.now().timestamp()
+        if not model.ready:
+            FORECAST_FALLBACKS.labels('seasonal').inc()
+            return self.sinusoidal_with_trend(values, forecast_hours, datetime.fromtimestamp(start).hour)
+        return model.forecast(start, forecast_hours).tolist()
+
+    def sinusoidal_bands(self, data_points, forecast_hours=24, hour_now=None, quantiles=QUANTILES,
+                         simulations=1000):
+        """Bande di quantili del modello sinusoidale: {'p10': [...], 'p50': [...], 'p90': [...]}
+
+        Il modello è un'euristica senza verosimiglianza: invece dei residui si
+        ricampionano i suoi errori di previsione reali, calcolati da ogni
+        origine in-sample con finestre di 24 ore (tutte in una sola chiamata
+        batch) e sommati alla previsione senza rumore. `hour_now` è l'ora del
+        primo passo previsto; None se lo storico è troppo corto.
+        """
+        values = np.asarray(data_points, dtype=np.float64)
+        values = values[~np.isnan(values)]  # Ore senza campioni: escluse come nella previsione puntuale
+        n_points = len(values)
+        if n_points < 24 + MIN_ORIGINS:
+            return None
+        if hour_now is None:
+            hour_now = datetime.now().hour
+
+        # draws = 0.5 annulla il rumore uniforme: resta la previsione puntuale
+        origins = np.arange(24, n_points)
+        windows = np.vstack([values[np.newaxis, -24:], np.lib.stride_tricks.sliding_window_view(values, 24)[:-1]])
+        hours = np.concatenate([[hour_now], (hour_now - (n_points - origins)) % 24])
+        predicted = self.sinusoidal_with_trend_batch(windows, forecast_hours, hours,
+                                                     draws=np.full((len(windows), forecast_hours), 0.5))
+
+        # Futuro osservato da ogni origine (NaN oltre la fine dello storico)
+        padded = np.concatenate([values[24:], np.full(forecast_hours, np.nan)])
+        actuals = np.lib.stride_tricks.sliding_window_view(padded, forecast_hours)[:len(origins)]
+        paths = error_paths(actuals - predicted[1:], simulations, self.rng)
+        if paths is None:
+            return None
+        return bands(predicted[0], paths, quantiles)
+
+    def seasonal_bands(self, timestamps, values, forecast_hours=24, start=None, model=None, quantiles=QUANTILES,
+                       simulations=1000):
+        """Bande di quantili del modello stagionale: bootstrap AR(1) dei residui del fit
+
+        I residui delle ultime RESIDUAL_HOURS ore rispetto a trend + Fourier
+        danno persistenza (phi) e innovazioni; le simulazioni sono una sola
+        matrice (simulazioni x ore). Con il modello non pronto usa le bande
+        del sinusoidale, come seasonal_harmonic.
+        """
+        if model is None:
+            model = HarmonicModel()
+        model.update(timestamps, values)
+
+        if start is None:
+            start = datetime.now().timestamp()
+        if not model.ready:
+            return self.sinusoidal_bands(values, forecast_hours, datetime.fromtimestamp(start).hour,
+                                         quantiles, simulations)
+
+        timestamps = np.asarray(timestamps, dtype=np.int64)[-RESIDUAL_HOURS:]
+        residuals = np.asarray(values, dtype=np.float64)[-RESIDUAL_HOURS:] - model.predict(timestamps)
+        paths = ar1_paths(residuals, forecast_hours, simulations, self.rng)
+        if paths is None:
+            return None
+        first = int(start) // HOUR * HOUR
+        point = model.predict(first + HOUR * np.arange(forecast_hours))
+        return bands(point, paths, quantiles)
+
+    def linear_trend(self, data_points, forecast_hours=24, window=24):
+        """Solo trend, senza componente giornaliera né rumore (vedi linear_trend_batch)"""
+        return self.linear_trend_batch(np.asarray(data_points, dtype=np.float64)[np.newaxis, :],
+                                       forecast_hours, window)[0].tolist()
+
+    def linear_trend_batch(self, series, forecast_hours=24, window=24):
+        """Retta ai minimi quadrati sulle ultime `window` ore di ogni serie (serie x forecast_hours)
+
+        Per grandezze senza ciclo giornaliero proprio, come le risorse allocate
+        o le soglie delle regole predittive: nessun profilo sinusoidale
+        imposto. La previsione parte dal valore della retta all'ultima ora. I
+        NaN (ore non osservate) sono esclusi mantenendo la loro posizione nel
+        tempo; con meno di due ore osservate la serie resta piatta.
+        """
+        series = np.atleast_2d(np.asarray(series, dtype=np.float64))[:, -window:]
+        forecast_hours = max(0, forecast_hours)
+        n_points = series.shape[1]
+        observed = ~np.isnan(series)
+        counts = observed.sum(axis=1)
+
+        x = np.arange(n_points, dtype=np.float64)
+        values = np.where(observed, series, 0.0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            x_mean = (observed @ x) / counts
+            y_mean = values.sum(axis=1) / counts
+            dx = np.where(observed, x - x_mean[:, None], 0.0)
+            slope = (dx * (values - y_mean[:, None])).sum(axis=1) / (dx * dx).sum(axis=1)
+        slope = np.where(np.isfinite(slope), slope, 0.0)
+        level = np.where(counts > 0, y_mean + slope * (n_points - 1 - x_mean), 0.0)
+
+        prediction = level[:, None] + slope[:, None] * np.arange(forecast_hours)
+        return np.round(np.clip(prediction, 0.0, 100.0), 1)
+
+    def default_daily_pattern(self, forecast_hours, current_value=15, hour_now=None):
         """Pattern giornaliero realistico basato sul valore attuale"""
-        hour_now = datetime.now().hour
-        predictions = []
-
-        for i in range(forecast_hours):
-            hour_of_day = (hour_now + i) % 24
-
-            # Pattern realistico basato su studi di carico cloud
-            # I valori sono percentuali rispetto al valore attuale
-
-            if 0 <= hour_of_day < 6:  # Notte profonda (0-6)
-                factor = 0.6  # -40%
-            elif 6 <= hour_of_day < 9:  # Mattina presto (6-9)
-                factor = 0.8  # -20%
-            elif 9 <= hour_of_day < 12:  # Mattina lavorativa (9-12)
-                factor = 1.2  # +20%
-            elif 12 <= hour_of_day < 14:  # Pausa pranzo (12-14)
-                factor = 1.0  # Valore base
-            elif 14 <= hour_of_day < 18:  # Pomeriggio lavorativo (14-18)
-                factor = 1.4  # +40% (picco)
-            elif 18 <= hour_of_day < 22:  # Sera (18-22)
-                factor = 0.9  # -10%
-            else:  # Notte (22-24)
-                factor = 0.7  # -30%
-
-            # Calcola predizione
-            prediction = current_value * factor
-
-            # Aggiungi piccola variazione random
-            prediction += random.uniform(-3, 3)
-
-            # Limita valori
-            prediction = max(5.0, min(95.0, prediction))
-
-            predictions.append(round(prediction, 1))
-
-        return predictions
+        return self.default_daily_pattern_batch(np.array([current_value]), forecast_hours, hour_now)[0].tolist()
+
+    def default_daily_pattern_batch(self, current_values, forecast_hours, hour_now=None, draws=None):
+        """Pattern giornaliero di default per più serie (serie x forecast_hours)"""
+        if hour_now is None:
+            hour_now = datetime.now().hour
+        current_values = np.asarray(current_values, dtype=np.float64)
+        forecast_hours = max(0, forecast_hours)
+        if draws is None:
+            draws = self.draws(len(current_values), forecast_hours)
+
+        # Pattern realistico basato su studi di carico cloud (fattori rispetto al valore attuale)
+        factors = DAILY_FACTORS[(hour_now + np.arange(forecast_hours)) % 24]
+        prediction = current_values[:, None] * factors
+        prediction += -3.0 + 6.0 * draws[:, :forecast_hours]  # Piccola variazione random in [-3, 3)
+
+        return np.round(np.clip(prediction, 5.0, 95.0), 1)
 
     # Vecchio metodo per compatibilità (non utilizzato più nelle API)
     def simple_linear_regression(self, data_points, forecast_hours=24):
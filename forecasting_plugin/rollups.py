@@ -0,0 +1,286 @@
+# Rollup incrementali dello storico: bucket da 5 minuti, 1 ora e 1 giorno
+from datetime import datetime
+
+import numpy as np
+
+from .history import readonly
+
+# Tier disponibili oltre ai campioni grezzi: nome -> (risoluzione in secondi, capacità in bucket)
+TIERS = {
+    '5m': (300, 2016),  # 7 giorni
+    '1h': (3600, 2160),  # 90 giorni
+    '1d': (86400, 730),  # 2 anni
+}
+
+RAW_RESOLUTION = 60  # Campioni grezzi: uno ogni COLLECTION_INTERVAL
+
+FIELDS = ('min', 'max', 'mean', 'p95')
+
+
+def parse_duration(text):
+    """Converte '90m', '12h', '30d' o un numero di secondi in secondi (ValueError se non positiva)"""
+    if text is None:
+        return None
+    text = str(text).strip().lower()
+    units = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+    if text and text[-1] in units:
+        seconds = int(float(text[:-1]) * units[text[-1]])
+    else:
+        seconds = int(text)
+    if seconds <= 0:
+        raise ValueError(f"Durata non positiva: {text}")
+    return seconds
+
+
+def _percentile_sorted(sorted_values, starts, counts, q=95):
+    """Percentile (interpolazione lineare come np.percentile) per gruppi già ordinati"""
+    position = (counts - 1) * (q / 100)
+    lower = np.floor(position).astype(np.int64)
+    upper = np.minimum(lower + 1, counts - 1)
+    fraction = position - lower
+    lo_values = sorted_values[starts + lower]
+    hi_values = sorted_values[starts + upper]
+    return lo_values + fraction * (hi_values - lo_values)
+
+
+def _rebased(column, end, keep):
+    """Colonna nuova della stessa lunghezza con gli ultimi `keep` valori (fino a `end`) in testa"""
+    fresh = np.zeros_like(column)
+    fresh[:keep] = column[end - keep:end]
+    return fresh
+
+
+class RollupTier:
+    """Bucket chiusi di una risoluzione, in colonne NumPy circolari
+
+    Il bucket aperto accumula somma/min/max e i valori grezzi; alla chiusura
+    il p95 costa O(n) una sola volta per n campioni, quindi O(1) ammortizzato.
+    Tutte le colonne si scrivono solo in avanti (come MetricsRingBuffer), così
+    freeze() non copia nulla. I bucket senza campioni tra due osservati
+    restano nella serie con count 0 e statistiche NaN: le posizioni
+    corrispondono sempre a intervalli di tempo consecutivi.
+    """
+
+    def __init__(self, name, resolution, capacity):
+        self.name = name
+        self.resolution = resolution
+        self.capacity = capacity
+
+        # Stessa tecnica di MetricsRingBuffer: colonne lunghe 2 * capacity scritte in avanti
+        size = 2 * capacity
+        self._starts = np.zeros(size, dtype=np.int64)
+        self._counts = np.zeros(size, dtype=np.int32)
+        self._columns = {field: np.zeros(size, dtype=np.float32) for field in FIELDS}
+        self._end = 0
+        self._count = 0
+
+        self._open_start = None  # Inizio del bucket aperto
+        self._open_values = np.empty(64)  # Valori grezzi del bucket aperto: i primi _open_n
+        self._open_n = 0
+        self._open_sum = 0.0
+        self._open_min = None
+        self._open_max = None
+        self._readonly = None  # Viste in sola lettura degli array correnti, per freeze()
+
+    def __len__(self):
+        return self._count + (1 if self._open_n else 0)
+
+    def freeze(self):
+        """Copia immutabile per gli snapshot, in O(1)
+
+        Il tier vivo scrive solo oltre la fine delle finestre congelate, o su
+        array nuovi quando le colonne o il buffer del bucket aperto sono pieni
+        e a ogni chiusura: la copia condivide tutto tramite viste in sola lettura.
+        """
+        if self._readonly is None:
+            self._readonly = {
+                '_starts': readonly(self._starts),
+                '_counts': readonly(self._counts),
+                '_columns': {field: readonly(column) for field, column in self._columns.items()},
+                '_open_values': readonly(self._open_values),  # La copia legge solo i suoi primi _open_n
+            }
+        # Come copy.copy(), senza il suo costo fisso: un freeze() a ogni campione
+        frozen = object.__new__(type(self))
+        frozen.__dict__ = {**self.__dict__, **self._readonly}
+        return frozen
+
+    def _push(self, start, count, minimum, maximum, mean, p95):
+        if self._end == len(self._starts):
+            # Colonne nuove con gli ultimi capacity - 1 bucket in testa (O(1) ammortizzato)
+            keep = min(self._count, self.capacity - 1)
+            for name in ('_starts', '_counts'):
+                setattr(self, name, _rebased(getattr(self, name), self._end, keep))
+            self._columns = {field: _rebased(column, self._end, keep) for field, column in self._columns.items()}
+            self._end = self._count = keep
+            self._readonly = None
+        j = self._end
+        self._starts[j] = start
+        self._counts[j] = count
+        self._columns['min'][j] = minimum
+        self._columns['max'][j] = maximum
+        self._columns['mean'][j] = mean
+        self._columns['p95'][j] = p95
+        self._end = j + 1
+        self._count = min(self._count + 1, self.capacity)
+
+    def _skip(self, start):
+        """Bucket vuoti tra l'ultimo chiuso e `start` (escluso), al massimo una finestra"""
+        if not self._count:
+            return
+        first = int(self._starts[self._end - 1]) + self.resolution
+        for empty in range(max(first, start - self.capacity * self.resolution), start, self.resolution):
+            self._push(empty, 0, np.nan, np.nan, np.nan, np.nan)
+
+    def _close(self):
+        values = self._open_values[:self._open_n]
+        self._push(
+            self._open_start, len(values), self._open_min, self._open_max,
+            self._open_sum / len(values), np.percentile(values, 95)
+        )
+        # Buffer nuovo: gli snapshot continuano a leggere quello del bucket chiuso
+        self._open_values = np.empty(len(self._open_values))
+        self._open_n = 0
+        self._readonly = None
+
+    def add(self, timestamp, value):
+        """Aggiorna il bucket corrente in O(1) (chiude quello precedente se serve)
+
+        Un campione in ritardo per un bucket già chiuso viene ignorato.
+        """
+        start = int(timestamp) // self.resolution * self.resolution
+        if self._open_n and start < self._open_start:
+            return
+        if self._open_n and start != self._open_start:
+            self._close()
+
+        if not self._open_n:
+            self._skip(start)
+            self._open_start = start
+            self._open_sum = 0.0
+            self._open_min = value
+            self._open_max = value
+
+        if self._open_n == len(self._open_values):
+            grown = np.empty(2 * self._open_n)
+            grown[:self._open_n] = self._open_values
+            self._open_values = grown
+            self._readonly = None
+        self._open_values[self._open_n] = value
+        self._open_n += 1
+        self._open_sum += value
+        self._open_min = min(self._open_min, value)
+        self._open_max = max(self._open_max, value)
+
+    def load(self, timestamps, values):
+        """Costruisce i bucket in blocco (vettorizzato) da campioni ordinati per tempo"""
+        if not len(values):
+            return
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        values = np.asarray(values, dtype=np.float64)
+
+        buckets = timestamps // self.resolution * self.resolution
+        starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+
+        # L'ultimo bucket resta aperto e passa dal percorso incrementale
+        last = starts[-1]
+        closed = starts[:-1]
+        if len(closed):
+            ends = np.r_[closed[1:], last]
+            counts = ends - closed
+
+            # Ordina i valori dentro ogni bucket per calcolare il p95 senza loop
+            order = np.lexsort((values[:last], buckets[:last]))
+            sorted_values = values[:last][order]
+
+            minimum = np.minimum.reduceat(values[:last], closed)
+            maximum = np.maximum.reduceat(values[:last], closed)
+            mean = np.add.reduceat(values[:last], closed) / counts
+            p95 = _percentile_sorted(sorted_values, closed, counts)
+
+            keep = slice(-self.capacity, None)
+            for row in zip(buckets[closed][keep], counts[keep], minimum[keep],
+                           maximum[keep], mean[keep], p95[keep]):
+                self._skip(row[0])
+                self._push(*row)
+
+        for timestamp, value in zip(timestamps[last:], values[last:]):
+            self.add(timestamp, float(value))
+
+    def window(self, limit=None, include_open=True):
+        """Ultimi `limit` bucket come dizionario di array (timestamp, count, min, max, mean, p95)"""
+        n = self._count if limit is None else max(0, min(limit, self._count))
+        end = self._end
+        data = {
+            'timestamp': self._starts[end - n:end],
+            'count': self._counts[end - n:end],
+        }
+        for field in FIELDS:
+            data[field] = self._columns[field][end - n:end]
+
+        if include_open and self._open_n and (limit is None or limit > 0):
+            values = self._open_values[:self._open_n]
+            partial = {
+                'timestamp': self._open_start,
+                'count': len(values),
+                'min': self._open_min,
+                'max': self._open_max,
+                'mean': self._open_sum / len(values),
+                'p95': np.percentile(values, 95),
+            }
+            # Con il bucket aperto la finestra resta lunga `limit`
+            drop = 1 if limit is not None and n == limit and n > 0 else 0
+            data = {key: np.append(column[drop:], partial[key]) for key, column in data.items()}
+        return data
+
+
+class MetricRollups:
+    """Tutti i tier di rollup di una metrica"""
+
+    def __init__(self, tiers=None):
+        tiers = tiers or TIERS
+        self.tiers = {name: RollupTier(name, res, cap) for name, (res, cap) in tiers.items()}
+
+    def freeze(self):
+        """Copia immutabile di tutti i tier (vedi RollupTier.freeze)"""
+        frozen = object.__new__(MetricRollups)
+        frozen.__dict__ = {**self.__dict__, 'tiers': {name: tier.freeze() for name, tier in self.tiers.items()}}
+        return frozen
+
+    def add(self, timestamp, value):
+        for tier in self.tiers.values():
+            tier.add(timestamp, value)
+
+    def load(self, timestamps, values):
+        for tier in self.tiers.values():
+            tier.load(timestamps, values)
+
+    def select(self, span=None, resolution=None, max_points=1000, raw_resolution=RAW_RESOLUTION):
+        """Sceglie il tier adatto: il più grossolano con risoluzione <= quella richiesta,
+        oppure il più fine che copre `span` in al massimo `max_points` punti.
+        Restituisce None se bastano i campioni grezzi."""
+        ordered = sorted(self.tiers.values(), key=lambda t: t.resolution)
+        if resolution is not None:
+            chosen = None
+            for tier in ordered:
+                if tier.resolution <= resolution:
+                    chosen = tier
+            return chosen
+
+        if span is None or span / raw_resolution <= max_points:
+            return None
+        for tier in ordered:
+            if span / tier.resolution <= max_points:
+                return tier
+        return ordered[-1]
+
+
+def rollup_points(window):
+    """Converte una finestra di rollup in lista di punti JSON"""
+    points = []
+    columns = [window['timestamp'].tolist(), window['count'].tolist()] + [window[f].tolist() for f in FIELDS]
+    for timestamp, count, *stats in zip(*columns):
+        point = {'timestamp': datetime.fromtimestamp(timestamp).isoformat(), 'count': count}
+        for field, value in zip(FIELDS, stats):
+            point[field] = round(value, 1) if count else None  # Bucket vuoto: statistiche NaN
+        points.append(point)
+    return points
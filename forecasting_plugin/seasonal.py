@@ -0,0 +1,144 @@
+# Modello stagionale appreso dallo storico: regressione armonica (Fourier giornaliero e settimanale)
+import threading
+
+import numpy as np
+
+HOUR = 3600
+
+
+class HarmonicModel:
+    """Livello + trend + termini di Fourier con periodo 24h e 168h, ai minimi quadrati
+
+    Il fit è in forma chiusa sulle equazioni normali (X'X, X'y), che sono
+    statistiche sufficienti: ogni nuova ora si aggiunge in O(p²) senza
+    rileggere lo storico, e i coefficienti si risolvono (sistema p x p) solo
+    quando sono cambiati. Un fattore di oblio esponenziale (half_life ore)
+    fa pesare di più le settimane recenti.
+    """
+
+    def __init__(self, daily_harmonics=3, weekly_harmonics=2, half_life=672, ridge=1e-3, min_points=48):
+        self.daily_harmonics = daily_harmonics
+        self.weekly_harmonics = weekly_harmonics
+        self.decay = 0.5 ** (1 / half_life)  # Peso di un'ora rispetto alla successiva
+        self.ridge = ridge
+        self.min_points = min_points
+
+        self.n_features = 2 + 2 * (daily_harmonics + weekly_harmonics)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.origin = None  # Prima ora vista (origine del trend)
+        self.last_timestamp = None  # Ultima ora incorporata nel fit
+        self.points = 0
+        self._xtx = np.zeros((self.n_features, self.n_features))
+        self._xty = np.zeros(self.n_features)
+        self._yty = 0.0
+        self._weight = 0.0
+        self._coef = None
+
+    def features(self, timestamps):
+        """Matrice di regressione (ore x feature) per timestamp epoch"""
+        hours = np.asarray(timestamps, dtype=np.float64) / HOUR
+        columns = [np.ones_like(hours), (hours - self.origin) / 168]
+        for period, harmonics in ((24, self.daily_harmonics), (168, self.weekly_harmonics)):
+            angle = 2 * np.pi * np.outer(hours % period, np.arange(1, harmonics + 1)) / period
+            columns.extend(np.sin(angle).T)
+            columns.extend(np.cos(angle).T)
+        return np.column_stack(columns)
+
+    def update(self, timestamps, values):
+        """Incorpora le ore successive all'ultimo fit; restituisce quante ne ha aggiunte"""
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        values = np.asarray(values, dtype=np.float64)
+        observed = ~np.isnan(values)  # Ore senza campioni: la regressione non ha bisogno di ore contigue
+        timestamps, values = timestamps[observed], values[observed]
+        with self._lock:
+            if self.last_timestamp is not None and len(timestamps) and timestamps[-1] < self.last_timestamp:
+                self.reset()  # Storico sostituito con uno più vecchio: si riparte
+
+            if self.last_timestamp is not None:
+                new = timestamps > self.last_timestamp
+                timestamps, values = timestamps[new], values[new]
+            if not len(timestamps):
+                return 0
+            if self.origin is None:
+                self.origin = timestamps[0] / HOUR
+
+            # Oblio: le statistiche esistenti invecchiano fino all'ultima nuova ora
+            last = timestamps[-1]
+            if self.last_timestamp is not None:
+                aging = self.decay ** ((last - self.last_timestamp) / HOUR)
+                self._xtx *= aging
+                self._xty *= aging
+                self._yty *= aging
+                self._weight *= aging
+            weights = self.decay ** ((last - timestamps) / HOUR)
+
+            x = self.features(timestamps)
+            weighted = x * weights[:, None]
+            self._xtx += x.T @ weighted
+            self._xty += weighted.T @ values
+            self._yty += float(weights @ (values * values))
+            self._weight += float(weights.sum())
+
+            self.last_timestamp = int(last)
+            self.points += len(timestamps)
+            self._coef = None
+            return len(timestamps)
+
+    @property
+    def ready(self):
+        return self.points >= self.min_points
+
+    def coefficients(self):
+        """Coefficienti del fit (risolti solo se sono arrivati nuovi dati)"""
+        with self._lock:
+            if self._coef is None and self.points:
+                penalty = self.ridge * max(self._weight, 1.0) * np.eye(self.n_features)
+                penalty[0, 0] = 0.0  # Il livello non è regolarizzato
+                self._coef = np.linalg.lstsq(self._xtx + penalty, self._xty, rcond=None)[0]
+            return self._coef
+
+    def residual_std(self):
+        """Deviazione standard dei residui (pesata) del fit corrente"""
+        coef = self.coefficients()
+        if coef is None or self._weight <= 0:
+            return 0.0
+        sse = self._yty - 2 * coef @ self._xty + coef @ self._xtx @ coef
+        return float(np.sqrt(max(sse, 0.0) / self._weight))
+
+    def predict(self, timestamps):
+        """Valori del modello ai timestamp dati (senza clip)"""
+        return self.features(timestamps) @ self.coefficients()
+
+    def forecast(self, start, forecast_hours=24):
+        """Previsione oraria dall'ora che contiene `start`, limitata a 0-100%"""
+        first = int(start) // HOUR * HOUR
+        timestamps = first + HOUR * np.arange(forecast_hours)
+        return np.round(np.clip(self.predict(timestamps), 0.0, 100.0), 1)
+
+
+class SeasonalModels:
+    """Modelli armonici per serie ('cpu', 'ram', ...), aggiornati in modo incrementale"""
+
+    def __init__(self, **params):
+        self.params = params
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            model = self._models.get(key)
+            if model is None:
+                model = self._models[key] = HarmonicModel(**self.params)
+            return model
+
+    def fit(self, key, timestamps, values):
+        """Aggiorna il modello della serie con le ore chiuse e lo restituisce"""
+        model = self.get(key)
+        model.update(timestamps, values)
+        return model
+
+    def stats(self):
+        return {key: {'points': m.points, 'last_timestamp': m.last_timestamp} for key, m in self._models.items()}
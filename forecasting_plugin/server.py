@@ -0,0 +1,218 @@
+# Avvio del servizio: server di sviluppo (standalone) oppure prefork con
+# N worker WSGI e un solo processo collector che pubblica lo stato condiviso
+import argparse
+import logging
+import os
+import signal
+import socket
+import sys
+import threading
+from datetime import datetime
+
+from .shared import default_state_path
+
+# Nome esplicito: con `python -m forecasting_plugin.server` __name__ è '__main__'
+log = logging.getLogger('forecasting_plugin.server')
+
+
+def metrics_prefix(state_path):
+    """Prefisso dei file di metriche per processo, accanto allo stato condiviso"""
+    return f"{os.path.splitext(state_path)[0]}-metrics"
+
+
+def listen(host, port):
+    """Socket in ascolto, aperto prima di importare API e dipendenze pesanti"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(1024)
+    return sock
+
+
+def _run_collector(state_path, host):
+    """Processo collector: unico processo che interroga OpenStack e scrive lo storage"""
+    from . import instrumentation
+    from .collector import collector
+    from .shared import SharedState
+
+    instrumentation.share(metrics_prefix(state_path))
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+
+    collector.shared = SharedState(state_path)
+    collector.startup(host)  # Gli eventi nascono qui: lo stream SSE non passa dai worker
+
+    stop.wait()
+    collector.shutdown()
+
+
+def _run_worker(sock, host, port, state_path):
+    """Processo worker: serve le API leggendo lo snapshot pubblicato dal collector"""
+    from werkzeug.serving import make_server
+
+    from . import instrumentation
+    from .api import create_app
+    from .collector import collector
+    from .config import Config
+    from .shared import SharedState
+
+    instrumentation.share(metrics_prefix(state_path))
+    if Config.STORAGE_ENABLED:
+        # Segmenti in sola lettura per le query lunghe: lo storico arriva dal collector
+        collector.open_store(read_only=True, load=False)
+    collector.shared = SharedState(state_path)
+    server = make_server(host, port, create_app(), threaded=True, fd=sock.fileno())
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    server.serve_forever()
+
+
+def run_standalone(host, port):
+    """Processo singolo: bind, poi API e collector nello stesso processo"""
+    from . import logs
+
+    logs.configure()  # Anche le righe di accesso di werkzeug passano dalla coda
+    sock = listen(host, port)
+
+    from werkzeug.serving import make_server
+
+    from .api import create_app
+    from .collector import collector
+
+    # Server di sviluppo senza debug né reloader, sul socket già in ascolto
+    server = make_server(host, port, create_app(), threaded=True, fd=sock.fileno())
+    collector.startup(host)  # Dopo il bind: la prima raccolta non ritarda le prime risposte
+
+    print("\n" + "=" * 60)
+    print("OPENSTACK AI FORECASTING SERVICE")
+    print("=" * 60)
+    print(f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print(f"Data source: {'✅ OpenStack' if collector.is_connected() else '🤖 Mock data'}")
+    print(f"API: http://{host}:{port}")
+    print(f"Collector interval: {collector.interval}s")
+    print("=" * 60)
+    print("Endpoints disponibili:")
+    print("  • GET  /api/v1/health")
+    print("  • GET  /api/v1/forecast/cpu?hours=24")
+    print("  • GET  /api/v1/forecast/ram?hours=24")
+    print("  • GET  /api/v1/alerts")
+    print("  • GET  /api/v1/metrics/current")
+    print("  • GET  /api/v1/openstack/info")
+    print("  • GET  /metrics (Prometheus)")
+    if collector.stream:
+        print(f"  • GET  {collector.stream.PATH} (SSE, porta {collector.stream.port})")
+    print("=" * 60 + "\n")
+
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        collector.shutdown()
+
+
+def run_prefork(host, port, workers):
+    """Master prefork: apre il socket, avvia collector e worker e li riavvia se terminano"""
+    from .config import Config
+
+    # Directory privata creata qui, prima del fork: collector e worker la ereditano
+    state_path = Config.SHARED_STATE_PATH or default_state_path(port)
+    sock = listen(host, port)
+    sock.set_inheritable(True)
+
+    # Import nel master dopo il bind e prima del fork: le connessioni attendono
+    # nel backlog e i worker condividono le pagine dei moduli in copy-on-write
+    from .api import create_app  # noqa: F401
+
+    children = {}  # pid -> ruolo
+    stopping = False
+
+    def spawn(role):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGINT, signal.SIG_IGN)  # CTRL+C lo gestisce il master
+            code = 0
+            try:
+                if role == 'collector':
+                    sock.close()
+                    _run_collector(state_path, host)
+                else:
+                    _run_worker(sock, host, port, state_path)
+            except SystemExit:
+                pass
+            except Exception as e:
+                log.exception("Processo %s terminato con errore: %s", role, e)
+                code = 1
+            finally:
+                from . import logs
+                logs.shutdown()  # os._exit salta atexit: si svuota qui la coda di logging
+                os._exit(code)
+        children[pid] = role
+
+    def shutdown(*_):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    spawn('collector')
+    for _ in range(workers):
+        spawn('worker')
+
+    log.info("Prefork avviato", extra={
+        'url': f"http://{host}:{port}", 'workers': workers, 'pid': os.getpid(), 'state': state_path})
+
+    while children:
+        try:
+            pid, _ = os.wait()
+        except ChildProcessError:
+            break
+        role = children.pop(pid, None)
+        if role and not stopping:
+            log.warning("Processo terminato: riavvio", extra={'role': role, 'pid': pid})
+            spawn(role)
+
+    sock.close()
+    try:
+        os.remove(state_path)
+    except FileNotFoundError:
+        pass
+    from .instrumentation import SharedMetrics
+    SharedMetrics(metrics_prefix(state_path)).remove_all()
+    if not Config.SHARED_STATE_PATH:
+        try:
+            os.rmdir(os.path.dirname(state_path))
+        except OSError:
+            pass
+    log.info("Servizio fermato")
+
+
+def main(argv=None):
+    from . import logs
+    from .config import Config
+
+    logs.configure()  # Prima del fork: i figli riavviano il proprio thread di scrittura
+
+    parser = argparse.ArgumentParser(description="OpenStack AI Resource Forecasting Service")
+    parser.add_argument('--host', default=Config.API_HOST)
+    parser.add_argument('--port', type=int, default=Config.API_PORT)
+    parser.add_argument('--workers', type=int, default=Config.API_WORKERS,
+                        help="Worker WSGI prefork (0 = processo singolo con server di sviluppo)")
+    args = parser.parse_args(argv)
+
+    if args.workers > 0:
+        run_prefork(args.host, args.port, args.workers)
+    else:
+        run_standalone(args.host, args.port)
+
+
+if __name__ == '__main__':
+    main()
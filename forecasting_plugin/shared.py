@@ -0,0 +1,125 @@
+# Stato condiviso tra il processo collector e i worker WSGI
+import io
+import logging
+import os
+import pickle
+import stat
+import tempfile
+
+log = logging.getLogger(__name__)
+
+# Unici globali ammessi nello snapshot: classi dello stato e ricostruzione degli array NumPy
+_STATE_GLOBALS = {
+    ('forecasting_plugin.snapshot', 'StateSnapshot'),
+    ('forecasting_plugin.history', 'MetricsRingBuffer'),
+    ('forecasting_plugin.hosts', 'HostMetrics'),
+    ('forecasting_plugin.rollups', 'MetricRollups'),
+    ('forecasting_plugin.rollups', 'RollupTier'),
+    ('numpy', 'dtype'),
+    ('numpy', 'ndarray'),
+    ('numpy._core.numeric', '_frombuffer'),
+    ('numpy.core.numeric', '_frombuffer'),
+    ('numpy._core.multiarray', '_reconstruct'),
+    ('numpy.core.multiarray', '_reconstruct'),
+}
+
+
+def default_state_path(port):
+    """File di stato in una directory privata (0700) nuova
+
+    Da chiamare nel master prima del fork: collector e worker ereditano il
+    percorso. La directory sta in $XDG_RUNTIME_DIR o in /dev/shm (memoria
+    condivisa) se disponibili; un nome prevedibile in una directory
+    scrivibile da tutti permetterebbe a un altro utente di sostituire lo stato.
+    """
+    base = os.getenv('XDG_RUNTIME_DIR')
+    if not base or not os.path.isdir(base):
+        base = '/dev/shm' if os.path.isdir('/dev/shm') else None
+    directory = tempfile.mkdtemp(prefix=f"forecasting-{port}-", dir=base)
+    return os.path.join(directory, "state.pkl")
+
+
+def write_private(path, data):
+    """Scrive `data` (bytes) con rename atomico da un file temporaneo nuovo, 0600, mai tramite symlink"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.unlink(tmp_path)  # Residuo di un processo precedente con lo stesso pid
+    except FileNotFoundError:
+        pass
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | os.O_NOFOLLOW, 0o600)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def read_private(path):
+    """Contenuto di un file scritto da write_private (PermissionError se di un altro utente o scrivibile da altri)"""
+    fd = os.open(path, os.O_RDONLY | os.O_NOFOLLOW)
+    with os.fdopen(fd, 'rb') as f:
+        st = os.fstat(f.fileno())
+        if st.st_uid != os.geteuid() or st.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+            raise PermissionError(f"{path}: proprietario o permessi non attesi")
+        return f.read()
+
+
+class _StateUnpickler(pickle.Unpickler):
+    """Unpickler che rifiuta qualunque globale fuori da _STATE_GLOBALS"""
+
+    def find_class(self, module, name):
+        if (module, name) not in _STATE_GLOBALS:
+            raise pickle.UnpicklingError(f"Globale non ammesso nello stato condiviso: {module}.{name}")
+        return super().find_class(module, name)
+
+
+class SharedState:
+    """Snapshot dello stato del collector pubblicato su un file in memoria condivisa
+
+    Il processo collector scrive lo snapshot completo dopo ogni ciclo con
+    rename atomico; i worker fanno solo una stat() per richiesta e ricaricano
+    lo snapshot quando cambia, senza lock tra processi. Il file si legge solo
+    se appartiene allo stesso utente e solo con le classi dello stato.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._signature = None  # (st_mtime_ns, st_size, st_ino) dell'ultimo snapshot letto
+        self._state = None
+        self.publishes = 0
+        self.loads = 0
+        self.rejected = 0
+
+    def publish(self, state):
+        """Scrive lo snapshot (processo collector)"""
+        write_private(self.path, pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL))
+        self.publishes += 1
+
+    def load(self):
+        """Ultimo snapshot pubblicato, ricaricato solo se cambiato (processo worker)
+
+        Restituisce (state, changed); state è None se non ancora pubblicato.
+        Uno snapshot rifiutato lascia in uso quello precedente.
+        """
+        try:
+            st = os.lstat(self.path)
+        except FileNotFoundError:
+            return self._state, False
+
+        signature = (st.st_mtime_ns, st.st_size, st.st_ino)
+        if signature == self._signature:
+            return self._state, False
+
+        self._signature = signature  # Anche se rifiutato: si riprova solo quando cambia
+        try:
+            self._state = _StateUnpickler(io.BytesIO(read_private(self.path))).load()
+        except (OSError, EOFError, pickle.UnpicklingError) as e:
+            self.rejected += 1
+            log.error("Stato condiviso rifiutato: %s", e, extra={'path': self.path})
+            return self._state, False
+        self.loads += 1
+        return self._state, True
+
+    def remove(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,322 @@
+# Simulazione deterministica del collector: orologio virtuale, RNG con seed e OpenStack finto
+# Uso: python -m forecasting_plugin.simulation --days 90 --fleet 500 --hosts 16 --seed 1
+import argparse
+import contextlib
+import logging
+import random
+import shutil
+import tempfile
+import time
+import zlib
+from datetime import datetime
+from types import SimpleNamespace
+
+import numpy as np
+
+from .config import Config
+from .connections import CircuitBreaker, ConnectionManager
+
+log = logging.getLogger(__name__)
+
+SIM_FLAVORS = [
+    {'id': '1', 'name': 'm1.tiny', 'vcpus': 1, 'ram': 512},
+    {'id': '2', 'name': 'm1.small', 'vcpus': 1, 'ram': 2048},
+    {'id': '3', 'name': 'm1.medium', 'vcpus': 2, 'ram': 4096},
+    {'id': '4', 'name': 'm1.large', 'vcpus': 4, 'ram': 8192},
+]
+
+
+class VirtualClock:
+    """Orologio che avanza solo quando richiesto (secondi epoch)"""
+
+    def __init__(self, start=None):
+        self.epoch = float(start if start is not None else time.time())
+
+    def now(self):
+        """Sostituto di datetime.now()"""
+        return datetime.fromtimestamp(self.epoch)
+
+    def monotonic(self):
+        """Sostituto di time.monotonic() (es. TTL della FlavorCache)"""
+        return self.epoch
+
+    def advance(self, seconds):
+        self.epoch += seconds
+
+
+class ScriptedFleet:
+    """Flotta di VM scriptata: quante sono ACTIVE dipende dal tempo virtuale
+
+    La frazione attiva segue un profilo giornaliero (picco nel pomeriggio),
+    un calo nel weekend e una crescita lineare; ogni server ha un rango fisso
+    (permutazione con seed), quindi a parità di frazione sono attive sempre
+    le stesse VM e la distribuzione per host resta stabile.
+    """
+
+    def __init__(self, size=8, hosts=2, flavors=SIM_FLAVORS, base=0.35, daily=0.3, weekend=0.5,
+                 growth=0.002, overcommit=1.1, seed=0):
+        self.size = size
+        self.flavors = flavors
+        self.base = base
+        self.daily = daily
+        self.weekend = weekend  # Fattore del carico giornaliero nel weekend
+        self.growth = growth  # Crescita della frazione attiva per giorno
+        self.host_names = [f'compute-{i:03d}' for i in range(hosts)]
+
+        rng = np.random.default_rng(seed)
+        self._rank = rng.permutation(size)
+        self._flavor = rng.integers(0, len(flavors), size)
+        self._host = rng.integers(0, hosts, size)
+        self._origin = None
+
+        # Oggetti server creati una volta: a ogni tick cambia solo lo stato di quelli che transitano
+        self._servers = [
+            SimpleNamespace(
+                id=f"srv-{i:08d}",
+                name=f"vm-{i}",
+                status='SHUTOFF',
+                flavor={'id': flavors[self._flavor[i]]['id']},
+                hypervisor_hostname=self.host_names[self._host[i]],
+            )
+            for i in range(size)
+        ]
+        self._active = np.zeros(size, dtype=bool)
+
+        # Capacità per host: la flotta intera occupa `overcommit` volte la capacità
+        vcpus = np.array([f['vcpus'] for f in flavors])[self._flavor]
+        ram = np.array([f['ram'] for f in flavors])[self._flavor]
+        self.host_vcpus = int(np.ceil(vcpus.sum() / hosts / overcommit))
+        self.host_ram_mb = int(np.ceil(ram.sum() / hosts / overcommit))
+
+    def active_fraction(self, epoch):
+        now = datetime.fromtimestamp(epoch)
+        if self._origin is None:
+            self._origin = epoch
+        days = (epoch - self._origin) / 86400
+        hour = now.hour + now.minute / 60
+        profile = np.exp(-((hour - 14) ** 2) / 18)
+        if now.weekday() >= 5:
+            profile *= self.weekend
+        return float(np.clip(self.base * (1 + self.growth * days) + self.daily * profile, 0.0, 1.0))
+
+    def servers(self, epoch):
+        """Server al tempo `epoch`, ordinati per id"""
+        active = self._rank < int(self.active_fraction(epoch) * self.size)
+        for i in np.flatnonzero(active != self._active):
+            self._servers[i].status = 'ACTIVE' if active[i] else 'SHUTOFF'
+        self._active = active
+        return self._servers
+
+
+class Outages:
+    """Finestre [inizio, fine) in cui il control plane finto non risponde"""
+
+    def __init__(self, clock, windows=(), latency=0.0):
+        self.clock = clock
+        self.windows = list(windows)
+        self.latency = latency  # Secondi reali prima dell'errore (es. timeout di connessione)
+        self.failures = 0
+
+    def check(self):
+        if any(start <= self.clock.epoch < end for start, end in self.windows):
+            self.failures += 1
+            if self.latency:
+                time.sleep(self.latency)
+            raise ConnectionError("Control plane OpenStack non raggiungibile (simulato)")
+
+
+class _FakeCompute:
+    """compute di openstacksdk: servers() paginato con limit/marker, flavors(), hypervisors()"""
+
+    def __init__(self, fleet, clock, page_latency=0.0, outages=None):
+        self.fleet = fleet
+        self.clock = clock
+        self.page_latency = page_latency
+        self.outages = outages or Outages(clock)
+        self.requests = 0
+
+    def servers(self, details=True, limit=1000, marker=None, **query):
+        servers = self.fleet.servers(self.clock.epoch)
+        start = int(marker.split('-')[1]) + 1 if marker else 0
+        while start < len(servers):
+            self.outages.check()
+            self.requests += 1
+            if self.page_latency:
+                time.sleep(self.page_latency)
+            end = min(start + limit, len(servers))
+            yield from servers[start:end]
+            start = end
+
+    def flavors(self, details=True, **query):
+        self.outages.check()
+        self.requests += 1
+        return [SimpleNamespace(id=f['id'], name=f['name'], vcpus=f['vcpus'], ram=f['ram'])
+                for f in self.fleet.flavors]
+
+    def hypervisors(self, details=True):
+        self.outages.check()
+        self.requests += 1
+        return [SimpleNamespace(name=host, state='up', status='enabled',
+                                vcpus=self.fleet.host_vcpus, memory_size=self.fleet.host_ram_mb)
+                for host in self.fleet.host_names]
+
+
+class _FakeBlockStorage:
+    def __init__(self, fleet, outages):
+        self.fleet = fleet
+        self.outages = outages
+
+    def volumes(self):
+        self.outages.check()
+        return [SimpleNamespace(id=f"vol-{i}", status='in-use') for i in range(self.fleet.size // 2)]
+
+
+class FakeConnection:
+    """Connessione OpenStack finta per il collector (compute + block_storage)"""
+
+    def __init__(self, fleet, clock, page_latency=0.0, outages=None):
+        self.outages = outages or Outages(clock)
+        self.compute = _FakeCompute(fleet, clock, page_latency, self.outages)
+        self.block_storage = _FakeBlockStorage(fleet, self.outages)
+
+    def close(self):
+        pass  # Il pool chiude le connessioni che hanno fallito
+
+
+class Simulation:
+    """Esegue il collector su orologio virtuale: mesi di campioni in pochi secondi
+
+    I poll non passano dal CollectionEngine: i tick sono chiamati in sequenza
+    con gli stessi intervalli, quindi l'esecuzione è riproducibile con lo
+    stesso seed. Con connection=None il collector usa il percorso mock.
+    Il pool di connessioni del collector è sostituito da uno che presta
+    sempre la connessione finta, con circuit breaker sull'orologio virtuale
+    e retry senza attese reali.
+    """
+
+    def __init__(self, collector, clock, connection=None, seed=0):
+        self.collector = collector
+        self.clock = clock
+        self.connection = connection
+        self.seed = seed
+        self.samples = 0
+
+        breaker = CircuitBreaker(Config.OS_BREAKER_THRESHOLD, Config.OS_BREAKER_RESET, clock=clock.monotonic)
+        if connection is None:
+            # Nessun cloud: circuito sempre aperto, nessuna chiamata
+            breaker.state, breaker.retry_at = CircuitBreaker.OPEN, float('inf')
+        self.connections = ConnectionManager(lambda: self.connection, size=Config.OS_POOL_SIZE,
+                                             retries=Config.OS_RETRIES, breaker=breaker,
+                                             sleep=lambda seconds: None, rng=random.Random(seed))
+
+    @contextlib.contextmanager
+    def attached(self):
+        """Collega orologio, RNG e connessione al collector per la durata della simulazione"""
+        c = self.collector
+        saved = (c.clock, c.random, c.connections, c.running, c.flavor_cache.clock, Config.SCAN_WORKERS)
+        Config.SCAN_WORKERS = 1  # Pagine elaborate in ordine, nel thread della simulazione
+        c.clock = self.clock.now
+        c.random = random.Random(self.seed)
+        c.connections = self.connections  # Mai verso un cloud reale
+        c.running = True
+        c.flavor_cache.clock = self.clock.monotonic
+        try:
+            yield c
+        finally:
+            c.clock, c.random, c.connections, c.running, c.flavor_cache.clock, Config.SCAN_WORKERS = saved
+
+    def run(self, duration, step=None, quiet=True):
+        """Simula `duration` secondi di raccolta, un ciclo ogni `step` secondi"""
+        step = step or Config.COLLECTION_INTERVAL
+        secondary = Config.POLL_SCHEDULES['hypervisors']['interval']
+        end = self.clock.epoch + duration
+        next_secondary = self.clock.epoch
+
+        # In modalità silenziosa restano solo warning ed errori del collector
+        logger = logging.getLogger('forecasting_plugin')
+        level = logger.level
+        if quiet:
+            logger.setLevel(logging.WARNING)
+        try:
+            with self.attached() as c:
+                while self.clock.epoch < end:
+                    if self.connection is not None and self.clock.epoch >= next_secondary:
+                        for poll in (c.poll_hypervisors, c.poll_volumes):
+                            try:
+                                poll()
+                            except Exception as e:  # Come il CollectionEngine: errore contato, poll successivo
+                                log.error("Errore nel poll: %s", e, extra={'poll': poll.__name__})
+                        next_secondary += secondary
+                    c.collect_once()
+                    self.samples += 1
+                    self.clock.advance(step)
+        finally:
+            logger.setLevel(level)
+        return self.samples
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulazione deterministica del collector")
+    parser.add_argument('--days', type=float, default=30, help="Giorni simulati")
+    parser.add_argument('--step', type=int, default=Config.COLLECTION_INTERVAL, help="Secondi tra due raccolte")
+    parser.add_argument('--fleet', type=int, default=8, help="VM totali della flotta scriptata")
+    parser.add_argument('--hosts', type=int, default=2, help="Hypervisor")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--start', type=float, help="Epoch iniziale (default: adesso meno la durata)")
+    parser.add_argument('--mock', action='store_true', help="Percorso mock del collector invece della flotta finta")
+    parser.add_argument('--outage', action='append', default=[], metavar='ORA:DURATA',
+                        help="Control plane giù per DURATA ore a partire da ORA ore dall'inizio (ripetibile)")
+    parser.add_argument('--data-dir', help="Directory dello storage (default: temporanea, eliminata alla fine)")
+    args = parser.parse_args(argv)
+
+    # Lo storage va configurato prima di creare il collector
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix='forecasting-sim-')
+    Config.STORAGE_DIR = data_dir
+    Config.SSE_ENABLED = False
+    from .collector import collector
+    if Config.STORAGE_ENABLED:
+        collector.open_store()
+
+    duration = args.days * 86400
+    # Di default finisce "adesso", così la retention dello storage resta coerente
+    clock = VirtualClock(args.start if args.start is not None else time.time() - duration)
+    windows = []
+    for spec in args.outage:
+        offset, hours = (float(x) * 3600 for x in spec.split(':'))
+        windows.append((clock.epoch + offset, clock.epoch + offset + hours))
+    connection = None if args.mock else FakeConnection(
+        ScriptedFleet(args.fleet, args.hosts, seed=args.seed), clock, outages=Outages(clock, windows))
+    simulation = Simulation(collector, clock, connection, seed=args.seed)
+
+    start = time.perf_counter()
+    samples = simulation.run(duration, args.step)
+    elapsed = time.perf_counter() - start
+
+    t0 = time.perf_counter()
+    from .predictor import ResourcePredictor
+    window = collector.get_rollup('cpu', '1h', include_open=False)
+    forecast = ResourcePredictor(seed=args.seed).seasonal_harmonic(
+        window['timestamp'], window['mean'], 24, clock.epoch)
+    forecast_ms = (time.perf_counter() - t0) * 1000
+
+    print(f"Simulati {args.days:g} giorni: {samples} campioni in {elapsed:.2f}s "
+          f"({samples / elapsed:,.0f} campioni/s)")
+    print(f"Storage: {data_dir} ({len(collector.store.days()) if collector.store is not None else 0} segmenti)")
+    print(f"Rollup 1h: {len(collector.rollups['cpu'].tiers['1h'])} ore | host: {len(collector.host_metrics.hosts)}")
+    print(f"Alert: {collector.alert_engine.stats()} | eventi: {collector.events.seq}")
+    print(f"Anomalie: {collector.get_anomaly_stats()}")
+    if windows:
+        stats = simulation.connections.stats()
+        print(f"Buchi: {len(collector.get_gaps(clock.epoch - duration))} cicli | circuito: {stats['state']} "
+              f"(chiamate {stats['calls']}, retry {stats['retries']}, rifiutate {stats['rejected']})")
+    print(f"Previsione stagionale 24h: {forecast_ms:.1f} ms, prime ore {forecast[:4]}")
+    print(f"Impronta della serie cpu: {zlib.crc32(collector.get_values('cpu', 10000).tobytes()):08x}")
+
+    if not args.data_dir:
+        if collector.store is not None:
+            collector.store.close()
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+# Snapshot immutabili e versionati dello stato del collector, letti dalle API senza lock
+import time
+from datetime import datetime
+
+import numpy as np
+
+from .rollups import RAW_RESOLUTION
+from .storage import RECORD_DTYPE, records_to_history, slice_records
+
+
+class StateSnapshot:
+    """Stato del collector congelato a una versione
+
+    Il collector costruisce uno snapshot a ogni ciclo e lo pubblica con una
+    sola assegnazione di attributo (atomica): chi legge prende il riferimento
+    una volta (`snap = collector.snapshot`) e lavora su dati che non cambiano
+    più, quindi cpu e ram sono sempre dello stesso ciclo e nessun lettore
+    attende lo scrittore o gli altri lettori. Le strutture congelate
+    condividono gli array con quelle vive: storico e rollup scrivono solo
+    in avanti o su array nuovi, le matrici orarie degli host si copiano alla
+    chiusura dell'ora (vedi i metodi freeze()).
+    """
+
+    __slots__ = ('version', 'created', 'metrics_history', 'rollups', 'host_metrics', 'hypervisor_info',
+                 'hypervisor_capacity', 'volume_info', 'total_vcpus', 'total_ram_gb', 'interval', 'gaps', 'flavors')
+
+    def __init__(self, version, created, metrics_history, rollups, host_metrics, hypervisor_info,
+                 hypervisor_capacity, volume_info, total_vcpus, total_ram_gb, interval=RAW_RESOLUTION, gaps=(),
+                 flavors=()):
+        values = (version, created, metrics_history, rollups, host_metrics, hypervisor_info,
+                  hypervisor_capacity, volume_info, total_vcpus, total_ram_gb, interval, gaps, flavors)
+        for name, value in zip(self.__slots__, values):
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("StateSnapshot è immutabile")
+
+    def __reduce__(self):
+        # Pickle (stato condiviso con i worker prefork) senza passare da __setattr__
+        return StateSnapshot, tuple(getattr(self, name) for name in self.__slots__)
+
+    @classmethod
+    def capture(cls, collector, version):
+        """Congela lo stato vivo del collector (da chiamare con il lock di scrittura)"""
+        return cls(
+            version=version,
+            created=time.time(),
+            metrics_history={key: buffer.freeze() for key, buffer in collector.metrics_history.items()},
+            rollups={key: rollups.freeze() for key, rollups in collector.rollups.items()},
+            host_metrics=collector.host_metrics.freeze(),
+            # Questi vengono solo riassegnati, mai modificati sul posto: basta il riferimento
+            hypervisor_info=collector.hypervisor_info,
+            hypervisor_capacity=collector.hypervisor_capacity,
+            volume_info=collector.volume_info,
+            total_vcpus=collector.total_vcpus,
+            total_ram_gb=collector.total_ram_gb,
+            interval=collector.interval,
+            gaps=collector.gaps,  # Tupla, sostituita a ogni nuovo buco
+            flavors=collector.flavors,  # Tupla, sostituita dal ciclo di raccolta
+        )
+
+    # ----- Letture -----
+
+    def current(self):
+        """Ultimo campione cpu/ram (entrambi dello stesso ciclo)"""
+        current = {}
+        for key in ('cpu', 'ram'):
+            last = self.metrics_history[key].last()
+            current[key] = last if last is not None else {
+                'timestamp': datetime.now().isoformat(),
+                'value': 0,
+                'source': 'none'
+            }
+        return current
+
+    def last_timestamp(self):
+        """Epoch dell'ultimo campione (None se lo storico è vuoto)"""
+        timestamps = self.metrics_history['cpu'].timestamps(1)
+        return int(timestamps[0]) if len(timestamps) else None
+
+    def values(self, metric, limit):
+        return self.metrics_history[metric].values(limit)
+
+    def rollup(self, metric, tier, limit=None, include_open=True):
+        """Ultimi `limit` bucket di un tier di rollup ('5m', '1h', '1d')"""
+        return self.rollups[metric].tiers[tier].window(limit, include_open)
+
+    def select_rollup_tier(self, span=None, resolution=None, max_points=1000):
+        """Tier di rollup per span/risoluzione richiesti (None = campioni grezzi)"""
+        return self.rollups['cpu'].select(span, resolution, max_points, raw_resolution=self.interval)
+
+    def memory_records(self):
+        """Buffer in memoria come record RECORD_DTYPE (al massimo HISTORY_LENGTH)"""
+        cpu = self.metrics_history['cpu'].columns()
+        ram = self.metrics_history['ram'].columns()
+        records = np.zeros(len(cpu['value']), dtype=RECORD_DTYPE)
+        records['timestamp'] = cpu['timestamp']
+        records['cpu'] = cpu['value']
+        records['ram'] = ram['value']
+        records['allocated_vcpus'] = cpu['allocated']
+        records['allocated_ram_mb'] = ram['allocated']
+        records['active_vms'] = cpu['active_vms']
+        records['source'] = cpu['source']
+        records['flags'] = cpu['flags']  # Stessi flag nei due buffer (un record per ciclo)
+        return records
+
+    def covers(self, limit=None, since=None):
+        """True se bastano i campioni in memoria per la richiesta"""
+        if since is not None:
+            timestamps = self.metrics_history['cpu'].timestamps()
+            return bool(len(timestamps)) and since >= timestamps[0]
+        return limit is not None and limit <= len(self.metrics_history['cpu'])
+
+    def records(self, limit=None, since=None, until=None):
+        return slice_records(self.memory_records(), limit, since, until)
+
+    def gaps_between(self, since=None, until=None):
+        """Epoch dei cicli senza dati (buchi recenti in memoria) con since <= t < until"""
+        return [t for t in self.gaps if (since is None or t >= since) and (until is None or t < until)]
+
+    def history_records(self, limit, since=None, until=None):
+        return records_to_history(self.records(limit, since, until))
@@ -0,0 +1,344 @@
+# Storage persistente su disco: segmenti binari append-only, uno per giorno
+import logging
+import os
+import re
+import threading
+from datetime import datetime, timezone
+
+import numpy as np
+
+from .history import MetricsRingBuffer
+
+log = logging.getLogger(__name__)
+
+# Record a larghezza fissa (28 byte, little-endian): un campione per ciclo di raccolta
+RECORD_DTYPE = np.dtype([
+    ('timestamp', '<i8'),  # Epoch in secondi
+    ('cpu', '<f4'),
+    ('ram', '<f4'),
+    ('allocated_vcpus', '<i4'),  # -1 = non disponibile
+    ('allocated_ram_mb', '<i4'),  # -1 = non disponibile
+    ('active_vms', '<i2'),
+    ('source', 'u1'),  # Indice in MetricsRingBuffer.SOURCES
+    ('flags', 'u1'),  # Bit di stato (FLAG_GAP, FLAG_ANOMALY_*, ...)
+])
+
+# Ciclo senza dati (OpenStack irraggiungibile o circuito aperto): cpu/ram NaN, esclusi dalle letture
+FLAG_GAP = 0x01
+# Marcature del rilevatore di anomalie (anomalies.py): spike e cambio di livello per serie, cambio di sorgente
+FLAG_ANOMALY_CPU = 0x02
+FLAG_ANOMALY_RAM = 0x04
+FLAG_LEVEL_SHIFT_CPU = 0x08
+FLAG_SOURCE_CHANGE = 0x10
+FLAG_LEVEL_SHIFT_RAM = 0x20
+FLAGS = {'gap': FLAG_GAP, 'anomaly_cpu': FLAG_ANOMALY_CPU, 'anomaly_ram': FLAG_ANOMALY_RAM,
+         'level_shift_cpu': FLAG_LEVEL_SHIFT_CPU, 'level_shift_ram': FLAG_LEVEL_SHIFT_RAM,
+         'source_change': FLAG_SOURCE_CHANGE}  # Legenda per le API
+
+MAGIC = b'FCSTSEG1'
+HEADER_DTYPE = np.dtype([('magic', 'S8'), ('record_size', '<u4'), ('resolution', '<u4')])
+HEADER_SIZE = HEADER_DTYPE.itemsize
+SEGMENT_PATTERN = re.compile(r'^metrics-(\d{8})\.seg$')
+
+DAY = 86400
+
+
+def empty_records():
+    return np.zeros(0, dtype=RECORD_DTYPE)
+
+
+def without_gaps(records):
+    """Record senza i marcatori di buco (nessuna copia se non ce ne sono)"""
+    gaps = (records['flags'] & FLAG_GAP) != 0
+    return records[~gaps] if gaps.any() else records
+
+
+def slice_records(records, limit=None, since=None, until=None):
+    """Applica i cursori: since (escluso) / until (escluso) e poi limit
+
+    Con `since` restituisce i primi `limit` punti successivi al cursore,
+    altrimenti gli ultimi `limit`.
+    """
+    timestamps = records['timestamp']
+    lo = np.searchsorted(timestamps, since, 'right') if since is not None else 0
+    hi = np.searchsorted(timestamps, until, 'left') if until is not None else len(records)
+    records = records[lo:hi]
+    if limit is not None:
+        records = records[:limit] if since is not None else records[len(records) - min(limit, len(records)):]
+    return records
+
+
+def records_to_history(records):
+    """Converte i record in {'cpu': [...], 'ram': [...]} come MetricsRingBuffer.to_records"""
+    history = {'cpu': [], 'ram': []}
+    for row in records.tolist():
+        timestamp, cpu, ram, vcpus, ram_mb, active_vms, source, flags = row
+        iso = datetime.fromtimestamp(timestamp).isoformat()
+        source = MetricsRingBuffer.SOURCES[source]
+        cpu_point = {'timestamp': iso, 'value': round(cpu, 1), 'source': source, 'active_vms': active_vms}
+        ram_point = {'timestamp': iso, 'value': round(ram, 1), 'source': source, 'active_vms': active_vms}
+        if vcpus >= 0:
+            cpu_point['allocated_vcpus'] = vcpus
+        if ram_mb >= 0:
+            ram_point['allocated_ram_gb'] = round(ram_mb / 1024, 1)
+        if flags & FLAG_ANOMALY_CPU:
+            cpu_point['anomaly'] = True
+        if flags & FLAG_ANOMALY_RAM:
+            ram_point['anomaly'] = True
+        history['cpu'].append(cpu_point)
+        history['ram'].append(ram_point)
+    return history
+
+
+class TimeSeriesStore:
+    """Serie storiche su segmenti giornalieri append-only letti via mmap
+
+    Ogni file `metrics-YYYYMMDD.seg` contiene un header di 16 byte seguito da
+    record RECORD_DTYPE in ordine di timestamp. Le letture usano np.memmap,
+    quindi all'avvio settimane di storico sono disponibili senza parsing.
+    """
+
+    def __init__(self, directory, retention_days=35, compact_after_days=7, compact_resolution=300,
+                 read_only=False, quarantine_samples=None):
+        self.directory = directory
+        self.read_only = read_only  # I worker WSGI leggono soltanto, scrive il collector
+        self.retention_days = retention_days
+        self.compact_after_days = compact_after_days  # 0 = compattazione disattivata
+        self.compact_resolution = compact_resolution  # Secondi per record dopo la compattazione
+        # Spike in quarantena esclusi dalle medie compattate (ANOMALY_SHIFT_SAMPLES; None = nessuna quarantena)
+        self.quarantine_samples = quarantine_samples
+
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._file = None  # File del segmento corrente (aperto in append)
+        self._day = None
+        self._maps = {}  # day -> (dimensione file, memmap)
+
+        if not read_only:
+            for day in self.days():
+                self._repair(day)
+
+    # ----- Segmenti -----
+
+    @staticmethod
+    def day_of(timestamp):
+        return datetime.fromtimestamp(timestamp, tz=timezone.utc).strftime('%Y%m%d')
+
+    def _path(self, day):
+        return os.path.join(self.directory, f"metrics-{day}.seg")
+
+    def days(self):
+        """Giorni presenti su disco, in ordine cronologico"""
+        days = []
+        for name in os.listdir(self.directory):
+            match = SEGMENT_PATTERN.match(name)
+            if match:
+                days.append(match.group(1))
+        return sorted(days)
+
+    def _write_header(self, f, resolution=0):
+        header = np.array([(MAGIC, RECORD_DTYPE.itemsize, resolution)], dtype=HEADER_DTYPE)
+        f.write(header.tobytes())
+
+    def _read_header(self, day):
+        header = np.fromfile(self._path(day), dtype=HEADER_DTYPE, count=1)
+        if len(header) != 1 or header['magic'][0] != MAGIC or header['record_size'][0] != RECORD_DTYPE.itemsize:
+            raise ValueError(f"Segmento non valido: {self._path(day)}")
+        return header[0]
+
+    def _repair(self, day):
+        """Tronca un eventuale record parziale lasciato da un crash"""
+        path = self._path(day)
+        size = os.path.getsize(path)
+        if size < HEADER_SIZE:
+            os.remove(path)
+            return
+        extra = (size - HEADER_SIZE) % RECORD_DTYPE.itemsize
+        if extra:
+            with open(path, 'r+b') as f:
+                f.truncate(size - extra)
+            log.warning("Segmento con record parziale troncato", extra={'day': day, 'bytes': extra})
+
+    def _open_segment(self, day):
+        if self._file is not None:
+            self._file.close()
+        path = self._path(day)
+        is_new = not os.path.exists(path)
+        self._file = open(path, 'ab')
+        if is_new:
+            self._write_header(self._file)
+            self._file.flush()
+        self._day = day
+
+    # ----- Scrittura -----
+
+    def append(self, timestamp, cpu, ram, source, active_vms=0, allocated_vcpus=-1, allocated_ram_mb=-1, flags=0):
+        """Aggiunge un record al segmento del giorno (rotazione automatica)"""
+        if self.read_only:
+            raise RuntimeError("Storage aperto in sola lettura")
+        if isinstance(timestamp, datetime):
+            timestamp = timestamp.timestamp()
+        timestamp = int(timestamp)
+
+        record = np.array([(
+            timestamp, cpu, ram, allocated_vcpus, allocated_ram_mb, active_vms,
+            MetricsRingBuffer.SOURCES.index(source), flags
+        )], dtype=RECORD_DTYPE)
+
+        day = self.day_of(timestamp)
+        with self._lock:
+            rotated = day != self._day
+            if rotated:
+                self._open_segment(day)
+            self._file.write(record.tobytes())
+            self._file.flush()
+
+        if rotated:
+            # Al cambio di giorno applica retention e compattazione
+            self.maintain(now=timestamp)
+
+    def append_gap(self, timestamp):
+        """Marca un ciclo senza dati: record con FLAG_GAP e valori NaN"""
+        self.append(timestamp, np.nan, np.nan, 'none', flags=FLAG_GAP)
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+                self._day = None
+
+    # ----- Lettura -----
+
+    def _segment(self, day):
+        """Record di un segmento come np.memmap in sola lettura (senza copia)"""
+        path = self._path(day)
+        size = os.path.getsize(path)
+        cached = self._maps.get(day)
+        if cached is not None and cached[0] == size:
+            return cached[1]
+
+        count = (size - HEADER_SIZE) // RECORD_DTYPE.itemsize
+        if count <= 0:
+            return empty_records()
+        records = np.memmap(path, dtype=RECORD_DTYPE, mode='r', offset=HEADER_SIZE, shape=(count,))
+        self._maps[day] = (size, records)
+        return records
+
+    def tail(self, limit):
+        """Ultimi `limit` record (buchi esclusi), leggendo solo i segmenti necessari"""
+        parts = []
+        needed = limit
+        for day in reversed(self.days()):
+            if needed <= 0:
+                break
+            records = without_gaps(self._segment(day))
+            parts.append(records[-needed:] if needed < len(records) else records)
+            needed -= len(parts[-1])
+        if not parts:
+            return empty_records()
+        return np.concatenate(parts[::-1])
+
+    def range(self, since=None, until=None, gaps=False):
+        """Record con since <= timestamp < until (epoch in secondi); con gaps=True anche i buchi"""
+        parts = []
+        for day in self.days():
+            day_start = int(datetime.strptime(day, '%Y%m%d').replace(tzinfo=timezone.utc).timestamp())
+            if since is not None and day_start + DAY <= since:
+                continue
+            if until is not None and day_start >= until:
+                break
+
+            records = self._segment(day)
+            timestamps = records['timestamp']
+            lo = np.searchsorted(timestamps, since, 'left') if since is not None else 0
+            hi = np.searchsorted(timestamps, until, 'left') if until is not None else len(records)
+            if hi > lo:
+                parts.append(records[lo:hi] if gaps else without_gaps(records[lo:hi]))
+        if not parts:
+            return empty_records()
+        return np.concatenate(parts)
+
+    def gaps(self, since=None, until=None):
+        """Timestamp dei cicli marcati come buco, con since <= timestamp < until"""
+        records = self.range(since, until, gaps=True)
+        return records['timestamp'][(records['flags'] & FLAG_GAP) != 0]
+
+    def __len__(self):
+        return sum(len(self._segment(day)) for day in self.days())
+
+    # ----- Retention e compattazione -----
+
+    def maintain(self, now=None):
+        """Elimina i segmenti scaduti e compatta quelli più vecchi"""
+        if self.read_only:
+            return
+        now = int(now if now is not None else datetime.now().timestamp())
+        today = self.day_of(now)
+        expire_before = self.day_of(now - self.retention_days * DAY)
+        compact_before = self.day_of(now - self.compact_after_days * DAY)
+
+        for day in self.days():
+            if day == today:
+                continue
+            if day < expire_before:
+                self._maps.pop(day, None)
+                os.remove(self._path(day))
+                log.info("Segmento eliminato", extra={'day': day, 'retention_days': self.retention_days})
+            elif self.compact_after_days and day < compact_before:
+                self.compact(day)
+
+    def compact(self, day):
+        """Riscrive un segmento a risoluzione ridotta (media per bucket)
+
+        Con la quarantena gli spike non entrano nella media della loro serie
+        (se il bucket ha solo spike resta la media grezza) e i flag del
+        bucket sono l'OR di quelli dei suoi campioni.
+        """
+        if self._read_header(day)['resolution'] >= self.compact_resolution:
+            return  # Già compattato
+
+        records = np.array(self._segment(day))
+        if not len(records):
+            return
+        gaps = records[(records['flags'] & FLAG_GAP) != 0]
+        records = without_gaps(records)
+
+        compacted = records[:0]
+        if len(records):
+            buckets = records['timestamp'] // self.compact_resolution
+            starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+            ends = np.r_[starts[1:], len(records)]
+            counts = ends - starts
+
+            # Valori medi per bucket, campi di stato presi dall'ultimo campione
+            compacted = records[ends - 1].copy()
+            compacted['timestamp'] = buckets[starts] * self.compact_resolution
+            compacted['flags'] = np.bitwise_or.reduceat(records['flags'], starts)
+            for key in ('cpu', 'ram'):
+                values = records[key].astype(np.float64)
+                mean = np.add.reduceat(values, starts) / counts
+                if self.quarantine_samples is not None:
+                    from .anomalies import quarantine_mask
+                    keep = ~quarantine_mask(records['flags'], key, self.quarantine_samples)
+                    kept = np.add.reduceat(keep, starts)
+                    with np.errstate(divide='ignore', invalid='ignore'):
+                        mean = np.where(kept > 0, np.add.reduceat(np.where(keep, values, 0.0), starts) / kept, mean)
+                compacted[key] = mean
+
+        # Un solo marcatore per i bucket che non hanno nessun campione valido
+        if len(gaps):
+            gaps['timestamp'] = gaps['timestamp'] // self.compact_resolution * self.compact_resolution
+            gaps = gaps[np.r_[True, gaps['timestamp'][1:] != gaps['timestamp'][:-1]]]
+            gaps = gaps[~np.isin(gaps['timestamp'], compacted['timestamp'])]
+            compacted = np.sort(np.concatenate([compacted, gaps]), order='timestamp', kind='stable')
+
+        path = self._path(day)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            self._write_header(f, resolution=self.compact_resolution)
+            f.write(compacted.tobytes())
+        self._maps.pop(day, None)
+        os.replace(tmp_path, path)
+        log.info("Segmento compattato", extra={'day': day, 'records': len(records), 'compacted': len(compacted)})
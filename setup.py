@@ -16,7 +16,7 @@ setup(
     ],
     entry_points={
         'console_scripts': [
-            'forecasting-api = forecasting_plugin.api:main',
+            'forecasting-api = forecasting_plugin.server:main',
         ],
     },
 )
\ No newline at end of file
@@ -0,0 +1,119 @@
+# Motore di alert: soglie con isteresi, deduplicazione e regole predittive
+import numpy as np
+import pytest
+
+from forecasting_plugin.alerts import AlertEngine, AnomalyRule, PredictiveRule, RateRule, ThresholdRule, default_rules
+from forecasting_plugin.collector import OpenStackMetricsCollector
+from forecasting_plugin.config import Config
+from forecasting_plugin.rollups import MetricRollups
+from forecasting_plugin.seasonal import SeasonalModels
+
+START = 1760000400
+HOUR = 3600
+
+
+@pytest.fixture
+def collector(monkeypatch):
+    c = OpenStackMetricsCollector()
+    monkeypatch.setattr(Config, 'ANOMALY_DETECTION', False)
+    monkeypatch.setattr(c, 'store', None)
+    monkeypatch.setattr(c, 'rollups', {'cpu': MetricRollups(), 'ram': MetricRollups()})
+    monkeypatch.setattr(c, 'alert_engine', AlertEngine(default_rules(Config)))
+    monkeypatch.setattr(c, 'alert_models', SeasonalModels())
+    monkeypatch.setattr(c, '_last_predictive', None)
+    return c
+
+
+def levels(engine, values, series='cpu'):
+    """Severità attiva dopo ogni campione"""
+    result = []
+    for t, value in enumerate(values):
+        engine.evaluate(START + 60 * t, {series: value})
+        alert = engine.active.get(f'threshold:{series}')
+        result.append(alert and alert['severity'])
+    return result
+
+
+def test_threshold_hysteresis():
+    engine = AlertEngine([ThresholdRule('cpu', 80, 90, hysteresis=5)])
+    assert levels(engine, [50, 80, 77, 76, 91, 87, 85, 84, 74]) == [
+        None, 'WARNING', 'WARNING', 'WARNING', 'CRITICAL', 'CRITICAL', 'CRITICAL', 'WARNING', None]
+
+
+def test_threshold_needs_consecutive_samples():
+    engine = AlertEngine([ThresholdRule('cpu', 80, for_samples=3)])
+    assert levels(engine, [85, 85, 70, 85, 85, 85, 60]) == [
+        None, None, None, None, None, 'WARNING', None]  # Discesa immediata
+
+
+def test_firing_alert_is_not_repeated():
+    transitions = []
+    engine = AlertEngine([ThresholdRule('cpu', 80)], on_transition=lambda a, state, t: transitions.append(state))
+    for t, value in enumerate([85, 86, 90, float('nan'), 88, 70]):
+        engine.evaluate(START + 60 * t, {'cpu': value})
+    assert transitions == ['firing', 'resolved']  # NaN non cambia lo stato
+    assert engine.alerts() == [] and engine.transitions == 2
+
+
+def test_rate_rule_compares_with_window_samples_ago():
+    engine = AlertEngine([RateRule('cpu', 20, window=3)])
+    fired = [bool(engine.evaluate(START + 60 * t, {'cpu': value})) for t, value in enumerate([10, 12, 14, 35, 36])]
+    assert fired == [False, False, False, True, False]
+    assert engine.active['rate:cpu']['value'] == 25.0  # 35 - 10, al momento dello scatto
+
+
+def test_alerts_sorted_by_severity_and_rules_added_later_keep_state():
+    engine = AlertEngine([ThresholdRule('cpu', 80, 90)])
+    engine.evaluate(START, {'cpu': 85, 'ram': 95})
+    engine.add_rule(ThresholdRule('ram', 80, 90))
+    engine.evaluate(START + 60, {'cpu': 85, 'ram': 95})
+    assert [(a['id'], a['severity']) for a in engine.alerts()] == [
+        ('threshold:ram', 'CRITICAL'), ('threshold:cpu', 'WARNING')]
+    assert engine.transitions == 2
+
+
+def test_anomaly_rule_clears_after_quiet_samples():
+    engine = AlertEngine([AnomalyRule('cpu', clear_samples=2)])
+    spike = {'series': 'cpu', 'kind': 'spike', 'value': 95.0, 'baseline': 30.0, 'z': 8.0}
+    assert len(engine.evaluate_anomalies(START, [spike])) == 1
+    assert engine.evaluate_anomalies(START + 60, [spike]) == []  # Stessa anomalia: nessun duplicato
+    assert len(engine.evaluate_anomalies(START + 120, [dict(spike, kind='level_shift')])) == 1
+    assert engine.evaluate_anomalies(START + 180, []) == []
+    assert len(engine.evaluate_anomalies(START + 240, [])) == 1
+    assert engine.alerts() == []
+
+
+def predictive_alerts(collector, cpu_hourly):
+    timestamps = START + HOUR * np.arange(len(cpu_hourly))
+    collector.rollups['cpu'].load(timestamps, cpu_hourly)
+    collector.rollups['ram'].load(timestamps, np.full(len(cpu_hourly), 10.0))
+    collector._publish_snapshot()
+    collector._update_alerts(int(timestamps[-1]), float(cpu_hourly[-1]), 10.0)
+    return [a for a in collector.alert_engine.alerts() if a['rule'] == 'predictive']
+
+
+def test_flat_load_below_critical_does_not_fire(collector):
+    # 35% costante: il vecchio profilo sinusoidale (+40% alle 14:00) superava il 40% critico
+    assert predictive_alerts(collector, np.full(30, 35.0)) == []
+
+
+def test_rising_load_fires_before_reaching_critical(collector):
+    alerts = predictive_alerts(collector, np.linspace(10.0, 38.0, 30))  # ~1% all'ora
+    assert [a['id'] for a in alerts] == ['predictive:cpu']
+    assert alerts[0]['hours_to_threshold'] <= Config.ALERT_PREDICTIVE_HOURS
+
+
+def test_learned_daily_profile_drives_the_forecast(collector):
+    hours = np.arange(14 * 24)
+    peaks = 30.0 + 15.0 * np.sin(2 * np.pi * ((START // HOUR + hours) % 24 - 8) / 24)  # Picco reale alle 14 UTC
+    alerts = predictive_alerts(collector, peaks[:13 * 24 + 2])  # Ultima ora: le 10 UTC (37.5%), picco 45% alle 14
+    assert collector.alert_models.get('cpu').ready
+    assert [a['id'] for a in alerts] == ['predictive:cpu']
+
+
+def test_predictive_rule_clears_when_forecast_drops():
+    engine = AlertEngine([PredictiveRule('cpu', 40, within_hours=3)])
+    assert len(engine.evaluate_forecasts(0, {'cpu': [30, 41, 45]})) == 1
+    assert engine.evaluate_forecasts(1, {'cpu': [30, 42, 45]}) == []  # Già attivo: nessun duplicato
+    assert len(engine.evaluate_forecasts(2, {'cpu': [30, 31, 32]})) == 1
+    assert engine.alerts() == []
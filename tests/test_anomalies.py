@@ -0,0 +1,73 @@
+# Quarantena degli spike: ricostruzione da disco uguale al percorso live e compattazione senza spike
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+
+from forecasting_plugin.anomalies import quarantine_mask
+from forecasting_plugin.collector import OpenStackMetricsCollector
+from forecasting_plugin.config import Config
+from forecasting_plugin.storage import (FLAG_ANOMALY_CPU, FLAG_ANOMALY_RAM, FLAG_LEVEL_SHIFT_CPU,
+                                        TimeSeriesStore)
+
+START = 1760000400  # Multiplo di 300 (inizio di un bucket da 5 minuti)
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'STORAGE_DIR', str(tmp_path))
+    monkeypatch.setattr(Config, 'SSE_ENABLED', False)
+    return tmp_path
+
+
+def cpu_shift_with_ram_spike():
+    """cpu: cambio di livello di +30 dal campione 60; ram: uno spike isolato subito prima della conferma"""
+    rng = np.random.default_rng(0)
+    cpu = 40 + rng.normal(0, 1, 120)
+    ram = 50 + rng.normal(0, 1, 120)
+    cpu[60:] += 30
+    confirmed = 60 + Config.ANOMALY_SHIFT_SAMPLES - 1
+    ram[confirmed - 1] += 30
+    return cpu, ram, confirmed
+
+
+def test_rebuild_after_cpu_only_shift_matches_live(storage):
+    cpu, ram, confirmed = cpu_shift_with_ram_spike()
+    live = OpenStackMetricsCollector()
+    live.open_store()
+    for i, (c, r) in enumerate(zip(cpu, ram)):
+        live._record_sample(START + 60 * i, float(c), float(r), 'openstack_calculated')
+    live.store.close()
+
+    flags = live.store.range()['flags']
+    assert flags[confirmed] & FLAG_LEVEL_SHIFT_CPU
+    assert flags[confirmed - 1] & FLAG_ANOMALY_RAM
+    assert quarantine_mask(flags, 'ram', Config.ANOMALY_SHIFT_SAMPLES)[confirmed - 1]  # La ram non si rilascia
+    assert not quarantine_mask(flags, 'cpu', Config.ANOMALY_SHIFT_SAMPLES)[60:confirmed].any()
+
+    rebuilt = OpenStackMetricsCollector()
+    rebuilt.open_store()
+    for key in ('cpu', 'ram'):
+        for name in ('5m', '1h'):
+            a = live.rollups[key].tiers[name].window()
+            b = rebuilt.rollups[key].tiers[name].window()
+            assert np.array_equal(a['count'], b['count']), (key, name)
+            assert np.allclose(a['mean'], b['mean']), (key, name)
+    rebuilt.store.close()
+
+
+def test_compaction_keeps_spikes_out_and_their_flags(tmp_path):
+    store = TimeSeriesStore(str(tmp_path), quarantine_samples=Config.ANOMALY_SHIFT_SAMPLES)
+    cpu = [10, 10, 90, 10, 10] + [90, 80, 90, 80, 90]  # Secondo bucket: solo spike
+    flags = [0, 0, FLAG_ANOMALY_CPU, 0, 0] + [FLAG_ANOMALY_CPU] * 5
+    for i, (value, flag) in enumerate(zip(cpu, flags)):
+        store.append(START + 60 * i, value, 20.0, 'openstack_calculated', flags=flag)
+    day = datetime.fromtimestamp(START, timezone.utc).strftime('%Y%m%d')
+    store.compact(day)
+
+    records = store.range()
+    assert records['timestamp'].tolist() == [START, START + 300]
+    assert records['cpu'].tolist() == [10.0, 86.0]  # Spike fuori dalla media; bucket di soli spike: media grezza
+    assert records['ram'].tolist() == [20.0, 20.0]
+    assert (records['flags'] & FLAG_ANOMALY_CPU).all()  # Il flag dello spike a metà bucket resta
+    store.close()
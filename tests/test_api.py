@@ -0,0 +1,176 @@
+# Validazione dei parametri e cache delle previsioni degli endpoint
+import json
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from forecasting_plugin import api
+from forecasting_plugin.api import create_app
+from forecasting_plugin.config import Config
+from forecasting_plugin.history import MetricsRingBuffer
+from forecasting_plugin.hosts import HostMetrics
+from forecasting_plugin.rollups import MetricRollups
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(Config, 'SSE_ENABLED', False)
+    return create_app().test_client()
+
+
+@pytest.mark.parametrize('query', ['limit=0', 'limit=-5', 'span=-1h', 'span=0', 'resolution=-5m'])
+def test_history_rejects_non_positive_arguments(client, query):
+    response = client.get(f'/api/v1/metrics/history?{query}')
+    assert response.status_code == 400
+
+
+def test_history_caps_limit(client, monkeypatch):
+    monkeypatch.setattr(Config, 'HISTORY_MAX_LIMIT', 5)
+    response = client.get('/api/v1/metrics/history?limit=1000000&format=columnar')
+    assert response.status_code == 200
+    assert response.get_json()['count'] <= 5
+
+
+@pytest.fixture
+def history(monkeypatch):
+    """Storico in memoria di 30 campioni, senza storage su disco"""
+    collector = api.collector
+    monkeypatch.setattr(collector, 'store', None)
+    monkeypatch.setattr(collector, 'anomalies', None)
+    monkeypatch.setattr(collector, 'metrics_history', {
+        'cpu': MetricsRingBuffer(100, 'allocated_vcpus'),
+        'ram': MetricsRingBuffer(100, 'allocated_ram_gb', allocated_scale=1 / 1024)})
+    monkeypatch.setattr(collector, 'rollups', {'cpu': MetricRollups(), 'ram': MetricRollups()})
+    for i in range(30):
+        collector._record_sample(1760000400 + 60 * i, 20.0 + i, 40.0, 'openstack_calculated', active_vms=5)
+    collector._publish_snapshot()
+    return collector
+
+
+def test_history_formats_agree(client, history):
+    columnar = client.get('/api/v1/metrics/history?limit=20&format=columnar').get_json()
+    count = columnar['count']
+    assert count == 20 and columnar['columns']['cpu'][-1] == 49.0
+
+    ndjson = client.get('/api/v1/metrics/history?limit=20&format=ndjson')
+    assert ndjson.mimetype == 'application/x-ndjson'
+    lines = ndjson.get_data(as_text=True).splitlines()
+    assert len(lines) == count + 1 and json.loads(lines[0])['next_since'] == columnar['next_since']
+
+    binary = client.get('/api/v1/metrics/history?limit=20&format=binary')
+    assert binary.headers['X-Record-Count'] == str(count)
+    itemsize = sum(np.dtype(field.split(':')[1]).itemsize for field in binary.headers['X-Record-Format'].split(','))
+    assert len(binary.get_data()) == count * itemsize
+
+    assert client.get('/api/v1/metrics/history?format=xml').status_code == 400
+
+
+class FrozenDatetime(datetime):
+    current = datetime(2025, 10, 9, 9, 30)
+
+    @classmethod
+    def now(cls, tz=None):
+        return cls.current
+
+
+def test_forecast_cache_keys_include_start_hour(client, monkeypatch):
+    monkeypatch.setattr(api, 'datetime', FrozenDatetime)
+    monkeypatch.setattr(FrozenDatetime, 'current', datetime(2025, 10, 9, 9, 30))
+    api.forecast_cache.clear()
+
+    single = client.get('/api/v1/forecast/cpu?hours=6&simulations=0').get_json()['predictions']
+    batch = client.post('/api/v1/forecast/batch', json={'forecasts': [
+        {'metric': 'cpu', 'scope': 'cloud', 'hours': 6}]}).get_json()['results'][0]['predictions']
+    assert batch == single  # Stessa ora e stessa versione: stessa voce di cache
+
+    # Un'ora dopo, con lo stesso storico, la previsione parte dall'ora nuova
+    monkeypatch.setattr(FrozenDatetime, 'current', datetime(2025, 10, 9, 10, 30))
+    later = client.get('/api/v1/forecast/cpu?hours=6&simulations=0').get_json()['predictions']
+    assert later != single
+    assert client.post('/api/v1/forecast/batch', json={'forecasts': [
+        {'metric': 'cpu', 'scope': 'cloud', 'hours': 6}]}).get_json()['results'][0]['predictions'] == later
+
+
+def hosts_with_allocations(percents):
+    """HostMetrics con un host da 100 vCPU/100 GB e una media oraria per valore di `percents`"""
+    metrics = HostMetrics()
+    capacity = {'hv-0': {'vcpus': 100, 'memory_mb': 100 * 1024}}
+    for hour, percent in enumerate(percents):
+        allocated = {'hv-0': {'vcpus': int(percent), 'ram_mb': int(percent) * 1024, 'active': 1}}
+        metrics.record(1760000400 + hour * 3600, allocated, capacity)
+    return metrics
+
+
+def capacity_plan(client, monkeypatch, percents):
+    monkeypatch.setattr(api.collector, 'host_metrics', hosts_with_allocations(percents))
+    api.collector._publish_snapshot()
+    api.forecast_cache.clear()  # Stessa versione dello storico cloud: nessun riuso tra i test
+    response = client.get('/api/v1/capacity?threshold=90&horizons=6,24')
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def test_capacity_flat_allocations_never_exhaust(client, monkeypatch):
+    plan = capacity_plan(client, monkeypatch, [80] * 48)
+    assert plan['model'] == 'linear_trend'
+    # Con il profilo sinusoidale (+40% alle 14:00) l'80% superava il 90% ogni pomeriggio
+    assert plan['resources']['cpu']['exhaustion_hours'] is None
+    assert plan['resources']['cpu']['peak_percent'] == {'6h': 80.0, '24h': 80.0}
+
+
+def test_capacity_growing_allocations_exhaust(client, monkeypatch):
+    plan = capacity_plan(client, monkeypatch, range(40, 88))  # +1% all'ora, ora all'87%
+    assert plan['resources']['cpu']['exhaustion_hours'] == 4
+
+
+def batch(client, *specs):
+    response = client.post('/api/v1/forecast/batch', json={'forecasts': list(specs)})
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def test_batch_matches_single_calls(client, monkeypatch):
+    monkeypatch.setattr(api, 'datetime', FrozenDatetime)
+    monkeypatch.setattr(api.collector, 'host_metrics', hosts_with_allocations(range(40, 88)))
+    api.collector._publish_snapshot()
+    api.forecast_cache.clear()
+
+    body = batch(client, {'metric': 'cpu', 'hours': 24}, {'metric': 'cpu', 'hours': 6},
+                 {'metric': 'ram', 'scope': 'hosts', 'hours': 12}, {'metric': 'ram', 'scope': 'host:hv-0', 'hours': 3})
+    cloud24, cloud6, hosts, host = body['results']
+    assert body['count'] == 4 and body['errors'] == 0
+    assert cloud6['predictions'] == cloud24['predictions'][:6]  # Orizzonti corti: prefissi dello stesso passaggio
+
+    api.forecast_cache.clear()
+    single = client.get('/api/v1/forecast/cpu?hours=24&simulations=0').get_json()['predictions']
+    assert single == cloud24['predictions']
+    single_hosts = client.get('/api/v1/hosts/forecast?metric=ram&hours=12').get_json()
+    assert hosts['hosts'] == single_hosts['hosts'] and hosts['aggregate'] == single_hosts['aggregate']
+    assert host['predictions'] == hosts['hosts']['hv-0'][:3]
+
+
+def test_batch_errors_stay_with_their_spec(client):
+    body = batch(client, {'metric': 'disk'}, {'metric': 'cpu', 'hours': 0}, {'scope': 'host:nessuno', 'hours': 2},
+                 {'metric': 'cpu', 'scope': 'hosts', 'model': 'seasonal'}, {'metric': 'cpu', 'hours': 2}, 'cpu')
+    results = body['results']
+    assert body['errors'] == 5
+    assert ['error' in r for r in results] == [True, True, True, True, False, True]
+    assert results[2]['error'] == 'Host sconosciuto: nessuno'
+    assert len(results[4]['predictions']) == 2
+
+
+def test_batch_seasonal_spec(client):
+    result = batch(client, {'metric': 'cpu', 'hours': 5, 'model': 'seasonal'})['results'][0]
+    assert result['model'] == 'seasonal' and len(result['predictions']) == 5
+
+
+@pytest.mark.parametrize('body', [None, {}, {'forecasts': []}, {'forecasts': {'metric': 'cpu'}}])
+def test_batch_rejects_malformed_bodies(client, body):
+    assert client.post('/api/v1/forecast/batch', json=body).status_code == 400
+
+
+def test_batch_limits_specs(client, monkeypatch):
+    monkeypatch.setattr(Config, 'FORECAST_BATCH_MAX_SPECS', 2)
+    response = client.post('/api/v1/forecast/batch', json={'forecasts': [{'metric': 'cpu'}] * 3})
+    assert response.status_code == 400
@@ -0,0 +1,84 @@
+# Application factory: import senza effetti collaterali, app indipendenti, collector avviato dopo il bind
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+import pytest
+
+from forecasting_plugin import api
+from forecasting_plugin.api import create_app
+from forecasting_plugin.collector import collector
+
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+
+IMPORT_PROBE = """
+import json, sys, threading
+import {module}
+print(json.dumps({{'threads': threading.active_count() - 1,
+                  'loaded': [m for m in ('flask', 'numpy', 'openstack') if m in sys.modules]}}))
+"""
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def environment(tmp_path):
+    env = dict(os.environ, PYTHONPATH=ROOT, FORECASTING_DATA_DIR=str(tmp_path),
+               FORECASTING_SSE_PORT=str(free_port()), FORECASTING_LOG_LEVEL='ERROR')
+    env.pop('FORECASTING_ROLE', None)
+    return env
+
+
+def probe(module, env):
+    out = subprocess.run([sys.executable, '-c', IMPORT_PROBE.format(module=module)], env=env,
+                         capture_output=True, text=True, timeout=60, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def test_imports_start_nothing(tmp_path):
+    env = environment(tmp_path)
+    assert probe('forecasting_plugin', env) == {'threads': 0, 'loaded': []}
+    assert probe('forecasting_plugin.api', env)['threads'] == 0
+    assert os.listdir(tmp_path) == []  # Nessuno storage aperto all'import
+
+
+def test_create_app_builds_independent_apps():
+    first, second = create_app(), create_app()
+    assert first is not second
+    rules = {rule.rule for rule in first.url_map.iter_rules()}
+    assert {'/api/v1/health', '/metrics', '/api/v1/forecast/batch'} <= rules
+    assert not collector.is_running()
+
+
+def test_default_app_is_created_once():
+    assert api.app is api.app
+    import forecasting_plugin
+    assert forecasting_plugin.app is api.app
+
+
+def test_standalone_server_answers_health(tmp_path):
+    port = free_port()
+    process = subprocess.Popen([sys.executable, '-m', 'forecasting_plugin.server', '--host', '127.0.0.1',
+                                '--port', str(port), '--workers', '0'],
+                               env=environment(tmp_path), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/api/v1/health", timeout=1) as response:
+                    assert response.status == 200
+                    break
+            except OSError:
+                if time.monotonic() > deadline or process.poll() is not None:
+                    pytest.fail("Il server non ha risposto su /api/v1/health")
+                time.sleep(0.05)
+    finally:
+        process.terminate()
+        process.wait(10)
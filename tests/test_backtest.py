@@ -0,0 +1,76 @@
+# Backtest con origini mobili: tracce, metriche e determinismo tra processi
+import json
+
+import numpy as np
+import pytest
+
+from forecasting_plugin.backtest import main, run_backtest, stored_trace, summarize, synthetic_trace
+from forecasting_plugin.seasonal import HOUR
+from forecasting_plugin.storage import FLAG_ANOMALY_CPU, TimeSeriesStore
+
+START = 1760000400
+
+
+def test_synthetic_trace_is_hourly_and_seeded():
+    timestamps, values = synthetic_trace(2, seed=3)
+    assert len(timestamps) == len(values) == 2 * 168
+    assert set(np.diff(timestamps)) == {HOUR}
+    assert values.min() >= 0 and values.max() <= 100
+    assert np.array_equal(values, synthetic_trace(2, seed=3)[1])
+    assert not np.array_equal(values, synthetic_trace(2, seed=4)[1])
+
+
+def test_summarize():
+    errors = np.array([[1.0, -2.0], [3.0, -6.0]])
+    actuals = np.array([[10.0, 20.0], [0.0, 30.0]])
+    stats = summarize(errors, actuals, np.array([0.001, 0.003]), [2048, 4096], tolerance=2.5)
+    assert stats['mae'] == 3.0
+    assert stats['per_horizon']['mae'] == [2.0, 4.0]
+    assert stats['per_horizon']['mape'] == [10.0, 15.0]  # Attuale 0 escluso dalla MAPE
+    assert stats['coverage'] == 0.5
+    assert stats['alloc_peak_kb'] == 3.0
+
+
+def test_report_does_not_depend_on_the_number_of_workers():
+    timestamps, values = synthetic_trace(3)
+    models = ['simple_linear_regression', 'seasonal']
+    single = run_backtest(timestamps, values, models, horizon=6, step=24, workers=1, alloc_samples=0)
+    parallel = run_backtest(timestamps, values, models, horizon=6, step=24, workers=2, alloc_samples=0)
+
+    assert single['origins'] == len(range(168, 3 * 168 - 6 + 1, 24))
+    for model in models:
+        assert len(single['models'][model]['per_horizon']['mae']) == 6
+        assert single['models'][model]['mae'] == parallel['models'][model]['mae']
+
+
+def test_short_trace_is_rejected():
+    timestamps, values = synthetic_trace(1)
+    with pytest.raises(ValueError):
+        run_backtest(timestamps, values, ['seasonal'], horizon=24, min_history=168)
+
+
+def test_stored_trace_uses_closed_hours_without_spikes(tmp_path):
+    store = TimeSeriesStore(str(tmp_path))
+    for i in range(3 * 60):
+        cpu = 95.0 if i == 30 else 10.0 * (i // 60 + 1)
+        store.append(START + 60 * i, cpu, 40.0, 'openstack_calculated',
+                     flags=FLAG_ANOMALY_CPU if i == 30 else 0)
+    store.close()
+
+    timestamps, values = stored_trace(str(tmp_path), 'cpu')
+    hour = START // HOUR * HOUR
+    assert timestamps.tolist() == [hour, hour + HOUR]  # L'ultima ora è ancora aperta
+    assert values.tolist() == pytest.approx([10.0, 20.0])
+
+
+def test_cli_writes_json_report(tmp_path, capsys):
+    output = tmp_path / 'report.json'
+    main(['--trace', 'synthetic:2:1', '--models', 'default_daily_pattern', '--horizon', '6', '--step', '48',
+          '--workers', '1', '--alloc-samples', '1', '--output', str(output)])
+    report = json.loads(output.read_text())
+    assert report['trace'] == {'source': 'synthetic:2:1', 'metric': 'cpu', 'hours': 336}
+    assert list(report['models']) == ['default_daily_pattern']
+    assert 'default_daily_pattern' in capsys.readouterr().err
+
+    with pytest.raises(SystemExit):
+        main(['--models', 'prophet'])
@@ -0,0 +1,46 @@
+# Raccolta dei server attraverso il pool di connessioni
+from types import SimpleNamespace
+
+import pytest
+
+from forecasting_plugin.collector import OpenStackMetricsCollector
+from forecasting_plugin.config import Config
+from forecasting_plugin.connections import ConnectionManager
+
+
+class FakeCompute:
+    def __init__(self):
+        self.flavor_calls = 0
+
+    def servers(self, details=True, limit=1000, marker=None, **query):
+        if marker:
+            return iter(())
+        return iter([SimpleNamespace(id=f'srv-{i}', status='ACTIVE', hypervisor_hostname='hv-0',
+                                     flavor={'id': 'f-large'}) for i in range(3)])
+
+    def flavors(self, details=True, **query):
+        self.flavor_calls += 1
+        return [SimpleNamespace(id='f-large', name='m1.large', vcpus=4, ram=8192)]
+
+
+@pytest.fixture
+def collector(monkeypatch):
+    monkeypatch.setattr(Config, 'SCAN_WORKERS', 2)
+    monkeypatch.setattr(Config, 'SSE_ENABLED', False)
+    c = OpenStackMetricsCollector()
+    saved = (c.connections, c.flavor_cache._flavors.copy(), c.flavor_cache._loaded_at)
+    yield c
+    c.connections, c.flavor_cache._flavors, c.flavor_cache._loaded_at = saved
+
+
+def test_flavor_refresh_reuses_the_leased_connection(collector):
+    compute = FakeCompute()
+    # Un pool da una sola connessione: un secondo lease scadrebbe in PoolTimeout
+    collector.connections = ConnectionManager(lambda: SimpleNamespace(compute=compute), size=1, timeout=0.2)
+    collector.flavor_cache._loaded_at = None
+
+    info = collector.connections.call(collector.get_active_servers_info, 'servers', retries=0)
+
+    assert compute.flavor_calls == 1
+    assert info['allocated_vcpus'] == 12
+    assert collector.connections.stats()['pool']['open'] == 1
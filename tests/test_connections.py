@@ -0,0 +1,172 @@
+# Pool di connessioni e circuit breaker
+import pytest
+
+from forecasting_plugin.connections import (
+    CircuitBreaker, CircuitOpenError, ConnectionManager, PoolTimeout, is_transport_error)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeConn:
+    def __init__(self, number):
+        self.number = number
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class SDKError(Exception):
+    """Come openstack.exceptions.SDKException, riconosciuta dal modulo"""
+
+
+SDKError.__module__ = 'openstack.exceptions'
+
+
+def manager(size=2, threshold=2, reset=30, clock=None):
+    created = []
+
+    def factory():
+        created.append(FakeConn(len(created)))
+        return created[-1]
+
+    breaker = CircuitBreaker(threshold, reset, clock=clock or Clock())
+    connections = ConnectionManager(factory, size=size, retries=2, breaker=breaker, timeout=0.05,
+                                    sleep=lambda seconds: None)
+    return connections, created
+
+
+def fail(connections, error):
+    with pytest.raises(type(error)):
+        with connections.lease():
+            raise error
+
+
+def test_transport_errors():
+    assert is_transport_error(ConnectionError())
+    assert is_transport_error(TimeoutError())
+    assert is_transport_error(SDKError())
+    assert not is_transport_error(TypeError())
+    assert not is_transport_error(PoolTimeout())
+
+
+def test_pool_reuses_connections_up_to_size():
+    connections, created = manager(size=2)
+    with connections.lease() as a:
+        with connections.lease() as b:
+            assert a is not b
+            with pytest.raises(PoolTimeout):
+                with connections.lease():
+                    pass
+    with connections.lease() as c:
+        assert c is a  # LIFO: l'ultima restituita
+    assert len(created) == 2
+    assert connections.stats()['pool'] == {'size': 2, 'open': 2, 'idle': 2}
+
+
+def test_failed_call_discards_the_connection():
+    connections, created = manager()
+    fail(connections, ConnectionError("reset"))
+    assert created[0].closed
+    assert connections.stats()['pool']['open'] == 0
+    with connections.lease() as conn:
+        assert conn is created[1]
+
+
+def test_breaker_opens_after_threshold_and_rejects():
+    clock = Clock()
+    connections, created = manager(threshold=2, clock=clock)
+    fail(connections, ConnectionError())
+    assert connections.breaker.state == CircuitBreaker.CLOSED
+    fail(connections, SDKError())
+    assert connections.breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        with connections.lease():
+            pass
+    assert connections.rejected == 1
+
+
+def test_breaker_waits_the_fixed_reset_timeout():
+    clock = Clock()
+    breaker = CircuitBreaker(threshold=1, reset=30, clock=clock)
+    for opening in range(3):
+        breaker.failure()
+        assert breaker.retry_at == clock.now + 30
+        clock.now += 29.9
+        assert not breaker.allow()
+        clock.now += 0.1
+        assert breaker.allow()  # Prova: riapre alla prossima failure()
+    breaker.success()
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.openings == 0
+
+
+def test_half_open_admits_a_single_probe():
+    clock = Clock()
+    connections, created = manager(threshold=1, clock=clock)
+    fail(connections, ConnectionError())
+    clock.now += 30
+
+    with connections.lease():
+        assert connections.breaker.state == CircuitBreaker.HALF_OPEN
+        with pytest.raises(CircuitOpenError):
+            with connections.lease():
+                pass
+    assert connections.breaker.state == CircuitBreaker.CLOSED
+    with connections.lease(), connections.lease():
+        pass  # Di nuovo chiuso: passano tutte
+
+
+def test_failed_probe_reopens():
+    clock = Clock()
+    connections, created = manager(threshold=1, clock=clock)
+    fail(connections, ConnectionError())
+    clock.now += 30
+    fail(connections, TimeoutError())
+    assert connections.breaker.state == CircuitBreaker.OPEN
+    assert connections.breaker.retry_at == 60
+
+
+def test_local_errors_do_not_count():
+    clock = Clock()
+    connections, created = manager(threshold=1, clock=clock)
+    fail(connections, TypeError("bug"))
+    assert connections.breaker.state == CircuitBreaker.CLOSED
+    assert connections.breaker.failures == 0
+
+    # Una prova terminata con un errore locale libera il posto per la prossima
+    fail(connections, ConnectionError())
+    clock.now += 30
+    fail(connections, KeyError('vcpus'))
+    assert connections.breaker.state == CircuitBreaker.HALF_OPEN
+    with connections.lease():
+        pass
+    assert connections.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_call_retries_only_transport_errors():
+    connections, created = manager(threshold=5)
+    attempts = []
+
+    def flaky(conn):
+        attempts.append(conn)
+        if len(attempts) < 3:
+            raise ConnectionError("reset")
+        return 'ok'
+
+    assert connections.call(flaky, 'servers') == 'ok'
+    assert connections.retried == 2
+
+    def broken(conn):
+        attempts.append(conn)
+        raise ValueError("bug")
+
+    attempts.clear()
+    with pytest.raises(ValueError):
+        connections.call(broken, 'servers')
+    assert len(attempts) == 1
@@ -0,0 +1,119 @@
+# Codifiche dello storico: NDJSON, binario, Arrow e cursori
+import json
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from forecasting_plugin import encoding
+from forecasting_plugin.encoding import (
+    arrow_ipc, binary_dtype, columnar_json, describe_dtype, iter_binary, iter_ndjson, next_cursor,
+    parse_cursor, record_columns, rollup_columns)
+from forecasting_plugin.storage import RECORD_DTYPE, slice_records
+
+START = 1760000400
+
+
+def records(n):
+    result = np.zeros(n, dtype=RECORD_DTYPE)
+    result['timestamp'] = START + 60 * np.arange(n)
+    result['cpu'] = 10.0 + np.arange(n)
+    result['ram'] = 50.25
+    result['allocated_vcpus'] = -1
+    result['active_vms'] = 7
+    return result
+
+
+def test_parse_cursor():
+    assert parse_cursor(None) is None
+    assert parse_cursor('') is None
+    assert parse_cursor('1760000400') == START
+    assert parse_cursor('1760000400.9') == START
+    assert parse_cursor(datetime.fromtimestamp(START).isoformat()) == START
+    with pytest.raises(ValueError):
+        parse_cursor('ieri')
+
+
+def test_slice_records_cursors():
+    data = records(10)
+    timestamps = data['timestamp']
+    # Senza since: gli ultimi `limit`; con since (escluso): i primi `limit` dopo il cursore
+    assert slice_records(data, limit=3)['timestamp'].tolist() == timestamps[-3:].tolist()
+    assert slice_records(data, limit=3, since=timestamps[2])['timestamp'].tolist() == timestamps[3:6].tolist()
+    assert slice_records(data, until=timestamps[2])['timestamp'].tolist() == timestamps[:2].tolist()
+    assert len(slice_records(data, since=timestamps[-1])) == 0
+
+
+def test_paging_with_next_cursor_visits_every_record_once():
+    data = records(25)
+    seen, since = [], START - 1
+    while True:
+        columns = record_columns(slice_records(data, limit=10, since=since))
+        if not len(columns['timestamp']):
+            break
+        seen.extend(columns['timestamp'].tolist())
+        since = next_cursor(columns)
+    assert seen == data['timestamp'].tolist()
+
+
+def test_rollup_columns_cursors():
+    timestamps = START + 300 * np.arange(6)
+    window = {'timestamp': timestamps, 'count': np.full(6, 5), 'min': np.arange(6.0), 'max': np.arange(6.0),
+              'mean': np.arange(6.0), 'p95': np.arange(6.0)}
+    windows = {'cpu': window, 'ram': window}
+    assert rollup_columns(windows, limit=2)['timestamp'].tolist() == timestamps[-2:].tolist()
+    columns = rollup_columns(windows, since=timestamps[1], limit=2)
+    assert columns['timestamp'].tolist() == timestamps[2:4].tolist()
+    assert columns['cpu_mean'].dtype == np.float32
+    assert next_cursor(rollup_columns(windows, since=timestamps[-1])) is None
+
+
+def test_ndjson_streams_meta_then_one_point_per_line(monkeypatch):
+    monkeypatch.setattr(encoding, 'CHUNK_SIZE', 2)
+    data = records(5)
+    data['cpu'][1] = np.nan
+    columns = record_columns(data)
+    chunks = list(iter_ndjson(columns, {'resolution': 'raw', 'next_since': next_cursor(columns)}))
+    assert len(chunks) == 4  # Metadati + 3 chunk da al più 2 punti
+
+    lines = [json.loads(line) for line in ''.join(chunks).splitlines()]
+    assert lines[0] == {'resolution': 'raw', 'next_since': int(data['timestamp'][-1])}
+    assert [row['timestamp'] for row in lines[1:]] == data['timestamp'].tolist()
+    assert lines[2]['cpu'] is None  # NaN non è JSON valido
+    assert lines[1]['ram'] == 50.2 and lines[1]['active_vms'] == 7
+
+
+def test_columnar_json():
+    columns = record_columns(records(3))
+    body = columnar_json(columns)
+    assert body['count'] == 3
+    assert body['columns']['cpu'] == [10.0, 11.0, 12.0]
+    assert body['next_since'] == START + 120
+
+
+def test_binary_round_trip(monkeypatch):
+    monkeypatch.setattr(encoding, 'CHUNK_SIZE', 4)
+    data = records(10)
+    columns = record_columns(data)
+    dtype = binary_dtype(columns)
+    assert describe_dtype(dtype).startswith('timestamp:<i8,cpu:<f4,ram:<f4,')
+
+    chunks = list(iter_binary(columns))
+    assert [len(chunk) for chunk in chunks] == [4 * dtype.itemsize, 4 * dtype.itemsize, 2 * dtype.itemsize]
+    decoded = np.frombuffer(b''.join(chunks), dtype=dtype)
+    for name in dtype.names:
+        assert decoded[name].tolist() == data[name].tolist()
+
+
+def test_arrow_round_trip():
+    pa = pytest.importorskip('pyarrow')
+    data = records(3)
+    table = pa.ipc.open_stream(arrow_ipc(record_columns(data))).read_all()
+    assert table.column('timestamp').to_pylist() == data['timestamp'].tolist()
+    assert table.column('cpu').type == pa.float32()
+
+
+def test_arrow_without_pyarrow(monkeypatch):
+    monkeypatch.setattr(encoding, 'pa', None)
+    with pytest.raises(RuntimeError):
+        arrow_ipc(record_columns(records(1)))
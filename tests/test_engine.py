@@ -0,0 +1,67 @@
+# Motore di raccolta asincrono: tick fissi, timeout senza sovrapposizioni, errori isolati
+import threading
+import time
+
+from forecasting_plugin.engine import CollectionEngine, PollTask
+
+
+def run(engine, seconds):
+    engine.start()
+    try:
+        time.sleep(seconds)
+    finally:
+        started = time.perf_counter()
+        engine.stop()
+    return time.perf_counter() - started
+
+
+def test_polls_on_a_fixed_grid():
+    calls = []
+    task = PollTask('servers', lambda: calls.append(time.perf_counter()), interval=0.05)
+    run(CollectionEngine([task]), 0.32)
+
+    assert 5 <= task.runs <= 8
+    assert task.errors == task.timeouts == task.skipped_ticks == 0
+    assert all(0.02 < b - a < 0.1 for a, b in zip(calls, calls[1:]))
+
+
+def test_slow_poll_is_never_run_twice_at_once():
+    lock = threading.Lock()
+    concurrent, peak = [0], [0]
+
+    def slow():
+        with lock:
+            concurrent[0] += 1
+            peak[0] = max(peak[0], concurrent[0])
+        time.sleep(0.12)
+        with lock:
+            concurrent[0] -= 1
+
+    task = PollTask('hypervisors', slow, interval=0.03, timeout=0.02)
+    run(CollectionEngine([task]), 0.3)
+
+    assert peak[0] == 1
+    assert task.timeouts >= 1
+    assert task.skipped_ticks >= 1
+
+
+def test_errors_do_not_stop_other_tasks():
+    def broken():
+        raise RuntimeError("Nova non risponde")
+
+    failing = PollTask('servers', broken, interval=0.04)
+    healthy = PollTask('volumes', lambda: None, interval=0.04)
+    engine = CollectionEngine([failing, healthy])
+    run(engine, 0.2)
+
+    assert failing.errors == failing.runs >= 3
+    assert healthy.runs >= 3 and healthy.errors == 0
+    assert engine.stats()['servers']['errors'] == failing.errors
+
+
+def test_stop_does_not_wait_for_the_next_tick():
+    task = PollTask('servers', lambda: None, interval=60)
+    engine = CollectionEngine([task])
+    assert run(engine, 0.05) < 1
+    assert not engine.running
+    assert task.runs == 1
@@ -0,0 +1,103 @@
+# Stream SSE: framing, replay, client lenti, bind e CORS
+import socket
+
+import pytest
+
+from forecasting_plugin.collector import OpenStackMetricsCollector
+from forecasting_plugin.config import Config
+from forecasting_plugin.events import Broadcaster, SSEServer, _Subscriber, format_event
+
+
+@pytest.fixture
+def server():
+    servers = []
+
+    def start(broadcaster, **options):
+        stream = SSEServer(broadcaster, '127.0.0.1', 0, **options)
+        stream.start()
+        servers.append(stream)
+        return stream
+
+    yield start
+    for stream in servers:
+        stream.stop()
+
+
+def read_until(sock, marker):
+    data = b''
+    while marker not in data:
+        chunk = sock.recv(65536)
+        if not chunk:
+            break
+        data += chunk
+    return data
+
+
+def request(stream, target='/api/v1/stream', headers=''):
+    sock = socket.create_connection(('127.0.0.1', stream.port), timeout=5)
+    sock.sendall(f'GET {target} HTTP/1.1\r\nHost: x\r\n{headers}\r\n'.encode())
+    return sock
+
+
+def test_format_event_frames():
+    assert format_event(7, 'sample', {'cpu': 1.5}) == b'id: 7\nevent: sample\ndata: {"cpu": 1.5}\n\n'
+
+
+def test_replay_after_last_event_id_and_filter(server):
+    broadcaster = Broadcaster(replay=8)
+    for i in range(5):
+        broadcaster.publish('sample' if i % 2 == 0 else 'alert', {'i': i})
+    stream = server(broadcaster)
+
+    sock = request(stream, '/api/v1/stream?events=sample', 'Last-Event-ID: 1\r\n')
+    data = read_until(sock, b'"i": 4}')
+    sock.close()
+    body = data.split(b'retry: 5000\n\n', 1)[1]
+    assert body == format_event(3, 'sample', {'i': 2}) + format_event(5, 'sample', {'i': 4})
+
+
+def test_no_cors_header_by_default(server):
+    stream = server(Broadcaster())
+    sock = request(stream)
+    head = read_until(sock, b'retry: 5000\n\n')
+    sock.close()
+    assert head.startswith(b'HTTP/1.1 200 OK\r\n')
+    assert b'Access-Control-Allow-Origin' not in head
+
+
+def test_configured_cors_origin(server):
+    stream = server(Broadcaster(), cors_origin='https://dashboard.example')
+    sock = request(stream)
+    head = read_until(sock, b'retry: 5000\n\n')
+    sock.close()
+    assert b'Access-Control-Allow-Origin: https://dashboard.example\r\n' in head
+    with pytest.raises(ValueError):
+        SSEServer(Broadcaster(), cors_origin='*\r\nSet-Cookie: x=1')
+
+
+def test_unknown_path_is_404(server):
+    stream = server(Broadcaster())
+    sock = request(stream, '/other')
+    assert read_until(sock, b'\r\n\r\n').startswith(b'HTTP/1.1 404')
+    sock.close()
+
+
+def test_slow_client_drops_oldest_frames():
+    client = _Subscriber(3, None)
+    dropped = [client.push(bytes([i])) for i in range(5)]
+    assert dropped == [False, False, False, True, True]
+    assert list(client.queue) == [b'\x02', b'\x03', b'\x04']
+
+
+def test_stream_binds_to_server_host(monkeypatch):
+    monkeypatch.setattr(Config, 'SSE_ENABLED', True)
+    collector = OpenStackMetricsCollector()
+    stream = collector.stream
+    collector.stream = None
+    try:
+        collector.start_stream('127.0.0.1', 0)
+        assert collector.stream.host == '127.0.0.1'
+        assert collector.stream._server.sockets[0].getsockname()[0] == '127.0.0.1'
+    finally:
+        collector.stop_stream()
+        collector.stream = stream
@@ -0,0 +1,104 @@
+# Buffer e rollup scritti in avanti: finestre corrette oltre il giro e snapshot che non cambiano più
+import numpy as np
+import pytest
+
+from forecasting_plugin.history import MetricsRingBuffer
+from forecasting_plugin.rollups import RollupTier, parse_duration, rollup_points
+
+
+def test_ring_buffer_windows_across_rebase():
+    buffer = MetricsRingBuffer(capacity=8)
+    reference = []
+    for i in range(50):
+        if i % 7 == 3:
+            block = list(range(100 * i, 100 * i + 5))
+            buffer.extend(block, [float(v) for v in block], [1] * 5, [0] * 5, [-1] * 5)
+            reference += block
+        else:
+            buffer.append(i, float(i), 'mock_realistic')
+            reference.append(i)
+        assert buffer.timestamps().tolist() == reference[-8:]
+        assert buffer.values(3).tolist() == [float(v) for v in reference[-3:]]
+    assert buffer.last()['value'] == float(reference[-1])
+
+
+def test_frozen_ring_buffer_does_not_change():
+    buffer = MetricsRingBuffer(capacity=8)
+    snapshots = []
+    for i in range(40):
+        buffer.append(i, float(i), 'mock_realistic', flags=i % 3)
+        frozen = buffer.freeze()
+        snapshots.append((frozen, {k: v.copy() for k, v in frozen.columns().items()}))
+    for frozen, columns in snapshots:
+        for key, column in frozen.columns().items():
+            assert np.array_equal(column, columns[key])
+        assert not frozen.values().flags.writeable
+
+
+def test_frozen_rollup_tier_does_not_change():
+    tier = RollupTier('5m', 300, capacity=4)
+    snapshots = []
+    for i in range(400):
+        tier.add(60 * i, float(i % 17))
+        frozen = tier.freeze()
+        snapshots.append((frozen, {k: np.array(v, copy=True) for k, v in frozen.window().items()}))
+    for frozen, window in snapshots:
+        for key, column in frozen.window().items():
+            assert np.array_equal(column, window[key])
+
+
+def test_rollup_tier_matches_bulk_load():
+    timestamps = np.arange(0, 3 * 86400, 60)
+    values = (np.sin(timestamps / 5000.0) + 1) * 40
+    incremental = RollupTier('1h', 3600, capacity=20)
+    for t, v in zip(timestamps, values):
+        incremental.add(t, float(v))
+    bulk = RollupTier('1h', 3600, capacity=20)
+    bulk.load(timestamps, values)
+    a, b = incremental.window(), bulk.window()
+    for key in a:
+        assert np.allclose(a[key], b[key])
+
+
+def test_rollup_window_limit_zero_is_empty():
+    tier = RollupTier('5m', 300, capacity=4)
+    for i in range(12):
+        tier.add(60 * i, float(i))  # Due bucket chiusi e uno aperto
+    assert all(len(column) == 0 for column in tier.window(limit=0).values())
+    assert len(tier.window(limit=1)['timestamp']) == 1
+    assert len(tier.window()['timestamp']) == 3
+
+
+def test_parse_duration_rejects_non_positive():
+    assert parse_duration('90m') == 5400
+    assert parse_duration('3600') == 3600
+    for text in ('-1h', '0', '0d', '-30'):
+        with pytest.raises(ValueError):
+            parse_duration(text)
+
+
+def test_rollup_tier_pads_skipped_buckets():
+    timestamps = np.r_[np.arange(0, 2 * 3600, 60), np.arange(6 * 3600, 8 * 3600, 60)]  # 4 ore senza campioni
+    values = np.full(len(timestamps), 30.0)
+    incremental = RollupTier('1h', 3600, capacity=20)
+    for t, v in zip(timestamps, values):
+        incremental.add(t, float(v))
+    bulk = RollupTier('1h', 3600, capacity=20)
+    bulk.load(timestamps, values)
+
+    for tier in (incremental, bulk):
+        window = tier.window()
+        assert window['timestamp'].tolist() == [3600 * h for h in range(8)]
+        assert window['count'].tolist() == [60, 60, 0, 0, 0, 0, 60, 60]
+        assert np.isnan(window['mean'][2:6]).all()
+        assert np.allclose(window['mean'][[0, 1, 6, 7]], 30.0)
+    assert rollup_points(incremental.window(limit=3, include_open=False))[0]['mean'] is None
+
+
+def test_rollup_tier_pads_at_most_one_window():
+    tier = RollupTier('5m', 300, capacity=4)
+    tier.add(0, 1.0)
+    tier.add(86400, 2.0)  # Un giorno dopo: solo gli ultimi 4 bucket restano
+    window = tier.window(include_open=False)
+    assert window['timestamp'].tolist() == [86400 - 300 * k for k in range(4, 0, -1)]
+    assert window['count'].tolist() == [0, 0, 0, 0]
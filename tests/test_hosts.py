@@ -0,0 +1,86 @@
+# Host comparsi dopo l'avvio: ore precedenti NaN, previsioni solo sulle ore osservate
+import numpy as np
+
+from forecasting_plugin.hosts import HostMetrics
+from forecasting_plugin.predictor import ResourcePredictor
+
+CAPACITY = {'vcpus': 32, 'memory_mb': 65536}
+
+
+def fill(metrics, hours, start=0, late_from=10):
+    """Un campione ogni 10 minuti; 'late' compare a metà dell'ora `late_from`"""
+    for minute in range(start, hours * 60, 10):
+        allocations = {'early': {'vcpus': 16, 'ram_mb': 32768, 'active': 4}}
+        capacities = {'early': CAPACITY}
+        if minute >= late_from * 60 + 30:
+            allocations['late'] = {'vcpus': 24, 'ram_mb': 16384, 'active': 3}
+            capacities['late'] = CAPACITY
+        metrics.record(minute * 60, allocations, capacities)
+
+
+def test_late_host_rows_are_nan_not_zero():
+    metrics = HostMetrics(capacity=48, initial_hosts=1)  # 'late' fa crescere le colonne
+    fill(metrics, 24)
+    matrix = metrics.hourly('cpu')
+    late = matrix[metrics.index['late']]
+    assert np.isnan(late[:10]).all()
+    assert np.allclose(late[10:], 75.0)  # Anche l'ora di comparsa: media dei soli campioni visti
+    assert np.allclose(matrix[metrics.index['early']], 50.0)
+
+
+def test_aggregate_skips_hosts_not_yet_present():
+    metrics = HostMetrics(capacity=48)
+    fill(metrics, 24)
+    aggregate = metrics.aggregate_hourly('cpu')
+    assert np.allclose(aggregate[:10], 50.0)
+    assert np.allclose(aggregate[11:], 62.5)
+
+
+def test_late_host_forecast_uses_observed_hours_only():
+    metrics = HostMetrics(capacity=48)
+    fill(metrics, 24)
+    matrix = metrics.hourly('cpu')
+    draws = ResourcePredictor(seed=1).draws(len(matrix), 12)
+    batch = ResourcePredictor().sinusoidal_with_trend_batch(matrix, 12, 7, draws)
+
+    column = metrics.index['late']
+    alone = ResourcePredictor().sinusoidal_with_trend_batch(matrix[column, 10:], 12, 7, draws[[column]])
+    assert np.array_equal(batch[column], alone[0])
+    assert not np.isnan(batch).any()
+    # L'host sempre presente non cambia rispetto a una chiamata senza l'altro
+    early = metrics.index['early']
+    assert np.array_equal(batch[early], ResourcePredictor().sinusoidal_with_trend_batch(
+        matrix[[early]], 12, 7, draws[[early]])[0])
+
+
+def test_missing_host_loses_totals_and_is_nan_then_expires():
+    metrics = HostMetrics(capacity=4)
+    allocations = {'a': {'vcpus': 8, 'ram_mb': 8192, 'active': 2}, 'b': {'vcpus': 16, 'ram_mb': 16384, 'active': 4}}
+    for hour in range(3):
+        metrics.record(hour * 3600, allocations, {'a': CAPACITY, 'b': CAPACITY})
+    for hour in range(3, 6):
+        metrics.record(hour * 3600, {'a': allocations['a']}, {'a': CAPACITY})
+
+    b = metrics.index['b']
+    assert metrics.total_vcpus[b] == 0 and not metrics.present[b]
+    assert [host['host'] for host in metrics.snapshot()] == ['a']
+    assert metrics.totals() == (32, 65536)
+    assert np.isnan(metrics.hourly('cpu')[b, -3:]).all()
+    assert np.allclose(metrics.hourly('cpu')[b, :-3], 50.0)
+
+    for hour in range(6, 10):
+        metrics.record(hour * 3600, {'a': allocations['a']}, {'a': CAPACITY})
+    assert metrics.hosts == ['a']  # Nessuna ora osservata di 'b' nella finestra
+    assert metrics.hourly('cpu').shape == (1, 5)  # 4 ore chiuse e quella aperta
+
+
+def test_skipped_hours_are_nan_rows():
+    metrics = HostMetrics(capacity=24)
+    fill(metrics, 3)
+    allocations = {'early': {'vcpus': 16, 'ram_mb': 32768, 'active': 4}}
+    metrics.record(7 * 3600, allocations, {'early': CAPACITY})  # Nessun campione tra le 3 e le 7
+
+    row = metrics.hourly('cpu')[metrics.index['early']]
+    assert len(row) == 8
+    assert np.allclose(row[:3], 50.0) and np.isnan(row[3:7]).all() and row[7] == 50.0
+    assert np.isnan(metrics.aggregate_hourly('cpu')[3:7]).all()
@@ -0,0 +1,104 @@
+# Strumentazione: istogrammi, contatori, somma tra processi ed esposizione Prometheus
+import os
+
+import pytest
+
+from forecasting_plugin import instrumentation
+from forecasting_plugin.api import create_app
+from forecasting_plugin.config import Config
+from forecasting_plugin.instrumentation import Registry, SharedMetrics, merge, render
+
+
+def test_histogram_buckets_are_inclusive_and_cumulative():
+    registry = Registry()
+    latency = registry.histogram('latency_seconds', "Latenza", ['call'], buckets=(0.1, 1))
+    for value in (0.05, 0.1, 0.5, 3):
+        latency.labels('servers').observe(value)
+
+    text = render(registry.export())
+    assert 'latency_seconds_bucket{call="servers",le="0.1"} 2' in text  # le: estremo incluso
+    assert 'latency_seconds_bucket{call="servers",le="1.0"} 3' in text
+    assert 'latency_seconds_bucket{call="servers",le="+Inf"} 4' in text
+    assert 'latency_seconds_sum{call="servers"} 3.65' in text
+    assert 'latency_seconds_count{call="servers"} 4' in text
+    assert '# TYPE latency_seconds histogram' in text
+
+
+def test_timer_counts_errors():
+    registry = Registry()
+    latency = registry.histogram('call_seconds', "Durata", ['call'])
+    errors = registry.counter('call_errors_total', "Errori", ['call'])
+    with latency.labels('flavors').time(errors.labels('flavors')):
+        pass
+    with pytest.raises(ConnectionError):
+        with latency.labels('flavors').time(errors.labels('flavors')):
+            raise ConnectionError
+
+    counts, total, count = latency.labels('flavors').export()
+    assert count == 2 and total >= 0
+    assert errors.labels('flavors').export() == 1
+
+
+def test_disabled_registry_records_nothing():
+    registry = Registry(enabled=False)
+    latency = registry.histogram('call_seconds', "Durata")
+    calls = registry.counter('calls_total', "Chiamate")
+    with latency.labels().time():
+        pass
+    latency.labels().observe(1.0)
+    calls.labels().inc()
+    assert latency.labels().export()[2] == 0
+    assert calls.labels().export() == 0
+
+
+def test_merge_sums_processes():
+    snapshots = []
+    for calls in (2, 5):
+        registry = Registry()
+        registry.counter('calls_total', "Chiamate", ['call']).labels('servers').inc(calls)
+        registry.histogram('call_seconds', "Durata", buckets=(1,)).labels().observe(0.5)
+        snapshots.append(registry.export())
+    snapshots[1]['calls_total']['series'][('volumes',)] = 1
+
+    merged = merge(snapshots)
+    assert merged['calls_total']['series'] == {('servers',): 7, ('volumes',): 1}
+    assert merged['call_seconds']['series'][()] == ([2, 0], 1.0, 2)
+
+
+def test_labels_are_escaped_and_failing_gauges_skipped():
+    registry = Registry()
+    registry.counter('errors_total', "Errori", ['reason']).labels('say "ciao"\n').inc()
+    registry.gauge('broken', "Non disponibile", lambda: 1 / 0)
+    registry.gauge('state', "Stato", lambda: {('open',): 0, ('closed',): 1}, ['state'])
+
+    text = render(registry.export(), registry.gauges)
+    assert 'errors_total{reason="say \\"ciao\\"\\n"} 1' in text
+    assert 'broken' not in text
+    assert 'state{state="closed"} 1.0' in text
+
+
+def test_dead_process_snapshots_are_dropped(tmp_path):
+    shared = SharedMetrics(str(tmp_path / 'metrics'))
+    shared.publish(Registry(), force=True)
+    dead = os.fork()
+    if dead == 0:
+        os._exit(0)
+    os.waitpid(dead, 0)
+    (tmp_path / f'metrics-{dead}.json').write_text('{}')
+
+    assert len(shared.collect()) == 1
+    assert sorted(p.name for p in tmp_path.iterdir()) == [f'metrics-{os.getpid()}.json']
+
+
+def test_metrics_endpoint(monkeypatch):
+    monkeypatch.setattr(Config, 'SSE_ENABLED', False)
+    monkeypatch.setattr(instrumentation, 'SHARED', None)
+    client = create_app().test_client()
+    client.get('/api/v1/health')
+    response = client.get('/metrics')
+
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    text = response.get_data(as_text=True)
+    assert 'forecasting_http_responses_total{endpoint="/api/v1/health",status="200"}' in text
+    assert '# TYPE forecasting_data_version gauge' in text
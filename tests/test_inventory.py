@@ -0,0 +1,43 @@
+# Scansione paginata dell'inventario server
+from types import SimpleNamespace
+
+from forecasting_plugin.inventory import iter_server_pages, scan_servers
+
+
+class CappedCompute:
+    """Nova finto che riduce `limit` a osapi_max_limit e pagina a marker"""
+
+    def __init__(self, total, max_limit):
+        self.all = [SimpleNamespace(id=f'srv-{i:05d}', status='ACTIVE', hypervisor_hostname='hv-0')
+                    for i in range(total)]
+        self.max_limit = max_limit
+        self.requests = []
+
+    def servers(self, details=True, limit=1000, marker=None, **query):
+        self.requests.append(limit)
+        start = 0
+        if marker:
+            start = next(i for i, server in enumerate(self.all) if server.id == marker) + 1
+        return iter(self.all[start:start + min(limit, self.max_limit)])
+
+
+def test_scan_continues_after_pages_capped_by_server():
+    compute = CappedCompute(total=2500, max_limit=1000)
+    conn = SimpleNamespace(compute=compute)
+
+    pages = list(iter_server_pages(conn, page_size=2000))
+
+    assert [len(page) for page in pages] == [1000, 1000, 500]
+    assert [s.id for page in pages for s in page] == [s.id for s in compute.all]
+    assert len(compute.requests) == 4  # L'ultima richiesta restituisce una pagina vuota
+
+
+def test_scan_totals_with_capped_pages():
+    conn = SimpleNamespace(compute=CappedCompute(total=1200, max_limit=500))
+
+    totals = scan_servers(conn, lambda server: {'vcpus': 2, 'ram_mb': 4096},
+                          page_size=1000, max_workers=2)
+
+    assert totals['server_count'] == 1200
+    assert totals['allocated_vcpus'] == 2400
+    assert totals['hosts']['hv-0']['active'] == 1200
@@ -0,0 +1,79 @@
+# Logging strutturato: formato text/json, coda non bloccante, campionamento e livelli
+import io
+import json
+import logging
+import queue
+import sys
+
+from forecasting_plugin.logs import (
+    NonBlockingQueueHandler, SamplingFilter, StructuredFormatter, _Pipeline, fields, parse_levels)
+
+
+def record(msg='Ciclo completato', level=logging.INFO, args=(), **extra):
+    entry = logging.LogRecord('forecasting_plugin.collector', level, __file__, 1, msg, args, None)
+    entry.__dict__.update(extra)
+    return entry
+
+
+def test_text_format_appends_fields():
+    line = StructuredFormatter('text').format(record(duration_ms=12.5, reason='circuit open', empty=''))
+    assert line.endswith('INFO    forecasting_plugin.collector Ciclo completato '
+                         'duration_ms=12.5 reason="circuit open" empty=""')
+
+
+def test_json_format_is_one_object_per_record():
+    try:
+        raise ValueError("flavor sconosciuto")
+    except ValueError:
+        entry = record('Errore %s', logging.ERROR, ('scansione',), page=3)
+        entry.exc_info = sys.exc_info()
+
+    data = json.loads(StructuredFormatter('json').format(entry))
+    assert data['level'] == 'ERROR' and data['msg'] == 'Errore scansione'
+    assert data['logger'] == 'forecasting_plugin.collector' and data['page'] == 3
+    assert 'ValueError: flavor sconosciuto' in data['exc']
+    assert fields(entry) == {'page': 3}
+
+
+def test_full_queue_drops_without_blocking_and_defers_formatting():
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=2))
+    args = (7, 'hv-0')
+    for _ in range(5):
+        handler.handle(record('Pagina %s su %s', args=args))
+
+    assert handler.dropped == 3
+    queued = handler.queue.get_nowait()
+    assert queued.args is args and queued.msg == 'Pagina %s su %s'  # Formattato solo dal thread di scrittura
+
+
+def test_sampling_filter_keeps_warnings():
+    sampler = SamplingFilter(every=3)
+    kept = [sampler.filter(record(level=logging.DEBUG)) for _ in range(7)]
+    assert kept == [True, False, False, True, False, False, True]
+    assert sampler.filter(record(level=logging.WARNING))
+
+
+def test_parse_levels():
+    assert parse_levels(' forecasting_plugin.inventory=debug, werkzeug=WARNING,,') == {
+        'forecasting_plugin.inventory': 'DEBUG', 'werkzeug': 'WARNING'}
+    assert parse_levels(None) == {}
+
+
+def test_pipeline_flushes_queued_records_on_stop():
+    stream = io.StringIO()
+    pipeline = _Pipeline(stream, 'json', queue_size=100)
+    pipeline.start()
+    logger = logging.getLogger('forecasting_plugin.tests.pipeline')
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    logger.addHandler(pipeline.handler)
+    try:
+        for i in range(10):
+            logger.info("Campione %d", i, extra={'cpu': 40.0 + i})
+    finally:
+        logger.removeHandler(pipeline.handler)
+        pipeline.stop()
+
+    lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [line['msg'] for line in lines] == [f"Campione {i}" for i in range(10)]
+    assert lines[-1]['cpu'] == 49.0
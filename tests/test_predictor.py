@@ -0,0 +1,28 @@
+# Orizzonti vuoti: come il ciclo originale su range(forecast_hours), nessuna previsione e nessun errore
+import numpy as np
+import pytest
+
+from forecasting_plugin.predictor import ResourcePredictor
+
+HISTORY = [40.0 + i % 7 for i in range(48)]
+
+
+@pytest.mark.parametrize('hours', [0, -1, -24])
+def test_sinusoidal_with_trend_empty_horizon(hours):
+    predictor = ResourcePredictor(seed=0)
+    assert predictor.sinusoidal_with_trend(HISTORY, hours) == []
+    assert predictor.sinusoidal_with_trend(HISTORY[:2], hours) == []  # Pattern giornaliero di default
+
+
+@pytest.mark.parametrize('hours', [0, -5])
+def test_sinusoidal_with_trend_batch_empty_horizon(hours):
+    series = np.array([HISTORY, HISTORY[::-1], HISTORY])
+    result = ResourcePredictor(seed=0).sinusoidal_with_trend_batch(series, hours)
+    assert result.shape == (3, 0)
+
+
+def test_empty_horizon_does_not_consume_draws():
+    # Una richiesta vuota non sposta lo stream: la previsione successiva non cambia
+    a, b = ResourcePredictor(seed=3), ResourcePredictor(seed=3)
+    a.sinusoidal_with_trend(HISTORY, 0)
+    assert a.sinusoidal_with_trend(HISTORY, 12, hour_now=5) == b.sinusoidal_with_trend(HISTORY, 12, hour_now=5)
@@ -0,0 +1,85 @@
+# Stato e metriche condivisi in prefork: file privati, niente symlink, solo dati dello stato
+import os
+import pickle
+import stat
+
+from forecasting_plugin.collector import collector
+from forecasting_plugin.instrumentation import Registry, SharedMetrics, merge, render
+from forecasting_plugin.shared import SharedState, default_state_path, write_private
+
+
+class Exploit:
+    def __reduce__(self):
+        return (os.system, ('true',))
+
+
+def test_default_state_path_is_in_a_private_directory(tmp_path, monkeypatch):
+    monkeypatch.setenv('XDG_RUNTIME_DIR', str(tmp_path))
+    path = default_state_path(5000)
+    directory = os.path.dirname(path)
+    assert os.path.dirname(directory) == str(tmp_path)
+    assert stat.S_IMODE(os.stat(directory).st_mode) == 0o700
+    assert default_state_path(5000) != path  # Nome non prevedibile
+
+
+def test_state_round_trip(tmp_path):
+    path = str(tmp_path / 'state.pkl')
+    collector._publish_snapshot()
+    SharedState(path).publish(collector.export_state())
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+
+    state, changed = SharedState(path).load()
+    assert changed and state['snapshot'].version == collector.snapshot.version
+
+
+def test_state_with_foreign_globals_is_rejected(tmp_path):
+    path = str(tmp_path / 'state.pkl')
+    write_private(path, pickle.dumps({'snapshot': Exploit()}))
+    shared = SharedState(path)
+    assert shared.load() == (None, False)
+    assert shared.rejected == 1
+
+
+def test_state_symlink_and_writable_files_are_rejected(tmp_path):
+    target = tmp_path / 'elsewhere.pkl'
+    target.write_bytes(pickle.dumps({'running': True}))
+    link = tmp_path / 'state.pkl'
+    link.symlink_to(target)
+    assert SharedState(str(link)).load() == (None, False)
+
+    writable = tmp_path / 'writable.pkl'
+    write_private(str(writable), pickle.dumps({'running': True}))
+    os.chmod(writable, 0o666)
+    assert SharedState(str(writable)).load() == (None, False)
+
+
+def test_publish_does_not_follow_a_planted_temp_symlink(tmp_path):
+    path = tmp_path / 'state.pkl'
+    victim = tmp_path / 'victim'
+    victim.write_text('intatto')
+    (tmp_path / f'state.pkl.{os.getpid()}.tmp').symlink_to(victim)
+
+    write_private(str(path), b'dati')
+    assert victim.read_text() == 'intatto'
+    assert path.read_bytes() == b'dati' and not path.is_symlink()
+
+
+def test_shared_metrics_are_json(tmp_path):
+    registry = Registry()
+    registry.counter('calls_total', "Chiamate", ['call']).labels('servers').inc(3)
+    registry.histogram('latency_seconds', "Latenza", ['call']).labels('servers').observe(0.02)
+    shared = SharedMetrics(str(tmp_path / 'state-metrics'))
+    shared.publish(registry, force=True)
+
+    files = list(tmp_path.iterdir())
+    assert [f.name for f in files] == [f'state-metrics-{os.getpid()}.json']
+    assert stat.S_IMODE(files[0].stat().st_mode) == 0o600
+    collected = shared.collect()
+    assert render(merge(collected)) == render(registry.export())
+
+
+def test_shared_metrics_reject_pickles(tmp_path):
+    shared = SharedMetrics(str(tmp_path / 'state-metrics'))
+    write_private(f"{shared.prefix}-{os.getpid()}.json", pickle.dumps(Exploit()))
+    assert shared.collect() == []
+
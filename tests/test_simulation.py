@@ -0,0 +1,73 @@
+# Simulazione deterministica: orologio virtuale, flotta scriptata, interruzioni e riproducibilità
+import re
+import subprocess
+import sys
+
+import pytest
+
+from forecasting_plugin.simulation import FakeConnection, Outages, ScriptedFleet, VirtualClock
+
+START = 1760000000
+
+
+def simulate(*args):
+    """Esegue la CLI in un processo separato (il collector è un singleton) e ne restituisce l'output"""
+    result = subprocess.run([sys.executable, '-m', 'forecasting_plugin.simulation', '--start', str(START), *args],
+                            capture_output=True, text=True, timeout=120, check=True)
+    return result.stdout
+
+
+def fingerprint(output):
+    return re.search(r'Impronta della serie cpu: (\w+)', output).group(1)
+
+
+def test_virtual_clock():
+    clock = VirtualClock(START)
+    clock.advance(90)
+    assert clock.monotonic() == START + 90
+    assert clock.now().timestamp() == START + 90
+
+
+def test_fleet_follows_the_daily_profile_and_is_seeded():
+    fleet = ScriptedFleet(200, hosts=4, seed=1)
+    day = START - START % 86400 + 86400 * 4  # Lunedì 13/10/2025 00:00 UTC
+
+    def active(epoch):
+        return {s.id for s in fleet.servers(epoch) if s.status == 'ACTIVE'}
+
+    night, afternoon = active(day + 3 * 3600), active(day + 14 * 3600)
+    assert night < afternoon  # Stesso rango: di notte un sottoinsieme delle VM del pomeriggio
+    assert active(day + 3 * 3600) == night
+
+    other = ScriptedFleet(200, hosts=4, seed=1)
+    assert {s.id for s in other.servers(day + 3 * 3600) if s.status == 'ACTIVE'} == night
+    assert len(fleet.host_names) == 4
+
+
+def test_outage_window_fails_every_call():
+    clock = VirtualClock(START)
+    connection = FakeConnection(ScriptedFleet(10, seed=0), clock, outages=Outages(clock, [(START + 60, START + 120)]))
+    assert len(list(connection.compute.servers(limit=3))) == 10
+    assert connection.compute.requests == 4  # Pagine da 3
+
+    clock.advance(60)
+    with pytest.raises(ConnectionError):
+        connection.compute.flavors()
+    with pytest.raises(ConnectionError):
+        connection.block_storage.volumes()
+    clock.advance(60)
+    assert len(connection.compute.hypervisors()) == 2
+    assert connection.outages.failures == 2
+
+
+def test_same_seed_same_run():
+    first = simulate('--days', '0.25')
+    assert fingerprint(simulate('--days', '0.25')) == fingerprint(first)
+    assert fingerprint(simulate('--days', '0.25', '--seed', '1')) != fingerprint(first)
+
+
+def test_outage_becomes_gaps_and_the_circuit_recovers():
+    output = simulate('--days', '0.25', '--outage', '2:1')
+    gaps, state = re.search(r'Buchi: (\d+) cicli \| circuito: (\w+)', output).groups()
+    assert int(gaps) == 60  # Un ciclo al minuto per un'ora
+    assert state == 'closed'
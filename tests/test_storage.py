@@ -0,0 +1,117 @@
+# Storage su segmenti giornalieri: persistenza, riparazione, compattazione e retention
+import numpy as np
+import pytest
+
+from forecasting_plugin.collector import OpenStackMetricsCollector
+from forecasting_plugin.config import Config
+from forecasting_plugin.storage import (
+    DAY, FLAG_ANOMALY_CPU, FLAG_GAP, HEADER_SIZE, RECORD_DTYPE, TimeSeriesStore)
+
+START = 1760000400  # 2025-10-09 09:00 UTC, multiplo di 300
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'STORAGE_DIR', str(tmp_path))
+    monkeypatch.setattr(Config, 'SSE_ENABLED', False)
+    return tmp_path
+
+
+def test_sample_is_persisted_into_empty_store(storage):
+    collector = OpenStackMetricsCollector()
+    collector.open_store()
+    assert collector.store is not None and len(collector.store) == 0  # Vuoto, quindi falsy
+
+    collector._record_sample(START, 42.0, 17.5, 'openstack_calculated', active_vms=3)
+    collector.store.close()
+
+    records = TimeSeriesStore(str(storage), read_only=True).range()
+    assert records['timestamp'].tolist() == [START]
+    assert records['cpu'].tolist() == [42.0]
+    assert records['ram'].tolist() == [17.5]
+    assert records['active_vms'].tolist() == [3]
+
+
+def test_partial_record_is_truncated_on_open(tmp_path):
+    store = TimeSeriesStore(str(tmp_path))
+    for i in range(3):
+        store.append(START + 60 * i, 10.0 + i, 20.0, 'openstack_calculated')
+    store.close()
+    path = tmp_path / f"metrics-{TimeSeriesStore.day_of(START)}.seg"
+    with open(path, 'ab') as f:
+        f.write(b'\x01' * 11)  # Crash a metà di un record
+
+    store = TimeSeriesStore(str(tmp_path))
+    assert path.stat().st_size == HEADER_SIZE + 3 * RECORD_DTYPE.itemsize
+    assert store.range()['cpu'].tolist() == [10.0, 11.0, 12.0]
+
+    store.append(START + 180, 13.0, 20.0, 'openstack_calculated')
+    assert store.range()['timestamp'].tolist() == [START + 60 * i for i in range(4)]
+
+
+def test_segment_without_header_is_removed(tmp_path):
+    (tmp_path / "metrics-20251009.seg").write_bytes(b'FCST')
+    store = TimeSeriesStore(str(tmp_path))
+    assert store.days() == []
+    assert len(store.range()) == 0
+
+
+def test_reads_span_days_and_skip_gaps(tmp_path):
+    store = TimeSeriesStore(str(tmp_path), compact_after_days=0)
+    timestamps = [START, START + DAY, START + DAY + 60, START + 2 * DAY]
+    for i, timestamp in enumerate(timestamps):
+        store.append(timestamp, float(i), float(i), 'openstack_calculated')
+    store.append_gap(START + 2 * DAY + 60)
+
+    assert len(store.days()) == 3
+    assert store.range()['timestamp'].tolist() == timestamps
+    assert store.range(START + DAY, START + 2 * DAY)['cpu'].tolist() == [1.0, 2.0]
+    assert store.tail(2)['timestamp'].tolist() == timestamps[-2:]
+    assert store.gaps().tolist() == [START + 2 * DAY + 60]
+    assert np.isnan(store.range(gaps=True)['cpu'][-1])
+
+
+def test_retention_drops_expired_segments_on_rotation(tmp_path):
+    store = TimeSeriesStore(str(tmp_path), retention_days=2, compact_after_days=0)
+    for day in range(4):
+        store.append(START + day * DAY, 10.0, 10.0, 'openstack_calculated')
+
+    # Al cambio di giorno restano solo i segmenti entro la retention
+    assert store.days() == [TimeSeriesStore.day_of(START + day * DAY) for day in (1, 2, 3)]
+    assert store.range()['timestamp'].tolist() == [START + day * DAY for day in (1, 2, 3)]
+
+
+def test_compaction_averages_buckets_and_keeps_one_gap_marker(tmp_path):
+    store = TimeSeriesStore(str(tmp_path), compact_after_days=1, compact_resolution=300)
+    day = TimeSeriesStore.day_of(START)
+    for i in range(5):
+        store.append(START + 60 * i, 10.0 * (i + 1), 5.0, 'openstack_calculated', active_vms=i)
+    store.append_gap(START + 600)
+    store.append_gap(START + 660)
+
+    store.append(START + DAY, 1.0, 1.0, 'openstack_calculated')  # Rotazione: non ancora da compattare
+    assert len(store.range(gaps=True)) == 8
+    store.append(START + 2 * DAY, 1.0, 1.0, 'openstack_calculated')
+
+    compacted = store.range(START, START + DAY, gaps=True)
+    assert compacted['timestamp'].tolist() == [START, START + 600]
+    assert compacted['cpu'][0] == pytest.approx(30.0)
+    assert compacted['active_vms'][0] == 4  # Stato dall'ultimo campione del bucket
+    assert compacted['flags'].tolist() == [0, FLAG_GAP]
+    assert store._read_header(day)['resolution'] == 300
+
+    store.compact(day)  # Già compattato: nessun cambiamento
+    assert store.range(START, START + DAY, gaps=True)['timestamp'].tolist() == [START, START + 600]
+
+
+def test_compaction_keeps_quarantined_spikes_out_of_the_mean(tmp_path):
+    store = TimeSeriesStore(str(tmp_path), compact_after_days=1, quarantine_samples=3)
+    for i, cpu in enumerate([20.0, 20.0, 95.0, 20.0]):
+        store.append(START + 60 * i, cpu, 30.0, 'openstack_calculated',
+                     flags=FLAG_ANOMALY_CPU if cpu > 90 else 0)
+    store.compact(TimeSeriesStore.day_of(START))
+
+    bucket = store.range()
+    assert bucket['cpu'].tolist() == [20.0]  # Lo spike resta fuori dalla media
+    assert bucket['ram'].tolist() == [30.0]
+    assert bucket['flags'].tolist() == [FLAG_ANOMALY_CPU]